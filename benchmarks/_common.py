@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import json
+
+
+def sample_payload_json(lagoon_id: str, seq: int, tag_count: int = 30) -> str:
+    tags = {f"PT{index:03d}_R": round(1.0 + index * 0.01 + seq * 0.001, 3) for index in range(tag_count)}
+    return json.dumps(
+        {
+            "lagoon_id": lagoon_id,
+            "product_type": "crystal",
+            "source": "rockwell",
+            "timestamp": f"2026-04-11T18:00:{seq % 60:02d}+00:00",
+            "tags": tags,
+        }
+    )
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
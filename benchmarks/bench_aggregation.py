@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from common.aggregation import WindowAggregator
+from workers.get_simulator import SimulatedTagReader
+
+T0 = datetime(2026, 4, 11, 18, 0, tzinfo=timezone.utc)
+
+
+def _tag_specs(analogs: int) -> dict[str, Any]:
+    specs: dict[str, Any] = {}
+    for index in range(analogs):
+        prefix = "PT" if index % 2 else "FIT"
+        specs[f"{prefix}{index:03d}_R"] = {"min": 0, "max": 100, "step": 0.5, "decimals": 3}
+    return specs
+
+
+def _body(tags: dict[str, Any], ts: datetime) -> bytes:
+    return json.dumps(
+        {"lagoon_id": "bench", "source": "rockwell", "timestamp": ts.isoformat(), "tags": tags}
+    ).encode("utf-8")
+
+
+def _run(inputs: list[dict[str, Any]], window_sec: float | None) -> tuple[int, int, float]:
+    aggregator = WindowAggregator(["PT*_R", "FIT*_R"], window_sec) if window_sec else None
+    payloads = wire = 0
+    started = time.process_time()
+    for second, tags in enumerate(inputs):
+        ts = T0 + timedelta(seconds=second)
+        if aggregator is None:
+            payloads += 1
+            wire += len(_body(tags, ts))
+            continue
+        raw, closed = aggregator.add(tags, ts)
+        if closed is not None:
+            payloads += 1
+            wire += len(_body(closed[1], closed[0]))
+        if raw:
+            payloads += 1
+            wire += len(_body(raw, ts))
+    if aggregator is not None and (closed := aggregator.flush()) is not None:
+        payloads += 1
+        wire += len(_body(closed[1], closed[0]))
+    return payloads, wire, time.process_time() - started
+
+
+def _state_bytes(inputs: list[dict[str, Any]], window_sec: float) -> int:
+    """Memoria retenida por el agregador al final de la corrida (sin payloads)."""
+    tracemalloc.start()
+    aggregator = WindowAggregator(["PT*_R", "FIT*_R"], window_sec)
+    for second, tags in enumerate(inputs):
+        aggregator.add(tags, T0 + timedelta(seconds=second))
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Payload crudo a 1 Hz vs agregacion por ventana (min/max/avg/last)")
+    parser.add_argument("--analogs", type=int, default=40)
+    parser.add_argument("--seconds", type=int, default=3600)
+    parser.add_argument("--windows", type=float, nargs="+", default=[60, 300, 3600])
+    args = parser.parse_args()
+
+    reader = SimulatedTagReader(_tag_specs(args.analogs), seed=3)
+    inputs = [reader.read_once() for _ in range(args.seconds)]
+
+    raw_payloads, raw_wire, raw_sec = _run(inputs, None)
+    print(f"tags={args.analogs} seconds={args.seconds}")
+    print(f"raw          payloads={raw_payloads:<6} bytes={raw_wire:<10} cpu={raw_sec / args.seconds * 1e6:>6.1f}us/ciclo")
+    for window_sec in args.windows:
+        payloads, wire, elapsed = _run(inputs, window_sec)
+        state = _state_bytes(inputs, window_sec)
+        print(
+            f"window={window_sec:<6g} payloads={payloads:<6} bytes={wire:<10} cpu={elapsed / args.seconds * 1e6:>6.1f}us/ciclo "
+            f"reduccion={raw_payloads / max(payloads, 1):.0f}x payloads {raw_wire / max(wire, 1):.0f}x bytes "
+            f"estado={state / 1024:.1f}KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
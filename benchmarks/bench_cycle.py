@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from common.payload import NormalizedPayload
+from common.tag_plan import TagPlan
+from normalizer.tot_delta_normalizer import TotDeltaNormalizer
+
+TOT_TAG = "WM01_TOT_SCADA"
+DELTA_TAG = "WM01_TOT_DELTA_SCADA"
+
+
+# Detectores del hot path anterior, conservados como linea base del benchmark.
+class BooleanEventDetector:
+    def __init__(self):
+        self.last_states: dict[tuple, bool] = {}
+
+    def process(
+        self,
+        lagoon_id: str,
+        tags: dict[str, Any],
+        ts,
+        event_tags: dict[str, str],
+    ) -> list[dict]:
+        events: list[dict] = []
+
+        for tag_id, label in event_tags.items():
+            if tag_id not in tags:
+                continue
+
+            raw_value = tags[tag_id]
+            if raw_value is None:
+                continue
+
+            value = bool(raw_value)
+            key = (lagoon_id, tag_id)
+            prev = self.last_states.get(key)
+
+            if prev is None:
+                self.last_states[key] = value
+                continue
+
+            if prev is False and value is True:
+                events.append(
+                    {
+                        "type": "OPEN",
+                        "lagoon_id": lagoon_id,
+                        "tag_id": tag_id,
+                        "tag_label": label,
+                        "alert_type": "BOOLEAN",
+                        "state": int(value),
+                        "ts": ts.isoformat(),
+                    }
+                )
+            elif prev is True and value is False:
+                events.append(
+                    {
+                        "type": "CLOSE",
+                        "lagoon_id": lagoon_id,
+                        "tag_id": tag_id,
+                        "alert_type": "BOOLEAN",
+                        "state": int(value),
+                        "ts": ts.isoformat(),
+                    }
+                )
+
+            self.last_states[key] = value
+
+        return events
+
+
+class StateEventDetector:
+    def __init__(self):
+        self.last_states: dict[tuple, int] = {}
+
+    def process(self, lagoon_id: str, tags: dict[str, Any], ts) -> list[dict]:
+        events: list[dict] = []
+
+        for tag_id, raw_value in tags.items():
+            if isinstance(raw_value, bool):
+                continue
+            if not isinstance(raw_value, int):
+                continue
+            if raw_value not in (0, 1, 2, 3):
+                continue
+
+            key = (lagoon_id, tag_id)
+            prev = self.last_states.get(key)
+
+            if prev is None:
+                self.last_states[key] = raw_value
+                continue
+
+            if prev != raw_value:
+                events.append(
+                    {
+                        "type": "STATE_CHANGE",
+                        "lagoon_id": lagoon_id,
+                        "tag_id": tag_id,
+                        "alert_type": "STATE",
+                        "previous_state": prev,
+                        "state": raw_value,
+                        "ts": ts.isoformat(),
+                    }
+                )
+
+            self.last_states[key] = raw_value
+
+        return events
+
+
+def _build_tags(tag_count: int, seed: int) -> tuple[dict[str, Any], dict[str, str]]:
+    rng = random.Random(seed)
+    tags: dict[str, Any] = {TOT_TAG: 1000.0}
+    event_tags: dict[str, str] = {}
+    for index in range(tag_count - 1):
+        kind = index % 10
+        if kind == 0:
+            tag_id = f"VE{index:04d}_ST"
+            tags[tag_id] = rng.random() < 0.5
+            event_tags[tag_id] = f"Valvula {index}"
+        elif kind in (1, 2):
+            tags[f"P{index:04d}_ST"] = rng.randint(0, 3)
+        else:
+            tags[f"PT{index:04d}_R"] = round(rng.uniform(0, 100), 3)
+    return tags, event_tags
+
+
+def _next_cycle(template: dict[str, Any], rng: random.Random) -> dict[str, Any]:
+    tags = dict(template)
+    for tag_id, value in template.items():
+        if type(value) is float:
+            tags[tag_id] = value + rng.random()
+    # Cambios discretos ocasionales, como en planta.
+    tag_id = rng.choice(list(template))
+    value = template[tag_id]
+    if type(value) is bool:
+        template[tag_id] = not value
+    elif type(value) is int:
+        template[tag_id] = (value + 1) % 4
+    tags[TOT_TAG] = template[TOT_TAG] = template[TOT_TAG] + 1.0
+    return tags
+
+
+def _legacy_cycle(state: dict, raw_tags: dict[str, Any], ts: datetime) -> NormalizedPayload:
+    tags = dict(raw_tags)
+    if TOT_TAG in tags:
+        tags[DELTA_TAG] = state["tot"].compute(f"bench:{TOT_TAG}", tags.get(TOT_TAG))
+    payload = NormalizedPayload(lagoon_id="bench", source="rockwell", timestamp=ts, tags=tags)
+    events = state["boolean"].process("bench", tags, payload.timestamp, state["event_tags"])
+    events.extend(state["state"].process("bench", tags, payload.timestamp))
+    if events:
+        payload.events = events
+    return payload
+
+
+def _plan_cycle(state: dict, raw_tags: dict[str, Any], ts: datetime) -> NormalizedPayload:
+    plan: TagPlan = state["plan"]
+    tags = raw_tags
+    events = plan.process(tags, ts)
+    if plan.has_totalizer:
+        tags[DELTA_TAG] = state["tot"].compute(f"bench:{TOT_TAG}", tags.get(TOT_TAG))
+    return NormalizedPayload.model_construct(
+        lagoon_id="bench",
+        source="rockwell",
+        timestamp=ts,
+        tags=tags,
+        events=events or None,
+    )
+
+
+def _run(tag_count: int, cycles: int) -> None:
+    template, event_tags = _build_tags(tag_count, seed=tag_count)
+    rng = random.Random(1)
+    inputs = [_next_cycle(template, rng) for _ in range(cycles)]
+    ts = datetime(2026, 4, 11, 18, 0, tzinfo=timezone.utc)
+
+    results = {}
+    for name, cycle in (("legacy", _legacy_cycle), ("plan", _plan_cycle)):
+        state = {
+            "tot": TotDeltaNormalizer(),
+            "boolean": BooleanEventDetector(),
+            "state": StateEventDetector(),
+            "event_tags": event_tags,
+            "plan": TagPlan("bench", event_tags, totalizer_tag=TOT_TAG),
+        }
+        batch = [dict(tags) for tags in inputs]
+        started = time.process_time()
+        events = 0
+        for tags in batch:
+            events += len(cycle(state, tags, ts).events or ())
+        results[name] = ((time.process_time() - started) / cycles, events)
+
+    legacy_sec, legacy_events = results["legacy"]
+    plan_sec, plan_events = results["plan"]
+    print(
+        f"tags={tag_count:<5} legacy={legacy_sec * 1e6:>8.1f}us/ciclo plan={plan_sec * 1e6:>8.1f}us/ciclo "
+        f"speedup={legacy_sec / plan_sec:>4.1f}x events={legacy_events}/{plan_events}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CPU por ciclo: detectores por tag vs plan compilado")
+    parser.add_argument("--tags", type=int, nargs="+", default=[30, 300, 3000])
+    parser.add_argument("--cycles", type=int, default=2000)
+    args = parser.parse_args()
+
+    for tag_count in args.tags:
+        _run(tag_count, args.cycles)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from common.payload import CyclePayload, NormalizedPayload
+from common.sender import BackendSender
+from workers.get_simulator import SimulatedTagReader
+
+T0 = datetime(2026, 4, 11, 18, 0, tzinfo=timezone.utc)
+SENDER = BackendSender(url="http://127.0.0.1:1/ingest/scada")
+
+
+def _tag_specs(analogs: int, discretes: int) -> dict[str, Any]:
+    specs: dict[str, Any] = {f"PT{index:03d}_R": {"min": 0, "max": 100, "step": 0.5, "decimals": 3} for index in range(analogs)}
+    for index in range(discretes):
+        specs[f"VE{index:03d}_ST"] = {"type": "bool", "change_probability": 0.01}
+    return specs
+
+
+def _pydantic(tags: dict[str, Any], ts: datetime, spool: bool) -> int:
+    # Camino anterior: modelo Pydantic, cuerpo rearmado y serializado por `requests` (json=), y otra vez para el spool.
+    payload = NormalizedPayload.model_construct(
+        lagoon_id="bench", product_type="crystal", source="rockwell", timestamp=ts, tags=tags, events=None
+    )
+    size = len(json.dumps(SENDER._build_body(payload), allow_nan=False).encode("utf-8"))
+    if spool:
+        size += len(payload.model_dump_json().encode("utf-8"))
+    return size
+
+
+def _cycle(tags: dict[str, Any], ts: datetime, spool: bool) -> int:
+    payload = CyclePayload("bench", "crystal", "rockwell", ts, tags)
+    size = len(payload.encode())
+    if spool:
+        # Mismos bytes: el spool no vuelve a serializar.
+        size += len(payload.encode())
+    return size
+
+
+def _cpu(path: Callable[[dict, datetime, bool], int], inputs: list[dict], stamps: list[datetime], spool: bool, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        for tags, ts in zip(inputs, stamps):
+            path(tags, ts, spool)
+        best = min(best, time.process_time() - started)
+    return best / len(inputs)
+
+
+def _peak(path: Callable[[dict, datetime, bool], int], inputs: list[dict], stamps: list[datetime], spool: bool) -> float:
+    """Pico de memoria transitoria por payload (objeto, dict del cuerpo y strings/bytes intermedios)."""
+    total = 0
+    tracemalloc.start()
+    for tags, ts in zip(inputs, stamps):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        path(tags, ts, spool)
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total / len(inputs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="NormalizedPayload + doble serializacion vs CyclePayload codificado una vez")
+    parser.add_argument("--payloads", type=int, default=5000)
+    parser.add_argument("--analogs", type=int, default=60)
+    parser.add_argument("--discretes", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    reader = SimulatedTagReader(_tag_specs(args.analogs, args.discretes), seed=5)
+    inputs = [reader.read_once() for _ in range(args.payloads)]
+    stamps = [T0 + timedelta(seconds=second) for second in range(args.payloads)]
+
+    print(f"payloads={args.payloads} tags={len(inputs[0])}")
+    for spool in (False, True):
+        scenario = "http+spool" if spool else "http"
+        results = {}
+        for name, path in (("pydantic", _pydantic), ("cycle", _cycle)):
+            results[name] = (_cpu(path, inputs, stamps, spool, args.repeat), _peak(path, inputs[:500], stamps, spool))
+            cpu, peak = results[name]
+            print(f"{scenario:<10} {name:<8} cpu={cpu * 1e6:>6.1f}us/payload pico={peak / 1024:>5.1f}KiB/payload")
+        (old_cpu, old_peak), (new_cpu, new_peak) = results["pydantic"], results["cycle"]
+        print(f"{scenario:<10} reduccion cpu={old_cpu / max(new_cpu, 1e-12):.2f}x pico={old_peak / max(new_peak, 1):.2f}x")
+    SENDER.close()
+
+
+if __name__ == "__main__":
+    main()
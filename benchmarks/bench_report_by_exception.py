@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from common.payload import CyclePayload
+from common.report_by_exception import parse_report_by_exception
+from workers.get_simulator import SimulatedTagReader
+
+TOT_TAG = "WM01_TOT_SCADA"
+
+# Tasas de cambio tipicas de planta a 1 Hz: analogos con ruido chico y deriva lenta,
+# valvulas y estados que cambian pocas veces por hora.
+DEFAULT_DEADBANDS = {
+    "PT*_R": {"abs": 0.05},
+    "LT*_R": {"abs": 0.02},
+    "FIT*_R": {"pct": 1.0},
+    "TE*_R": {"abs": 0.1},
+}
+
+
+def _tag_specs(analogs: int, discretes: int) -> dict[str, Any]:
+    specs: dict[str, Any] = {}
+    for index in range(analogs):
+        kind = index % 4
+        if kind == 0:
+            specs[f"PT{index:03d}_R"] = {"min": 0, "max": 6, "step": 0.02, "decimals": 3, "change_probability": 0.5}
+        elif kind == 1:
+            specs[f"LT{index:03d}_R"] = {"min": 0, "max": 4, "step": 0.01, "decimals": 3, "change_probability": 0.3}
+        elif kind == 2:
+            specs[f"FIT{index:03d}_R"] = {"min": 10, "max": 400, "step": 1.0, "decimals": 2, "change_probability": 0.6}
+        else:
+            specs[f"TE{index:03d}_R"] = {"min": 15, "max": 30, "step": 0.05, "decimals": 1, "change_probability": 0.2}
+    for index in range(discretes):
+        if index % 2:
+            specs[f"VE{index:03d}_ST"] = {"type": "bool", "change_probability": 0.002}
+        else:
+            specs[f"P{index:03d}_ST"] = {"type": "state", "values": [0, 1, 2, 3], "change_probability": 0.002}
+    return specs
+
+
+def _cycles(cycles: int, analogs: int, discretes: int) -> list[dict[str, Any]]:
+    reader = SimulatedTagReader(_tag_specs(analogs, discretes), seed=7)
+    tot = 1000.0
+    out = []
+    for cycle in range(cycles):
+        tags = reader.read_once()
+        # Totalizador: cuenta en pasos de 0.1 m3, unas pocas veces por minuto.
+        if cycle % 7 == 0:
+            tot = round(tot + 0.1, 1)
+        tags[TOT_TAG] = tot
+        out.append(tags)
+    return out
+
+
+def _encode(tags: dict[str, Any], ts: datetime) -> bytes:
+    # Mismo camino que el envio HTTP: el cuerpo que el collector codifica una vez por payload.
+    return CyclePayload("bench", "crystal", "rockwell", ts, tags).encode()
+
+
+def _run(inputs: list[dict[str, Any]], rbe_cfg: dict | None, repeat: int) -> tuple[float, int, int, int]:
+    # Mejor de `repeat` corridas: con una sola, el ruido del equipo tapa la diferencia de CPU.
+    runs = [_run_once(inputs, rbe_cfg) for _ in range(max(1, repeat))]
+    return (min(run[0] for run in runs),) + runs[0][1:]
+
+
+def _run_once(inputs: list[dict[str, Any]], rbe_cfg: dict | None) -> tuple[float, int, int, int]:
+    report_filter = parse_report_by_exception(rbe_cfg)
+    if report_filter is not None:
+        # Reloj del benchmark: un ciclo = un segundo de planta.
+        clock = [0.0]
+        report_filter.clock = lambda: clock[0]
+    ts = datetime(2026, 4, 11, 18, 0, tzinfo=timezone.utc)
+    batch = [dict(tags) for tags in inputs]
+
+    payloads = wire = tags_out = 0
+    started = time.process_time()
+    for cycle, tags in enumerate(batch):
+        report = tags
+        if report_filter is not None:
+            clock[0] = float(cycle)
+            report = report_filter.filter(tags)
+        if not report:
+            continue
+        body = _encode(report, ts)
+        payloads += 1
+        wire += len(body)
+        tags_out += len(report)
+    return time.process_time() - started, payloads, wire, tags_out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Payload completo por ciclo vs report-by-exception con deadbands")
+    parser.add_argument("--cycles", type=int, default=3600, help="ciclos de 1 s (3600 = una hora)")
+    parser.add_argument("--analogs", type=int, default=40)
+    parser.add_argument("--discretes", type=int, default=20)
+    parser.add_argument("--snapshot-every-sec", type=float, default=60.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    inputs = _cycles(args.cycles, args.analogs, args.discretes)
+    tag_count = len(inputs[0])
+    rbe_cfg = {"snapshot_every_sec": args.snapshot_every_sec, "deadbands": DEFAULT_DEADBANDS}
+
+    full_sec, full_payloads, full_wire, full_tags = _run(inputs, None, args.repeat)
+    rbe_sec, rbe_payloads, rbe_wire, rbe_tags = _run(inputs, rbe_cfg, args.repeat)
+
+    print(f"tags={tag_count} cycles={args.cycles} snapshot_every_sec={args.snapshot_every_sec:g}")
+    for name, sec, payloads, wire, tags_out in (
+        ("full", full_sec, full_payloads, full_wire, full_tags),
+        ("rbe", rbe_sec, rbe_payloads, rbe_wire, rbe_tags),
+    ):
+        print(
+            f"{name:<5} payloads={payloads:<6} tags={tags_out:<8} bytes={wire:<10} "
+            f"bytes/ciclo={wire / args.cycles:>8.1f} cpu={sec / args.cycles * 1e6:>7.1f}us/ciclo"
+        )
+    print(
+        f"reduccion bytes={full_wire / max(rbe_wire, 1):.1f}x tags={full_tags / max(rbe_tags, 1):.1f}x "
+        f"cpu={full_sec / max(rbe_sec, 1e-9):.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
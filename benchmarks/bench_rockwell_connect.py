@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import argparse
+import struct
+import tempfile
+import time
+
+from pycomm3 import LogixDriver
+
+from benchmarks._common import percentile
+from workers.get_rockwell import RockwellSessionReader
+from workers.rockwell_tag_cache import CachedLogixDriver, TagDefinitionCache
+
+DINT_CODE = 0xC4
+REAL_CODE = 0xCA
+FIRST_UDT_ID = 0x100
+
+
+class _SimulatedController(LogixDriver):
+    """
+    Stand-in de un controlador grande: cada request CIP del upload cuesta
+    `request_latency_sec` y el tag list llega en paginas de `tags_per_request`.
+    """
+
+    controller_tags = 2000
+    udt_count = 50
+    request_latency_sec = 0.002
+    tags_per_request = 25
+    requests = 0
+
+    def _request(self) -> None:
+        _SimulatedController.requests += 1
+        time.sleep(self.request_latency_sec)
+
+    def open(self) -> bool:
+        # Register session + list identity + info + nombre del programa.
+        for _ in range(4):
+            self._request()
+        self._target_is_connected = True
+        self._info = {"product_code": 96, "serial": "00c0ffee", "revision": {"major": 33, "minor": 11}, "name": "Main"}
+        return True
+
+    def close(self) -> None:
+        pass
+
+    def _get_instance_attribute_list_service(self, program=None):
+        tags = []
+        for index in range(self.controller_tags):
+            if index % self.tags_per_request == 0:
+                self._request()
+            udt = index % (self.udt_count * 4) if self.udt_count else -1
+            symbol_type = 0x8000 | (FIRST_UDT_ID + udt) if 0 <= udt < self.udt_count else REAL_CODE
+            tags.append(
+                {
+                    "instance_id": index + 1,
+                    "tag_name": f"TAG_{index:05d}",
+                    "symbol_type": symbol_type,
+                    "symbol_address": 0,
+                    "symbol_object_address": 0,
+                    "software_control": 0x20000000,
+                    "external_access": "Read/Write",
+                    "dimensions": [0, 0, 0],
+                }
+            )
+        return tags
+
+    def _get_structure_makeup(self, instance_id):
+        if instance_id not in self._cache["id:struct"]:
+            self._request()
+            self._cache["id:struct"][instance_id] = {
+                "object_definition_size": 10,
+                "structure_size": 8,
+                "member_count": 2,
+                "structure_handle": instance_id,
+            }
+        return self._cache["id:struct"][instance_id]
+
+    def _read_template(self, instance_id, object_definition_size):
+        self._request()
+        members = struct.pack("<HHI", 0, DINT_CODE, 0) + struct.pack("<HHI", 0, REAL_CODE, 4)
+        return members + f"UDT_{instance_id};n".encode() + b"\x00Speed\x00Flow\x00"
+
+
+class _BenchDriver(CachedLogixDriver, _SimulatedController):
+    pass
+
+
+def _connect_ms(tag_map: dict[str, str], cache: TagDefinitionCache) -> tuple[float, int]:
+    reader = RockwellSessionReader(
+        ip="10.0.0.5",
+        slot=0,
+        tag_map=tag_map,
+        background_connect=False,
+        tag_cache=cache,
+        driver_factory=_BenchDriver,
+    )
+    _SimulatedController.requests = 0
+    reader._connect()
+    return reader.last_connect_sec * 1000, _SimulatedController.requests
+
+
+def _run(controller_tags: int, udt_count: int, configured: int, repeats: int) -> None:
+    _SimulatedController.controller_tags = controller_tags
+    _SimulatedController.udt_count = udt_count
+    tag_map = {f"L{index:03d}": f"TAG_{index:05d}" for index in range(configured)}
+    tag_map.update({f"S{index:03d}": f"TAG_{index:05d}.Speed" for index in range(0, udt_count, 10)})
+
+    cold: list[float] = []
+    warm: list[float] = []
+    cold_requests = warm_requests = 0
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = TagDefinitionCache(cache_dir)
+            elapsed, cold_requests = _connect_ms(tag_map, cache)
+            cold.append(elapsed)
+            elapsed, warm_requests = _connect_ms(tag_map, cache)
+            warm.append(elapsed)
+
+    cold_p50 = percentile(cold, 50)
+    warm_p50 = percentile(warm, 50)
+    print(
+        f"controller_tags={controller_tags:<6} udts={udt_count:<4} configured={len(tag_map):<4} "
+        f"cold_p50={cold_p50:>8.1f}ms ({cold_requests} req) "
+        f"warm_p50={warm_p50:>6.1f}ms ({warm_requests} req) "
+        f"speedup={cold_p50 / warm_p50 if warm_p50 else 0.0:>5.1f}x"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Connect Rockwell: upload completo vs definiciones cacheadas")
+    parser.add_argument("--controller-tags", type=int, nargs="+", default=[500, 5000, 20000])
+    parser.add_argument("--udts", type=int, default=50)
+    parser.add_argument("--configured", type=int, default=30)
+    parser.add_argument("--request-latency-ms", type=float, default=2.0)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    _SimulatedController.request_latency_sec = args.request_latency_ms / 1000
+    for controller_tags in args.controller_tags:
+        _run(controller_tags, args.udts, args.configured, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import argparse
+from typing import Any
+
+from common.config import load_config
+from workers.scan_classes import ScanClassReader, parse_scan_classes
+
+# Modelo de tamano CIP (lectura multi-servicio de pycomm3), suficiente para comparar estrategias:
+# encapsulacion ENIP + CPF por paquete, cabecera multi-servicio + offset por tag,
+# y por tag: servicio, path simbolico por segmento (padding par) y cantidad de elementos.
+PACKET_OVERHEAD = 48
+MULTI_SERVICE_HEADER = 8
+REPLY_PER_TAG = 10
+
+DEFAULT_SCAN_CLASSES = {
+    "slow": {"interval_sec": 60, "tags": ["WM01_TOT*", "TE*", "TH*"]},
+    "medium": {"interval_sec": 10, "tags": ["*_ST", "*.ST", "*_FREQ"]},
+}
+
+
+def _request_bytes(plc_tag: str) -> int:
+    path = sum(2 + len(part) + len(part) % 2 for part in plc_tag.split("."))
+    return 1 + 1 + path + 2 + 2
+
+
+def _packets(sizes: list[int], connection_size: int) -> int:
+    packets = 0
+    used = connection_size
+    for size in sizes:
+        if used + size > connection_size:
+            packets += 1
+            used = MULTI_SERVICE_HEADER
+        used += size
+    return packets
+
+
+class _CountingReader:
+    def __init__(self, tag_map: dict[str, str]) -> None:
+        self.tag_map = tag_map
+        self.tag_ids = list(tag_map)
+        self.reads: list[tuple[str, ...]] = []
+
+    def read_once(self) -> dict[str, Any]:
+        return self.read_tags(tuple(self.tag_ids))
+
+    def read_tags(self, tag_ids: tuple[str, ...]) -> dict[str, Any]:
+        self.reads.append(tag_ids)
+        return {tag_id: 0.0 for tag_id in tag_ids}
+
+
+def _traffic(reader: _CountingReader, connection_size: int) -> tuple[int, int, int]:
+    packets = tags = wire = 0
+    for tag_ids in reader.reads:
+        sizes = [_request_bytes(reader.tag_map[tag_id]) + 2 for tag_id in tag_ids]
+        read_packets = _packets(sizes, connection_size)
+        packets += read_packets
+        tags += len(tag_ids)
+        wire += sum(sizes) + read_packets * (2 * PACKET_OVERHEAD + MULTI_SERVICE_HEADER) + len(tag_ids) * REPLY_PER_TAG
+    return packets, tags, wire
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Polling uniforme vs scan classes sobre un tag map real")
+    parser.add_argument("--config", default="config/laguna_mountain_view.yml")
+    parser.add_argument("--minutes", type=int, default=10)
+    args = parser.parse_args()
+
+    cfg = load_config(args.config)
+    tag_map = {str(key): str(value) for key, value in cfg["tags"].items()}
+    poll = float(cfg.get("poll_seconds", 1))
+    ticks = int(args.minutes * 60 / poll)
+    raw_classes = cfg.get("scan_classes") or DEFAULT_SCAN_CLASSES
+
+    uniform = _CountingReader(tag_map)
+    for _ in range(ticks):
+        uniform.read_once()
+
+    multi = _CountingReader(tag_map)
+    now = [0.0]
+    reader = ScanClassReader(multi, parse_scan_classes(raw_classes, poll), poll, clock=lambda: now[0])
+    for _ in range(ticks):
+        reader.read_once()
+        now[0] += poll
+
+    print(
+        f"config={args.config} tags={len(tag_map)} ticks={ticks} classes="
+        + ",".join(f"{c.name}:{len(c.tag_ids)}@{c.interval_sec:g}s" for c in reader.classes)
+    )
+    for connection_size in (500, 4002):
+        base_packets, base_tags, base_bytes = _traffic(uniform, connection_size)
+        packets, tags, wire = _traffic(multi, connection_size)
+        print(
+            f"connection_size={connection_size:<5} "
+            f"uniform: packets={base_packets:<6} tag_reads={base_tags:<7} bytes={base_bytes:<9} "
+            f"scan_classes: packets={packets:<6} tag_reads={tags:<7} bytes={wire:<9} "
+            f"saved_bytes={100 * (1 - wire / base_bytes):.1f}% saved_packets={100 * (1 - packets / base_packets):.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
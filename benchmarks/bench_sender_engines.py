@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Queue
+
+from common.delivery import enqueue_payload, sender_worker_loop
+from common.payload import NormalizedPayload
+from common.sender import BackendSender
+from common.sender_engine import AsyncSenderEngine, SenderLane
+from common.time import utc_now
+
+
+class _IngestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        with self.server.stats_lock:
+            self.server.requests += 1
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _child(model: str, lagoons: int, url: str, duration_sec: float, interval_sec: float) -> None:
+    os.chdir(tempfile.mkdtemp(prefix="bench-sender-"))
+    rss_before = _rss_bytes()
+    threads_before = threading.active_count()
+
+    queues: list[tuple[str, Queue]] = []
+    engine: AsyncSenderEngine | None = None
+    lane_options = {
+        "spool_on_fail": True,
+        "log_every_n_sends": 0,
+        "replay_batch_size": 10,
+        "max_replay_payload_age_sec": 900,
+        "retry_attempts": 0,
+        "retry_backoff_base_sec": 0.0,
+        "retry_backoff_max_sec": 0.0,
+    }
+    if model == "asyncio":
+        engine = AsyncSenderEngine(max_connections=8)
+        sender = BackendSender(url=url, pool_maxsize=8)
+        for index in range(lagoons):
+            lagoon_id = f"bench-{index}"
+            queues.append((lagoon_id, engine.register(SenderLane(lagoon_id, sender, **lane_options), maxsize=100)))
+    else:
+        for index in range(lagoons):
+            lagoon_id = f"bench-{index}"
+            send_queue: Queue = Queue(maxsize=100)
+            threading.Thread(
+                target=sender_worker_loop,
+                args=(lagoon_id, BackendSender(url=url, pool_connections=1, pool_maxsize=1), send_queue)
+                + tuple(lane_options.values()),
+                daemon=True,
+            ).start()
+            queues.append((lagoon_id, send_queue))
+
+    time.sleep(0.5)
+    rss_ready = _rss_bytes()
+
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    seq = 0
+    while time.perf_counter() - started < duration_sec:
+        tick = time.perf_counter()
+        for lagoon_id, send_queue in queues:
+            payload = NormalizedPayload(
+                lagoon_id=lagoon_id,
+                source="simulator",
+                timestamp=utc_now(),
+                tags={f"PT{index:03d}_R": seq + index * 0.01 for index in range(30)},
+            )
+            enqueue_payload(send_queue, payload, "drop_newest")
+        seq += 1
+        time.sleep(max(0.0, interval_sec - (time.perf_counter() - tick)))
+    for _, send_queue in queues:
+        send_queue.join()
+    elapsed = time.perf_counter() - started
+    cpu_sec = time.process_time() - cpu_started
+    threads_used = threading.active_count() - threads_before
+
+    print(
+        json.dumps(
+            {
+                "threads": threads_used,
+                "rss_bytes": rss_ready - rss_before,
+                "cpu_sec": cpu_sec,
+                "elapsed_sec": elapsed,
+                "payloads": seq * lagoons,
+            }
+        ),
+        flush=True,
+    )
+    if engine is not None:
+        engine.stop(2.0)
+    os._exit(0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Hebra por laguna vs engine asyncio compartido")
+    parser.add_argument("--lagoons", type=int, nargs="+", default=[12, 50, 200])
+    parser.add_argument("--duration-sec", type=float, default=5.0)
+    parser.add_argument("--interval-sec", type=float, default=1.0)
+    parser.add_argument("--child", choices=["threads", "asyncio"])
+    parser.add_argument("--url")
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.lagoons[0], args.url, args.duration_sec, args.interval_sec)
+        return
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _IngestHandler)
+    server.daemon_threads = True
+    server.stats_lock = threading.Lock()
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/ingest/scada"
+    env = {**os.environ, "COLLECTOR_API_KEY": "bench"}
+
+    for lagoons in args.lagoons:
+        for model in ("threads", "asyncio"):
+            output = subprocess.run(
+                [
+                    sys.executable, "-m", "benchmarks.bench_sender_engines",
+                    "--child", model,
+                    "--lagoons", str(lagoons),
+                    "--url", url,
+                    "--duration-sec", str(args.duration_sec),
+                    "--interval-sec", str(args.interval_sec),
+                ],
+                capture_output=True,
+                check=True,
+                env=env,
+                text=True,
+            ).stdout
+            stats = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{model:<8} lagoons={lagoons:<4} threads={stats['threads']:<4} "
+                f"rss/lagoon={stats['rss_bytes'] / lagoons / 1024:>7.1f}KiB "
+                f"cpu/lagoon={stats['cpu_sec'] / lagoons * 1000 / stats['elapsed_sec']:>6.2f}ms/s "
+                f"payloads={stats['payloads']}"
+            )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
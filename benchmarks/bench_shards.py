@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+
+from common.sharding import select_shard
+
+
+def _configs(lagoons: int, tags: int) -> list[dict]:
+    tag_specs = {f"PT{index:03d}_R": {"type": "float"} for index in range(tags)}
+    tag_specs.update({f"P{index:03d}_ST": {"type": "state"} for index in range(tags // 5)})
+    return [
+        {
+            "lagoon_id": f"sim_{index:03d}",
+            "source": "simulator",
+            "poll_seconds": 1,
+            "timezone": "UTC",
+            "event_tags": {f"P{tag:03d}_ST": f"Bomba {tag}" for tag in range(tags // 5)},
+            "simulator": {"seed": index, "tags": tag_specs},
+        }
+        for index in range(lagoons)
+    ]
+
+
+def _run_shard(args: tuple[list[dict], float, str]) -> int:
+    """Un proceso shard: ciclos de sus lagunas sin dormir (lectura, eventos y payload)."""
+    configs, duration, workdir = args
+    os.chdir(workdir)
+
+    from main import LagoonCollector
+    from storage import jsonl_buffer
+
+    logging.getLogger("collector").setLevel(logging.WARNING)
+
+    collectors = [LagoonCollector(cfg, {}) for cfg in configs]
+    cycles = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for collector in collectors:
+            collector.run_cycle()
+            cycles += 1
+    jsonl_buffer.close_all()
+    return cycles
+
+
+def _throughput(configs: list[dict], shard_count: int, duration: float, workdir: str) -> float:
+    jobs = [(select_shard(configs, index, shard_count), duration, workdir) for index in range(shard_count)]
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(shard_count) as pool:
+        cycles = sum(pool.map(_run_shard, jobs))
+    return cycles / duration
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ciclos/s del simulator con 1..N procesos shard")
+    parser.add_argument("--lagoons", type=int, default=48)
+    parser.add_argument("--tags", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--shards", type=int, nargs="+", default=None)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    shard_counts = args.shards or sorted({1, 2, 4, cores})
+    configs = _configs(args.lagoons, args.tags)
+    print(f"cpu_count={cores} lagoons={args.lagoons} tags={args.tags + args.tags // 5} duration={args.duration:g}s")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        baseline = None
+        for shard_count in shard_counts:
+            rate = _throughput(configs, shard_count, args.duration, workdir)
+            baseline = baseline or rate
+            print(f"shards={shard_count:<3} cycles_per_sec={rate:>10.0f} speedup={rate / baseline:>5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks._common import percentile, sample_payload_json
+from storage import jsonl_buffer
+from storage.segmented_spool import SegmentedSpool
+
+
+def _run(mode: str, lagoons: int, appends: int, interval_sec: float) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        base_dir = Path(tmpdir)
+        jsonl_buffer.configure_group_commit(interval_sec if mode == "group" else 0.0)
+        latencies: list[float] = []
+        latencies_lock = threading.Lock()
+        start_barrier = threading.Barrier(lagoons + 1)
+
+        def _worker(index: int) -> None:
+            lagoon_id = f"bench-{mode}-{index}"
+            spool = jsonl_buffer.open_spool(lagoon_id, base_dir=base_dir)
+            payloads = [sample_payload_json(lagoon_id, seq) for seq in range(appends)]
+            local: list[float] = []
+            start_barrier.wait()
+            for payload_json in payloads:
+                started = time.perf_counter()
+                spool.append(payload_json)
+                local.append(time.perf_counter() - started)
+            with latencies_lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=_worker, args=(index,)) for index in range(lagoons)]
+        for thread in threads:
+            thread.start()
+        start_barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        jsonl_buffer.flush_all()
+        elapsed = time.perf_counter() - started
+        jsonl_buffer.configure_group_commit(0.0)
+
+    total = lagoons * appends
+    millis = [value * 1000 for value in latencies]
+    print(
+        f"{mode:<6} lagoons={lagoons:<3} appends={total:<6} "
+        f"rate={total / elapsed:>10.0f}/s "
+        f"p50={percentile(millis, 50):.3f}ms p99={percentile(millis, 99):.3f}ms"
+    )
+
+
+def _run_scaling(lagoon_counts: list[int], appends: int) -> None:
+    # Lock compartido (modelo anterior con `_BUFFER_LOCK`) vs lock + handle por laguna.
+    for lock_mode in ("global", "per-lagoon"):
+        for lagoons in lagoon_counts:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                shared_lock = threading.Lock() if lock_mode == "global" else None
+                spools = [
+                    SegmentedSpool(Path(tmpdir) / f"lagoon-{index}", lock=shared_lock)
+                    for index in range(lagoons)
+                ]
+                payloads = [sample_payload_json("bench", seq) for seq in range(appends)]
+                start_barrier = threading.Barrier(lagoons + 1)
+
+                def _worker(spool: SegmentedSpool) -> None:
+                    start_barrier.wait()
+                    for payload_json in payloads:
+                        spool.append(payload_json)
+
+                threads = [threading.Thread(target=_worker, args=(spool,)) for spool in spools]
+                for thread in threads:
+                    thread.start()
+                start_barrier.wait()
+                started = time.perf_counter()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - started
+                for spool in spools:
+                    spool.close()
+
+            total = lagoons * appends
+            print(
+                f"{lock_mode:<10} lagoons={lagoons:<3} appends={total:<6} "
+                f"rate={total / elapsed:>10.0f}/s"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Spool append throughput: fsync por append vs group commit")
+    parser.add_argument("--lagoons", type=int, default=12)
+    parser.add_argument("--appends", type=int, default=200)
+    parser.add_argument("--interval-sec", type=float, default=0.05)
+    parser.add_argument(
+        "--scaling",
+        default="1,2,4,8,16",
+        help="lista de cantidades de lagunas para comparar lock global vs lock por laguna",
+    )
+    args = parser.parse_args()
+
+    for mode in ("sync", "group"):
+        _run(mode, args.lagoons, args.appends, args.interval_sec)
+
+    lagoon_counts = [int(value) for value in args.scaling.split(",") if value.strip()]
+    if lagoon_counts:
+        _run_scaling(lagoon_counts, args.appends)
+
+
+if __name__ == "__main__":
+    main()
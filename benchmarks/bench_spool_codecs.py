@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks._common import sample_payload_json
+from storage.segmented_spool import SegmentedSpool
+
+
+def _run(codec: str, payloads: int, segment_max_bytes: int) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        spool = SegmentedSpool(Path(tmpdir), segment_max_bytes=segment_max_bytes, codec=codec)
+        lines = [sample_payload_json("bench", seq) for seq in range(payloads)]
+        raw_bytes = sum(len(line) + 1 for line in lines)
+
+        started = time.perf_counter()
+        spool.append_many(lines)
+        append_elapsed = time.perf_counter() - started
+        disk_bytes = spool.disk_bytes()
+
+        started = time.perf_counter()
+        replayed, _, _ = spool.replay(lambda payload: True, max_items=payloads)
+        replay_elapsed = time.perf_counter() - started
+        spool.close()
+
+    print(
+        f"{codec:<5} payloads={payloads} bytes/payload={disk_bytes / payloads:>7.1f} "
+        f"ratio={raw_bytes / max(disk_bytes, 1):>5.1f}x "
+        f"append={payloads / append_elapsed:>9.0f}/s replay={replayed / replay_elapsed:>9.0f}/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bytes por payload y throughput de replay por codec")
+    parser.add_argument("--payloads", type=int, default=20000)
+    parser.add_argument("--segment-max-bytes", type=int, default=1024 * 1024)
+    args = parser.parse_args()
+
+    for codec in ("none", "zlib", "lzma"):
+        _run(codec, args.payloads, args.segment_max_bytes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks._common import percentile
+from common.scheduler import TickScheduler
+from main import LagoonCollector
+from storage import jsonl_buffer
+
+
+def _configs(lagoons: int, tags: int, poll: float) -> list[dict]:
+    tag_specs = {f"PT{index:03d}_R": {"type": "float"} for index in range(tags)}
+    return [
+        {
+            "lagoon_id": f"sim_{index:04d}",
+            "source": "simulator",
+            "poll_seconds": poll,
+            "timezone": "UTC",
+            "simulator": {"seed": index, "tags": tag_specs},
+        }
+        for index in range(lagoons)
+    ]
+
+
+def _threads_model(collectors: list[LagoonCollector], duration: float) -> tuple[list[float], int]:
+    """Linea base: el loop de `run_one_plc`, una hebra por laguna, con el lag medido por ciclo."""
+    lags: list[float] = []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def _loop(collector: LagoonCollector) -> None:
+        time.sleep(random.uniform(0.0, collector.startup_jitter_max_sec))
+        next_tick = time.perf_counter()
+        while not stop.is_set():
+            lag = time.perf_counter() - next_tick
+            with lock:
+                lags.append(max(0.0, lag))
+            collector.run_cycle()
+            next_tick += collector.poll
+            sleep_for = next_tick - time.perf_counter()
+            if sleep_for > 0:
+                time.sleep(sleep_for)
+            else:
+                next_tick = time.perf_counter()
+
+    threads = [threading.Thread(target=_loop, args=(collector,), daemon=True) for collector in collectors]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    peak_threads = threading.active_count()
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return lags, peak_threads
+
+
+def _tick_model(collectors: list[LagoonCollector], duration: float, workers: int, policy: str) -> tuple[list[float], int, dict]:
+    scheduler = TickScheduler(max_workers=workers, overrun_policy=policy, stats_every_sec=0, lag_window=10**7)
+    for collector in collectors:
+        scheduler.add(collector.lagoon_id, collector.poll, collector.run_cycle)
+    scheduler.start()
+    time.sleep(duration)
+    peak_threads = threading.active_count()
+    scheduler.stop(1.0)
+    return list(scheduler.lags), peak_threads, scheduler.stats()
+
+
+def _report(name: str, lags: list[float], threads: int, cycles: int, extra: str = "") -> None:
+    print(
+        f"{name:<8} threads={threads:<5} cycles={cycles:<7} "
+        f"lag_p50={percentile(lags, 50) * 1000:>7.2f}ms lag_p99={percentile(lags, 99) * 1000:>7.2f}ms "
+        f"lag_max={max(lags, default=0.0) * 1000:>7.2f}ms {extra}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Hebra por laguna vs TickScheduler con pool acotado")
+    parser.add_argument("--lagoons", type=int, default=500)
+    parser.add_argument("--tags", type=int, default=30)
+    parser.add_argument("--poll", type=float, default=1.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--policy", default="skip")
+    args = parser.parse_args()
+
+    logging.getLogger("collector").setLevel(logging.WARNING)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            configs = _configs(args.lagoons, args.tags, args.poll)
+            print(f"lagoons={args.lagoons} tags={args.tags} poll={args.poll:g}s duration={args.duration:g}s")
+
+            collectors = [LagoonCollector(cfg, {}) for cfg in configs]
+            lags, threads = _threads_model(collectors, args.duration)
+            _report("threads", lags, threads, len(lags))
+
+            collectors = [LagoonCollector(cfg, {}) for cfg in configs]
+            lags, threads, stats = _tick_model(collectors, args.duration, args.workers, args.policy)
+            _report(
+                "tick",
+                lags,
+                threads,
+                stats["runs"],
+                f"workers={stats['workers']} overruns={stats['overruns']} skipped={stats['skipped']}",
+            )
+        finally:
+            jsonl_buffer.close_all()
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
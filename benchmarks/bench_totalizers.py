@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from normalizer.tot_delta_normalizer import TotDeltaNormalizer
+from normalizer.totalizer_pipeline import TotalizerPipeline, TotalizerSpec, parse_totalizers
+
+T0 = datetime(2026, 4, 11, 18, 0, tzinfo=timezone.utc)
+
+
+def _config(totalizers: int) -> list[dict[str, Any]]:
+    raw = []
+    for index in range(totalizers):
+        entry: dict[str, Any] = {"tag": f"TOT_WM{index:03d}", "rollover": 1e7}
+        if index % 2:
+            entry["rate_output"] = f"FIT_WM{index:03d}_CALC"
+        raw.append(entry)
+    return raw
+
+
+def _inputs(totalizers: int, analogs: int, cycles: int) -> list[dict[str, Any]]:
+    out = []
+    for cycle in range(cycles):
+        tags: dict[str, Any] = {f"PT{index:03d}_R": float(index) for index in range(analogs)}
+        for index in range(totalizers):
+            tags[f"TOT_WM{index:03d}"] = 1000.0 + cycle * (index + 1) * 0.1
+        out.append(tags)
+    return out
+
+
+def _hardcoded(keys: list[tuple[str, str, str]], normalizer: TotDeltaNormalizer, tags: dict) -> None:
+    # Piso de referencia: lo que hacia `main.py` con un solo TOT, repetido a mano por totalizador.
+    for tag, key, output in keys:
+        tags[output] = normalizer.compute(key, tags.get(tag))
+
+
+def _run(inputs: list[dict[str, Any]], specs: tuple[TotalizerSpec, ...], compiled: bool, repeat: int) -> float:
+    keys = [(spec.tag, f"bench:{spec.tag}", spec.output) for spec in specs]
+    stamps = [T0 + timedelta(seconds=second) for second in range(len(inputs))]
+    best = float("inf")
+    for _ in range(repeat):
+        batch = [dict(tags) for tags in inputs]
+        pipeline = TotalizerPipeline("bench", specs)
+        normalizer = TotDeltaNormalizer()
+        started = time.process_time()
+        if compiled:
+            for tags, ts in zip(batch, stamps):
+                pipeline.process(tags, ts, tags)
+        else:
+            for tags in batch:
+                _hardcoded(keys, normalizer, tags)
+        best = min(best, time.process_time() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Costo por ciclo de la etapa de totalizadores compilada")
+    parser.add_argument("--cycles", type=int, default=20000)
+    parser.add_argument("--analogs", type=int, default=60)
+    parser.add_argument("--totalizers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"cycles={args.cycles} analogs={args.analogs}")
+    for totalizers in args.totalizers:
+        specs = parse_totalizers(_config(totalizers))
+        inputs = _inputs(totalizers, args.analogs, args.cycles)
+        hardcoded = _run(inputs, specs, compiled=False, repeat=args.repeat)
+        compiled = _run(inputs, specs, compiled=True, repeat=args.repeat)
+        print(
+            f"totalizers={totalizers:<3} hardcoded={hardcoded / args.cycles * 1e6:>6.2f}us/ciclo "
+            f"pipeline={compiled / args.cycles * 1e6:>6.2f}us/ciclo "
+            f"({compiled / args.cycles / totalizers * 1e6:.2f}us por totalizador, mitad con tasa)"
+        )
+
+
+if __name__ == "__main__":
+    main()
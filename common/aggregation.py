@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import fnmatch
+import math
+from array import array
+from datetime import datetime, timezone
+from typing import Any
+
+DEFAULT_WINDOW_SEC = 60.0
+WINDOW_START_TAG = "AGG_WINDOW_START"
+DEFAULT_STATS = ("min", "max", "avg", "last")
+VALID_STATS = ("min", "max", "avg", "last", "count")
+
+_NUMERIC = (int, float)
+_NOT_AGGREGATED = -1
+
+
+class WindowAggregator:
+    """
+    Agregacion por ventana de reloj (alineada a `window_sec`) para tags
+    analogicos. Cada tag agregado tiene un slot en arreglos `array('d')`
+    (count, sum, min, max, last): la memoria es O(tags) sin importar el largo
+    de la ventana. `add()` acumula y devuelve el resto de los tags para el
+    payload crudo; al cruzar a la ventana siguiente devuelve tambien el
+    registro agregado de la ventana que cerro, con el fin de la ventana como
+    timestamp (el registro nace fresco, como un payload por ciclo) y el
+    inicio en el tag `AGG_WINDOW_START`.
+    """
+
+    def __init__(
+        self,
+        patterns: list[str],
+        window_sec: float = DEFAULT_WINDOW_SEC,
+        stats: tuple[str, ...] = DEFAULT_STATS,
+    ) -> None:
+        self.patterns = list(patterns)
+        self.window_sec = window_sec
+        self.stats = tuple(stats)
+        self.windows = 0
+        self.samples = 0
+
+        self._slots: dict[str, int] = {}
+        self.names: list[str] = []
+        self._output: list[tuple[tuple[str, str], ...]] = []
+        self._count = array("d")
+        self._sum = array("d")
+        self._min = array("d")
+        self._max = array("d")
+        self._last = array("d")
+        self._window: int | None = None
+
+    def _slot_for(self, tag_id: str) -> int:
+        if not any(fnmatch.fnmatchcase(tag_id, pattern) for pattern in self.patterns):
+            self._slots[tag_id] = _NOT_AGGREGATED
+            return _NOT_AGGREGATED
+        slot = len(self.names)
+        self.names.append(tag_id)
+        self._output.append(tuple((stat, f"{tag_id}_{stat.upper()}") for stat in self.stats))
+        self._count.append(0.0)
+        self._sum.append(0.0)
+        self._min.append(math.inf)
+        self._max.append(-math.inf)
+        self._last.append(math.nan)
+        self._slots[tag_id] = slot
+        return slot
+
+    def add(self, tags: dict[str, Any], ts: datetime) -> tuple[dict[str, Any], tuple[datetime, dict[str, Any]] | None]:
+        window = int(ts.timestamp() // self.window_sec)
+        closed = None
+        if self._window is None:
+            self._window = window
+        elif window != self._window:
+            closed = self.flush()
+            self._window = window
+
+        slots = self._slots
+        count, total, low, high, last = self._count, self._sum, self._min, self._max, self._last
+        raw: dict[str, Any] = {}
+        for tag_id, value in tags.items():
+            slot = slots.get(tag_id)
+            if slot is None:
+                slot = self._slot_for(tag_id)
+            # Un tag agregado que llega sin valor (o no numerico) sigue en el payload crudo.
+            if slot == _NOT_AGGREGATED or type(value) not in _NUMERIC:
+                raw[tag_id] = value
+                continue
+            count[slot] += 1
+            total[slot] += value
+            if value < low[slot]:
+                low[slot] = value
+            if value > high[slot]:
+                high[slot] = value
+            last[slot] = value
+            self.samples += 1
+        return raw, closed
+
+    def flush(self, now: datetime | None = None) -> tuple[datetime, dict[str, Any]] | None:
+        """
+        Cierra la ventana abierta: `(fin de la ventana, tags agregados)`, o None
+        si no hubo muestras. Una ventana parcial (stop) cierra en `now`.
+        """
+        if self._window is None:
+            return None
+        count, total, low, high, last = self._count, self._sum, self._min, self._max, self._last
+        tags: dict[str, Any] = {}
+        for slot, outputs in enumerate(self._output):
+            samples = count[slot]
+            if not samples:
+                continue
+            values = {
+                "min": low[slot],
+                "max": high[slot],
+                "avg": total[slot] / samples,
+                "last": last[slot],
+                "count": int(samples),
+            }
+            for stat, name in outputs:
+                tags[name] = values[stat]
+            count[slot] = 0.0
+            total[slot] = 0.0
+            low[slot] = math.inf
+            high[slot] = -math.inf
+            last[slot] = math.nan
+
+        start = datetime.fromtimestamp(self._window * self.window_sec, tz=timezone.utc)
+        end = datetime.fromtimestamp((self._window + 1) * self.window_sec, tz=timezone.utc)
+        self._window = None
+        if not tags:
+            return None
+        if now is not None and now < end:
+            end = now
+        tags[WINDOW_START_TAG] = start.isoformat()
+        self.windows += 1
+        return end, tags
+
+
+def parse_aggregation(raw: dict[str, Any] | None) -> WindowAggregator | None:
+    """
+    `aggregation` del YAML (por laguna o en el master):
+
+        aggregation:
+          window_sec: 60
+          tags: ["PT*_R", "FIT*_R"]
+          stats: [min, max, avg, last]
+
+    Los tags que calzan salen solo como `<tag>_MIN`, `<tag>_MAX`, `<tag>_AVG`,
+    `<tag>_LAST` (y `<tag>_COUNT` si se pide) una vez por ventana.
+    """
+    if not raw:
+        return None
+    if not isinstance(raw, dict):
+        raise ValueError("aggregation must be a mapping")
+    if raw.get("enabled", True) is False:
+        return None
+
+    patterns = raw.get("tags") or []
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    if not patterns:
+        return None
+
+    window_sec = float(raw.get("window_sec", DEFAULT_WINDOW_SEC))
+    if window_sec <= 0:
+        raise ValueError("aggregation window_sec must be > 0")
+
+    stats = tuple(str(stat).strip().lower() for stat in (raw.get("stats") or DEFAULT_STATS))
+    unknown = [stat for stat in stats if stat not in VALID_STATS]
+    if unknown:
+        raise ValueError(f"aggregation stats not supported: {', '.join(unknown)}")
+
+    return WindowAggregator([str(pattern) for pattern in patterns], window_sec, stats)
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+from typing import Any
+
+from common.config import load_config, resolve_path
+
+# Opciones del master que se leen una vez al arrancar el proceso; cambiarlas requiere reinicio.
+PROCESS_OPTIONS = (
+    "sender_engine",
+    "sender_engine_max_connections",
+    "cycle_scheduler",
+    "cycle_workers",
+    "cycle_overrun_policy",
+    "shards",
+    "spool_commit_interval_sec",
+    "spool_commit_max_batch",
+    "spool_total_max_bytes",
+    "health_every_sec",
+    "config_reload_every_sec",
+)
+
+
+def config_files(config_path: str) -> list[str]:
+    """Master mas los YAML incluidos desde `plcs`."""
+    files = [os.path.abspath(config_path)]
+    try:
+        root = load_config(config_path)
+    except Exception:
+        return files
+    for entry in root.get("plcs") or []:
+        if isinstance(entry, dict) and "include" in entry:
+            files.append(os.path.abspath(resolve_path(config_path, entry["include"])))
+    return files
+
+
+class ConfigWatcher:
+    """
+    Polling de mtime (y tamano) sobre el master y sus includes. `changed()`
+    devuelve True una vez por cada cambio observado; la lista de includes se
+    recalcula en cada cambio, asi un include agregado tambien se vigila.
+    """
+
+    def __init__(self, config_path: str) -> None:
+        self.config_path = config_path
+        self._stamps = self._snapshot()
+
+    def _snapshot(self) -> dict[str, tuple[int, int] | None]:
+        stamps: dict[str, tuple[int, int] | None] = {}
+        for path in config_files(self.config_path):
+            try:
+                stat = os.stat(path)
+                stamps[path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                stamps[path] = None
+        return stamps
+
+    def changed(self) -> bool:
+        stamps = self._snapshot()
+        if stamps == self._stamps:
+            return False
+        self._stamps = stamps
+        return True
+
+
+@dataclass
+class PlcConfigDiff:
+    added: list[dict] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    changed: list[dict] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    restart_required: list[str] = field(default_factory=list)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+
+def _root_settings(root_cfg: dict) -> dict[str, Any]:
+    settings = {key: value for key, value in root_cfg.items() if key != "plcs"}
+    runtime = dict(settings.get("runtime") or {})
+    for key in PROCESS_OPTIONS:
+        runtime.pop(key, None)
+        settings.pop(key, None)
+    settings["runtime"] = runtime
+    return settings
+
+
+def _process_options(root_cfg: dict) -> dict[str, Any]:
+    runtime = root_cfg.get("runtime") or {}
+    return {key: runtime.get(key, root_cfg.get(key)) for key in PROCESS_OPTIONS}
+
+
+def diff_plc_configs(
+    old_configs: list[dict],
+    old_root: dict,
+    new_configs: list[dict],
+    new_root: dict,
+) -> PlcConfigDiff:
+    """
+    Compara por `lagoon_id`. Una laguna cambia si cambia su bloque (o su
+    include) o algun ajuste del master que heredan todas (`runtime`,
+    `backend`, `product_type`...). Las opciones de proceso no se aplican en
+    caliente: solo se reportan en `restart_required`.
+    """
+    diff = PlcConfigDiff()
+    root_changed = _root_settings(old_root) != _root_settings(new_root)
+    old_process = _process_options(old_root)
+    new_process = _process_options(new_root)
+    diff.restart_required = [key for key in PROCESS_OPTIONS if old_process[key] != new_process[key]]
+
+    old_by_id = {str(cfg.get("lagoon_id")): cfg for cfg in old_configs}
+    new_ids = set()
+    for cfg in new_configs:
+        lagoon_id = str(cfg.get("lagoon_id"))
+        new_ids.add(lagoon_id)
+        previous = old_by_id.get(lagoon_id)
+        if previous is None:
+            diff.added.append(cfg)
+        elif root_changed or previous != cfg:
+            diff.changed.append(cfg)
+        else:
+            diff.unchanged.append(lagoon_id)
+    diff.removed = [lagoon_id for lagoon_id in old_by_id if lagoon_id not in new_ids]
+    return diff
@@ -0,0 +1,389 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from queue import Empty, Full, Queue
+from typing import Any, Callable
+
+from common.payload import AnyPayload, CyclePayload
+from common.retry import RetryScheduler
+from common.sender import BackendSender
+from common.time import utc_now
+from storage import jsonl_buffer
+
+logger = logging.getLogger("collector")
+
+
+def spool_line(payload: AnyPayload) -> str | bytes:
+    # Un CyclePayload se spoolea con los mismos bytes de su cuerpo HTTP.
+    if isinstance(payload, CyclePayload):
+        return payload.encode()
+    return payload.model_dump_json()
+
+
+def spool_payload(payload: AnyPayload):
+    try:
+        jsonl_buffer.append_for_lagoon(
+            lagoon_id=str(payload.lagoon_id),
+            payload_json=spool_line(payload),
+        )
+    except Exception as exc:
+        logger.error(
+            "[BUFFER ERROR] lagoon=%s err=%s",
+            payload.lagoon_id,
+            exc,
+        )
+
+
+def spool_payloads(lagoon_id: str, payloads: list[AnyPayload]) -> None:
+    if not payloads:
+        return
+    try:
+        jsonl_buffer.append_many_for_lagoon(
+            lagoon_id=lagoon_id,
+            payload_jsons=[spool_line(payload) for payload in payloads],
+        )
+    except Exception as exc:
+        logger.error(
+            "[BUFFER ERROR] lagoon=%s count=%s err=%s",
+            lagoon_id,
+            len(payloads),
+            exc,
+        )
+
+
+def drain_pending(
+    retries: RetryScheduler,
+    send_queue: Queue | None,
+    in_flight: list[AnyPayload] | None = None,
+) -> list[AnyPayload]:
+    """
+    Saca todo lo pendiente de una laguna en orden de antiguedad: el lote en
+    vuelo (si el envio no termino a tiempo), los reintentos y la cola.
+    """
+    payloads = list(in_flight or [])
+    payloads.extend(retries.drain())
+    while send_queue is not None:
+        try:
+            payloads.append(send_queue.get_nowait())
+        except Empty:
+            break
+        send_queue.task_done()
+    return payloads
+
+
+def spool_pending(
+    lagoon_id: str,
+    retries: RetryScheduler,
+    send_queue: Queue | None,
+    spool_on_fail: bool,
+    in_flight: list[AnyPayload] | None = None,
+) -> int:
+    payloads = drain_pending(retries, send_queue, in_flight)
+    if not payloads:
+        return 0
+    if spool_on_fail:
+        spool_payloads(lagoon_id, payloads)
+    else:
+        logger.warning("[COLLECTOR SEND STOP] lagoon=%s dropped=%s reason=spool_disabled", lagoon_id, len(payloads))
+    return len(payloads)
+
+
+def send_payloads(sender: BackendSender, payloads: list[AnyPayload]) -> list[bool]:
+    try:
+        if sender.batch_enabled:
+            return sender.send_batch(payloads)
+        return [sender.send(payload) for payload in payloads]
+    except Exception:
+        return [False] * len(payloads)
+
+
+def route_failures(
+    sender: BackendSender,
+    retries: RetryScheduler,
+    payloads: list[AnyPayload],
+    attempts: list[int],
+    results: list[bool],
+) -> list[AnyPayload]:
+    """Devuelve los payloads a spool. Con el breaker abierto no se agendan reintentos."""
+    if sender.circuit_open:
+        return [payload for payload, ok in zip(payloads, results) if not ok]
+    return retries.reschedule_failed(payloads, attempts, results)
+
+
+def parse_payload_timestamp(value: Any) -> datetime | None:
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, str):
+        raw = value.strip()
+        if not raw:
+            return None
+        if raw.endswith("Z"):
+            raw = f"{raw[:-1]}+00:00"
+        try:
+            parsed = datetime.fromisoformat(raw)
+        except ValueError:
+            return None
+    else:
+        return None
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def should_drop_replay_payload(payload: dict[str, Any], max_payload_age_sec: int) -> bool:
+    if max_payload_age_sec <= 0:
+        return False
+
+    payload_ts = parse_payload_timestamp(payload.get("timestamp"))
+    if payload_ts is None:
+        return False
+
+    payload_age_sec = (utc_now() - payload_ts).total_seconds()
+    return payload_age_sec > max_payload_age_sec
+
+
+def replay_spool(
+    lagoon_id: str,
+    sender: BackendSender,
+    replay_batch_size: int,
+    max_replay_payload_age_sec: int,
+) -> tuple[int, int, int]:
+    # Breaker abierto: el replay fallaria en el primer POST, no se lee el spool.
+    if sender.circuit_open:
+        return (0, jsonl_buffer.pending_for_lagoon(lagoon_id), 0)
+
+    def _send_or_requeue(payload: dict[str, Any]) -> str:
+        if should_drop_replay_payload(payload, max_replay_payload_age_sec):
+            return "drop"
+        return "sent" if sender.send(payload) else "keep"
+
+    min_timestamp = None
+    if max_replay_payload_age_sec > 0:
+        min_timestamp = utc_now().timestamp() - max_replay_payload_age_sec
+
+    if sender.batch_enabled:
+        def _send_batch(payloads: list[dict[str, Any]]) -> list[str]:
+            actions = [
+                "drop" if should_drop_replay_payload(payload, max_replay_payload_age_sec) else "keep"
+                for payload in payloads
+            ]
+            to_send = [index for index, action in enumerate(actions) if action == "keep"]
+            results = sender.send_batch([payloads[index] for index in to_send])
+            for index, ok in zip(to_send, results):
+                if ok:
+                    actions[index] = "sent"
+            return actions
+
+        # En modo batch un lote completo es un solo POST.
+        return jsonl_buffer.replay_batch_for_lagoon(
+            lagoon_id=lagoon_id,
+            send_batch=_send_batch,
+            max_items=max(replay_batch_size, sender.batch_max_items),
+            max_bytes=sender.batch_max_bytes,
+            min_timestamp=min_timestamp,
+        )
+
+    return jsonl_buffer.replay_for_lagoon(
+        lagoon_id=lagoon_id,
+        send_payload=_send_or_requeue,
+        max_items=max(1, replay_batch_size),
+        min_timestamp=min_timestamp,
+    )
+
+
+def enqueue_payload(send_queue: Queue, payload: AnyPayload, policy: str) -> bool:
+    if policy == "block":
+        send_queue.put(payload)
+        return True
+
+    try:
+        send_queue.put_nowait(payload)
+        return True
+    except Full:
+        if policy != "drop_oldest":
+            return False
+
+    try:
+        _ = send_queue.get_nowait()
+        send_queue.task_done()
+    except Empty:
+        return False
+
+    try:
+        send_queue.put_nowait(payload)
+        return True
+    except Full:
+        return False
+
+
+class SenderWorker:
+    """
+    Sender por hebra. Los fallidos van a un RetryScheduler en vez de dormir la
+    hebra: mientras esperan su backoff, la cola en vivo se sigue drenando.
+    """
+
+    def __init__(
+        self,
+        lagoon_id: str,
+        sender: BackendSender,
+        send_queue: Queue,
+        spool_on_fail: bool,
+        log_every_n_sends: int,
+        replay_batch_size: int,
+        max_replay_payload_age_sec: int,
+        retry_attempts: int,
+        retry_backoff_base_sec: float,
+        retry_backoff_max_sec: float,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        idle_wait_sec: float = 1.0,
+    ) -> None:
+        self.lagoon_id = lagoon_id
+        self.sender = sender
+        self.send_queue = send_queue
+        self.spool_on_fail = spool_on_fail
+        self.log_every_n_sends = log_every_n_sends
+        self.replay_batch_size = replay_batch_size
+        self.max_replay_payload_age_sec = max_replay_payload_age_sec
+        self.idle_wait_sec = idle_wait_sec
+        self.retries = RetryScheduler(
+            retry_attempts,
+            retry_backoff_base_sec,
+            retry_backoff_max_sec,
+            clock=clock,
+            max_pending=max(send_queue.maxsize, 1) * 10,
+        )
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.spooled_on_stop = 0
+        # Lote que se esta enviando; si el stop vence su plazo, va al spool junto con lo pendiente.
+        self.in_flight: list[AnyPayload] = []
+        self._last_stats_total = 0
+        self._stop = threading.Event()
+
+    @property
+    def max_batch(self) -> int:
+        return self.sender.batch_max_items if self.sender.batch_enabled else 1
+
+    def _deliver(self, payloads: list[AnyPayload], attempts: list[int]) -> None:
+        self.in_flight = payloads
+        results = send_payloads(self.sender, payloads)
+        exhausted = route_failures(self.sender, self.retries, payloads, attempts, results)
+        ok_count = sum(1 for ok in results if ok)
+        self.sent += ok_count
+        self.retried += len(payloads) - ok_count - len(exhausted)
+        self.failed += len(exhausted)
+        if self.spool_on_fail and exhausted:
+            spool_payloads(self.lagoon_id, exhausted)
+        self.in_flight = []
+
+    def _wait_timeout(self) -> float:
+        next_retry = self.retries.next_delay()
+        if next_retry is None:
+            return self.idle_wait_sec
+        return min(self.idle_wait_sec, next_retry)
+
+    def _drain_queue(self, timeout: float) -> list[AnyPayload]:
+        try:
+            batch = [self.send_queue.get(timeout=timeout) if timeout > 0 else self.send_queue.get_nowait()]
+        except Empty:
+            return []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.send_queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def run_once(self) -> None:
+        due = self.retries.pop_due(self.max_batch)
+        if due:
+            self._deliver([entry.payload for entry in due], [entry.attempts for entry in due])
+
+        # Con reintentos pendientes el backend esta fallando: no se agrega carga de replay.
+        if self.send_queue.qsize() == 0 and not self.retries:
+            try:
+                replay_spool(
+                    lagoon_id=self.lagoon_id,
+                    sender=self.sender,
+                    replay_batch_size=self.replay_batch_size,
+                    max_replay_payload_age_sec=self.max_replay_payload_age_sec,
+                )
+            except Exception:
+                pass
+
+        batch = self._drain_queue(0.0 if due else self._wait_timeout())
+        if batch:
+            try:
+                self._deliver(batch, [0] * len(batch))
+            finally:
+                for _ in batch:
+                    self.send_queue.task_done()
+
+        total = self.sent + self.failed
+        if self.log_every_n_sends > 0 and total - self._last_stats_total >= self.log_every_n_sends:
+            self._last_stats_total = total
+            logger.debug(
+                "[COLLECTOR SEND STATS] lagoon=%s sent=%s failed=%s retrying=%s queue=%s breaker=%s",
+                self.lagoon_id,
+                self.sent,
+                self.failed,
+                len(self.retries),
+                self.send_queue.qsize(),
+                self.sender.breaker.state,
+            )
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            self.run_once()
+        # Lo que quedo en cola o esperando reintento pasa al spool; el replay lo envia despues.
+        self.spooled_on_stop = spool_pending(self.lagoon_id, self.retries, self.send_queue, self.spool_on_fail)
+
+    def join(self, thread: threading.Thread, timeout: float) -> tuple[int, bool]:
+        """
+        Espera a que `thread` (el que corre `run_forever`) termine tras
+        `stop()`. Si vence el plazo con un envio o replay todavia en curso, lo
+        pendiente y el lote en vuelo se pasan al spool desde aqui (at-least-once:
+        si ese envio termina bien, el replay lo reenvia). Devuelve
+        `(spooled, timed_out)`.
+        """
+        thread.join(timeout)
+        if not thread.is_alive():
+            return self.spooled_on_stop, False
+        spooled = spool_pending(self.lagoon_id, self.retries, self.send_queue, self.spool_on_fail, self.in_flight)
+        return spooled, True
+
+
+def sender_worker_loop(
+    lagoon_id: str,
+    sender: BackendSender,
+    send_queue: Queue,
+    spool_on_fail: bool,
+    log_every_n_sends: int,
+    replay_batch_size: int,
+    max_replay_payload_age_sec: int,
+    retry_attempts: int,
+    retry_backoff_base_sec: float,
+    retry_backoff_max_sec: float,
+):
+    # Forma funcional de `SenderWorker`; el collector ya no la usa, queda para `benchmarks.bench_sender_engines`.
+    SenderWorker(
+        lagoon_id,
+        sender,
+        send_queue,
+        spool_on_fail,
+        log_every_n_sends,
+        replay_batch_size,
+        max_replay_payload_age_sec,
+        retry_attempts,
+        retry_backoff_base_sec,
+        retry_backoff_max_sec,
+    ).run_forever()
@@ -1,6 +1,9 @@
+import json
+import math
+
 from pydantic import BaseModel
 from datetime import datetime, date
-from typing import Any, Optional, List
+from typing import Any, Optional, List, Union
 
 
 class ScadaEvent(BaseModel):
@@ -21,3 +24,80 @@ class NormalizedPayload(BaseModel):
 
 
     events: Optional[List[ScadaEvent]] = None
+
+
+def _finite(value: Any) -> Any:
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_finite(item) for item in value]
+    return value
+
+
+def _json_default(value: Any) -> Any:
+    # Tags que no son JSON nativo (fechas, strings de PLC en bytes): se codifican en vez de perder el payload.
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode("utf-8", errors="replace")
+    return str(value)
+
+
+class CyclePayload:
+    """
+    Payload del camino caliente (ciclo -> cola -> HTTP/spool), sin validacion
+    Pydantic: los campos ya los tipa el collector. `encode()` arma el cuerpo
+    HTTP una sola vez y lo cachea; esos mismos bytes son el POST y la linea
+    del spool. `send_events` lo fija el collector segun su backend, asi el
+    cuerpo es el mismo que armaria `BackendSender._build_body`.
+    """
+
+    __slots__ = ("lagoon_id", "product_type", "source", "timestamp", "tags", "events", "send_events", "_encoded")
+
+    def __init__(
+        self,
+        lagoon_id: str,
+        product_type: Optional[str],
+        source: str,
+        timestamp: datetime,
+        tags: dict[str, Any],
+        events: Optional[List[dict]] = None,
+        *,
+        send_events: bool = False,
+    ) -> None:
+        self.lagoon_id = lagoon_id
+        self.product_type = product_type
+        self.source = source
+        self.timestamp = timestamp
+        self.tags = tags
+        self.events = events
+        self.send_events = send_events
+        self._encoded: Optional[bytes] = None
+
+    def body(self) -> dict[str, Any]:
+        body: dict[str, Any] = {"lagoon_id": self.lagoon_id}
+        if self.product_type is not None:
+            body["product_type"] = self.product_type
+        body["source"] = self.source
+        body["timestamp"] = self.timestamp.isoformat()
+        body["tags"] = self.tags
+        if self.send_events and self.events:
+            body["events"] = self.events
+        return body
+
+    def encode(self) -> bytes:
+        encoded = self._encoded
+        if encoded is None:
+            body = self.body()
+            try:
+                text = json.dumps(body, separators=(",", ":"), allow_nan=False, default=_json_default)
+            except ValueError:
+                # NaN/inf de un PLC: JSON no los admite, salen como null (igual que el spool Pydantic).
+                text = json.dumps(_finite(body), separators=(",", ":"), allow_nan=False, default=_json_default)
+            encoded = self._encoded = text.encode("utf-8")
+        return encoded
+
+
+AnyPayload = Union[CyclePayload, NormalizedPayload]
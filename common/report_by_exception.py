@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import fnmatch
+import time
+from typing import Any, Callable
+
+DEFAULT_SNAPSHOT_EVERY_SEC = 60.0
+
+_UNSEEN = object()
+_NUMERIC = (int, float)
+
+
+class Deadband:
+    __slots__ = ("pattern", "absolute", "percent")
+
+    def __init__(self, pattern: str, absolute: float = 0.0, percent: float = 0.0) -> None:
+        self.pattern = pattern
+        self.absolute = absolute
+        self.percent = percent
+
+    def matches(self, tag_id: str) -> bool:
+        return fnmatch.fnmatchcase(tag_id, self.pattern)
+
+
+class ReportByException:
+    """
+    Filtro entre el reader y la cola: solo deja pasar los tags que cambiaron
+    respecto del ultimo valor reportado (no del ultimo leido, asi una deriva
+    lenta termina saliendo). Un tag numerico cambia si se mueve mas que su
+    deadband, `max(abs, |ultimo| * pct / 100)`; bool, str y None cambian con
+    cualquier diferencia. Cada `snapshot_every_sec` se entrega el set
+    completo para que el backend pueda reconstruir el estado.
+    """
+
+    def __init__(
+        self,
+        deadbands: list[Deadband] | None = None,
+        snapshot_every_sec: float = DEFAULT_SNAPSHOT_EVERY_SEC,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.deadbands = list(deadbands or [])
+        self.snapshot_every_sec = max(0.0, snapshot_every_sec)
+        self.clock = clock
+        self.cycles = 0
+        self.snapshots = 0
+        self.tags_in = 0
+        self.tags_out = 0
+        # Deadband resuelto una vez por tag: (abs, pct); (0, 0) = cualquier cambio.
+        self._bands: dict[str, tuple[float, float]] = {}
+        self._last: dict[str, Any] = {}
+        # Umbral vigente por tag numerico, calculado al reportar: el ciclo solo compara.
+        self._limits: dict[str, float] = {}
+        self._next_snapshot: float | None = None
+
+    def _band_for(self, tag_id: str) -> tuple[float, float]:
+        band = next((deadband for deadband in self.deadbands if deadband.matches(tag_id)), None)
+        if band is None:
+            return (0.0, 0.0)
+        return (band.absolute, band.percent)
+
+    def _report(self, tag_id: str, value: Any) -> None:
+        self._last[tag_id] = value
+        if type(value) not in _NUMERIC:
+            self._limits.pop(tag_id, None)
+            return
+        band = self._bands.get(tag_id)
+        if band is None:
+            band = self._bands[tag_id] = self._band_for(tag_id)
+        absolute, percent = band
+        self._limits[tag_id] = max(absolute, abs(value) * percent / 100)
+
+    def filter(self, tags: dict[str, Any]) -> dict[str, Any]:
+        """Devuelve `tags` completo en un snapshot, o un dict nuevo solo con lo que cambio."""
+        now = self.clock()
+        self.cycles += 1
+        self.tags_in += len(tags)
+        last = self._last
+
+        if self._next_snapshot is None or now >= self._next_snapshot:
+            self._next_snapshot = now + self.snapshot_every_sec
+            self.snapshots += 1
+            self.tags_out += len(tags)
+            for tag_id, value in tags.items():
+                self._report(tag_id, value)
+            return tags
+
+        limits = self._limits
+        changed: dict[str, Any] = {}
+        for tag_id, value in tags.items():
+            prev = last.get(tag_id, _UNSEEN)
+            if value == prev and type(value) is type(prev):
+                continue
+            limit = limits.get(tag_id)
+            if limit is not None and type(value) in _NUMERIC and abs(value - prev) <= limit:
+                continue
+            changed[tag_id] = value
+            self._report(tag_id, value)
+
+        self.tags_out += len(changed)
+        return changed
+
+
+def parse_report_by_exception(raw: dict[str, Any] | None) -> ReportByException | None:
+    """
+    `report_by_exception` del YAML (por laguna o en el master):
+
+        report_by_exception:
+          snapshot_every_sec: 60
+          deadbands:
+            "PT*_R": {abs: 0.05}
+            "FIT*_R": {pct: 1.0}
+
+    Los patrones son fnmatch sobre el tag logico y gana el primero que calza;
+    un tag sin patron se reporta con cualquier cambio. `enabled: false` lo
+    desactiva sin borrar la config.
+    """
+    if not raw:
+        return None
+    if not isinstance(raw, dict):
+        raise ValueError("report_by_exception must be a mapping")
+    if raw.get("enabled", True) is False:
+        return None
+
+    deadbands: list[Deadband] = []
+    for pattern, spec in (raw.get("deadbands") or {}).items():
+        if isinstance(spec, (int, float)):
+            spec = {"abs": spec}
+        if not isinstance(spec, dict):
+            raise ValueError(f"deadband {pattern!r} must be a number or a mapping")
+        absolute = float(spec.get("abs", 0.0))
+        percent = float(spec.get("pct", 0.0))
+        if absolute < 0 or percent < 0:
+            raise ValueError(f"deadband {pattern!r} must be >= 0")
+        deadbands.append(Deadband(str(pattern), absolute, percent))
+
+    return ReportByException(
+        deadbands,
+        float(raw.get("snapshot_every_sec", DEFAULT_SNAPSHOT_EVERY_SEC)),
+    )
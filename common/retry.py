@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable
+
+
+class RetryEntry:
+    __slots__ = ("due", "seq", "payload", "attempts")
+
+    def __init__(self, due: float, seq: int, payload: Any, attempts: int) -> None:
+        self.due = due
+        self.seq = seq
+        self.payload = payload
+        self.attempts = attempts
+
+    def __lt__(self, other: RetryEntry) -> bool:
+        return (self.due, self.seq) < (other.due, other.seq)
+
+
+class RetryScheduler:
+    """
+    Heap de reintentos ordenado por hora del proximo intento. El sender sigue
+    drenando la cola en vivo y solo toma de aqui los payloads ya vencidos.
+    `retry_attempts` son los reintentos despues del primer envio; agotados,
+    el payload se devuelve al llamador para spool. El heap tiene su lock: el
+    stop con plazo vencido lo drena desde otra hebra mientras el sender
+    todavia puede estar agendando.
+    """
+
+    def __init__(
+        self,
+        retry_attempts: int,
+        backoff_base_sec: float,
+        backoff_max_sec: float,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        max_pending: int = 0,
+    ) -> None:
+        self.retry_attempts = max(0, int(retry_attempts))
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.clock = clock
+        self.max_pending = max(0, int(max_pending))
+        self._heap: list[RetryEntry] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def delay_for(self, attempts: int) -> float:
+        return max(
+            0.0,
+            min(self.backoff_base_sec * (2 ** (attempts - 1)), self.backoff_max_sec),
+        )
+
+    def schedule(self, payload: Any, attempts: int) -> bool:
+        """Agenda un reintento tras `attempts` envios fallidos. False = agotado o heap lleno."""
+        if attempts > self.retry_attempts:
+            return False
+        due = self.clock() + self.delay_for(attempts)
+        with self._lock:
+            if self.max_pending and len(self._heap) >= self.max_pending:
+                return False
+            heapq.heappush(self._heap, RetryEntry(due, next(self._seq), payload, attempts))
+        return True
+
+    def reschedule_failed(
+        self,
+        payloads: list[Any],
+        attempts: list[int],
+        results: list[bool],
+    ) -> list[Any]:
+        """Agenda los fallidos de un envio; devuelve los que deben ir al spool."""
+        exhausted: list[Any] = []
+        for payload, done, ok in zip(payloads, attempts, results):
+            if not ok and not self.schedule(payload, done + 1):
+                exhausted.append(payload)
+        return exhausted
+
+    def pop_due(self, limit: int = 0) -> list[RetryEntry]:
+        now = self.clock()
+        due: list[RetryEntry] = []
+        with self._lock:
+            while self._heap and self._heap[0].due <= now:
+                if limit and len(due) >= limit:
+                    break
+                due.append(heapq.heappop(self._heap))
+        return due
+
+    def next_delay(self) -> float | None:
+        with self._lock:
+            if not self._heap:
+                return None
+            due = self._heap[0].due
+        return max(0.0, due - self.clock())
+
+    def drain(self) -> list[Any]:
+        with self._lock:
+            heap, self._heap = self._heap, []
+        return [entry.payload for entry in sorted(heap)]
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger("collector")
+
+OVERRUN_SKIP = "skip"
+OVERRUN_COALESCE = "coalesce"
+DEFAULT_CYCLE_WORKERS = 16
+
+# Fraccion aurea: fases bien repartidas para cualquier cantidad de jobs, sin conocer el total.
+_PHASE_STEP = (math.sqrt(5) - 1) / 2
+
+
+class TickJob:
+    __slots__ = (
+        "job_id",
+        "interval_sec",
+        "func",
+        "due",
+        "running",
+        "pending",
+        "runs",
+        "skipped",
+        "coalesced",
+        "overruns",
+        "max_lag_sec",
+        "last_error",
+    )
+
+    def __init__(self, job_id: str, interval_sec: float, func: Callable[[], Any]) -> None:
+        self.job_id = job_id
+        self.interval_sec = interval_sec
+        self.func = func
+        self.due = 0.0
+        self.running = False
+        self.pending = False
+        self.runs = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.overruns = 0
+        self.max_lag_sec = 0.0
+        self.last_error: str | None = None
+
+
+class TickScheduler:
+    """
+    Un heap de ticks y una hebra despachadora para todas las lagunas; los
+    ciclos corren en un pool acotado a `max_workers` hebras. Cada job tiene
+    a lo sumo un ciclo en curso: si su tick llega mientras el anterior sigue
+    corriendo (overrun), `skip` descarta ese tick y `coalesce` lo junta en un
+    solo ciclo extra al terminar el actual. El lag (inicio real - tick
+    agendado) se guarda para medir jitter.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_CYCLE_WORKERS,
+        *,
+        overrun_policy: str = OVERRUN_SKIP,
+        clock: Callable[[], float] = time.monotonic,
+        stats_every_sec: float = 60.0,
+        lag_window: int = 10000,
+    ) -> None:
+        if overrun_policy not in {OVERRUN_SKIP, OVERRUN_COALESCE}:
+            raise ValueError(f"Unsupported overrun policy: {overrun_policy!r}")
+        self.max_workers = max(1, int(max_workers))
+        self.overrun_policy = overrun_policy
+        self.clock = clock
+        self.stats_every_sec = stats_every_sec
+        self.jobs: dict[str, TickJob] = {}
+        self.lags: deque[float] = deque(maxlen=lag_window)
+
+        self._heap: list[tuple[float, int, TickJob]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread: threading.Thread | None = None
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cycle")
+        self._next_stats = 0.0
+
+    # =========================
+    # JOBS
+    # =========================
+
+    def add(
+        self,
+        job_id: str,
+        interval_sec: float,
+        func: Callable[[], Any],
+        *,
+        phase_sec: float | None = None,
+    ) -> TickJob:
+        job = TickJob(job_id, max(0.001, float(interval_sec)), func)
+        if phase_sec is None:
+            phase_sec = ((len(self.jobs) * _PHASE_STEP) % 1.0) * job.interval_sec
+        job.due = self.clock() + phase_sec
+        with self._cond:
+            self.jobs[job_id] = job
+            self._push(job)
+            self._cond.notify()
+        return job
+
+    def remove(self, job_id: str) -> None:
+        with self._cond:
+            job = self.jobs.pop(job_id, None)
+            if job is not None:
+                # Entradas del heap de un job removido se descartan al salir.
+                job.pending = False
+                self._cond.notify()
+
+    def reset(self, job_id: str) -> TickJob | None:
+        """
+        Reemplaza un job cuyo ciclo quedo colgado: el nuevo corre de inmediato
+        y el ciclo viejo, si alguna vez vuelve, solo libera su propio job.
+        """
+        with self._cond:
+            old = self.jobs.get(job_id)
+            if old is None:
+                return None
+            job = TickJob(job_id, old.interval_sec, old.func)
+            job.due = self.clock()
+            job.runs = old.runs
+            self.jobs[job_id] = job
+            self._push(job)
+            self._cond.notify()
+        return job
+
+    def _push(self, job: TickJob) -> None:
+        heapq.heappush(self._heap, (job.due, next(self._seq), job))
+
+    # =========================
+    # LIFECYCLE
+    # =========================
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopped = False
+            self._next_stats = self.clock() + self.stats_every_sec
+            self._thread = threading.Thread(target=self._dispatch_loop, name="tick-scheduler", daemon=True)
+            self._thread.start()
+
+    def run_forever(self) -> None:
+        self.start()
+        thread = self._thread
+        while thread is not None and thread.is_alive():
+            thread.join(1.0)
+
+    def stop(self, timeout: float | None = None) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        # Sin esperar al pool: un ciclo colgado en el driver no debe bloquear el stop.
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # =========================
+    # DISPATCH
+    # =========================
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    now = self.clock()
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+                    timeout = self._heap[0][0] - now if self._heap else None
+                    if self.stats_every_sec > 0:
+                        stats_in = max(0.0, self._next_stats - now)
+                        timeout = stats_in if timeout is None else min(timeout, stats_in)
+                        if stats_in == 0.0:
+                            break
+                    self._cond.wait(timeout)
+                if self._stopped:
+                    return
+
+                now = self.clock()
+                ready = []
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, job = heapq.heappop(self._heap)
+                    if self.jobs.get(job.job_id) is job:
+                        ready.append(job)
+
+                for job in ready:
+                    self._dispatch_locked(job, now)
+
+            if self.stats_every_sec > 0 and self.clock() >= self._next_stats:
+                self._next_stats = self.clock() + self.stats_every_sec
+                self._log_stats()
+
+    def _dispatch_locked(self, job: TickJob, now: float) -> None:
+        scheduled = job.due
+        job.due += job.interval_sec
+        if job.due <= now:
+            # Se atraso mas de un intervalo: se saltan los ticks perdidos, sin rafaga.
+            missed = math.floor((now - job.due) / job.interval_sec) + 1
+            job.due += missed * job.interval_sec
+            job.skipped += missed
+        self._push(job)
+
+        if job.running:
+            job.overruns += 1
+            if self.overrun_policy == OVERRUN_COALESCE:
+                if job.pending:
+                    job.coalesced += 1
+                job.pending = True
+            else:
+                job.skipped += 1
+            return
+
+        job.running = True
+        self._executor.submit(self._run, job, scheduled)
+
+    def _run(self, job: TickJob, scheduled: float) -> None:
+        while True:
+            lag = max(0.0, self.clock() - scheduled)
+            self.lags.append(lag)
+            if lag > job.max_lag_sec:
+                job.max_lag_sec = lag
+            try:
+                job.func()
+                job.last_error = None
+            except Exception as exc:
+                job.last_error = f"{type(exc).__name__}: {exc}"
+                logger.error("[SCHEDULER JOB ERROR] job=%s err=%s", job.job_id, job.last_error)
+            job.runs += 1
+
+            with self._cond:
+                if not job.pending or self._stopped:
+                    job.running = False
+                    job.pending = False
+                    return
+                job.pending = False
+                scheduled = self.clock()
+
+    # =========================
+    # STATS
+    # =========================
+
+    def lag_percentile(self, pct: float) -> float:
+        lags = sorted(self.lags)
+        if not lags:
+            return 0.0
+        index = min(len(lags) - 1, max(0, round(pct / 100 * (len(lags) - 1))))
+        return lags[index]
+
+    def stats(self) -> dict[str, Any]:
+        jobs = list(self.jobs.values())
+        return {
+            "jobs": len(jobs),
+            "workers": self.max_workers,
+            "runs": sum(job.runs for job in jobs),
+            "overruns": sum(job.overruns for job in jobs),
+            "skipped": sum(job.skipped for job in jobs),
+            "coalesced": sum(job.coalesced for job in jobs),
+            "lag_p50_ms": round(self.lag_percentile(50) * 1000, 3),
+            "lag_p99_ms": round(self.lag_percentile(99) * 1000, 3),
+            "lag_max_ms": round(max(self.lags, default=0.0) * 1000, 3),
+        }
+
+    def _log_stats(self) -> None:
+        stats = self.stats()
+        logger.info(
+            "[SCHEDULER STATS] jobs=%s workers=%s runs=%s overruns=%s skipped=%s coalesced=%s lag_p50_ms=%.1f lag_p99_ms=%.1f lag_max_ms=%.1f",
+            stats["jobs"],
+            stats["workers"],
+            stats["runs"],
+            stats["overruns"],
+            stats["skipped"],
+            stats["coalesced"],
+            stats["lag_p50_ms"],
+            stats["lag_p99_ms"],
+            stats["lag_max_ms"],
+        )
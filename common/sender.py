@@ -1,16 +1,138 @@
 from __future__ import annotations
 
+import json
 import logging
 import os
+import threading
 import time
 from datetime import datetime
-from typing import Any
+from typing import Any, Callable
 
 import requests
 from requests.adapters import HTTPAdapter
 
+from common.payload import CyclePayload
+
 logger = logging.getLogger("collector")
 
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    closed: pasa todo. Tras `failure_threshold` fallos seguidos pasa a open.
+    open: rechaza sin tocar la red durante `open_sec`.
+    half_open: deja pasar una sola sonda; exito cierra, fallo vuelve a open.
+    failure_threshold <= 0 deshabilita el breaker.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        open_sec: float = 30.0,
+        *,
+        name: str = "",
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = int(failure_threshold)
+        self.open_sec = max(0.0, float(open_sec))
+        self.name = name
+        self.clock = clock
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.opened = 0
+        self.half_opened = 0
+        self.closed = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    @property
+    def is_open(self) -> bool:
+        """True si un envio ahora seria rechazado sin tocar la red."""
+        with self._lock:
+            if self.state == BREAKER_OPEN:
+                return self.clock() - self._opened_at < self.open_sec
+            return self.state == BREAKER_HALF_OPEN and self._probe_in_flight
+
+    def allow_request(self) -> bool:
+        if not self.enabled:
+            return True
+        with self._lock:
+            if self.state == BREAKER_CLOSED:
+                return True
+            if self.state == BREAKER_OPEN and self.clock() - self._opened_at >= self.open_sec:
+                self._transition(BREAKER_HALF_OPEN)
+            if self.state == BREAKER_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+            if self.state != BREAKER_CLOSED:
+                self._transition(BREAKER_CLOSED)
+
+    def record_failure(self) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == BREAKER_HALF_OPEN or (
+                self.state == BREAKER_CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self._transition(BREAKER_OPEN)
+            elif self.state == BREAKER_OPEN:
+                self._opened_at = self.clock()
+
+    def _transition(self, state: str) -> None:
+        previous, self.state = self.state, state
+        if state == BREAKER_OPEN:
+            self._opened_at = self.clock()
+            self.opened += 1
+        elif state == BREAKER_HALF_OPEN:
+            self.half_opened += 1
+        else:
+            self.closed += 1
+        logger.warning(
+            "[SENDER BREAKER] url=%s from=%s to=%s failures=%s rejected=%s",
+            self.name,
+            previous,
+            state,
+            self.consecutive_failures,
+            self.rejected,
+        )
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "opened": self.opened,
+                "half_opened": self.half_opened,
+                "closed": self.closed,
+                "rejected": self.rejected,
+            }
+
+
+def _backend_unavailable(exc: Exception) -> bool:
+    # 4xx (salvo 429) significa backend arriba rechazando el payload: no abre el breaker.
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+        return status >= 500 or status == 429
+    return True
+
 
 class BackendSender:
     def __init__(
@@ -20,8 +142,16 @@ class BackendSender:
         send_events: bool = False,
         pool_connections: int = 2,
         pool_maxsize: int = 4,
+        batch_url: str | None = None,
+        batch_max_items: int = 100,
+        batch_max_bytes: int = 512 * 1024,
+        breaker_failure_threshold: int = 5,
+        breaker_open_sec: float = 30.0,
     ):
         self.url = url
+        self.batch_url = batch_url or None
+        self.batch_max_items = max(1, int(batch_max_items))
+        self.batch_max_bytes = max(1, int(batch_max_bytes))
         self.timeout = timeout
         self.send_events = send_events
         self.api_key = os.getenv("COLLECTOR_API_KEY")
@@ -30,6 +160,7 @@ class BackendSender:
         )
         self._last_error_signature: str | None = None
         self._last_error_log_monotonic = 0.0
+        self.breaker = CircuitBreaker(breaker_failure_threshold, breaker_open_sec, name=url)
 
         if not self.api_key:
             logger.error("COLLECTOR_API_KEY NOT SET")
@@ -45,6 +176,15 @@ class BackendSender:
         self.session.mount("https://", adapter)
 
         self._headers = {"X-Api-Key": self.api_key or ""}
+        self._json_headers = {**self._headers, "Content-Type": "application/json"}
+
+    @property
+    def batch_enabled(self) -> bool:
+        return self.batch_url is not None
+
+    @property
+    def circuit_open(self) -> bool:
+        return self.breaker.is_open
 
     def _serialize_events(self, events: list[Any]) -> list[Any]:
         serialized: list[Any] = []
@@ -112,19 +252,125 @@ class BackendSender:
     def send(self, payload: Any) -> bool:
         if not self.api_key:
             return False
+        if not self.breaker.allow_request():
+            return False
 
+        try:
+            if isinstance(payload, CyclePayload):
+                # Cuerpo ya codificado por el payload: mismos bytes que su linea de spool.
+                response = self.session.post(
+                    self.url,
+                    data=payload.encode(),
+                    headers=self._json_headers,
+                    timeout=self.timeout,
+                )
+            else:
+                response = self.session.post(
+                    self.url,
+                    json=self._build_body(payload),
+                    headers=self._headers,
+                    timeout=self.timeout,
+                )
+            response.raise_for_status()
+        except Exception as exc:
+            self._record_error(exc)
+            return False
+
+        self.breaker.record_success()
+        return True
+
+    def _record_error(self, exc: Exception) -> None:
+        if _backend_unavailable(exc):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        self._log_send_error(exc)
+
+    # =========================
+    # BATCH
+    # =========================
+
+    def _iter_batches(self, encoded: list[bytes]):
+        start = 0
+        while start < len(encoded):
+            end = start
+            size = 2
+            while end < len(encoded) and end - start < self.batch_max_items:
+                item_size = len(encoded[end]) + 1
+                # Un payload mas grande que el limite viaja solo en su propio POST.
+                if end > start and size + item_size > self.batch_max_bytes:
+                    break
+                size += item_size
+                end += 1
+            yield start, end
+            start = end
+
+    def _parse_batch_results(self, response: requests.Response, count: int) -> list[bool]:
+        try:
+            data = response.json()
+        except ValueError:
+            return [True] * count
+
+        results = data.get("results") if isinstance(data, dict) else data
+        if not isinstance(results, list):
+            return [True] * count
+        if len(results) != count:
+            raise ValueError(f"batch results mismatch expected={count} got={len(results)}")
+
+        parsed: list[bool] = []
+        for item in results:
+            if isinstance(item, dict):
+                parsed.append(bool(item.get("ok", False)))
+            else:
+                parsed.append(bool(item))
+        return parsed
+
+    def _post_batch(self, chunk: list[bytes]) -> list[bool]:
         try:
             response = self.session.post(
-                self.url,
-                json=self._build_body(payload),
-                headers=self._headers,
+                self.batch_url,
+                data=b"[" + b",".join(chunk) + b"]",
+                headers=self._json_headers,
                 timeout=self.timeout,
             )
             response.raise_for_status()
-            return True
+        except Exception as exc:
+            self._record_error(exc)
+            return [False] * len(chunk)
+
+        self.breaker.record_success()
+        try:
+            return self._parse_batch_results(response, len(chunk))
         except Exception as exc:
             self._log_send_error(exc)
-            return False
+            return [False] * len(chunk)
+
+    def send_batch(self, payloads: list[Any]) -> list[bool]:
+        """
+        Envia payloads en POSTs con un arreglo JSON, limitados por
+        batch_max_items y batch_max_bytes. Devuelve un resultado por payload.
+        Sin batch_url configurado, envia uno por uno.
+        """
+        if not payloads:
+            return []
+        if not self.api_key:
+            return [False] * len(payloads)
+        if not self.batch_enabled:
+            return [self.send(payload) for payload in payloads]
+
+        encoded = [
+            payload.encode()
+            if isinstance(payload, CyclePayload)
+            else json.dumps(self._build_body(payload), separators=(",", ":")).encode("utf-8")
+            for payload in payloads
+        ]
+        results: list[bool] = []
+        for start, end in self._iter_batches(encoded):
+            if self.breaker.allow_request():
+                results.extend(self._post_batch(encoded[start:end]))
+            else:
+                results.extend([False] * (end - start))
+        return results
 
     def close(self):
         self.session.close()
@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, Queue
+from typing import Any, Callable
+
+from common.delivery import replay_spool, route_failures, send_payloads, spool_payloads, spool_pending
+from common.payload import AnyPayload
+from common.retry import RetryScheduler
+from common.sender import BackendSender
+from storage import jsonl_buffer
+from storage.segmented_spool import SegmentedSpool
+
+logger = logging.getLogger("collector")
+
+DEFAULT_MAX_CONNECTIONS = 8
+
+
+def _load_spool(lagoon_id: str) -> SegmentedSpool:
+    # Primera apertura: mkdir, import legacy, scan de segmentos e indice del activo.
+    spool = jsonl_buffer.open_spool(lagoon_id)
+    spool.pending_count()
+    return spool
+
+
+class NotifyingQueue(Queue):
+    """Queue normal (mismas politicas de enqueue_payload) que avisa al loop en cada put."""
+
+    def __init__(self, maxsize: int, on_put: Callable[[], None]) -> None:
+        super().__init__(maxsize=maxsize)
+        self._on_put = on_put
+
+    def _put(self, item: Any) -> None:
+        super()._put(item)
+        self._on_put()
+
+
+class SenderLane:
+    def __init__(
+        self,
+        lagoon_id: str,
+        sender: BackendSender,
+        *,
+        spool_on_fail: bool,
+        log_every_n_sends: int,
+        replay_batch_size: int,
+        max_replay_payload_age_sec: int,
+        retry_attempts: int,
+        retry_backoff_base_sec: float,
+        retry_backoff_max_sec: float,
+    ) -> None:
+        self.lagoon_id = lagoon_id
+        self.sender = sender
+        self.spool_on_fail = spool_on_fail
+        self.log_every_n_sends = log_every_n_sends
+        self.replay_batch_size = replay_batch_size
+        self.max_replay_payload_age_sec = max_replay_payload_age_sec
+        self.retries = RetryScheduler(retry_attempts, retry_backoff_base_sec, retry_backoff_max_sec)
+        self.queue: Queue | None = None
+        self.wakeup: asyncio.Event | None = None
+        self.task: asyncio.Task | None = None
+        self.stopping = False
+        self.in_flight: list[AnyPayload] = []
+        self.spool: SegmentedSpool | None = None
+        self.sent = 0
+        self.failed = 0
+        self.last_stats_total = 0
+
+    @property
+    def max_batch(self) -> int:
+        return self.sender.batch_max_items if self.sender.batch_enabled else 1
+
+    def drain(self) -> list[AnyPayload]:
+        batch: list[AnyPayload] = []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+
+class AsyncSenderEngine:
+    """
+    Un solo event loop atiende la cola, reintentos y replay de todas las lagunas.
+    Las sesiones HTTP keep-alive se comparten por backend y el I/O bloqueante
+    corre en un pool acotado a max_connections hebras. Cada laguna ocupa a lo
+    sumo un slot a la vez y los slots se entregan en orden FIFO, asi una laguna
+    con backlog no monopoliza el backend.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        idle_wait_sec: float = 1.0,
+    ) -> None:
+        self.max_connections = max(1, int(max_connections))
+        self.idle_wait_sec = idle_wait_sec
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_connections,
+            thread_name_prefix="sender-io",
+        )
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._senders: dict[str, BackendSender] = {}
+        self._lanes: dict[str, SenderLane] = {}
+        self._lock = threading.Lock()
+
+    # =========================
+    # LIFECYCLE
+    # =========================
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            ready = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run_loop,
+                args=(ready,),
+                name="sender-engine",
+                daemon=True,
+            )
+            self._thread.start()
+        ready.wait()
+
+    def _run_loop(self, ready: threading.Event) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._slots = asyncio.Semaphore(self.max_connections)
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def stop(self, timeout: float | None = None) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+        if loop is None or thread is None or not thread.is_alive():
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(self._cancel_lanes(), loop).result(timeout)
+        except Exception:
+            pass
+        try:
+            loop.call_soon_threadsafe(loop.stop)
+        except RuntimeError:
+            # Un stop anterior vencio su plazo y el loop termino de cerrarse recien ahora.
+            pass
+        thread.join(timeout)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for sender in self._senders.values():
+            sender.close()
+
+    async def _cancel_lanes(self) -> None:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # =========================
+    # REGISTRATION
+    # =========================
+
+    def shared_sender(
+        self,
+        backend_cfg: dict[str, Any],
+        factory: Callable[[], BackendSender],
+    ) -> BackendSender:
+        key = json.dumps(backend_cfg, sort_keys=True, default=str)
+        with self._lock:
+            sender = self._senders.get(key)
+            if sender is None:
+                sender = factory()
+                self._senders[key] = sender
+            return sender
+
+    def register(self, lane: SenderLane, maxsize: int) -> Queue:
+        self.start()
+        loop = self._loop
+        wakeup = asyncio.Event()
+
+        def _notify() -> None:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                pass
+
+        lane.wakeup = wakeup
+        lane.queue = NotifyingQueue(maxsize=maxsize, on_put=_notify)
+        lane.retries.max_pending = max(maxsize, 1) * 10
+        with self._lock:
+            self._lanes[lane.lagoon_id] = lane
+        asyncio.run_coroutine_threadsafe(self._run_lane(lane), loop)
+        return lane.queue
+
+    def request_stop(self, lagoon_id: str) -> None:
+        """Pide a la tarea de una laguna que termine tras su envio o replay en curso."""
+        with self._lock:
+            lane = self._lanes.get(lagoon_id)
+            loop = self._loop
+        if lane is None:
+            return
+        lane.stopping = True
+        if loop is not None and lane.wakeup is not None:
+            try:
+                loop.call_soon_threadsafe(lane.wakeup.set)
+            except RuntimeError:
+                pass
+
+    def unregister(self, lagoon_id: str, timeout: float | None = None) -> int:
+        """
+        Detiene la tarea de una laguna y pasa su cola y reintentos al spool.
+        Devuelve cuantos payloads quedaron en spool.
+        """
+        with self._lock:
+            lane = self._lanes.pop(lagoon_id, None)
+            loop = self._loop
+        if lane is None:
+            return 0
+        lane.stopping = True
+        in_flight: list[AnyPayload] = []
+        if loop is not None and lane.task is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._stop_lane(lane), loop).result(timeout)
+            except Exception:
+                # Envio en curso mas largo que el timeout: se corta la tarea y su lote va al spool.
+                in_flight = lane.in_flight
+                loop.call_soon_threadsafe(lane.task.cancel)
+        return spool_pending(lane.lagoon_id, lane.retries, lane.queue, lane.spool_on_fail, in_flight)
+
+    async def _stop_lane(self, lane: SenderLane) -> None:
+        # La tarea termina su envio en curso y sale en la siguiente vuelta.
+        lane.stopping = True
+        if lane.wakeup is not None:
+            lane.wakeup.set()
+        task = lane.task
+        if task is not None and not task.done():
+            await asyncio.gather(task, return_exceptions=True)
+
+    @property
+    def lanes(self) -> list[SenderLane]:
+        with self._lock:
+            return list(self._lanes.values())
+
+    # =========================
+    # LOOP
+    # =========================
+
+    async def _io(self, func: Callable[..., Any], *args: Any) -> Any:
+        async with self._slots:
+            return await self._loop.run_in_executor(self._executor, func, *args)
+
+    async def _next_batch(self, lane: SenderLane) -> list[AnyPayload]:
+        batch = lane.drain()
+        if batch:
+            return batch
+
+        lane.wakeup.clear()
+        # Se revisa de nuevo tras clear(): un put entre drain y clear no se pierde.
+        batch = lane.drain()
+        if batch:
+            return batch
+
+        timeout = self.idle_wait_sec
+        next_retry = lane.retries.next_delay()
+        if next_retry is not None:
+            timeout = min(timeout, next_retry)
+        try:
+            await asyncio.wait_for(lane.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        return lane.drain()
+
+    async def _deliver(
+        self,
+        lane: SenderLane,
+        payloads: list[AnyPayload],
+        attempts: list[int],
+    ) -> None:
+        lane.in_flight = payloads
+        results = await self._io(send_payloads, lane.sender, payloads)
+        exhausted = route_failures(lane.sender, lane.retries, payloads, attempts, results)
+        lane.sent += sum(1 for ok in results if ok)
+        lane.failed += len(exhausted)
+        if lane.spool_on_fail and exhausted:
+            await self._loop.run_in_executor(
+                self._executor, spool_payloads, lane.lagoon_id, exhausted
+            )
+        lane.in_flight = []
+
+    async def _replay_if_pending(self, lane: SenderLane) -> None:
+        # Con el spool ya cargado, un spool vacio se resuelve en el loop sin lock ni slot de I/O.
+        if lane.spool is None or lane.spool.pending_hint() == 0:
+            return
+        await self._io(
+            replay_spool,
+            lane.lagoon_id,
+            lane.sender,
+            lane.replay_batch_size,
+            lane.max_replay_payload_age_sec,
+        )
+
+    async def _run_lane(self, lane: SenderLane) -> None:
+        lane.task = asyncio.current_task()
+        # La carga del spool (y su lock, compartido con la hebra de la laguna) nunca corre en el loop.
+        try:
+            lane.spool = await self._loop.run_in_executor(self._executor, _load_spool, lane.lagoon_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.error("[BUFFER ERROR] lagoon=%s action=load err=%s", lane.lagoon_id, exc)
+        while not lane.stopping:
+            due = lane.retries.pop_due(lane.max_batch)
+            if due:
+                await self._deliver(
+                    lane,
+                    [entry.payload for entry in due],
+                    [entry.attempts for entry in due],
+                )
+                continue
+
+            if lane.queue.qsize() == 0 and not lane.retries:
+                try:
+                    await self._replay_if_pending(lane)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    pass
+
+            batch = await self._next_batch(lane)
+            if not batch:
+                continue
+
+            try:
+                await self._deliver(lane, batch, [0] * len(batch))
+            finally:
+                for _ in batch:
+                    lane.queue.task_done()
+
+            total = lane.sent + lane.failed
+            if lane.log_every_n_sends > 0 and total - lane.last_stats_total >= lane.log_every_n_sends:
+                lane.last_stats_total = total
+                logger.debug(
+                    "[COLLECTOR SEND STATS] lagoon=%s sent=%s failed=%s retrying=%s queue=%s breaker=%s",
+                    lane.lagoon_id,
+                    lane.sent,
+                    lane.failed,
+                    len(lane.retries),
+                    lane.queue.qsize(),
+                    lane.sender.breaker.state,
+                )
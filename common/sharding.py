@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+DEFAULT_HEALTH_DIR = Path("data/health")
+
+
+def lagoon_weight(cfg: dict) -> float:
+    weight = cfg.get("shard_weight", 1)
+    try:
+        return max(0.0, float(weight))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def resolve_shard_count(value: Any, lagoons: int) -> int:
+    """`runtime.shards`: entero o `auto` (un shard por CPU); nunca mas shards que lagunas."""
+    if isinstance(value, str) and value.strip().lower() == "auto":
+        count = os.cpu_count() or 1
+    else:
+        count = int(value or 1)
+    return max(1, min(count, max(1, lagoons)))
+
+
+def assign_shards(plc_configs: list[dict], shard_count: int) -> list[list[int]]:
+    """
+    Reparte las lagunas por `shard_weight` (default 1): la mas pesada va al
+    shard con menos carga. Es deterministico, asi cada proceso calcula su
+    propio subconjunto desde el mismo YAML sin coordinarse.
+    """
+    shard_count = max(1, shard_count)
+    loads = [0.0] * shard_count
+    shards: list[list[int]] = [[] for _ in range(shard_count)]
+    order = sorted(range(len(plc_configs)), key=lambda index: (-lagoon_weight(plc_configs[index]), index))
+    for index in order:
+        target = min(range(shard_count), key=lambda shard: (loads[shard], len(shards[shard]), shard))
+        shards[target].append(index)
+        loads[target] += lagoon_weight(plc_configs[index])
+    return [sorted(indexes) for indexes in shards]
+
+
+def select_shard(plc_configs: list[dict], shard_index: int, shard_count: int) -> list[dict]:
+    if shard_count <= 1:
+        return list(plc_configs)
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard_index {shard_index} out of range for shard_count {shard_count}")
+    return [plc_configs[index] for index in assign_shards(plc_configs, shard_count)[shard_index]]
+
+
+# =========================
+# HEALTH
+# =========================
+
+def health_path(shard_index: int, base_dir: str | Path = DEFAULT_HEALTH_DIR) -> Path:
+    return Path(base_dir) / f"shard_{shard_index}.json"
+
+
+def write_health(path: str | Path, data: dict) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def read_health(path: str | Path) -> dict | None:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def aggregate_health(
+    shard_count: int,
+    *,
+    base_dir: str | Path = DEFAULT_HEALTH_DIR,
+    stale_after_sec: float = 60.0,
+    now: float | None = None,
+) -> dict:
+    now = time.time() if now is None else now
+    shards: dict[str, dict] = {}
+    lagoons = 0
+    cycles = 0
+    stale: list[int] = []
+    for shard_index in range(shard_count):
+        health = read_health(health_path(shard_index, base_dir))
+        age = None if health is None else now - float(health.get("updated_ts", 0))
+        if health is None or age > stale_after_sec:
+            stale.append(shard_index)
+        if health is not None:
+            shard_lagoons = health.get("lagoons") or {}
+            lagoons += len(shard_lagoons)
+            cycles += sum(int(item.get("cycles", 0)) for item in shard_lagoons.values())
+        shards[str(shard_index)] = {
+            "pid": None if health is None else health.get("pid"),
+            "age_sec": None if age is None else round(age, 1),
+            "lagoons": 0 if health is None else len(health.get("lagoons") or {}),
+        }
+    return {
+        "updated_ts": now,
+        "shard_count": shard_count,
+        "lagoons": lagoons,
+        "cycles": cycles,
+        "stale_shards": stale,
+        "shards": shards,
+    }
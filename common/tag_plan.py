@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Callable
+
+_UNSEEN = object()
+
+
+def _slot_getter(names: tuple[str, ...]) -> Callable[[dict[str, Any]], tuple]:
+    if not names:
+        return lambda tags: ()
+    if len(names) == 1:
+        single = itemgetter(names[0])
+        return lambda tags: (single(tags),)
+    return itemgetter(*names)
+
+
+class TagPlan:
+    """
+    Plan compilado por laguna. Con el primer ciclo fija el orden de los tags,
+    clasifica una vez que tags son de evento booleano, candidatos a estado
+    (valores int) y totalizador, y guarda los valores previos en listas planas
+    por slot. Cada ciclo extrae los slots en una tupla y solo recorre tag por
+    tag cuando la tupla cambio. Si cambia el set de tags que entrega el reader,
+    el plan se recompila conservando los estados previos por nombre.
+    """
+
+    def __init__(
+        self,
+        lagoon_id: str,
+        event_tags: dict[str, str] | None = None,
+        *,
+        enable_state_events: bool = True,
+        totalizer_tag: str | None = None,
+    ) -> None:
+        self.lagoon_id = lagoon_id
+        self.event_tags = dict(event_tags or {})
+        self.enable_state_events = enable_state_events
+        self.totalizer_tag = totalizer_tag
+        self.has_totalizer = False
+        self._totalizer_get: Callable[[dict[str, Any]], Any] | None = None
+        self.compiles = 0
+
+        self._count = -1
+        self.bool_names: tuple[str, ...] = ()
+        self.bool_prev: list[bool | None] = []
+        self._bool_get = _slot_getter(())
+        self._bool_raw: tuple = ()
+
+        self.state_names: tuple[str, ...] = ()
+        self.state_prev: list[int | None] = []
+        self._state_get = _slot_getter(())
+        self._state_raw: tuple = ()
+
+    def compile(self, tags: dict[str, Any]) -> None:
+        previous_bool = dict(zip(self.bool_names, self.bool_prev))
+        previous_state = dict(zip(self.state_names, self.state_prev))
+
+        self.bool_names = tuple(tag_id for tag_id in self.event_tags if tag_id in tags)
+        self.bool_prev = [previous_bool.get(tag_id) for tag_id in self.bool_names]
+        self._bool_get = _slot_getter(self.bool_names)
+        self._bool_raw = (_UNSEEN,) * len(self.bool_names)
+
+        if self.enable_state_events:
+            # Solo enteros (o sin valor aun) pueden ser estados 0..3; float/str/bool nunca.
+            self.state_names = tuple(
+                tag_id
+                for tag_id, value in tags.items()
+                if value is None or type(value) is int
+            )
+        else:
+            self.state_names = ()
+        self.state_prev = [previous_state.get(tag_id) for tag_id in self.state_names]
+        self._state_get = _slot_getter(self.state_names)
+        self._state_raw = (_UNSEEN,) * len(self.state_names)
+
+        self.has_totalizer = self.totalizer_tag is not None and self.totalizer_tag in tags
+        self._totalizer_get = itemgetter(self.totalizer_tag) if self.has_totalizer else None
+        self._count = len(tags)
+        self.compiles += 1
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Estados previos por nombre (sin los que aun no tienen valor)."""
+        return {
+            "bool": {tag_id: value for tag_id, value in zip(self.bool_names, self.bool_prev) if value is not None},
+            "state": {tag_id: value for tag_id, value in zip(self.state_names, self.state_prev) if value is not None},
+        }
+
+    def restore(self, bool_states: dict[str, Any], state_states: dict[str, Any]) -> None:
+        """
+        Siembra los estados previos antes del primer ciclo: el `compile()` del
+        primer `process()` los conserva por nombre, asi un cambio ocurrido
+        mientras el proceso estaba abajo genera su evento en la primera lectura.
+        """
+        bools = {tag_id: bool(value) for tag_id, value in bool_states.items() if tag_id in self.event_tags}
+        states = {
+            tag_id: value
+            for tag_id, value in state_states.items()
+            if self.enable_state_events and type(value) is int and 0 <= value <= 3
+        }
+        self.bool_names = tuple(bools)
+        self.bool_prev = list(bools.values())
+        self.state_names = tuple(states)
+        self.state_prev = list(states.values())
+        self._count = -1
+
+    def _extract(self, tags: dict[str, Any]) -> tuple[tuple, tuple]:
+        # Se recompila si cambia la cantidad de tags o falta un slot de evento/totalizador.
+        if len(tags) != self._count:
+            self.compile(tags)
+        try:
+            if self._totalizer_get is not None:
+                self._totalizer_get(tags)
+            return self._bool_get(tags), self._state_get(tags)
+        except KeyError:
+            self.compile(tags)
+            return self._bool_get(tags), self._state_get(tags)
+
+    def process(self, tags: dict[str, Any], ts: datetime) -> list[dict]:
+        bool_raw, state_raw = self._extract(tags)
+        events: list[dict] = []
+        ts_iso: str | None = None
+
+        if bool_raw != self._bool_raw:
+            prev_states = self.bool_prev
+            for slot, raw_value in enumerate(bool_raw):
+                if raw_value is None:
+                    continue
+                value = bool(raw_value)
+                prev = prev_states[slot]
+                prev_states[slot] = value
+                if prev is None or prev == value:
+                    continue
+
+                tag_id = self.bool_names[slot]
+                if ts_iso is None:
+                    ts_iso = ts.isoformat()
+                if value:
+                    events.append(
+                        {
+                            "type": "OPEN",
+                            "lagoon_id": self.lagoon_id,
+                            "tag_id": tag_id,
+                            "tag_label": self.event_tags[tag_id],
+                            "alert_type": "BOOLEAN",
+                            "state": 1,
+                            "ts": ts_iso,
+                        }
+                    )
+                else:
+                    events.append(
+                        {
+                            "type": "CLOSE",
+                            "lagoon_id": self.lagoon_id,
+                            "tag_id": tag_id,
+                            "alert_type": "BOOLEAN",
+                            "state": 0,
+                            "ts": ts_iso,
+                        }
+                    )
+            self._bool_raw = bool_raw
+
+        if state_raw != self._state_raw:
+            prev_raw = self._state_raw
+            prev_states = self.state_prev
+            for slot, value in enumerate(state_raw):
+                if value is prev_raw[slot] or type(value) is not int or not 0 <= value <= 3:
+                    continue
+                prev = prev_states[slot]
+                prev_states[slot] = value
+                if prev is None or prev == value:
+                    continue
+
+                if ts_iso is None:
+                    ts_iso = ts.isoformat()
+                events.append(
+                    {
+                        "type": "STATE_CHANGE",
+                        "lagoon_id": self.lagoon_id,
+                        "tag_id": self.state_names[slot],
+                        "alert_type": "STATE",
+                        "previous_state": prev,
+                        "state": value,
+                        "ts": ts_iso,
+                    }
+                )
+            self._state_raw = state_raw
+
+        return events
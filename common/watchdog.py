@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Iterable, Protocol
+
+logger = logging.getLogger("collector")
+
+
+class Heartbeat(Protocol):
+    lagoon_id: str
+    watchdog_stall_sec: float
+
+    def stalled_for(self, now: float) -> float: ...
+
+    def beat(self) -> None: ...
+
+
+class LagoonWatchdog:
+    """
+    Revisa el heartbeat de cada laguna; si una lleva mas de su
+    `watchdog_stall_sec` sin latir (ciclo colgado en una llamada del driver o
+    loop muerto) llama `recover(target)` solo para esa laguna. Despues de
+    recuperar se reinicia su heartbeat, asi un rebuild que falla se reintenta
+    recien al siguiente periodo de stall.
+    """
+
+    def __init__(
+        self,
+        targets: Iterable[Heartbeat],
+        recover: Callable[[Any], None],
+        *,
+        check_every_sec: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        # Iterable vivo (p. ej. `CollectorFleet`): las lagunas agregadas por un reload tambien se vigilan.
+        self.targets = targets
+        self.recover = recover
+        self.check_every_sec = check_every_sec
+        self.clock = clock
+        self.recoveries = 0
+        self._stop = threading.Event()
+
+    def check(self) -> list[str]:
+        now = self.clock()
+        recovered: list[str] = []
+        for target in list(self.targets):
+            stall_sec = target.watchdog_stall_sec
+            if stall_sec <= 0:
+                continue
+            stalled = target.stalled_for(now)
+            if stalled < stall_sec:
+                continue
+
+            logger.warning(
+                "[COLLECTOR WATCHDOG] lagoon=%s stalled_sec=%.1f limit_sec=%.1f action=rebuild",
+                target.lagoon_id,
+                stalled,
+                stall_sec,
+            )
+            try:
+                self.recover(target)
+            except Exception as exc:
+                logger.error("[COLLECTOR WATCHDOG] lagoon=%s action=rebuild_failed err=%s", target.lagoon_id, exc)
+            target.beat()
+            self.recoveries += 1
+            recovered.append(target.lagoon_id)
+        return recovered
+
+    def run_forever(self) -> None:
+        while not self._stop.wait(self.check_every_sec):
+            self.check()
+
+    def stop(self) -> None:
+        self._stop.set()
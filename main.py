@@ -1,12 +1,14 @@
 import argparse
 import logging
+import math
+import os
 import random
+import signal
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime, timezone
-from queue import Empty, Full, Queue
-from typing import Any, Dict
+from datetime import datetime
+from queue import Queue
+from typing import Any, Iterable
 from zoneinfo import ZoneInfo
 
 for noisy_logger_name in (
@@ -25,121 +27,47 @@ for noisy_logger_name in (
 
 from dotenv import load_dotenv
 
+from common.aggregation import parse_aggregation
 from common.config import load_plc_configs, resolve_product_type
+from common.config_watch import ConfigWatcher, PlcConfigDiff, diff_plc_configs
+from common.delivery import SenderWorker, enqueue_payload, spool_payload
 from common.logger import get_logger
-from common.payload import NormalizedPayload
+from common.payload import CyclePayload
+from common.report_by_exception import parse_report_by_exception
+from common.scheduler import DEFAULT_CYCLE_WORKERS, OVERRUN_COALESCE, OVERRUN_SKIP, TickScheduler
 from common.sender import BackendSender
+from common.sender_engine import DEFAULT_MAX_CONNECTIONS, AsyncSenderEngine, SenderLane
+from common.sharding import health_path, select_shard, write_health
+from common.tag_plan import TagPlan
 from common.time import utc_now
-from normalizer.tot_delta_normalizer import TotDeltaNormalizer
+from common.watchdog import LagoonWatchdog
+from normalizer.totalizer_pipeline import (
+    DEFAULT_DELTA_TAG,
+    DEFAULT_TOTALIZER_TAG,
+    DEFAULT_TOTALIZERS,
+    TotalizerPipeline,
+    parse_totalizers,
+)
 from storage import jsonl_buffer
+from storage.state_snapshot import DEFAULT_STATE_MAX_AGE_SEC, read_state, state_path_for_lagoon, write_state
 from workers.get_rockwell import RockwellSessionReader
-from workers.get_siemens import SiemensModulesReader, SiemensSessionReader
+from workers.get_siemens import (
+    DEFAULT_MODULE_READ_WORKERS,
+    SiemensModulesReader,
+    SiemensSessionReader,
+    subscription_options,
+)
 from workers.get_simulator import SimulatedTagReader
+from workers.rockwell_tag_cache import DEFAULT_TAG_CACHE_DIR, TagDefinitionCache
+from workers.scan_classes import ScanClassReader, parse_scan_classes
 
 load_dotenv()
 
 logger = get_logger()
 
-TOT_TAG = "WM01_TOT_SCADA"
-DELTA_TAG = "WM01_TOT_DELTA_SCADA"
-
-
-class BooleanEventDetector:
-    def __init__(self):
-        self.last_states: Dict[tuple, bool] = {}
-
-    def process(
-        self,
-        lagoon_id: str,
-        tags: Dict[str, Any],
-        ts,
-        event_tags: Dict[str, str],
-    ) -> list[dict]:
-        events: list[dict] = []
-
-        for tag_id, label in event_tags.items():
-            if tag_id not in tags:
-                continue
-
-            raw_value = tags[tag_id]
-            if raw_value is None:
-                continue
-
-            value = bool(raw_value)
-            key = (lagoon_id, tag_id)
-            prev = self.last_states.get(key)
-
-            if prev is None:
-                self.last_states[key] = value
-                continue
-
-            if prev is False and value is True:
-                events.append(
-                    {
-                        "type": "OPEN",
-                        "lagoon_id": lagoon_id,
-                        "tag_id": tag_id,
-                        "tag_label": label,
-                        "alert_type": "BOOLEAN",
-                        "state": int(value),
-                        "ts": ts.isoformat(),
-                    }
-                )
-            elif prev is True and value is False:
-                events.append(
-                    {
-                        "type": "CLOSE",
-                        "lagoon_id": lagoon_id,
-                        "tag_id": tag_id,
-                        "alert_type": "BOOLEAN",
-                        "state": int(value),
-                        "ts": ts.isoformat(),
-                    }
-                )
-
-            self.last_states[key] = value
-
-        return events
-
-
-class StateEventDetector:
-    def __init__(self):
-        self.last_states: Dict[tuple, int] = {}
-
-    def process(self, lagoon_id: str, tags: Dict[str, Any], ts) -> list[dict]:
-        events: list[dict] = []
-
-        for tag_id, raw_value in tags.items():
-            if isinstance(raw_value, bool):
-                continue
-            if not isinstance(raw_value, int):
-                continue
-            if raw_value not in (0, 1, 2, 3):
-                continue
-
-            key = (lagoon_id, tag_id)
-            prev = self.last_states.get(key)
-
-            if prev is None:
-                self.last_states[key] = raw_value
-                continue
-
-            if prev != raw_value:
-                events.append(
-                    {
-                        "type": "STATE_CHANGE",
-                        "lagoon_id": lagoon_id,
-                        "tag_id": tag_id,
-                        "alert_type": "STATE",
-                        "previous_state": prev,
-                        "state": raw_value,
-                        "ts": ts.isoformat(),
-                    }
-                )
-
-            self.last_states[key] = raw_value
-
-        return events
+TOT_TAG = DEFAULT_TOTALIZER_TAG
+DELTA_TAG = DEFAULT_DELTA_TAG
+DEFAULT_SHUTDOWN_DEADLINE_SEC = 10.0
 
 
 def as_bool(value: Any, default: bool = False) -> bool:
@@ -173,7 +101,11 @@ def get_runtime_option(cfg: dict, root_cfg: dict, key: str, default: Any) -> Any
     return default
 
 
-def get_backend_sender(cfg: dict, root_cfg: dict) -> BackendSender | None:
+def get_backend_sender(
+    cfg: dict,
+    root_cfg: dict,
+    sender_engine: AsyncSenderEngine | None = None,
+) -> BackendSender | None:
     backend_cfg = dict(root_cfg.get("backend") or {})
     backend_cfg.update(cfg.get("backend") or {})
 
@@ -181,261 +113,209 @@ def get_backend_sender(cfg: dict, root_cfg: dict) -> BackendSender | None:
     if not backend_url:
         return None
 
-    return BackendSender(
-        url=backend_url,
-        timeout=float(backend_cfg.get("timeout_sec", 3.0)),
-        send_events=as_bool(backend_cfg.get("send_events", False), False),
-        pool_connections=int(backend_cfg.get("pool_connections", 2)),
-        pool_maxsize=int(backend_cfg.get("pool_maxsize", 4)),
-    )
-
-
-def spool_payload(payload: NormalizedPayload):
-    try:
-        jsonl_buffer.append_for_lagoon(
-            lagoon_id=str(payload.lagoon_id),
-            payload_json=payload.model_dump_json(),
+    def _build(pool_maxsize: int) -> BackendSender:
+        return BackendSender(
+            url=backend_url,
+            timeout=float(backend_cfg.get("timeout_sec", 3.0)),
+            send_events=as_bool(backend_cfg.get("send_events", False), False),
+            pool_connections=int(backend_cfg.get("pool_connections", 2)),
+            pool_maxsize=pool_maxsize,
+            batch_url=backend_cfg.get("batch_url"),
+            batch_max_items=int(backend_cfg.get("batch_max_items", 100)),
+            batch_max_bytes=int(backend_cfg.get("batch_max_bytes", 512 * 1024)),
+            breaker_failure_threshold=int(backend_cfg.get("breaker_failure_threshold", 5)),
+            breaker_open_sec=float(backend_cfg.get("breaker_open_sec", 30.0)),
         )
-    except Exception as exc:
-        logger.error(
-            "[BUFFER ERROR] lagoon=%s err=%s",
-            payload.lagoon_id,
-            exc,
-        )
-
-
-def send_with_retry(
-    sender: BackendSender,
-    payload: NormalizedPayload,
-    retry_attempts: int,
-    retry_backoff_base_sec: float,
-    retry_backoff_max_sec: float,
-) -> bool:
-    attempts = max(0, retry_attempts)
-    max_attempts = attempts + 1
 
-    for attempt in range(1, max_attempts + 1):
-        if sender.send(payload):
-            return True
-
-        if attempt >= max_attempts:
-            break
-
-        delay_sec = min(
-            retry_backoff_base_sec * (2 ** (attempt - 1)),
-            retry_backoff_max_sec,
+    if sender_engine is not None:
+        # Una sesion por backend, compartida por todas las lagunas del engine.
+        return sender_engine.shared_sender(
+            backend_cfg,
+            lambda: _build(sender_engine.max_connections),
         )
-        time.sleep(max(0.0, delay_sec))
-
-    return False
-
-
-def parse_payload_timestamp(value: Any) -> datetime | None:
-    if isinstance(value, datetime):
-        parsed = value
-    elif isinstance(value, str):
-        raw = value.strip()
-        if not raw:
-            return None
-        if raw.endswith("Z"):
-            raw = f"{raw[:-1]}+00:00"
-        try:
-            parsed = datetime.fromisoformat(raw)
-        except ValueError:
-            return None
-    else:
-        return None
-
-    if parsed.tzinfo is None:
-        parsed = parsed.replace(tzinfo=timezone.utc)
-    return parsed.astimezone(timezone.utc)
-
-
-def should_drop_replay_payload(payload: dict[str, Any], max_payload_age_sec: int) -> bool:
-    if max_payload_age_sec <= 0:
-        return False
-
-    payload_ts = parse_payload_timestamp(payload.get("timestamp"))
-    if payload_ts is None:
-        return False
-
-    payload_age_sec = (utc_now() - payload_ts).total_seconds()
-    return payload_age_sec > max_payload_age_sec
-
-
-def replay_spool(
-    lagoon_id: str,
-    sender: BackendSender,
-    replay_batch_size: int,
-    max_replay_payload_age_sec: int,
-) -> tuple[int, int, int]:
-    def _send_or_requeue(payload: dict[str, Any]) -> str:
-        if should_drop_replay_payload(payload, max_replay_payload_age_sec):
-            return "drop"
-        return "sent" if sender.send(payload) else "keep"
-
-    return jsonl_buffer.replay_for_lagoon(
-        lagoon_id=lagoon_id,
-        send_payload=_send_or_requeue,
-        max_items=max(1, replay_batch_size),
-    )
-
+    return _build(int(backend_cfg.get("pool_maxsize", 4)))
 
-def enqueue_payload(send_queue: Queue, payload: NormalizedPayload, policy: str) -> bool:
-    if policy == "block":
-        send_queue.put(payload)
-        return True
 
+def _close_quietly(close) -> None:
     try:
-        send_queue.put_nowait(payload)
-        return True
-    except Full:
-        if policy != "drop_oldest":
-            return False
+        close()
+    except Exception:
+        pass
 
-    try:
-        _ = send_queue.get_nowait()
-        send_queue.task_done()
-    except Empty:
-        return False
 
-    try:
-        send_queue.put_nowait(payload)
-        return True
-    except Full:
-        return False
-
-
-def sender_worker_loop(
-    lagoon_id: str,
-    sender: BackendSender,
-    send_queue: Queue,
-    spool_on_fail: bool,
-    log_every_n_sends: int,
-    replay_batch_size: int,
-    max_replay_payload_age_sec: int,
-    retry_attempts: int,
-    retry_backoff_base_sec: float,
-    retry_backoff_max_sec: float,
-):
-    sent = 0
-    failed = 0
+class LagoonCollector:
+    """
+    Estado y ciclo de una laguna: sender/cola, spool, reader y plan de tags
+    se arman una vez; `run_cycle()` lee, normaliza y encola un payload. Lo
+    usan tanto el loop por hebra (`run_one_plc`) como el `TickScheduler`.
+    """
 
-    while True:
-        if send_queue.qsize() == 0:
-            try:
-                replay_spool(
-                    lagoon_id=lagoon_id,
-                    sender=sender,
-                    replay_batch_size=replay_batch_size,
-                    max_replay_payload_age_sec=max_replay_payload_age_sec,
-                )
-            except Exception:
-                pass
-
-        try:
-            payload = send_queue.get(timeout=1.0)
-        except Empty:
-            continue
+    def __init__(
+        self,
+        cfg: dict,
+        root_cfg: dict,
+        sender_engine: AsyncSenderEngine | None = None,
+        *,
+        previous: "LagoonCollector | None" = None,
+    ) -> None:
+        self.lagoon_id = lagoon_id = cfg["lagoon_id"]
+        self.product_type = resolve_product_type(cfg, root_cfg)
+        self.cfg = cfg
+        self.root_cfg = root_cfg
+        self.source = source = str(cfg["source"]).strip().lower()
+        poll = float(cfg.get("poll_seconds", 1))
+        if poll <= 0:
+            logger.warning("[COLLECTOR CONFIG] lagoon=%s reason=invalid_poll_seconds fallback=0.1", lagoon_id)
+            poll = 0.1
+        self.poll = poll
+
+        lagoon_timezone = cfg.get("timezone")
+        if not lagoon_timezone:
+            raise ValueError(f"Timezone not specified in config for lagoon {lagoon_id}")
 
         try:
-            ok = send_with_retry(
-                sender=sender,
-                payload=payload,
-                retry_attempts=retry_attempts,
-                retry_backoff_base_sec=retry_backoff_base_sec,
-                retry_backoff_max_sec=retry_backoff_max_sec,
+            self.tz = ZoneInfo(lagoon_timezone)
+        except Exception as exc:
+            raise ValueError(f"Invalid timezone {lagoon_timezone} for lagoon {lagoon_id}") from exc
+
+        self.sender = sender = get_backend_sender(cfg, root_cfg, sender_engine)
+        self.send_events = bool(sender is not None and sender.send_events)
+        self.sender_engine = sender_engine
+        self.send_queue: Queue | None = None
+        self.sender_worker: SenderWorker | None = None
+        self.sender_thread: threading.Thread | None = None
+
+        send_queue_maxsize = int(get_runtime_option(cfg, root_cfg, "send_queue_maxsize", 100))
+        send_queue_maxsize = max(1, send_queue_maxsize)
+        send_queue_full_policy = str(
+            get_runtime_option(cfg, root_cfg, "send_queue_full_policy", "drop_newest")
+        ).strip().lower()
+        if send_queue_full_policy not in {"drop_newest", "drop_oldest", "block"}:
+            logger.warning(
+                "[COLLECTOR CONFIG] lagoon=%s reason=invalid_queue_policy value=%s fallback=drop_newest",
+                lagoon_id,
+                send_queue_full_policy,
             )
-            if ok:
-                sent += 1
-            else:
-                failed += 1
-                if spool_on_fail:
-                    spool_payload(payload)
-        except Exception:
-            failed += 1
-            if spool_on_fail:
-                spool_payload(payload)
-        finally:
-            send_queue.task_done()
+            send_queue_full_policy = "drop_newest"
+        self.send_queue_full_policy = send_queue_full_policy
 
-        total = sent + failed
-        if log_every_n_sends > 0 and total > 0 and total % log_every_n_sends == 0:
-            logger.debug(
-                "[COLLECTOR SEND STATS] lagoon=%s sent=%s failed=%s queue=%s",
+        self.spool_on_send_fail = spool_on_send_fail = as_bool(
+            get_runtime_option(cfg, root_cfg, "spool_on_send_fail", True), True
+        )
+        self.log_every_n_cycles = int(get_runtime_option(cfg, root_cfg, "log_every_n_cycles", 10))
+        log_every_n_sends = int(get_runtime_option(cfg, root_cfg, "log_every_n_sends", 100))
+        replay_batch_size = int(
+            get_runtime_option(cfg, root_cfg, "replay_spool_batch_size", 10)
+        )
+        max_replay_payload_age_sec = int(
+            get_runtime_option(cfg, root_cfg, "max_replay_payload_age_sec", 900)
+        )
+        retry_attempts = int(
+            get_runtime_option(cfg, root_cfg, "send_retry_attempts", 2)
+        )
+        retry_backoff_base_sec = float(
+            get_runtime_option(cfg, root_cfg, "send_retry_backoff_base_sec", 1.0)
+        )
+        retry_backoff_max_sec = float(
+            get_runtime_option(cfg, root_cfg, "send_retry_backoff_max_sec", 8.0)
+        )
+        self.startup_jitter_max_sec = max(
+            0.0,
+            float(get_runtime_option(cfg, root_cfg, "startup_jitter_max_sec", min(0.25, poll))),
+        )
+        enable_state_events = as_bool(get_runtime_option(cfg, root_cfg, "enable_state_events", True), True)
+        spool_segment_max_bytes = int(
+            get_runtime_option(
+                cfg, root_cfg, "spool_segment_max_bytes", jsonl_buffer.DEFAULT_SEGMENT_MAX_BYTES
+            )
+        )
+        self._tag_plan_key = (cfg.get("event_tags", {}) or {}, enable_state_events)
+        # Una lista vacia en la laguna desactiva los totalizadores aunque el master los declare.
+        totalizer_specs = parse_totalizers(cfg["totalizers"] if "totalizers" in cfg else root_cfg.get("totalizers"))
+        # Rebuild por cambio de config: cada totalizador sigue desde su ultima lectura
+        # y, si los eventos no cambiaron, tambien los estados previos.
+        self.totalizers = TotalizerPipeline(
+            lagoon_id,
+            totalizer_specs,
+            previous.tot_normalizer if previous is not None and previous.lagoon_id == lagoon_id else None,
+        )
+        self.tot_normalizer = self.totalizers.normalizer
+        if totalizer_specs is not DEFAULT_TOTALIZERS:
+            logger.info(
+                "[COLLECTOR TOTALIZERS] lagoon=%s totalizers=%s",
                 lagoon_id,
-                sent,
-                failed,
-                send_queue.qsize(),
+                ",".join(f"{spec.tag}->{spec.output}" for spec in totalizer_specs) or "-",
+            )
+        if previous is not None and previous.lagoon_id == lagoon_id and previous._tag_plan_key == self._tag_plan_key:
+            self.tag_plan = previous.tag_plan
+        else:
+            self.tag_plan = TagPlan(
+                lagoon_id,
+                cfg.get("event_tags", {}) or {},
+                enable_state_events=enable_state_events,
             )
 
+        self.state_path = state_path_for_lagoon(lagoon_id)
+        self.state_snapshot_every_sec = float(get_runtime_option(cfg, root_cfg, "state_snapshot_every_sec", 30.0))
+        self._state_lock = threading.Lock()
+        self._next_state_save = time.monotonic() + self.state_snapshot_every_sec
+        if previous is None and self.state_snapshot_every_sec > 0:
+            # Antes de la primera lectura: el primer delta cubre el volumen de la caida.
+            self.restore_state(
+                float(get_runtime_option(cfg, root_cfg, "state_max_age_sec", DEFAULT_STATE_MAX_AGE_SEC))
+            )
 
-def run_one_plc(cfg: dict, root_cfg: dict):
-    lagoon_id = cfg["lagoon_id"]
-    product_type = resolve_product_type(cfg, root_cfg)
-    source = str(cfg["source"]).strip().lower()
-    poll = float(cfg.get("poll_seconds", 1))
-    if poll <= 0:
-        logger.warning("[COLLECTOR CONFIG] lagoon=%s reason=invalid_poll_seconds fallback=0.1", lagoon_id)
-        poll = 0.1
-
-    lagoon_timezone = cfg.get("timezone")
-    if not lagoon_timezone:
-        raise ValueError(f"Timezone not specified in config for lagoon {lagoon_id}")
+        self.aggregator = parse_aggregation(cfg.get("aggregation") or root_cfg.get("aggregation"))
+        if self.aggregator is not None:
+            logger.info(
+                "[COLLECTOR AGGREGATION] lagoon=%s window_sec=%.0f tags=%s stats=%s",
+                lagoon_id,
+                self.aggregator.window_sec,
+                ",".join(self.aggregator.patterns),
+                ",".join(self.aggregator.stats),
+            )
+        self.report_filter = parse_report_by_exception(
+            cfg.get("report_by_exception") or root_cfg.get("report_by_exception")
+        )
+        if self.report_filter is not None:
+            logger.info(
+                "[COLLECTOR REPORT BY EXCEPTION] lagoon=%s deadbands=%s snapshot_every_sec=%.0f",
+                lagoon_id,
+                len(self.report_filter.deadbands),
+                self.report_filter.snapshot_every_sec,
+            )
 
-    try:
-        tz = ZoneInfo(lagoon_timezone)
-    except Exception as exc:
-        raise ValueError(f"Invalid timezone {lagoon_timezone} for lagoon {lagoon_id}") from exc
-
-    sender = get_backend_sender(cfg, root_cfg)
-    send_queue: Queue | None = None
-
-    send_queue_maxsize = int(get_runtime_option(cfg, root_cfg, "send_queue_maxsize", 100))
-    send_queue_maxsize = max(1, send_queue_maxsize)
-    send_queue_full_policy = str(
-        get_runtime_option(cfg, root_cfg, "send_queue_full_policy", "drop_newest")
-    ).strip().lower()
-    if send_queue_full_policy not in {"drop_newest", "drop_oldest", "block"}:
-        logger.warning(
-            "[COLLECTOR CONFIG] lagoon=%s reason=invalid_queue_policy value=%s fallback=drop_newest",
+        # Reader y sender al final: si la config falla antes, no queda un hilo
+        # ni una lane del engine abiertos por un collector que nunca arranca.
+        self.reader = self._build_reader()
+        jsonl_buffer.open_spool(
             lagoon_id,
-            send_queue_full_policy,
+            segment_max_bytes=spool_segment_max_bytes,
+            codec=str(get_runtime_option(cfg, root_cfg, "spool_codec", jsonl_buffer.DEFAULT_CODEC)),
+            max_bytes=int(get_runtime_option(cfg, root_cfg, "spool_max_bytes", 0)),
         )
-        send_queue_full_policy = "drop_newest"
-
-    spool_on_send_fail = as_bool(get_runtime_option(cfg, root_cfg, "spool_on_send_fail", True), True)
-    log_every_n_cycles = int(get_runtime_option(cfg, root_cfg, "log_every_n_cycles", 10))
-    log_every_n_sends = int(get_runtime_option(cfg, root_cfg, "log_every_n_sends", 100))
-    replay_batch_size = int(
-        get_runtime_option(cfg, root_cfg, "replay_spool_batch_size", 10)
-    )
-    max_replay_payload_age_sec = int(
-        get_runtime_option(cfg, root_cfg, "max_replay_payload_age_sec", 900)
-    )
-    retry_attempts = int(
-        get_runtime_option(cfg, root_cfg, "send_retry_attempts", 2)
-    )
-    retry_backoff_base_sec = float(
-        get_runtime_option(cfg, root_cfg, "send_retry_backoff_base_sec", 1.0)
-    )
-    retry_backoff_max_sec = float(
-        get_runtime_option(cfg, root_cfg, "send_retry_backoff_max_sec", 8.0)
-    )
-    startup_jitter_max_sec = max(
-        0.0,
-        float(get_runtime_option(cfg, root_cfg, "startup_jitter_max_sec", min(0.25, poll))),
-    )
-    enable_state_events = as_bool(get_runtime_option(cfg, root_cfg, "enable_state_events", True), True)
 
-    if sender:
-        send_queue = Queue(maxsize=send_queue_maxsize)
-        sender_thread = threading.Thread(
-            target=sender_worker_loop,
-            args=(
+        if sender and sender_engine is not None:
+            self.send_queue = sender_engine.register(
+                SenderLane(
+                    lagoon_id,
+                    sender,
+                    spool_on_fail=spool_on_send_fail,
+                    log_every_n_sends=log_every_n_sends,
+                    replay_batch_size=replay_batch_size,
+                    max_replay_payload_age_sec=max_replay_payload_age_sec,
+                    retry_attempts=retry_attempts,
+                    retry_backoff_base_sec=retry_backoff_base_sec,
+                    retry_backoff_max_sec=retry_backoff_max_sec,
+                ),
+                maxsize=send_queue_maxsize,
+            )
+        elif sender:
+            self.send_queue = Queue(maxsize=send_queue_maxsize)
+            self.sender_worker = SenderWorker(
                 lagoon_id,
                 sender,
-                send_queue,
+                self.send_queue,
                 spool_on_send_fail,
                 log_every_n_sends,
                 replay_batch_size,
@@ -443,147 +323,362 @@ def run_one_plc(cfg: dict, root_cfg: dict):
                 retry_attempts,
                 retry_backoff_base_sec,
                 retry_backoff_max_sec,
-            ),
-            name=f"sender-{lagoon_id}",
-            daemon=True,
+            )
+            self.sender_thread = threading.Thread(
+                target=self.sender_worker.run_forever,
+                name=f"sender-{lagoon_id}",
+                daemon=True,
+            )
+            self.sender_thread.start()
+
+        self.cycle_count = 0
+        self.dropped_count = 0
+        self.last_cycle_ts: float | None = None
+        self.last_read_ok_ts: float | None = None
+        # Heartbeat: late al inicio y al final de cada ciclo; el watchdog mide contra este valor.
+        self.last_beat = time.monotonic()
+        self.generation = 0
+        self.rebuilds = 0
+        self.stopped = False
+        self.watchdog_stall_sec = float(
+            get_runtime_option(cfg, root_cfg, "watchdog_stall_sec", max(60.0, 10 * poll))
         )
-        sender_thread.start()
-
-    boolean_detector = BooleanEventDetector()
-    state_detector = StateEventDetector()
-    tot_normalizer = TotDeltaNormalizer()
-
-    event_tags = cfg.get("event_tags", {}) or {}
-
-    if source == "rockwell":
-        rockwell_cfg = cfg["rockwell"]
-        reader = RockwellSessionReader(
-            ip=rockwell_cfg["ip"],
-            slot=int(rockwell_cfg.get("slot", 0)),
-            tag_map=cfg["tags"],
-            force_reconnect_every_sec=int(cfg.get("force_reconnect_every_sec", 3600)),
-            max_consecutive_fails=int(cfg.get("max_consecutive_fails", 10)),
-            timeout_sec=float(rockwell_cfg.get("timeout_sec", 5.0)),
+
+        logger.info(
+            "[COLLECTOR START] lagoon=%s product=%s source=%s poll=%.2fs queue=%s policy=%s replay_batch=%s replay_max_age_sec=%s",
+            lagoon_id,
+            self.product_type,
+            source,
+            poll,
+            send_queue_maxsize if self.send_queue else 0,
+            send_queue_full_policy if self.send_queue else "disabled",
+            replay_batch_size if self.send_queue else 0,
+            max_replay_payload_age_sec if self.send_queue else 0,
         )
-    elif source == "siemens":
-        opcua_modules = cfg.get("opcua_modules") or []
-        if opcua_modules:
+
+    def _build_reader(self):
+        cfg = self.cfg
+        root_cfg = self.root_cfg
+        source = self.source
+        poll = self.poll
+        lagoon_id = self.lagoon_id
+
+        reconnect_options = {
+            "reconnect_backoff_base_sec": float(get_runtime_option(cfg, root_cfg, "reconnect_backoff_base_sec", 1.0)),
+            "reconnect_backoff_max_sec": float(get_runtime_option(cfg, root_cfg, "reconnect_backoff_max_sec", 60.0)),
+        }
+
+        if source == "rockwell":
+            rockwell_cfg = cfg["rockwell"]
+            reader = RockwellSessionReader(
+                ip=rockwell_cfg["ip"],
+                slot=int(rockwell_cfg.get("slot", 0)),
+                tag_map=cfg["tags"],
+                force_reconnect_every_sec=int(cfg.get("force_reconnect_every_sec", 3600)),
+                max_consecutive_fails=int(cfg.get("max_consecutive_fails", 10)),
+                timeout_sec=float(rockwell_cfg.get("timeout_sec", 5.0)),
+                **reconnect_options,
+                tag_cache=(
+                    TagDefinitionCache(
+                        rockwell_cfg.get("tag_cache_dir") or DEFAULT_TAG_CACHE_DIR,
+                        max_age_sec=float(rockwell_cfg.get("tag_cache_max_age_sec", 86400)),
+                    )
+                    if rockwell_cfg.get("tag_cache", True)
+                    else None
+                ),
+            )
+        elif source == "siemens":
+            opcua_modules = cfg.get("opcua_modules") or []
+            if opcua_modules:
+                simulator_cfg = cfg.get("simulator") or {}
+                reader = SiemensModulesReader(
+                    modules=opcua_modules,
+                    supplemental_tags=simulator_cfg.get("tags") or {},
+                    read_deadline_sec=float(get_runtime_option(cfg, root_cfg, "module_read_deadline_sec", poll)),
+                    max_workers=int(
+                        get_runtime_option(cfg, root_cfg, "module_read_max_workers", DEFAULT_MODULE_READ_WORKERS)
+                    ),
+                    reader_options=reconnect_options,
+                )
+            else:
+                siemens_cfg = cfg["siemens"]
+                reader = SiemensSessionReader(
+                    endpoint=siemens_cfg["opc_server_url"],
+                    tag_map=cfg["tags"],
+                    timeout_sec=float(siemens_cfg.get("timeout_sec", 4)),
+                    username=siemens_cfg.get("username"),
+                    password=siemens_cfg.get("password"),
+                    **subscription_options(siemens_cfg),
+                    **reconnect_options,
+                )
+        elif source == "simulator":
             simulator_cfg = cfg.get("simulator") or {}
-            reader = SiemensModulesReader(
-                modules=opcua_modules,
-                supplemental_tags=simulator_cfg.get("tags") or {},
+            reader = SimulatedTagReader(
+                tag_specs=simulator_cfg.get("tags") or cfg.get("tags") or {},
+                seed=simulator_cfg.get("seed"),
             )
         else:
-            siemens_cfg = cfg["siemens"]
-            reader = SiemensSessionReader(
-                endpoint=siemens_cfg["opc_server_url"],
-                tag_map=cfg["tags"],
-                timeout_sec=float(siemens_cfg.get("timeout_sec", 4)),
-                username=siemens_cfg.get("username"),
-                password=siemens_cfg.get("password"),
+            raise ValueError(f"Unsupported source: {source}")
+
+        scan_classes = parse_scan_classes(cfg.get("scan_classes"), poll)
+        if scan_classes:
+            reader = ScanClassReader(reader, scan_classes, poll)
+            logger.info(
+                "[COLLECTOR SCAN CLASSES] lagoon=%s classes=%s",
+                lagoon_id,
+                ",".join(
+                    f"{scan_class.name}:{len(scan_class.tag_ids)}@{scan_class.interval_sec:g}s"
+                    for scan_class in reader.classes
+                ),
             )
-    elif source == "simulator":
-        simulator_cfg = cfg.get("simulator") or {}
-        reader = SimulatedTagReader(
-            tag_specs=simulator_cfg.get("tags") or cfg.get("tags") or {},
-            seed=simulator_cfg.get("seed"),
+        return reader
+
+    # =========================
+    # HEARTBEAT
+    # =========================
+
+    def beat(self) -> None:
+        self.last_beat = time.monotonic()
+
+    def stalled_for(self, now: float) -> float:
+        return now - self.last_beat
+
+    def rebuild_reader(self) -> None:
+        """
+        Reemplaza el reader de una laguna colgada. El ciclo bloqueado no se
+        puede interrumpir: al volver ve otra `generation` y descarta su
+        lectura. Cola, spool, plan de tags y totalizador se conservan.
+        """
+        old_reader = self.reader
+        self.generation += 1
+        self.rebuilds += 1
+        self.beat()
+
+        close = getattr(old_reader, "close", None)
+        if close is not None:
+            # El close puede bloquear igual que la lectura colgada.
+            threading.Thread(target=_close_quietly, args=(close,), name=f"close-{self.lagoon_id}", daemon=True).start()
+        self.reader = self._build_reader()
+        logger.warning(
+            "[COLLECTOR WATCHDOG] lagoon=%s action=reader_rebuilt generation=%s rebuilds=%s",
+            self.lagoon_id,
+            self.generation,
+            self.rebuilds,
         )
-    else:
-        raise ValueError(f"Unsupported source: {source}")
 
-    startup_jitter = random.uniform(0.0, startup_jitter_max_sec)
-    if startup_jitter > 0:
-        time.sleep(startup_jitter)
+    # =========================
+    # STATE SNAPSHOT
+    # =========================
+
+    def save_state(self, fsync: bool = True) -> None:
+        """
+        Persiste totalizador y estados previos de eventos en `state.json`,
+        junto al spool. Ademas del snapshot periodico se guarda sin fsync en
+        cada ciclo con un delta no nulo, asi el snapshot nunca queda detras
+        de lo ya informado.
+        """
+        if self.state_snapshot_every_sec <= 0:
+            return
+        state = {
+            "lagoon_id": self.lagoon_id,
+            # Un NaN/inf no es JSON valido (`allow_nan=False`) y haria fallar todo el snapshot.
+            "totalizer": {key: value for key, value in self.tot_normalizer.prev.items() if math.isfinite(value)},
+            **self.tag_plan.snapshot(),
+        }
+        try:
+            with self._state_lock:
+                write_state(self.state_path, state, fsync=fsync)
+        except (OSError, ValueError) as exc:
+            logger.warning("[COLLECTOR STATE] lagoon=%s action=save_failed err=%s", self.lagoon_id, exc)
+
+    def restore_state(self, max_age_sec: float) -> bool:
+        state, reason = read_state(self.state_path, max_age_sec)
+        if state is None:
+            if reason != "missing":
+                logger.warning("[COLLECTOR STATE] lagoon=%s action=discarded reason=%s", self.lagoon_id, reason)
+            return False
+        try:
+            totalizer = {str(key): float(value) for key, value in (state.get("totalizer") or {}).items()}
+            self.tag_plan.restore(state.get("bool") or {}, state.get("state") or {})
+        except (AttributeError, TypeError, ValueError):
+            logger.warning("[COLLECTOR STATE] lagoon=%s action=discarded reason=corrupt", self.lagoon_id)
+            return False
+        self.tot_normalizer.prev.update(totalizer)
+        logger.info(
+            "[COLLECTOR STATE] lagoon=%s action=restored age=%.0fs totalizers=%s bool=%s state=%s",
+            self.lagoon_id,
+            time.time() - float(state["saved_at"]),
+            len(totalizer),
+            len(self.tag_plan.bool_names),
+            len(self.tag_plan.state_names),
+        )
+        return True
 
-    logger.info(
-        "[COLLECTOR START] lagoon=%s product=%s source=%s poll=%.2fs queue=%s policy=%s replay_batch=%s replay_max_age_sec=%s",
-        lagoon_id,
-        product_type,
-        source,
-        poll,
-        send_queue_maxsize if send_queue else 0,
-        send_queue_full_policy if send_queue else "disabled",
-        replay_batch_size if send_queue else 0,
-        max_replay_payload_age_sec if send_queue else 0,
-    )
+    def request_stop(self) -> None:
+        """
+        Primera fase del stop, sin esperar: corta los ciclos, cierra el reader
+        y avisa al sender que termine su envio o replay en curso. Permite
+        pedir el stop de todas las lagunas antes de esperar a cualquiera.
+        """
+        if self.stopped:
+            return
+        self.generation += 1
+        close = getattr(self.reader, "close", None)
+        if close is not None:
+            threading.Thread(target=_close_quietly, args=(close,), name=f"close-{self.lagoon_id}", daemon=True).start()
+        if self.aggregator is not None:
+            # Ventana parcial: sale con lo acumulado (`_COUNT` indica cuantas muestras tuvo).
+            closed = self.aggregator.flush(utc_now())
+            if closed is not None:
+                self._ship(self._payload(closed[1], closed[0]))
+        self.stopped = True
+        self.save_state()
+        if self.sender_worker is not None:
+            self.sender_worker.stop()
+        elif self.sender_engine is not None and self.send_queue is not None:
+            self.sender_engine.request_stop(self.lagoon_id)
+
+    def stop(self, timeout: float = 5.0) -> int:
+        """
+        Saca la laguna de servicio: su loop termina, el reader se cierra y lo
+        pendiente en cola y reintentos pasa al spool. Devuelve cuantos
+        payloads quedaron en spool.
+        """
+        self.request_stop()
+        spooled = 0
+        timed_out = False
+        if self.sender_worker is not None:
+            spooled, timed_out = self.sender_worker.join(self.sender_thread, timeout)
+        elif self.sender_engine is not None and self.send_queue is not None:
+            spooled = self.sender_engine.unregister(self.lagoon_id, timeout)
+        logger.info(
+            "[COLLECTOR STOP] lagoon=%s cycles=%s spooled=%s timeout=%s",
+            self.lagoon_id,
+            self.cycle_count,
+            spooled,
+            int(timed_out),
+        )
+        return spooled
 
-    cycle_count = 0
-    dropped_count = 0
-    next_tick = time.perf_counter()
+    # =========================
+    # CYCLE
+    # =========================
+
+    def _payload(
+        self,
+        tags: dict[str, Any],
+        timestamp_utc: datetime,
+        events: list[dict] | None = None,
+    ) -> CyclePayload:
+        # Campos ya tipados por el collector: sin Pydantic por ciclo, el cuerpo se codifica una vez.
+        return CyclePayload(
+            self.lagoon_id,
+            self.product_type,
+            self.source,
+            timestamp_utc,
+            tags,
+            events or None,
+            send_events=self.send_events,
+        )
+
+    def _ship(self, payload: CyclePayload) -> None:
+        if not (self.sender and self.send_queue):
+            return
+        if self.stopped:
+            # Ciclo que termino despues del stop: el sender ya no drena la cola.
+            if self.spool_on_send_fail:
+                spool_payload(payload)
+            return
+        if not enqueue_payload(self.send_queue, payload, self.send_queue_full_policy):
+            self.dropped_count += 1
+            if self.spool_on_send_fail:
+                spool_payload(payload)
 
-    while True:
-        cycle_count += 1
+    def run_cycle(self) -> None:
+        generation = self.generation
+        self.beat()
+        self.cycle_count += 1
         cycle_start = time.perf_counter()
         tags: dict[str, Any] = {}
         all_events: list[dict] = []
         timestamp_utc = utc_now()
 
         try:
-            raw_tags = reader.read_once()
-            tags = dict(raw_tags or {})
+            raw_tags = self.reader.read_once()
+            # Los readers entregan un dict nuevo por ciclo; solo se copia otro tipo de mapping.
+            tags = raw_tags if type(raw_tags) is dict else dict(raw_tags or {})
         except Exception:
             tags = {}
 
-        if tags:
-            if TOT_TAG in tags:
-                key = f"{lagoon_id}:{TOT_TAG}"
-                delta = tot_normalizer.compute(key, tags.get(TOT_TAG))
-                tags[DELTA_TAG] = delta
-
-            payload = NormalizedPayload(
-                lagoon_id=lagoon_id,
-                product_type=product_type,
-                source=source,
-                timestamp=timestamp_utc,
-                tags=tags,
-            )
-
-            if event_tags:
-                all_events.extend(
-                    boolean_detector.process(
-                        lagoon_id=lagoon_id,
-                        tags=tags,
-                        ts=payload.timestamp,
-                        event_tags=event_tags,
-                    )
-                )
-
-            if enable_state_events:
-                all_events.extend(
-                    state_detector.process(
-                        lagoon_id=lagoon_id,
-                        tags=tags,
-                        ts=payload.timestamp,
-                    )
-                )
-
-            if all_events:
-                payload.events = all_events
+        if generation != self.generation:
+            # El watchdog reemplazo el reader mientras esta lectura estaba colgada.
+            return
 
-            if sender and send_queue:
-                enqueued = enqueue_payload(send_queue, payload, send_queue_full_policy)
-                if not enqueued:
-                    dropped_count += 1
-                    if spool_on_send_fail:
-                        spool_payload(payload)
-        if log_every_n_cycles > 0 and cycle_count % log_every_n_cycles == 0:
+        report = tags
+        closed = None
+        moved = False
+        if tags:
+            self.last_read_ok_ts = time.time()
+            # Eventos y totalizador siempre sobre la lectura completa; agregacion y filtro solo recortan el payload.
+            all_events = self.tag_plan.process(tags, timestamp_utc)
+            if self.aggregator is not None:
+                report, closed = self.aggregator.add(report, timestamp_utc)
+            unfiltered = report
+            if self.report_filter is not None:
+                report = self.report_filter.filter(report)
+            if self.totalizers.specs:
+                # Un delta no nulo nunca se filtra: es volumen que no se vuelve a informar.
+                moved = self.totalizers.process(tags, timestamp_utc, report, keep_zero=report is unfiltered)
+
+        if closed is not None:
+            self._ship(self._payload(closed[1], closed[0]))
+        if report or all_events:
+            self._ship(self._payload(report, timestamp_utc, all_events))
+        self.last_cycle_ts = time.time()
+        self.beat()
+        if self.state_snapshot_every_sec > 0 and self.last_beat >= self._next_state_save:
+            self._next_state_save = self.last_beat + self.state_snapshot_every_sec
+            self.save_state()
+        elif moved:
+            # Volumen ya informado: un restart desde el snapshot periodico lo contaria dos veces.
+            self.save_state(fsync=False)
+        if self.log_every_n_cycles > 0 and self.cycle_count % self.log_every_n_cycles == 0:
             elapsed = time.perf_counter() - cycle_start
-            queue_depth = send_queue.qsize() if send_queue else 0
-            local_ts = timestamp_utc.astimezone(tz).isoformat()
+            queue_depth = self.send_queue.qsize() if self.send_queue else 0
+            local_ts = timestamp_utc.astimezone(self.tz).isoformat()
             logger.debug(
-                "[COLLECTOR CYCLE] lagoon=%s product=%s source=%s tags=%s events=%s queue=%s dropped=%s elapsed=%.1fms utc=%s local=%s",
-                lagoon_id,
-                product_type,
-                source,
+                "[COLLECTOR CYCLE] lagoon=%s product=%s source=%s tags=%s reported=%s events=%s queue=%s dropped=%s elapsed=%.1fms utc=%s local=%s",
+                self.lagoon_id,
+                self.product_type,
+                self.source,
                 len(tags),
+                len(report),
                 len(all_events),
                 queue_depth,
-                dropped_count,
+                self.dropped_count,
                 elapsed * 1000,
                 timestamp_utc.isoformat(),
                 local_ts,
             )
 
+
+def run_collector_loop(collector: LagoonCollector, jitter: bool = True) -> None:
+    poll = collector.poll
+    generation = collector.generation
+
+    startup_jitter = random.uniform(0.0, collector.startup_jitter_max_sec) if jitter else 0.0
+    if startup_jitter > 0:
+        time.sleep(startup_jitter)
+
+    next_tick = time.perf_counter()
+
+    # Si el watchdog reconstruye la laguna, este loop termina y lo reemplaza una hebra nueva.
+    while collector.generation == generation:
+        try:
+            collector.run_cycle()
+        except Exception as exc:
+            logger.error("[COLLECTOR CYCLE ERROR] lagoon=%s err=%s", collector.lagoon_id, exc)
+
         next_tick += poll
         sleep_for = next_tick - time.perf_counter()
         if sleep_for > 0:
@@ -592,30 +687,450 @@ def run_one_plc(cfg: dict, root_cfg: dict):
             next_tick = time.perf_counter()
 
 
-def main(config_path: str):
-    plc_configs, root_cfg = load_plc_configs(config_path)
-    migrated = jsonl_buffer.migrate_legacy_buffer()
-    if migrated:
-        logger.info("[COLLECTOR STARTUP] migrated_spool_lagoons=%s", migrated)
+def start_collector_thread(collector: LagoonCollector, jitter: bool = True) -> threading.Thread:
+    thread = threading.Thread(
+        target=run_collector_loop,
+        args=(collector, jitter),
+        name=f"plc-{collector.lagoon_id}-{collector.generation}",
+        daemon=True,
+    )
+    thread.start()
+    return thread
 
-    if len(plc_configs) == 1:
-        run_one_plc(plc_configs[0], root_cfg)
-        return
 
-    logger.info("[COLLECTOR STARTUP] workers=%s", len(plc_configs))
+def run_one_plc(cfg: dict, root_cfg: dict, sender_engine: AsyncSenderEngine | None = None):
+    run_collector_loop(LagoonCollector(cfg, root_cfg, sender_engine))
 
-    with ThreadPoolExecutor(max_workers=len(plc_configs), thread_name_prefix="plc") as ex:
-        futures = [ex.submit(run_one_plc, cfg, root_cfg) for cfg in plc_configs]
 
-        for future in futures:
+def build_collectors(
+    plc_configs: list[dict],
+    root_cfg: dict,
+    sender_engine: AsyncSenderEngine | None = None,
+) -> list[LagoonCollector]:
+    collectors: list[LagoonCollector] = []
+    for cfg in plc_configs:
+        try:
+            collectors.append(LagoonCollector(cfg, root_cfg, sender_engine))
+        except Exception as exc:
+            logger.error("[COLLECTOR WORKER ERROR] lagoon=%s err=%s action=retry_next_reload", cfg.get("lagoon_id"), exc)
+    return collectors
+
+
+def run_tick_scheduler(
+    collectors: list[LagoonCollector],
+    root_cfg: dict,
+    lagoons: int | None = None,
+) -> TickScheduler:
+    lagoons = len(collectors) if lagoons is None else lagoons
+    workers = int(
+        get_runtime_option({}, root_cfg, "cycle_workers", min(DEFAULT_CYCLE_WORKERS, lagoons))
+    )
+    overrun_policy = str(get_runtime_option({}, root_cfg, "cycle_overrun_policy", OVERRUN_SKIP)).strip().lower()
+    if overrun_policy not in {OVERRUN_SKIP, OVERRUN_COALESCE}:
+        logger.warning(
+            "[COLLECTOR CONFIG] reason=invalid_cycle_overrun_policy value=%s fallback=%s",
+            overrun_policy,
+            OVERRUN_SKIP,
+        )
+        overrun_policy = OVERRUN_SKIP
+
+    scheduler = TickScheduler(
+        max_workers=max(1, workers),
+        overrun_policy=overrun_policy,
+        stats_every_sec=float(get_runtime_option({}, root_cfg, "cycle_stats_every_sec", 60.0)),
+    )
+    for collector in collectors:
+        scheduler.add(collector.lagoon_id, collector.poll, collector.run_cycle)
+
+    logger.info(
+        "[COLLECTOR STARTUP] cycle_scheduler=tick lagoons=%s workers=%s overrun_policy=%s",
+        lagoons,
+        scheduler.max_workers,
+        overrun_policy,
+    )
+    scheduler.start()
+    return scheduler
+
+
+class CollectorFleet:
+    """
+    Lagunas en ejecucion del proceso, sobre el modelo de ciclos elegido (una
+    hebra por laguna o el `TickScheduler`). `apply()` aplica un cambio de
+    config en caliente: solo arranca, detiene o reconstruye las lagunas
+    agregadas, quitadas o cambiadas; las demas siguen con su conexion, cola
+    y estado.
+    """
+
+    def __init__(
+        self,
+        plc_configs: list[dict],
+        root_cfg: dict,
+        sender_engine: AsyncSenderEngine | None = None,
+        scheduler: TickScheduler | None = None,
+    ) -> None:
+        self.plc_configs = plc_configs
+        self.root_cfg = root_cfg
+        self.sender_engine = sender_engine
+        self.scheduler = scheduler
+        self.collectors: dict[str, LagoonCollector] = {}
+        self.failed: set[str] = set()
+        self.closing = False
+        self._lock = threading.RLock()
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self.collectors.values()))
+
+    def __len__(self) -> int:
+        return len(self.collectors)
+
+    def start(self, collector: LagoonCollector, jitter: bool = True) -> None:
+        with self._lock:
+            self.collectors[collector.lagoon_id] = collector
+            if self.scheduler is not None:
+                self.scheduler.add(collector.lagoon_id, collector.poll, collector.run_cycle)
+            else:
+                start_collector_thread(collector, jitter)
+
+    def start_all(self, collectors: list[LagoonCollector], jitter: bool = True) -> None:
+        """
+        Arranque inicial. Las lagunas de `plc_configs` que `build_collectors`
+        no pudo construir quedan en `failed`, asi el reloader las reintenta
+        en su primer poll igual que un rebuild fallido.
+        """
+        with self._lock:
+            for collector in collectors:
+                self.start(collector, jitter)
+            self.failed = {
+                lagoon_id
+                for cfg in self.plc_configs
+                if (lagoon_id := str(cfg.get("lagoon_id"))) not in self.collectors
+            }
+
+    def stop(self, lagoon_id: str) -> LagoonCollector | None:
+        with self._lock:
+            collector = self._detach(lagoon_id)
+        if collector is not None:
+            collector.stop()
+        return collector
+
+    def _detach(self, lagoon_id: str) -> LagoonCollector | None:
+        # Con el lock tomado: la saca de la flota y del scheduler, sin esperar su stop.
+        collector = self.collectors.pop(lagoon_id, None)
+        if collector is not None and self.scheduler is not None:
+            self.scheduler.remove(lagoon_id)
+        return collector
+
+    def recover(self, collector: LagoonCollector) -> None:
+        collector.rebuild_reader()
+        if self.scheduler is not None:
+            self.scheduler.reset(collector.lagoon_id)
+        else:
+            start_collector_thread(collector, jitter=False)
+
+    def apply(self, plc_configs: list[dict], root_cfg: dict) -> PlcConfigDiff:
+        """
+        El lock solo cubre leer el diff y cambiar entradas: el stop de las
+        lagunas quitadas o cambiadas (join del sender, hasta 5 s cada una) y
+        la construccion de las nuevas corren fuera, asi el health reporter y
+        el watchdog no quedan esperando el reload. Una laguna cuyo rebuild
+        falla queda con su config anterior en `plc_configs` y en `failed`, y
+        se reintenta en el siguiente poll.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            if self.closing:
+                return PlcConfigDiff()
+            diff = diff_plc_configs(self.plc_configs, self.root_cfg, plc_configs, root_cfg)
+            for cfg in plc_configs:
+                lagoon_id = str(cfg.get("lagoon_id"))
+                if lagoon_id in self.failed and lagoon_id in diff.unchanged:
+                    diff.unchanged.remove(lagoon_id)
+                    diff.changed.append(cfg)
+            for key in diff.restart_required:
+                logger.warning("[COLLECTOR RELOAD] option=%s action=ignored reason=restart_required", key)
+
+            old_by_id = {str(cfg.get("lagoon_id")): cfg for cfg in self.plc_configs}
+            removed = [self._detach(lagoon_id) for lagoon_id in diff.removed]
+            previous = {str(cfg.get("lagoon_id")): self._detach(str(cfg.get("lagoon_id"))) for cfg in diff.changed}
+
+        for collector in removed + list(previous.values()):
+            if collector is not None:
+                collector.stop()
+        built = [
+            (cfg, self._build(cfg, root_cfg, previous.get(str(cfg.get("lagoon_id")))))
+            for cfg in diff.changed + diff.added
+        ]
+
+        with self._lock:
+            closing = self.closing
+            failed: set[str] = set()
+            for cfg, collector in built:
+                if collector is None:
+                    failed.add(str(cfg.get("lagoon_id")))
+                elif not closing:
+                    self.start(collector, jitter=False)
+            if not closing:
+                self.plc_configs = [
+                    cfg if lagoon_id not in failed else old_by_id[lagoon_id]
+                    for cfg in plc_configs
+                    if (lagoon_id := str(cfg.get("lagoon_id"))) not in failed or lagoon_id in old_by_id
+                ]
+                self.root_cfg = root_cfg
+                self.failed = failed
+
+        if closing:
+            # Shutdown durante el reload: lo recien construido no entra a la flota.
+            for _, collector in built:
+                if collector is not None:
+                    collector.stop()
+            return diff
+
+        logger.info(
+            "[COLLECTOR RELOAD] added=%s removed=%s changed=%s unchanged=%s elapsed=%.1fms",
+            ",".join(str(cfg.get("lagoon_id")) for cfg in diff.added) or "-",
+            ",".join(diff.removed) or "-",
+            ",".join(str(cfg.get("lagoon_id")) for cfg in diff.changed) or "-",
+            len(diff.unchanged),
+            (time.perf_counter() - started) * 1000,
+        )
+        return diff
+
+    def shutdown(self, deadline_sec: float) -> int:
+        """
+        Apagado ordenado con plazo total `deadline_sec`: primero se cortan los
+        ciclos de todas las lagunas, despues cada sender termina su envio o
+        replay en curso y su cola y reintentos pasan al spool en una sola
+        escritura; al final se hace flush y cierre de los spools. Devuelve
+        cuantos payloads quedaron en spool.
+        """
+        started = time.perf_counter()
+        deadline = time.monotonic() + max(0.0, deadline_sec)
+        with self._lock:
+            self.closing = True
+            collectors = list(self.collectors.values())
+            self.collectors.clear()
+
+        if self.scheduler is not None:
+            self.scheduler.stop(max(0.0, deadline - time.monotonic()))
+        for collector in collectors:
+            collector.request_stop()
+        spooled = 0
+        for collector in collectors:
+            spooled += collector.stop(max(0.0, deadline - time.monotonic()))
+        if self.sender_engine is not None:
+            self.sender_engine.stop(max(0.0, deadline - time.monotonic()))
+
+        flushed = jsonl_buffer.flush_all()
+        jsonl_buffer.close_all()
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "[COLLECTOR SHUTDOWN] lagoons=%s spooled=%s flushed=%s elapsed=%.1fms deadline_sec=%.1f",
+            len(collectors),
+            spooled,
+            flushed,
+            elapsed * 1000,
+            deadline_sec,
+        )
+        return spooled
+
+    def _build(self, cfg: dict, root_cfg: dict, previous: LagoonCollector | None = None) -> LagoonCollector | None:
+        try:
+            return LagoonCollector(cfg, root_cfg, self.sender_engine, previous=previous)
+        except Exception as exc:
+            logger.error("[COLLECTOR WORKER ERROR] lagoon=%s err=%s action=retry_next_reload", cfg.get("lagoon_id"), exc)
+            return None
+
+
+def start_config_reloader(
+    config_path: str,
+    fleet: CollectorFleet,
+    every_sec: float,
+    stop: threading.Event | None = None,
+) -> threading.Thread | None:
+    if every_sec <= 0:
+        return None
+    watcher = ConfigWatcher(config_path)
+    stop = stop or threading.Event()
+
+    def _loop() -> None:
+        while not stop.wait(every_sec):
             try:
-                future.result()
+                # Sin cambios en disco solo se recarga si quedo una laguna por reconstruir.
+                if not watcher.changed() and not fleet.failed:
+                    continue
+                plc_configs, root_cfg = load_plc_configs(config_path)
             except Exception as exc:
-                logger.error("[COLLECTOR WORKER ERROR] err=%s", exc)
+                # YAML a medio guardar o invalido: se mantiene la config en ejecucion.
+                logger.error("[COLLECTOR RELOAD] err=%s action=keep_current", exc)
+                continue
+            fleet.apply(plc_configs, root_cfg)
+
+    thread = threading.Thread(target=_loop, name="config-reload", daemon=True)
+    thread.start()
+    return thread
+
+
+def shard_health(collectors: Iterable[LagoonCollector], shard_index: int, shard_count: int) -> dict:
+    return {
+        "shard_index": shard_index,
+        "shard_count": shard_count,
+        "pid": os.getpid(),
+        "updated_ts": time.time(),
+        "lagoons": {
+            collector.lagoon_id: {
+                "cycles": collector.cycle_count,
+                "dropped": collector.dropped_count,
+                "last_cycle_ts": collector.last_cycle_ts,
+                "last_read_ok_ts": collector.last_read_ok_ts,
+                "stalled_sec": round(collector.stalled_for(time.monotonic()), 1),
+                "rebuilds": collector.rebuilds,
+            }
+            for collector in collectors
+        },
+    }
+
+
+def start_health_reporter(
+    collectors: Iterable[LagoonCollector],
+    shard_index: int,
+    shard_count: int,
+    every_sec: float,
+) -> threading.Thread | None:
+    if every_sec <= 0:
+        return None
+    path = health_path(shard_index)
+
+    def _loop() -> None:
+        while True:
+            try:
+                write_health(path, shard_health(collectors, shard_index, shard_count))
+            except OSError as exc:
+                logger.warning("[COLLECTOR HEALTH] shard=%s err=%s", shard_index, exc)
+            time.sleep(every_sec)
+
+    thread = threading.Thread(target=_loop, name="shard-health", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(config_path: str, shard_index: int = 0, shard_count: int = 1):
+    plc_configs, root_cfg = load_plc_configs(config_path)
+    if shard_count > 1:
+        plc_configs = select_shard(plc_configs, shard_index, shard_count)
+        logger.info(
+            "[COLLECTOR STARTUP] shard=%s/%s lagoons=%s",
+            shard_index,
+            shard_count,
+            ",".join(str(cfg.get("lagoon_id")) for cfg in plc_configs),
+        )
+        if not plc_configs:
+            return
+
+    spool_commit_interval_sec = float(
+        get_runtime_option({}, root_cfg, "spool_commit_interval_sec", 0.0)
+    )
+    if spool_commit_interval_sec > 0:
+        spool_commit_max_batch = int(
+            get_runtime_option(
+                {}, root_cfg, "spool_commit_max_batch", jsonl_buffer.DEFAULT_COMMIT_MAX_BATCH
+            )
+        )
+        jsonl_buffer.configure_group_commit(
+            interval_sec=spool_commit_interval_sec,
+            max_batch=spool_commit_max_batch,
+        )
+        logger.info(
+            "[COLLECTOR STARTUP] spool_group_commit interval_sec=%.3f max_batch=%s",
+            spool_commit_interval_sec,
+            spool_commit_max_batch,
+        )
+
+    # La cuota global se reparte entre shards: cada proceso solo ve sus lagunas.
+    jsonl_buffer.configure_total_quota(
+        int(get_runtime_option({}, root_cfg, "spool_total_max_bytes", 0)) // max(1, shard_count)
+    )
+
+    if shard_count <= 1:
+        # Con shards la migracion la hace el supervisor antes de lanzarlos.
+        migrated = jsonl_buffer.migrate_legacy_buffer()
+        if migrated:
+            logger.info("[COLLECTOR STARTUP] migrated_spool_lagoons=%s", migrated)
+
+    sender_engine: AsyncSenderEngine | None = None
+    sender_engine_mode = str(get_runtime_option({}, root_cfg, "sender_engine", "threads")).strip().lower()
+    if sender_engine_mode == "asyncio":
+        sender_engine = AsyncSenderEngine(
+            max_connections=int(
+                get_runtime_option({}, root_cfg, "sender_engine_max_connections", DEFAULT_MAX_CONNECTIONS)
+            )
+        )
+        sender_engine.start()
+        logger.info(
+            "[COLLECTOR STARTUP] sender_engine=asyncio max_connections=%s",
+            sender_engine.max_connections,
+        )
+    elif sender_engine_mode != "threads":
+        logger.warning(
+            "[COLLECTOR CONFIG] reason=invalid_sender_engine value=%s fallback=threads",
+            sender_engine_mode,
+        )
+
+    cycle_scheduler = str(get_runtime_option({}, root_cfg, "cycle_scheduler", "threads")).strip().lower()
+    if cycle_scheduler not in {"threads", "tick"}:
+        logger.warning(
+            "[COLLECTOR CONFIG] reason=invalid_cycle_scheduler value=%s fallback=threads",
+            cycle_scheduler,
+        )
+        cycle_scheduler = "threads"
+
+    collectors = build_collectors(plc_configs, root_cfg, sender_engine)
+    if not collectors:
+        raise RuntimeError("No lagoon could be started")
+
+    scheduler = None
+    if cycle_scheduler == "tick":
+        scheduler = run_tick_scheduler([], root_cfg, lagoons=len(collectors))
+    else:
+        logger.info("[COLLECTOR STARTUP] workers=%s", len(collectors))
+
+    fleet = CollectorFleet(plc_configs, root_cfg, sender_engine, scheduler)
+    fleet.start_all(collectors)
+
+    start_health_reporter(
+        fleet,
+        shard_index,
+        shard_count,
+        float(get_runtime_option({}, root_cfg, "health_every_sec", 10.0)),
+    )
+
+    reload_stop = threading.Event()
+    reload_every_sec = float(get_runtime_option({}, root_cfg, "config_reload_every_sec", 5.0))
+    if shard_count > 1 and reload_every_sec > 0:
+        # Un cambio en `plcs` puede mover lagunas entre shards: se aplica reiniciando el supervisor.
+        logger.info("[COLLECTOR STARTUP] config_reload=disabled reason=sharded")
+    else:
+        start_config_reloader(config_path, fleet, reload_every_sec, reload_stop)
+
+    watchdog = LagoonWatchdog(fleet, fleet.recover)
+
+    def _request_shutdown(signum, frame) -> None:
+        logger.info("[COLLECTOR SHUTDOWN] signal=%s", signal.Signals(signum).name)
+        watchdog.stop()
+
+    # SIGTERM lo manda el supervisor al reiniciar o detener un shard; SIGINT es Ctrl+C.
+    signal.signal(signal.SIGTERM, _request_shutdown)
+    signal.signal(signal.SIGINT, _request_shutdown)
+
+    watchdog.run_forever()
+    reload_stop.set()
+    fleet.shutdown(float(get_runtime_option({}, root_cfg, "shutdown_deadline_sec", DEFAULT_SHUTDOWN_DEADLINE_SEC)))
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--config", required=True)
+    parser.add_argument("--shard-index", type=int, default=0)
+    parser.add_argument("--shard-count", type=int, default=1)
     args = parser.parse_args()
-    main(args.config)
+    main(args.config, args.shard_index, args.shard_count)
@@ -2,18 +2,28 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Dict, Optional
 
+RESET_CURRENT = "current"
+RESET_ZERO = "zero"
+
 
 @dataclass
 class TotDeltaNormalizer:
     """
     Convierte un acumulativo (TOT) a incrementos (DELTA) detectando resets:
       - primera lectura => delta 0
-      - si current < prev => reset => delta = current
+      - si current < prev => reset => delta = current (o 0 con reset="zero")
+      - si current < prev y el contador tiene `rollover` => vuelta => delta = rollover - prev + current
       - si current >= prev => delta = current - prev
     """
     prev: Dict[str, float] = field(default_factory=dict)
 
-    def compute(self, key: str, current: Optional[float]) -> float:
+    def compute(
+        self,
+        key: str,
+        current: Optional[float],
+        rollover: Optional[float] = None,
+        reset: str = RESET_CURRENT,
+    ) -> float:
         if current is None:
             return 0.0
 
@@ -31,7 +41,12 @@ class TotDeltaNormalizer:
             return 0.0
 
         if cur < previous:
-            delta = cur  # reset
+            if rollover and previous - cur > rollover / 2:
+                delta = rollover - previous + cur  # vuelta del contador
+            elif reset == RESET_ZERO:
+                delta = 0.0  # medidor reemplazado o precargado: no se inventa volumen
+            else:
+                delta = cur  # reset
         else:
             delta = cur - previous
 
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Callable
+
+from normalizer.tot_delta_normalizer import RESET_CURRENT, RESET_ZERO, TotDeltaNormalizer
+
+DEFAULT_TOTALIZER_TAG = "WM01_TOT_SCADA"
+DEFAULT_DELTA_TAG = "WM01_TOT_DELTA_SCADA"
+RATE_UNITS = {"s": 1.0, "min": 60.0, "h": 3600.0}
+
+
+class TotalizerSpec:
+    __slots__ = ("tag", "output", "rollover", "reset", "rate_output", "rate_scale")
+
+    def __init__(
+        self,
+        tag: str,
+        output: str | None = None,
+        rollover: float | None = None,
+        reset: str = RESET_CURRENT,
+        rate_output: str | None = None,
+        rate_scale: float = RATE_UNITS["h"],
+    ) -> None:
+        self.tag = tag
+        self.output = output or f"{tag}_DELTA"
+        self.rollover = rollover
+        self.reset = reset
+        self.rate_output = rate_output
+        self.rate_scale = rate_scale
+
+
+DEFAULT_TOTALIZERS = (TotalizerSpec(DEFAULT_TOTALIZER_TAG, DEFAULT_DELTA_TAG),)
+
+
+class TotalizerPipeline:
+    """
+    Etapa de totalizadores por laguna: cada acumulativo configurado sale como
+    su delta (y opcionalmente como tasa) en el payload. Se compila con el
+    primer ciclo a una lista de slots con los totalizadores que entrega el
+    reader; cada ciclo es un loop fijo sobre esos slots. Como `TagPlan`,
+    recompila si cambia el set de tags. El ultimo valor por totalizador vive
+    en un `TotDeltaNormalizer` (clave `<lagoon_id>:<tag>`), que es lo que se
+    conserva en un reload y en el snapshot de estado.
+    """
+
+    def __init__(
+        self,
+        lagoon_id: str,
+        specs: tuple[TotalizerSpec, ...] | list[TotalizerSpec] = DEFAULT_TOTALIZERS,
+        normalizer: TotDeltaNormalizer | None = None,
+    ) -> None:
+        self.lagoon_id = lagoon_id
+        self.specs = tuple(specs)
+        self.normalizer = normalizer if normalizer is not None else TotDeltaNormalizer()
+        self.compiles = 0
+        self._count = -1
+        # (tag, clave del normalizer, output, rollover, reset, rate_output, rate_scale)
+        self._slots: list[tuple] = []
+        self._get: Callable[[dict[str, Any]], Any] = lambda tags: ()
+        self._prev_ts: dict[str, float] = {}
+
+    def compile(self, tags: dict[str, Any]) -> None:
+        self._slots = [
+            (
+                spec.tag,
+                f"{self.lagoon_id}:{spec.tag}",
+                spec.output,
+                spec.rollover,
+                spec.reset,
+                spec.rate_output,
+                spec.rate_scale,
+            )
+            for spec in self.specs
+            if spec.tag in tags
+        ]
+        names = [slot[0] for slot in self._slots]
+        if len(names) == 1:
+            single = itemgetter(names[0])
+            self._get = lambda tags: (single(tags),)
+        elif names:
+            self._get = itemgetter(*names)
+        else:
+            self._get = lambda tags: ()
+        self._count = len(tags)
+        self.compiles += 1
+
+    @property
+    def active(self) -> tuple[str, ...]:
+        return tuple(slot[0] for slot in self._slots)
+
+    def process(self, tags: dict[str, Any], ts: datetime, out: dict[str, Any], keep_zero: bool = True) -> bool:
+        """
+        Escribe en `out` el delta de cada totalizador (y su tasa si tiene
+        `rate_output`). Con `keep_zero=False` un delta 0 no se escribe: lo
+        usa el report-by-exception, para el que un delta distinto de 0 nunca
+        se filtra porque es volumen que no se vuelve a informar. Devuelve si
+        algun delta fue distinto de 0.
+        """
+        if len(tags) != self._count:
+            self.compile(tags)
+        try:
+            values = self._get(tags)
+        except KeyError:
+            self.compile(tags)
+            values = self._get(tags)
+
+        compute = self.normalizer.compute
+        prev_ts = self._prev_ts
+        now = None
+        moved = False
+        for (tag, key, output, rollover, reset, rate_output, rate_scale), value in zip(self._slots, values):
+            delta = compute(key, value, rollover, reset)
+            if delta:
+                moved = True
+            if keep_zero or delta:
+                out[output] = delta
+            if rate_output is None:
+                continue
+            if now is None:
+                now = ts.timestamp()
+            last = prev_ts.get(key)
+            prev_ts[key] = now
+            # Sin lectura previa en este proceso no hay intervalo: la primera tasa sale el ciclo siguiente.
+            if last is not None and now > last and (keep_zero or delta):
+                out[rate_output] = delta / (now - last) * rate_scale
+        return moved
+
+
+def parse_totalizers(raw: Any) -> tuple[TotalizerSpec, ...]:
+    """
+    `totalizers` del YAML (por laguna o en el master). Sin la clave se usa
+    el totalizador historico `WM01_TOT_SCADA` -> `WM01_TOT_DELTA_SCADA`;
+    una lista vacia desactiva la etapa.
+
+        totalizers:
+          - WM01_TOT                       # delta en WM01_TOT_DELTA
+          - tag: TOT_WM001
+            output: TOT_WM001_DELTA
+            rollover: 999999.9             # el contador vuelve a 0 al pasar este valor
+            reset: zero                    # current (default) o zero
+            rate_output: FIT_WM001_CALC    # tasa derivada del delta
+            rate_unit: h                   # s, min o h (default)
+    """
+    if raw is None:
+        return DEFAULT_TOTALIZERS
+    if not isinstance(raw, list):
+        raise ValueError("totalizers must be a list")
+
+    specs: list[TotalizerSpec] = []
+    for entry in raw:
+        if isinstance(entry, str):
+            entry = {"tag": entry}
+        if not isinstance(entry, dict) or not entry.get("tag"):
+            raise ValueError(f"totalizer {entry!r} must be a tag name or a mapping with `tag`")
+
+        rollover = entry.get("rollover")
+        if rollover is not None:
+            rollover = float(rollover)
+            if rollover <= 0:
+                raise ValueError(f"totalizer {entry['tag']!r} rollover must be > 0")
+        reset = str(entry.get("reset", RESET_CURRENT)).strip().lower()
+        if reset not in (RESET_CURRENT, RESET_ZERO):
+            raise ValueError(f"totalizer {entry['tag']!r} reset must be `{RESET_CURRENT}` or `{RESET_ZERO}`")
+        rate_unit = str(entry.get("rate_unit", "h")).strip().lower()
+        if rate_unit not in RATE_UNITS:
+            raise ValueError(f"totalizer {entry['tag']!r} rate_unit must be one of {', '.join(RATE_UNITS)}")
+
+        specs.append(
+            TotalizerSpec(
+                str(entry["tag"]),
+                str(entry["output"]) if entry.get("output") else None,
+                rollover,
+                reset,
+                str(entry["rate_output"]) if entry.get("rate_output") else None,
+                RATE_UNITS[rate_unit],
+            )
+        )
+
+    outputs = [spec.output for spec in specs] + [spec.rate_output for spec in specs if spec.rate_output]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("totalizer outputs must be unique")
+    return tuple(specs)
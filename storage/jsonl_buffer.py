@@ -5,12 +5,20 @@ import os
 import re
 import threading
 from pathlib import Path
-from typing import Callable, TextIO
+from typing import Callable, Iterable, TextIO
+
+from storage.segmented_spool import (
+    DEFAULT_COMMIT_MAX_BATCH,
+    DEFAULT_SEGMENT_MAX_BYTES,
+    GroupCommitter,
+    ReplayAction,
+    SegmentedSpool,
+)
+from storage.spool_codecs import DEFAULT_CODEC, normalize_codec
 
 _BUFFER_LOCK = threading.Lock()
 DEFAULT_SPOOL_DIR = Path("data/spool")
 DEFAULT_LEGACY_BUFFER_PATH = Path("data/buffer.jsonl")
-ReplayAction = bool | str
 
 
 def _ensure_parent_dir(path: Path) -> None:
@@ -29,33 +37,182 @@ def _iter_nonempty_lines(handle: TextIO):
             yield line
 
 
-def _copy_nonempty_lines(source: Path, destination: TextIO) -> int:
-    if not source.exists():
-        return 0
-
-    copied = 0
-    with source.open("r", encoding="utf-8") as handle:
-        for line in _iter_nonempty_lines(handle):
-            destination.write(line)
-            destination.write("\n")
-            copied += 1
-
-    return copied
+def spool_path_for_lagoon(
+    lagoon_id: str,
+    base_dir: str | Path = DEFAULT_SPOOL_DIR,
+) -> Path:
+    return Path(base_dir) / f"{_safe_lagoon_id(lagoon_id)}.jsonl"
 
 
-def _normalize_replay_action(result: ReplayAction) -> str:
-    if result is True or result == "sent":
-        return "sent"
-    if result == "drop":
-        return "drop"
-    return "keep"
+def spool_dir_for_lagoon(
+    lagoon_id: str,
+    base_dir: str | Path = DEFAULT_SPOOL_DIR,
+) -> Path:
+    return Path(base_dir) / _safe_lagoon_id(lagoon_id)
 
 
-def spool_path_for_lagoon(
+def _prepare_legacy_files(lagoon_id: str, base_dir: str | Path) -> tuple[Path, ...]:
+    # Formato anterior: `<lagoon>.jsonl` + `.work` de un replay interrumpido (mas antiguo).
+    spool_path = spool_path_for_lagoon(lagoon_id, base_dir=base_dir)
+    spool_path.with_name(f"{spool_path.name}.remaining").unlink(missing_ok=True)
+    spool_path.with_name(f"{spool_path.name}.tmp").unlink(missing_ok=True)
+    return (spool_path.with_suffix(".work"), spool_path)
+
+
+class SpoolManager:
+    """
+    Registro de spools por laguna. Cada spool tiene su propio lock y su handle
+    de append abierto; este lock solo protege el registro.
+    """
+
+    def __init__(self) -> None:
+        self._spools: dict[Path, SegmentedSpool] = {}
+        self._lock = threading.Lock()
+        self._committer: GroupCommitter | None = None
+        self._commit_max_batch = DEFAULT_COMMIT_MAX_BATCH
+        self._quota_lock = threading.Lock()
+        self.total_max_bytes = 0
+
+    def open(
+        self,
+        lagoon_id: str,
+        base_dir: str | Path = DEFAULT_SPOOL_DIR,
+        *,
+        segment_max_bytes: int | None = None,
+        codec: str | None = None,
+        max_bytes: int | None = None,
+    ) -> SegmentedSpool:
+        directory = spool_dir_for_lagoon(lagoon_id, base_dir=base_dir)
+        key = directory.absolute()
+
+        with self._lock:
+            spool = self._spools.get(key)
+            if spool is None:
+                spool = SegmentedSpool(
+                    directory,
+                    segment_max_bytes=segment_max_bytes or DEFAULT_SEGMENT_MAX_BYTES,
+                    legacy_paths=_prepare_legacy_files(lagoon_id, base_dir),
+                    committer=self._committer,
+                    commit_max_batch=self._commit_max_batch,
+                    codec=codec or DEFAULT_CODEC,
+                    max_bytes=max_bytes or 0,
+                    on_sealed=self.enforce_total_quota,
+                )
+                self._spools[key] = spool
+                if self._committer is not None:
+                    self._committer.register(spool)
+            else:
+                if segment_max_bytes:
+                    spool.segment_max_bytes = max(1, int(segment_max_bytes))
+                if codec:
+                    spool.codec = normalize_codec(codec)
+                if max_bytes is not None:
+                    spool.max_bytes = max(0, int(max_bytes))
+
+        return spool
+
+    def enforce_total_quota(self) -> int:
+        if self.total_max_bytes <= 0:
+            return 0
+        if not self._quota_lock.acquire(blocking=False):
+            return 0
+
+        # Desalojo global: siempre el segmento sellado mas antiguo entre todas las lagunas.
+        freed_total = 0
+        try:
+            spools = self.spools()
+            total = sum(spool.disk_bytes() for spool in spools)
+            while total > self.total_max_bytes:
+                candidates = [
+                    (mtime, index)
+                    for index, spool in enumerate(spools)
+                    if (mtime := spool.oldest_sealed_mtime()) is not None
+                ]
+                if not candidates:
+                    break
+                _, victim_index = min(candidates)
+                freed = spools[victim_index].evict_oldest("total_quota")
+                if freed <= 0:
+                    break
+                total -= freed
+                freed_total += freed
+        finally:
+            self._quota_lock.release()
+        return freed_total
+
+    def spools(self) -> list[SegmentedSpool]:
+        with self._lock:
+            return list(self._spools.values())
+
+    def configure_group_commit(
+        self,
+        interval_sec: float,
+        max_batch: int = DEFAULT_COMMIT_MAX_BATCH,
+    ) -> None:
+        with self._lock:
+            previous = self._committer
+            self._committer = GroupCommitter(interval_sec) if interval_sec > 0 else None
+            self._commit_max_batch = max(1, int(max_batch))
+            for spool in self._spools.values():
+                spool.committer = self._committer
+                spool.commit_max_batch = self._commit_max_batch
+                if self._committer is not None:
+                    self._committer.register(spool)
+            committer = self._committer
+
+        if previous is not None:
+            previous.stop()
+        if committer is not None:
+            committer.start()
+
+    def flush_all(self) -> int:
+        return sum(spool.flush() for spool in self.spools())
+
+    def close_all(self) -> None:
+        with self._lock:
+            spools = list(self._spools.values())
+            self._spools.clear()
+        for spool in spools:
+            spool.close()
+
+
+_MANAGER = SpoolManager()
+
+
+def open_spool(
     lagoon_id: str,
     base_dir: str | Path = DEFAULT_SPOOL_DIR,
-) -> Path:
-    return Path(base_dir) / f"{_safe_lagoon_id(lagoon_id)}.jsonl"
+    *,
+    segment_max_bytes: int | None = None,
+    codec: str | None = None,
+    max_bytes: int | None = None,
+) -> SegmentedSpool:
+    return _MANAGER.open(
+        lagoon_id,
+        base_dir,
+        segment_max_bytes=segment_max_bytes,
+        codec=codec,
+        max_bytes=max_bytes,
+    )
+
+
+def configure_total_quota(total_max_bytes: int) -> None:
+    _MANAGER.total_max_bytes = max(0, int(total_max_bytes))
+
+
+def configure_group_commit(
+    interval_sec: float,
+    max_batch: int = DEFAULT_COMMIT_MAX_BATCH,
+) -> None:
+    _MANAGER.configure_group_commit(interval_sec, max_batch=max_batch)
+
+
+def flush_all() -> int:
+    return _MANAGER.flush_all()
+
+
+def close_all() -> None:
+    _MANAGER.close_all()
 
 
 def append(payload_json: str, path: str = "data/buffer.jsonl") -> None:
@@ -72,20 +229,25 @@ def append(payload_json: str, path: str = "data/buffer.jsonl") -> None:
 
 def append_for_lagoon(
     lagoon_id: str,
-    payload_json: str,
+    payload_json: str | bytes,
     base_dir: str | Path = DEFAULT_SPOOL_DIR,
 ) -> Path:
-    target_path = spool_path_for_lagoon(lagoon_id, base_dir=base_dir)
-    _ensure_parent_dir(target_path)
+    return open_spool(lagoon_id, base_dir=base_dir).append(payload_json)
 
-    with _BUFFER_LOCK:
-        with target_path.open("a", encoding="utf-8") as handle:
-            handle.write(payload_json)
-            handle.write("\n")
-            handle.flush()
-            os.fsync(handle.fileno())
 
-    return target_path
+def append_many_for_lagoon(
+    lagoon_id: str,
+    payload_jsons: Iterable[str | bytes],
+    base_dir: str | Path = DEFAULT_SPOOL_DIR,
+) -> Path | None:
+    return open_spool(lagoon_id, base_dir=base_dir).append_many(payload_jsons)
+
+
+def pending_for_lagoon(
+    lagoon_id: str,
+    base_dir: str | Path = DEFAULT_SPOOL_DIR,
+) -> int:
+    return open_spool(lagoon_id, base_dir=base_dir).pending_count()
 
 
 def _extract_lagoon_id(payload_json: str) -> str | None:
@@ -166,80 +328,28 @@ def replay_for_lagoon(
     send_payload: Callable[[dict], ReplayAction],
     max_items: int = 50,
     base_dir: str | Path = DEFAULT_SPOOL_DIR,
+    *,
+    min_timestamp: float | None = None,
 ) -> tuple[int, int, int]:
-    spool_path = spool_path_for_lagoon(lagoon_id, base_dir=base_dir)
-    work_path = spool_path.with_suffix(".work")
-    remaining_path = spool_path.with_name(f"{spool_path.name}.remaining")
-    merged_path = spool_path.with_name(f"{spool_path.name}.tmp")
+    return open_spool(lagoon_id, base_dir=base_dir).replay(
+        send_payload,
+        max_items=max_items,
+        min_timestamp=min_timestamp,
+    )
 
-    with _BUFFER_LOCK:
-        if work_path.exists():
-            active_work_path = work_path
-        elif not spool_path.exists() or spool_path.stat().st_size == 0:
-            return (0, 0, 0)
-        else:
-            os.replace(spool_path, work_path)
-            active_work_path = work_path
 
-    sent = 0
-    dropped = 0
-    pending_work = 0
-
-    try:
-        with (
-            active_work_path.open("r", encoding="utf-8") as source,
-            remaining_path.open("w", encoding="utf-8") as remaining_handle,
-        ):
-            copy_only = False
-            for line in _iter_nonempty_lines(source):
-                if copy_only or sent >= max_items:
-                    remaining_handle.write(line)
-                    remaining_handle.write("\n")
-                    pending_work += 1
-                    continue
-
-                try:
-                    payload = json.loads(line)
-                except json.JSONDecodeError:
-                    dropped += 1
-                    continue
-
-                action = _normalize_replay_action(send_payload(payload))
-                if action == "sent":
-                    sent += 1
-                    continue
-                if action == "drop":
-                    dropped += 1
-                    continue
-
-                remaining_handle.write(line)
-                remaining_handle.write("\n")
-                pending_work += 1
-                copy_only = True
-
-            remaining_handle.flush()
-            os.fsync(remaining_handle.fileno())
-    except FileNotFoundError:
-        return (0, 0, 0)
-
-    with _BUFFER_LOCK:
-        pending_total = 0
-        _ensure_parent_dir(merged_path)
-        with merged_path.open("w", encoding="utf-8") as merged_handle:
-            if pending_work:
-                pending_total += _copy_nonempty_lines(remaining_path, merged_handle)
-            if spool_path.exists():
-                pending_total += _copy_nonempty_lines(spool_path, merged_handle)
-            merged_handle.flush()
-            os.fsync(merged_handle.fileno())
-
-        if pending_total:
-            os.replace(merged_path, spool_path)
-        else:
-            merged_path.unlink(missing_ok=True)
-            spool_path.unlink(missing_ok=True)
-
-        active_work_path.unlink(missing_ok=True)
-        remaining_path.unlink(missing_ok=True)
-
-    return (sent, pending_total, dropped)
+def replay_batch_for_lagoon(
+    lagoon_id: str,
+    send_batch: Callable[[list[dict]], list[ReplayAction]],
+    max_items: int = 50,
+    base_dir: str | Path = DEFAULT_SPOOL_DIR,
+    *,
+    max_bytes: int = 0,
+    min_timestamp: float | None = None,
+) -> tuple[int, int, int]:
+    return open_spool(lagoon_id, base_dir=base_dir).replay_batch(
+        send_batch,
+        max_items=max_items,
+        max_bytes=max_bytes,
+        min_timestamp=min_timestamp,
+    )
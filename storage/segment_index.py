@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+import struct
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Callable
+
+INDEX_SUFFIX = ".idx"
+_INDEX_MAGIC = b"SPX1"
+_INDEX_HEADER = struct.Struct("<4sQQ")
+_TIMESTAMP_RE = re.compile(rb'"timestamp"\s*:\s*"([^"]*)"')
+
+
+def extract_timestamp(line: bytes) -> float:
+    match = _TIMESTAMP_RE.search(line)
+    if match is None:
+        return math.nan
+
+    raw = match.group(1).decode("ascii", errors="replace").strip()
+    if raw.endswith("Z"):
+        raw = f"{raw[:-1]}+00:00"
+    try:
+        parsed = datetime.fromisoformat(raw)
+    except ValueError:
+        return math.nan
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class SegmentIndex:
+    """
+    Sidecar `<segmento>.idx`: offset en bytes y timestamp (epoch) de cada linea.
+    Timestamp desconocido = NaN, nunca se descarta por edad.
+    """
+
+    __slots__ = ("offsets", "timestamps", "end", "min_timestamp", "max_timestamp", "unknown")
+
+    def __init__(self) -> None:
+        self.offsets = array("Q")
+        self.timestamps = array("d")
+        self.end = 0
+        self.min_timestamp = math.inf
+        self.max_timestamp = -math.inf
+        self.unknown = 0
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def add(self, offset: int, timestamp: float, length: int) -> None:
+        self.offsets.append(offset)
+        self.timestamps.append(timestamp)
+        self.end = offset + length
+        if math.isnan(timestamp):
+            self.unknown += 1
+            return
+        if timestamp < self.min_timestamp:
+            self.min_timestamp = timestamp
+        if timestamp > self.max_timestamp:
+            self.max_timestamp = timestamp
+
+    def offset_at(self, position: int) -> int:
+        if position < len(self.offsets):
+            return self.offsets[position]
+        return self.end
+
+    def position_for_offset(self, offset: int, count: int) -> int:
+        return bisect_left(self.offsets, offset, 0, count)
+
+    def first_fresh(self, position: int, count: int, min_timestamp: float) -> int:
+        if self.unknown == 0 and count == len(self.offsets) and self.max_timestamp < min_timestamp:
+            return count
+
+        timestamps = self.timestamps
+        while position < count:
+            timestamp = timestamps[position]
+            # NaN: comparacion falsa, el payload se conserva.
+            if not timestamp < min_timestamp:
+                return position
+            position += 1
+        return count
+
+    # =========================
+    # PERSISTENCE
+    # =========================
+
+    def dumps(self) -> bytes:
+        return (
+            _INDEX_HEADER.pack(_INDEX_MAGIC, len(self.offsets), self.end)
+            + self.offsets.tobytes()
+            + self.timestamps.tobytes()
+        )
+
+    @classmethod
+    def loads(cls, data: bytes) -> SegmentIndex | None:
+        if len(data) < _INDEX_HEADER.size:
+            return None
+
+        magic, count, end = _INDEX_HEADER.unpack_from(data)
+        body_size = count * (array("Q").itemsize + array("d").itemsize)
+        if magic != _INDEX_MAGIC or len(data) != _INDEX_HEADER.size + body_size:
+            return None
+
+        offsets = array("Q")
+        timestamps = array("d")
+        offsets_end = _INDEX_HEADER.size + count * offsets.itemsize
+        offsets.frombytes(data[_INDEX_HEADER.size:offsets_end])
+        timestamps.frombytes(data[offsets_end:])
+
+        index = cls()
+        for position in range(count):
+            next_offset = offsets[position + 1] if position + 1 < count else end
+            index.add(offsets[position], timestamps[position], next_offset - offsets[position])
+        return index
+
+    @classmethod
+    def build(cls, handle: BinaryIO) -> SegmentIndex:
+        index = cls()
+        offset = 0
+        for raw in handle:
+            if not raw.endswith(b"\n"):
+                break
+            index.add(offset, extract_timestamp(raw), len(raw))
+            offset += len(raw)
+        return index
+
+
+def index_path_for(segment_path: Path) -> Path:
+    return segment_path.with_suffix(INDEX_SUFFIX)
+
+
+def write_index(segment_path: Path, index: SegmentIndex) -> None:
+    path = index_path_for(segment_path)
+    temp_path = path.with_name(f"{path.name}.tmp")
+    with temp_path.open("wb") as handle:
+        handle.write(index.dumps())
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp_path, path)
+
+
+def load_index(segment_path: Path, open_segment: Callable[[], BinaryIO]) -> SegmentIndex:
+    try:
+        index = SegmentIndex.loads(index_path_for(segment_path).read_bytes())
+    except OSError:
+        index = None
+
+    if index is None:
+        with open_segment() as handle:
+            index = SegmentIndex.build(handle)
+        write_index(segment_path, index)
+    return index
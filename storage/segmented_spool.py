@@ -0,0 +1,921 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable
+
+from storage.segment_index import (
+    SegmentIndex,
+    extract_timestamp,
+    index_path_for,
+    load_index,
+    write_index,
+)
+from storage.spool_codecs import (
+    CODEC_ERRORS,
+    CODEC_SUFFIXES,
+    codec_from_name,
+    compress_file,
+    normalize_codec,
+    open_for_read,
+)
+
+SEGMENT_SUFFIX = ".jsonl"
+CURSOR_FILE_NAME = "cursor.json"
+DEFAULT_SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+DEFAULT_COMMIT_MAX_BATCH = 256
+ReplayAction = bool | str
+
+logger = logging.getLogger("collector")
+
+
+def _normalize_replay_action(result: ReplayAction) -> str:
+    if result is True or result == "sent":
+        return "sent"
+    if result == "drop":
+        return "drop"
+    return "keep"
+
+
+def _segment_name(first_line: int) -> str:
+    return f"{first_line:020d}{SEGMENT_SUFFIX}"
+
+
+class _SegmentReader:
+    __slots__ = ("segment", "offset", "handle", "lookahead")
+
+    def __init__(self, segment: int, offset: int, handle: BinaryIO) -> None:
+        self.segment = segment
+        self.offset = offset
+        self.handle = handle
+        self.lookahead: bytes | None = None
+
+    def readline(self) -> bytes:
+        if self.lookahead is not None:
+            raw, self.lookahead = self.lookahead, None
+            return raw
+        return self.handle.readline()
+
+    def close(self) -> None:
+        try:
+            self.handle.close()
+        except Exception:
+            pass
+
+
+class _ScanResult:
+    __slots__ = ("end", "first", "consumed", "dropped", "dropped_before_first")
+
+    def __init__(self) -> None:
+        self.end: tuple[int, int, int] = (0, 0, 0)
+        self.first: tuple[int, int, int] | None = None
+        self.consumed = 0
+        self.dropped = 0
+        self.dropped_before_first = 0
+
+
+def _fsync_write(path: Path, data: bytes) -> None:
+    temp_path = path.with_name(f"{path.name}.tmp")
+    with temp_path.open("wb") as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp_path, path)
+
+
+class GroupCommitter:
+    """
+    Hebra unica que hace commit (un write + un fsync) de los batches en memoria
+    de todos los spools registrados cada `interval_sec`, o antes si un batch se llena.
+    Ventana de durabilidad: un crash puede perder hasta `interval_sec` de appends.
+    """
+
+    def __init__(self, interval_sec: float) -> None:
+        self.interval_sec = max(0.001, float(interval_sec))
+        self._spools: list[SegmentedSpool] = []
+        self._spools_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def register(self, spool: SegmentedSpool) -> None:
+        with self._spools_lock:
+            if spool not in self._spools:
+                self._spools.append(spool)
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="spool-commit", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush_all()
+
+    def flush_all(self) -> int:
+        with self._spools_lock:
+            spools = list(self._spools)
+
+        flushed = 0
+        for spool in spools:
+            try:
+                flushed += spool.flush()
+            except Exception as exc:
+                logger.error("[BUFFER ERROR] spool=%s err=%s", spool.directory, exc)
+        return flushed
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.interval_sec)
+            self._wakeup.clear()
+            self.flush_all()
+
+
+class SegmentedSpool:
+    """
+    Spool append-only de una laguna:
+      - segmentos `<primera_linea>.jsonl` de tamano acotado; al sellarse se comprimen
+        segun `codec` (`.jsonl.gz` / `.jsonl.xz`)
+      - `cursor.json` con segmento, offset en bytes (sin comprimir) y linea absoluta ya confirmada
+    El replay avanza el cursor y borra segmentos confirmados: costo O(batch).
+    Si se supera `max_bytes`, se desalojan los segmentos mas antiguos.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        *,
+        segment_max_bytes: int = DEFAULT_SEGMENT_MAX_BYTES,
+        legacy_paths: Iterable[Path] = (),
+        lock: threading.Lock | None = None,
+        committer: GroupCommitter | None = None,
+        commit_max_batch: int = DEFAULT_COMMIT_MAX_BATCH,
+        codec: str = "none",
+        max_bytes: int = 0,
+        on_sealed: Callable[[], None] | None = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.segment_max_bytes = max(1, int(segment_max_bytes))
+        self.committer = committer
+        self.commit_max_batch = max(1, int(commit_max_batch))
+        self.codec = normalize_codec(codec)
+        self.max_bytes = max(0, int(max_bytes))
+        self.on_sealed = on_sealed
+        self.evicted_segments = 0
+        self.evicted_payloads = 0
+        self.evicted_bytes = 0
+
+        self._batch: list[str | bytes] = []
+        self._legacy_paths = tuple(legacy_paths)
+        self._lock = lock or threading.Lock()
+        self._maintenance_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._loaded = False
+        self._handle: BinaryIO | None = None
+        self._handle_segment = 0
+        self._reader: _SegmentReader | None = None
+
+        self._segments: list[int] = []
+        self._codecs: dict[int, str] = {}
+        self._sizes: dict[int, int] = {}
+        self._indexes: dict[int, SegmentIndex] = {}
+        self._to_compress: list[int] = []
+        self._sealed_pending = 0
+        self._active_size = 0
+        self._next_line = 1
+        self._cursor_segment = 0
+        self._cursor_offset = 0
+        self._cursor_line = 1
+
+    # =========================
+    # STATE
+    # =========================
+
+    @property
+    def cursor_path(self) -> Path:
+        return self.directory / CURSOR_FILE_NAME
+
+    def segment_path(self, first_line: int) -> Path:
+        return self.directory / _segment_name(first_line)
+
+    def _segment_file(self, first_line: int) -> Path:
+        codec = self._codecs.get(first_line, "none")
+        path = self.segment_path(first_line)
+        return path.with_name(f"{path.name}{CODEC_SUFFIXES[codec]}")
+
+    def _list_segments(self) -> dict[int, str]:
+        if not self.directory.exists():
+            return {}
+
+        segments: dict[int, str] = {}
+        for path in self.directory.iterdir():
+            name, codec = codec_from_name(path.name)
+            stem = name[: -len(SEGMENT_SUFFIX)]
+            if not name.endswith(SEGMENT_SUFFIX) or not stem.isdigit():
+                continue
+
+            first_line = int(stem)
+            if first_line in segments:
+                # Crash entre comprimir y borrar el original: la copia comprimida ya esta completa.
+                self.segment_path(first_line).unlink(missing_ok=True)
+                if codec == "none":
+                    continue
+            segments[first_line] = codec
+        return segments
+
+    def _read_cursor(self) -> tuple[int, int, int] | None:
+        try:
+            raw = json.loads(self.cursor_path.read_text(encoding="utf-8"))
+            return int(raw["segment"]), int(raw["offset"]), int(raw["line"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_cursor(self) -> None:
+        data = json.dumps(
+            {
+                "segment": self._cursor_segment,
+                "offset": self._cursor_offset,
+                "line": self._cursor_line,
+            }
+        ).encode("utf-8")
+        _fsync_write(self.cursor_path, data)
+
+    def _scan_active_segment(self, first_line: int) -> None:
+        path = self.segment_path(first_line)
+        with path.open("rb") as handle:
+            index = SegmentIndex.build(handle)
+
+        # Una escritura cortada por un crash deja una linea sin "\n": se descarta.
+        if path.stat().st_size != index.end:
+            with path.open("r+b") as handle:
+                handle.truncate(index.end)
+
+        self._indexes[first_line] = index
+        self._active_size = index.end
+        self._next_line = first_line + len(index)
+
+    def _close_reader_locked(self, first_line: int | None = None) -> None:
+        reader = self._reader
+        if reader is not None and (first_line is None or reader.segment == first_line):
+            self._reader = None
+            reader.close()
+
+    def _delete_segment_locked(self, first_line: int) -> None:
+        self._close_reader_locked(first_line)
+        segment_file = self._segment_file(first_line)
+        segment_file.unlink(missing_ok=True)
+        index_path_for(self.segment_path(first_line)).unlink(missing_ok=True)
+        self._codecs.pop(first_line, None)
+        self._sizes.pop(first_line, None)
+        self._indexes.pop(first_line, None)
+        if first_line in self._to_compress:
+            self._to_compress.remove(first_line)
+        if first_line in self._segments:
+            self._segments.remove(first_line)
+
+    def _close_handle_locked(self) -> None:
+        if self._handle is not None:
+            try:
+                self._handle.close()
+            finally:
+                self._handle = None
+
+    def _reset_empty(self) -> None:
+        self._close_handle_locked()
+        self._close_reader_locked()
+        self._segments = []
+        self._codecs = {}
+        self._sizes = {}
+        self._indexes = {}
+        self._to_compress = []
+        self._active_size = 0
+        self._cursor_segment = self._next_line
+        self._cursor_offset = 0
+        self._cursor_line = self._next_line
+        self.cursor_path.unlink(missing_ok=True)
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._codecs = self._list_segments()
+        self._segments = sorted(self._codecs)
+        cursor = self._read_cursor()
+
+        if self._segments:
+            active = self._segments[-1]
+            if self._codecs[active] != "none":
+                # El activo siempre es texto plano: si quedo comprimido, se abre uno nuevo.
+                with self._open_segment(active) as handle:
+                    self._indexes[active] = SegmentIndex.build(handle)
+                self._next_line = active + len(self._indexes[active])
+                self._active_size = self.segment_max_bytes
+            else:
+                self._scan_active_segment(active)
+            for first_line in self._segments[:-1]:
+                self._sizes[first_line] = self._segment_file(first_line).stat().st_size
+                if self._codecs[first_line] == "none" and self.codec != "none":
+                    self._to_compress.append(first_line)
+        elif cursor is not None:
+            self._next_line = max(1, cursor[2])
+
+        if cursor is not None and cursor[0] in self._segments:
+            self._cursor_segment, self._cursor_offset, self._cursor_line = cursor
+        elif self._segments:
+            self._cursor_segment = self._segments[0]
+            self._cursor_offset = 0
+            self._cursor_line = self._segments[0]
+        else:
+            self._reset_empty()
+
+        # Segmentos anteriores al cursor quedaron confirmados antes de un crash.
+        for first_line in [seg for seg in self._segments if seg < self._cursor_segment]:
+            self._delete_segment_locked(first_line)
+
+        self._loaded = True
+        self._import_legacy_files()
+
+    def _import_legacy_files(self) -> None:
+        for legacy_path in self._legacy_paths:
+            if not legacy_path.exists():
+                continue
+
+            with legacy_path.open("r", encoding="utf-8") as handle:
+                self._append_lines_locked(
+                    line.rstrip("\n") for line in handle if line.strip()
+                )
+            legacy_path.unlink(missing_ok=True)
+
+    def _open_segment(self, first_line: int) -> BinaryIO:
+        return open_for_read(self._segment_file(first_line), self._codecs.get(first_line, "none"))
+
+    def disk_bytes(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values()) + (self._active_size if self._segments else 0)
+
+    # =========================
+    # APPEND
+    # =========================
+
+    def _seal_segment_locked(self, first_line: int) -> None:
+        self._sealed_pending += 1
+        if self._codecs.get(first_line, "none") != "none":
+            self._sizes[first_line] = self._segment_file(first_line).stat().st_size
+            return
+
+        self._sizes[first_line] = self._active_size
+        if self.codec != "none":
+            self._to_compress.append(first_line)
+
+        index = self._indexes.get(first_line)
+        if index is None:
+            return
+        try:
+            write_index(self.segment_path(first_line), index)
+        except OSError:
+            # Sin sidecar el indice se reconstruye al hacer replay del segmento.
+            pass
+
+    def _segment_for_append_locked(self) -> Path:
+        if not self._segments:
+            self._cursor_segment = self._next_line
+            self._cursor_offset = 0
+            self._cursor_line = self._next_line
+        if not self._segments or self._active_size >= self.segment_max_bytes:
+            if self._segments:
+                self._close_handle_locked()
+                self._seal_segment_locked(self._segments[-1])
+            self._segments.append(self._next_line)
+            self._codecs[self._next_line] = "none"
+            self._indexes[self._next_line] = SegmentIndex()
+            self._active_size = 0
+        return self.segment_path(self._segments[-1])
+
+    def _append_handle_locked(self) -> tuple[Path, BinaryIO]:
+        target_path = self._segment_for_append_locked()
+        active_segment = self._segments[-1]
+        if self._handle is None or self._handle_segment != active_segment:
+            self._close_handle_locked()
+            self._handle = target_path.open("ab")
+            self._handle_segment = active_segment
+        return target_path, self._handle
+
+    def _write_chunk_locked(
+        self,
+        chunk: bytes,
+        entries: list[tuple[int, float, int]],
+    ) -> Path:
+        target_path, handle = self._append_handle_locked()
+        try:
+            handle.write(chunk)
+            handle.flush()
+            os.fsync(handle.fileno())
+        except Exception:
+            # Un handle con error queda en estado incierto: se reabre en el proximo append.
+            self._close_handle_locked()
+            raise
+
+        index = self._indexes[self._segments[-1]]
+        for relative_offset, timestamp, length in entries:
+            index.add(self._active_size + relative_offset, timestamp, length)
+        self._active_size += len(chunk)
+        self._next_line += len(entries)
+        return target_path
+
+    def _append_lines_locked(self, lines: Iterable[str | bytes]) -> Path | None:
+        # Un write + un fsync por segmento tocado, no por linea.
+        target_path: Path | None = None
+        chunk = bytearray()
+        entries: list[tuple[int, float, int]] = []
+        for line in lines:
+            if chunk and self._active_size + len(chunk) >= self.segment_max_bytes:
+                target_path = self._write_chunk_locked(bytes(chunk), entries)
+                chunk.clear()
+                entries = []
+            # Un payload ya codificado (CyclePayload) llega como bytes y se escribe tal cual.
+            data = (line if type(line) is bytes else line.encode("utf-8")) + b"\n"
+            entries.append((len(chunk), extract_timestamp(data), len(data)))
+            chunk += data
+
+        if chunk:
+            target_path = self._write_chunk_locked(bytes(chunk), entries)
+        return target_path
+
+    def _flush_batch_locked(self) -> None:
+        if not self._batch:
+            return
+
+        batch = self._batch
+        self._batch = []
+        try:
+            self._append_lines_locked(batch)
+        except Exception:
+            self._batch = batch + self._batch
+            raise
+
+    def append(self, payload_json: str | bytes) -> Path:
+        committer = self.committer
+        with self._lock:
+            self._load()
+            if committer is None:
+                target_path = self._append_lines_locked([payload_json])
+                target_path = target_path or self.segment_path(self._segments[-1])
+            else:
+                self._batch.append(payload_json)
+                batch_full = len(self._batch) >= self.commit_max_batch
+                target_path = self.directory
+
+        if committer is not None and batch_full:
+            committer.notify()
+        self._maintain()
+        return target_path
+
+    def append_many(self, payload_jsons: Iterable[str | bytes]) -> Path | None:
+        with self._lock:
+            self._load()
+            self._flush_batch_locked()
+            target_path = self._append_lines_locked(payload_jsons)
+        self._maintain()
+        return target_path
+
+    def flush(self) -> int:
+        with self._lock:
+            if not self._loaded or not self._batch:
+                return 0
+            flushed = len(self._batch)
+            self._flush_batch_locked()
+        self._maintain()
+        return flushed
+
+    def close(self) -> None:
+        with self._lock:
+            if self._loaded:
+                self._flush_batch_locked()
+            self._close_handle_locked()
+            self._close_reader_locked()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            self._load()
+            return self._pending_locked()
+
+    def pending_hint(self) -> int | None:
+        """
+        Pendientes sin tomar el lock (None si el spool aun no se cargo). Puede
+        ir un append o replay atrasado; sirve para decidir si vale la pena
+        agendar un replay, no para contar.
+        """
+        if not self._loaded:
+            return None
+        return self._pending_locked()
+
+    # =========================
+    # COMPRESSION / QUOTA
+    # =========================
+
+    def _over_quota(self) -> bool:
+        return bool(self.max_bytes) and (
+            sum(self._sizes.values()) + self._active_size > self.max_bytes
+        )
+
+    def _maintain(self) -> None:
+        if not self._sealed_pending and not self._to_compress and not self._over_quota():
+            return
+        if not self._maintenance_lock.acquire(blocking=False):
+            return
+
+        try:
+            with self._lock:
+                sealed, self._sealed_pending = self._sealed_pending, 0
+            self._compress_sealed()
+            with self._lock:
+                self._enforce_quota_locked()
+        finally:
+            self._maintenance_lock.release()
+
+        if sealed and self.on_sealed is not None:
+            self.on_sealed()
+
+    def _compress_sealed(self) -> int:
+        with self._lock:
+            pending = list(self._to_compress)
+
+        compressed = 0
+        for first_line in pending:
+            raw_path = self.segment_path(first_line)
+            target_path = raw_path.with_name(f"{raw_path.name}{CODEC_SUFFIXES[self.codec]}")
+            # El segmento sellado es inmutable: se comprime fuera del lock.
+            try:
+                size = compress_file(raw_path, target_path, self.codec)
+            except FileNotFoundError:
+                with self._lock:
+                    if first_line in self._to_compress:
+                        self._to_compress.remove(first_line)
+                continue
+            except CODEC_ERRORS as exc:
+                logger.error("[SPOOL COMPRESS ERROR] spool=%s segment=%s err=%s", self.directory, first_line, exc)
+                target_path.with_name(f"{target_path.name}.tmp").unlink(missing_ok=True)
+                continue
+
+            with self._lock:
+                if first_line not in self._segments:
+                    target_path.unlink(missing_ok=True)
+                    continue
+                self._close_reader_locked(first_line)
+                self._codecs[first_line] = self.codec
+                self._sizes[first_line] = size
+                if first_line in self._to_compress:
+                    self._to_compress.remove(first_line)
+                try:
+                    raw_path.unlink()
+                except OSError:
+                    # Windows: un lector aun lo tiene abierto; se limpia en el proximo load.
+                    pass
+            compressed += 1
+        return compressed
+
+    def _evict_oldest_locked(self) -> tuple[int, int]:
+        if len(self._segments) <= 1:
+            return (0, 0)
+
+        first_line, next_segment = self._segments[0], self._segments[1]
+        freed_bytes = self._sizes.get(first_line, 0)
+        if self._cursor_segment == first_line:
+            lost = next_segment - self._cursor_line
+            self._cursor_segment = next_segment
+            self._cursor_offset = 0
+            self._cursor_line = next_segment
+            self._write_cursor()
+        else:
+            lost = next_segment - first_line
+
+        self._delete_segment_locked(first_line)
+        self.evicted_segments += 1
+        self.evicted_payloads += lost
+        self.evicted_bytes += freed_bytes
+        return (lost, freed_bytes)
+
+    def _report_eviction(self, reason: str, segments: int, payloads: int, freed: int) -> None:
+        logger.warning(
+            "[SPOOL EVICT] spool=%s reason=%s segments=%s payloads=%s bytes=%s total_evicted_payloads=%s",
+            self.directory,
+            reason,
+            segments,
+            payloads,
+            freed,
+            self.evicted_payloads,
+        )
+
+    def _enforce_quota_locked(self) -> None:
+        if not self.max_bytes:
+            return
+
+        segments = payloads = freed = 0
+        while self._over_quota():
+            lost, freed_bytes = self._evict_oldest_locked()
+            if not freed_bytes and not lost:
+                break
+            segments += 1
+            payloads += lost
+            freed += freed_bytes
+
+        if segments:
+            self._report_eviction("lagoon_quota", segments, payloads, freed)
+
+    def oldest_sealed_mtime(self) -> float | None:
+        with self._lock:
+            if len(self._segments) <= 1:
+                return None
+            try:
+                return self._segment_file(self._segments[0]).stat().st_mtime
+            except OSError:
+                return 0.0
+
+    def evict_oldest(self, reason: str) -> int:
+        with self._lock:
+            lost, freed_bytes = self._evict_oldest_locked()
+        if lost or freed_bytes:
+            self._report_eviction(reason, 1, lost, freed_bytes)
+        return freed_bytes
+
+    # =========================
+    # REPLAY
+    # =========================
+
+    def _next_segment_after(self, first_line: int) -> int | None:
+        with self._lock:
+            for candidate in self._segments:
+                if candidate > first_line:
+                    return candidate
+        return None
+
+    def _index_snapshot(self, segment: int) -> tuple[SegmentIndex, int, bool] | None:
+        with self._lock:
+            if segment not in self._segments:
+                return None
+            sealed = segment != self._segments[-1]
+            index = self._indexes.get(segment)
+            if index is not None:
+                return index, len(index), sealed
+            open_segment = self._open_segment_callable(segment)
+
+        # Segmento sellado sin indice en memoria: es inmutable, se carga fuera del lock.
+        try:
+            index = load_index(self.segment_path(segment), open_segment)
+        except CODEC_ERRORS:
+            return None
+        with self._lock:
+            if segment not in self._segments:
+                return None
+            index = self._indexes.setdefault(segment, index)
+            return index, len(index), sealed
+
+    def _open_segment_callable(self, segment: int) -> Callable[[], BinaryIO]:
+        path = self._segment_file(segment)
+        codec = self._codecs.get(segment, "none")
+        return lambda: open_for_read(path, codec)
+
+    def _skip_expired(
+        self,
+        segment: int,
+        offset: int,
+        min_timestamp: float,
+    ) -> tuple[int, int, bool]:
+        snapshot = self._index_snapshot(segment)
+        if snapshot is None:
+            return offset, 0, False
+
+        index, count, sealed = snapshot
+        position = index.position_for_offset(offset, count)
+        fresh = index.first_fresh(position, count, min_timestamp)
+        return index.offset_at(fresh), fresh - position, sealed and fresh == count
+
+    def _take_reader(self, segment: int, offset: int) -> _SegmentReader:
+        with self._lock:
+            reader = self._reader
+            self._reader = None
+            open_segment = self._open_segment_callable(segment)
+
+        if reader is not None and reader.segment == segment:
+            if reader.offset != offset:
+                # Seek hacia adelante: en segmentos comprimidos solo descomprime lo saltado.
+                reader.lookahead = None
+                reader.handle.seek(offset)
+                reader.offset = offset
+            return reader
+
+        if reader is not None:
+            reader.close()
+        handle = open_segment()
+        try:
+            if offset:
+                handle.seek(offset)
+        except Exception:
+            handle.close()
+            raise
+        return _SegmentReader(segment, offset, handle)
+
+    def _keep_reader(self, reader: _SegmentReader) -> None:
+        with self._lock:
+            if reader.segment in self._segments and self._reader is None:
+                self._reader = reader
+                return
+        reader.close()
+
+    def replay(
+        self,
+        send_payload: Callable[[dict], ReplayAction],
+        max_items: int = 50,
+        *,
+        min_timestamp: float | None = None,
+    ) -> tuple[int, int, int]:
+        with self._replay_lock:
+            scan = self._scan(lambda payload, raw: send_payload(payload), max_items, min_timestamp)
+            if scan is None:
+                return (0, 0, 0)
+            with self._lock:
+                self._commit_cursor_locked(*scan.end)
+                return (scan.consumed, self._pending_locked(), scan.dropped)
+
+    def replay_batch(
+        self,
+        send_batch: Callable[[list[dict]], list[ReplayAction]],
+        max_items: int = 50,
+        *,
+        max_bytes: int = 0,
+        min_timestamp: float | None = None,
+    ) -> tuple[int, int, int]:
+        """
+        Lee hasta max_items payloads (y max_bytes de lineas) y los entrega en una
+        sola llamada a send_batch, que devuelve una accion por payload. Si todo el
+        lote queda en "keep" el cursor no avanza; en un fallo parcial el cursor
+        avanza y los payloads en "keep" se reencolan al final del spool.
+        """
+        with self._replay_lock:
+            batch: list[dict] = []
+            batch_bytes = 0
+
+            def _collect(payload: dict, raw: bytes) -> str:
+                nonlocal batch_bytes
+                if batch and max_bytes > 0 and batch_bytes + len(raw) > max_bytes:
+                    return "keep"
+                batch.append(payload)
+                batch_bytes += len(raw)
+                return "sent"
+
+            scan = self._scan(_collect, max_items, min_timestamp)
+            if scan is None:
+                return (0, 0, 0)
+
+            actions = [_normalize_replay_action(result) for result in send_batch(batch)] if batch else []
+            if len(actions) != len(batch):
+                raise ValueError(f"send_batch returned {len(actions)} results for {len(batch)} payloads")
+
+            requeue = [payload for payload, action in zip(batch, actions) if action == "keep"]
+            if batch and len(requeue) == len(batch):
+                # Backend caido: solo se confirma lo descartado antes del lote.
+                with self._lock:
+                    if scan.first is not None:
+                        self._commit_cursor_locked(*scan.first)
+                    return (0, self._pending_locked(), scan.dropped_before_first)
+
+            if requeue:
+                self.append_many(json.dumps(payload, separators=(",", ":")) for payload in requeue)
+
+            sent = actions.count("sent")
+            dropped = scan.dropped + actions.count("drop")
+            with self._lock:
+                self._commit_cursor_locked(*scan.end)
+                return (sent, self._pending_locked(), dropped)
+
+    def _pending_locked(self) -> int:
+        return self._next_line - self._cursor_line + len(self._batch)
+
+    def _scan(
+        self,
+        visit: Callable[[dict, bytes], ReplayAction],
+        max_items: int,
+        min_timestamp: float | None,
+    ) -> _ScanResult | None:
+        with self._lock:
+            self._load()
+            self._flush_batch_locked()
+            if self._next_line == self._cursor_line:
+                return None
+            segment = self._cursor_segment
+            offset = self._cursor_offset
+            line_no = self._cursor_line
+
+        result = _ScanResult()
+        stop = False
+
+        while not stop:
+            reader: _SegmentReader | None = None
+            exhausted = False
+            if min_timestamp is not None:
+                # Payloads expirados se saltan por indice: sin leer ni parsear JSON.
+                offset, skipped, exhausted = self._skip_expired(segment, offset, min_timestamp)
+                result.dropped += skipped
+                line_no += skipped
+
+            try:
+                if not exhausted:
+                    reader = self._take_reader(segment, offset)
+                while reader is not None:
+                    raw = reader.readline()
+                    if not raw:
+                        break
+                    # Linea todavia en escritura: se reintenta en la proxima pasada.
+                    if not raw.endswith(b"\n"):
+                        reader.close()
+                        reader = None
+                        stop = True
+                        break
+                    if result.consumed >= max_items:
+                        reader.lookahead = raw
+                        stop = True
+                        break
+
+                    text = raw.decode("utf-8", errors="replace").strip()
+                    if text:
+                        try:
+                            payload = json.loads(text)
+                        except json.JSONDecodeError:
+                            result.dropped += 1
+                        else:
+                            action = _normalize_replay_action(visit(payload, raw))
+                            if action == "keep":
+                                reader.lookahead = raw
+                                stop = True
+                                break
+                            if action == "sent":
+                                if result.first is None:
+                                    result.first = (segment, offset, line_no)
+                                    result.dropped_before_first = result.dropped
+                                result.consumed += 1
+                            else:
+                                result.dropped += 1
+
+                    offset += len(raw)
+                    line_no += 1
+                    reader.offset = offset
+            except FileNotFoundError:
+                break
+            except CODEC_ERRORS + (ValueError,) as exc:
+                if reader is not None:
+                    reader.close()
+                next_segment = self._next_segment_after(segment)
+                if next_segment is None:
+                    break
+                # Segmento sellado ilegible: se descarta para no bloquear el spool.
+                logger.error("[SPOOL CORRUPT] spool=%s segment=%s err=%s", self.directory, segment, exc)
+                result.dropped += next_segment - line_no
+                line_no = next_segment
+                segment = next_segment
+                offset = 0
+                continue
+
+            next_segment = None if stop else self._next_segment_after(segment)
+            if next_segment is None:
+                if reader is not None:
+                    self._keep_reader(reader)
+                break
+            if reader is not None:
+                reader.close()
+            segment = next_segment
+            offset = 0
+
+        result.end = (segment, offset, line_no)
+        return result
+
+    def _commit_cursor_locked(self, segment: int, offset: int, line_no: int) -> None:
+        # Si un desalojo movio el cursor mientras se hacia replay, gana el cursor mas nuevo.
+        if line_no <= self._cursor_line or segment not in self._segments:
+            return
+
+        self._cursor_segment = segment
+        self._cursor_offset = offset
+        self._cursor_line = line_no
+
+        if self._cursor_line >= self._next_line:
+            self._close_handle_locked()
+            for first_line in list(self._segments):
+                self._delete_segment_locked(first_line)
+            self._reset_empty()
+            return
+
+        self._write_cursor()
+        for first_line in [seg for seg in self._segments if seg < segment]:
+            self._delete_segment_locked(first_line)
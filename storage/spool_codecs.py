@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import gzip
+import lzma
+import os
+import shutil
+from pathlib import Path
+from typing import BinaryIO
+
+# "zlib" usa el contenedor gzip (deflate de zlib) porque permite lectura en streaming con seek.
+CODEC_SUFFIXES = {
+    "none": "",
+    "zlib": ".gz",
+    "lzma": ".xz",
+}
+DEFAULT_CODEC = "zlib"
+CODEC_ERRORS = (OSError, EOFError, lzma.LZMAError)
+
+
+def normalize_codec(value: str | None) -> str:
+    codec = str(value or "none").strip().lower()
+    if codec == "gzip":
+        codec = "zlib"
+    if codec not in CODEC_SUFFIXES:
+        allowed = ", ".join(sorted(CODEC_SUFFIXES))
+        raise ValueError(f"Invalid spool codec {codec!r}; expected one of: {allowed}")
+    return codec
+
+
+def codec_from_name(name: str) -> tuple[str, str]:
+    for codec, suffix in CODEC_SUFFIXES.items():
+        if suffix and name.endswith(suffix):
+            return name[: -len(suffix)], codec
+    return name, "none"
+
+
+def open_for_read(path: Path, codec: str) -> BinaryIO:
+    if codec == "zlib":
+        return gzip.open(path, "rb")
+    if codec == "lzma":
+        return lzma.open(path, "rb")
+    return path.open("rb")
+
+
+def compress_file(source: Path, destination: Path, codec: str) -> int:
+    temp_path = destination.with_name(f"{destination.name}.tmp")
+    with source.open("rb") as raw:
+        if codec == "zlib":
+            compressed = gzip.open(temp_path, "wb", compresslevel=6)
+        else:
+            compressed = lzma.open(temp_path, "wb", preset=6)
+        with compressed:
+            shutil.copyfileobj(raw, compressed, 1024 * 1024)
+
+    with temp_path.open("rb") as handle:
+        os.fsync(handle.fileno())
+    os.replace(temp_path, destination)
+    return destination.stat().st_size
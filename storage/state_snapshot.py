@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+from storage.jsonl_buffer import DEFAULT_SPOOL_DIR, spool_dir_for_lagoon
+
+STATE_FILE_NAME = "state.json"
+STATE_VERSION = 1
+DEFAULT_STATE_MAX_AGE_SEC = 3600.0
+
+
+def state_path_for_lagoon(lagoon_id: str, base_dir: str | Path = DEFAULT_SPOOL_DIR) -> Path:
+    # Junto al spool de la laguna: el spool segmentado solo mira sus segmentos y `cursor.json`.
+    return spool_dir_for_lagoon(lagoon_id, base_dir) / STATE_FILE_NAME
+
+
+def write_state(path: str | Path, state: dict[str, Any], *, fsync: bool = True) -> None:
+    """
+    Escritura atomica: un crash deja el snapshot anterior completo, nunca uno
+    cortado. Con `fsync=False` el archivo sobrevive a la caida del proceso
+    pero no a un corte de energia; sirve para escrituras de cada ciclo.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = json.dumps(
+        {"version": STATE_VERSION, "saved_at": time.time(), **state},
+        separators=(",", ":"),
+        allow_nan=False,
+    ).encode("utf-8")
+    tmp = path.with_name(f"{path.name}.tmp")
+    with tmp.open("wb") as handle:
+        handle.write(data)
+        if fsync:
+            handle.flush()
+            os.fsync(handle.fileno())
+    os.replace(tmp, path)
+
+
+def read_state(
+    path: str | Path,
+    max_age_sec: float = DEFAULT_STATE_MAX_AGE_SEC,
+    *,
+    now: float | None = None,
+) -> tuple[dict[str, Any] | None, str]:
+    """
+    Devuelve `(estado, motivo)`. El estado es None si no hay snapshot, si esta
+    corrupto o de otra version, o si es mas viejo que `max_age_sec` (0 = sin
+    limite): un totalizador de hace horas puede haber dado la vuelta.
+    """
+    try:
+        raw = json.loads(Path(path).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None, "missing"
+    except (OSError, ValueError):
+        return None, "corrupt"
+    if not isinstance(raw, dict) or raw.get("version") != STATE_VERSION:
+        return None, "corrupt"
+
+    try:
+        age = (time.time() if now is None else now) - float(raw["saved_at"])
+    except (KeyError, TypeError, ValueError):
+        return None, "corrupt"
+    if max_age_sec > 0 and age > max_age_sec:
+        return None, "stale"
+    return raw, "ok"
@@ -1,10 +1,15 @@
+import argparse
+import signal
 import subprocess
 import time
 import sys
 import os
 
 from dotenv import load_dotenv
+from common.config import load_plc_configs
 from common.logger import get_logger
+from common.sharding import DEFAULT_HEALTH_DIR, aggregate_health, resolve_shard_count, write_health
+from storage import jsonl_buffer
 load_dotenv()
 
 
@@ -13,38 +18,220 @@ PYTHON = sys.executable
 logger = get_logger("collector.supervisor")
 
 CONFIG = os.path.join(BASE_DIR, "collectors.yml")
+RESTART_DELAY_SEC = 5.0
+# Margen sobre el `shutdown_deadline_sec` (10 s por defecto) de cada shard.
+SHUTDOWN_GRACE_SEC = 15.0
 
-CMD = [
-    PYTHON,
-    os.path.join(BASE_DIR, "main.py"),
-    "--config",
-    CONFIG,
-]
 
-logger.info("Starting collector supervisor")
-logger.info("Command: %s", " ".join(CMD))
+def shard_command(config_path: str, shard_index: int, shard_count: int) -> list[str]:
+    cmd = [
+        PYTHON,
+        os.path.join(BASE_DIR, "main.py"),
+        "--config",
+        config_path,
+    ]
+    if shard_count > 1:
+        cmd += ["--shard-index", str(shard_index), "--shard-count", str(shard_count)]
+    return cmd
 
-while True:
-    try:
-        proc = subprocess.Popen(
-            CMD,
-            env=os.environ.copy(),  
-        )
-        logger.info("Collector running pid=%s", proc.pid)
 
-        proc.wait()
+class ShardSupervisor:
+    """
+    Un proceso `main.py` por shard. Si un shard cae, o deja de escribir su
+    archivo de salud, se relanza solo ese despues de `restart_delay_sec`; los
+    demas siguen corriendo. La salud se agrega desde los archivos
+    `data/health/shard_<n>.json` de cada shard.
+    """
+
+    def __init__(
+        self,
+        config_path: str,
+        shard_count: int,
+        *,
+        restart_delay_sec: float = RESTART_DELAY_SEC,
+        health_every_sec: float = 30.0,
+        health_stale_sec: float = 60.0,
+        shutdown_grace_sec: float = SHUTDOWN_GRACE_SEC,
+        health_dir=DEFAULT_HEALTH_DIR,
+        popen=subprocess.Popen,
+        clock=time.monotonic,
+    ) -> None:
+        self.config_path = config_path
+        self.shard_count = shard_count
+        self.restart_delay_sec = restart_delay_sec
+        self.health_every_sec = health_every_sec
+        self.health_stale_sec = health_stale_sec
+        self.shutdown_grace_sec = shutdown_grace_sec
+        self.health_dir = health_dir
+        self.popen = popen
+        self.clock = clock
+        self.procs: list = [None] * shard_count
+        self.next_start = [0.0] * shard_count
+        self.restarts = [0] * shard_count
+        self._next_health = clock() + health_every_sec
+
+    def tick(self) -> None:
+        now = self.clock()
+        for shard_index in range(self.shard_count):
+            proc = self.procs[shard_index]
+            if proc is not None and proc.poll() is not None:
+                logger.warning(
+                    "Collector stopped shard=%s code=%s, restarting in %.0fs",
+                    shard_index,
+                    proc.returncode,
+                    self.restart_delay_sec,
+                )
+                self.procs[shard_index] = None
+                self.next_start[shard_index] = now + self.restart_delay_sec
+                self.restarts[shard_index] += 1
+
+            if self.procs[shard_index] is None and now >= self.next_start[shard_index]:
+                try:
+                    proc = self.popen(
+                        shard_command(self.config_path, shard_index, self.shard_count),
+                        env=os.environ.copy(),
+                    )
+                except Exception as e:
+                    logger.error("Supervisor error shard=%s: %s", shard_index, e)
+                    self.next_start[shard_index] = now + self.restart_delay_sec
+                    continue
+                self.procs[shard_index] = proc
+                logger.info("Collector running shard=%s pid=%s", shard_index, proc.pid)
 
-        logger.warning("Collector stopped, restarting in 5s")
-        time.sleep(5)
+        if self.health_every_sec > 0 and now >= self._next_health:
+            self._next_health = now + self.health_every_sec
+            self.report_health()
 
-    except KeyboardInterrupt:
-        logger.info("Stopping collector supervisor")
+    def health(self) -> dict:
+        health = aggregate_health(
+            self.shard_count,
+            base_dir=self.health_dir,
+            stale_after_sec=self.health_stale_sec,
+        )
+        health["running"] = sum(1 for proc in self.procs if proc is not None and proc.poll() is None)
+        health["restarts"] = list(self.restarts)
+        return health
+
+    def report_health(self) -> dict:
+        health = self.health()
+        self.kill_stale(health)
+        logger.info(
+            "[SUPERVISOR HEALTH] shards=%s running=%s lagoons=%s cycles=%s stale=%s restarts=%s",
+            self.shard_count,
+            health["running"],
+            health["lagoons"],
+            health["cycles"],
+            ",".join(str(index) for index in health["stale_shards"]) or "-",
+            sum(self.restarts),
+        )
         try:
-            proc.terminate()
-        except Exception:
-            pass
-        break
+            write_health(os.path.join(self.health_dir, "supervisor.json"), health)
+        except OSError as e:
+            logger.warning("Supervisor health write failed: %s", e)
+        return health
+
+    def kill_stale(self, health: dict) -> list[int]:
+        """
+        Liveness: un shard cuyo proceso sigue vivo pero dejo de escribir su
+        archivo de salud esta colgado entero; se mata y el siguiente tick lo
+        relanza. Solo cuenta un archivo escrito por el pid actual, asi un shard
+        recien lanzado o con `health_every_sec: 0` no se mata.
+        """
+        killed = []
+        for shard_index in health["stale_shards"]:
+            proc = self.procs[shard_index]
+            shard = health["shards"][str(shard_index)]
+            if proc is None or proc.poll() is not None or shard["pid"] != proc.pid:
+                continue
+            logger.warning(
+                "[SUPERVISOR LIVENESS] shard=%s pid=%s age_sec=%s action=restart",
+                shard_index,
+                proc.pid,
+                shard["age_sec"],
+            )
+            try:
+                proc.kill()
+            except Exception as e:
+                logger.error("Supervisor error shard=%s: %s", shard_index, e)
+                continue
+            killed.append(shard_index)
+        return killed
+
+    def terminate(self) -> None:
+        """
+        SIGTERM a todos los shards y espera `shutdown_grace_sec` a que
+        terminen su apagado ordenado (colas al spool); el que no alcanza se mata.
+        """
+        procs = [proc for proc in self.procs if proc is not None and proc.poll() is None]
+        for proc in procs:
+            try:
+                proc.terminate()
+            except Exception:
+                pass
 
+        deadline = self.clock() + self.shutdown_grace_sec
+        for proc in procs:
+            try:
+                proc.wait(timeout=max(0.0, deadline - self.clock()))
+            except subprocess.TimeoutExpired:
+                logger.warning("Collector shard pid=%s did not stop in %.0fs, killing", proc.pid, self.shutdown_grace_sec)
+                try:
+                    proc.kill()
+                except Exception:
+                    pass
+            except Exception:
+                pass
+
+    def run_forever(self, interval_sec: float = 1.0) -> None:
+        while True:
+            try:
+                self.tick()
+                time.sleep(interval_sec)
+            except KeyboardInterrupt:
+                logger.info("Stopping collector supervisor")
+                self.terminate()
+                break
+            except Exception as e:
+                logger.error("Supervisor error: %s", e)
+                time.sleep(self.restart_delay_sec)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default=CONFIG)
+    parser.add_argument("--shards", default=None, help="cantidad de procesos o 'auto' (un shard por CPU)")
+    args = parser.parse_args()
+
+    shard_count = 1
+    root_cfg: dict = {}
+    try:
+        plc_configs, root_cfg = load_plc_configs(args.config)
+        runtime = root_cfg.get("runtime") or {}
+        shards = args.shards if args.shards is not None else runtime.get("shards", 1)
+        shard_count = resolve_shard_count(shards, len(plc_configs))
     except Exception as e:
-        logger.error("Supervisor error: %s", e)
-        time.sleep(5)
+        logger.error("Supervisor config error, running a single shard: %s", e)
+
+    if shard_count > 1:
+        # Antes de lanzar los shards, para que ningun proceso escriba el spool de una laguna ajena.
+        migrated = jsonl_buffer.migrate_legacy_buffer()
+        if migrated:
+            logger.info("Migrated legacy buffer lagoons=%s", migrated)
+
+    runtime = root_cfg.get("runtime") or {}
+    supervisor = ShardSupervisor(
+        args.config,
+        shard_count,
+        health_every_sec=float(runtime.get("supervisor_health_every_sec", 30.0)),
+        health_stale_sec=float(runtime.get("health_stale_sec", 60.0)),
+        shutdown_grace_sec=float(runtime.get("shutdown_deadline_sec", 10.0)) + 5.0,
+    )
+    # SIGTERM (systemd, docker stop) sigue el mismo camino que Ctrl+C: apagado ordenado de los shards.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    logger.info("Starting collector supervisor shards=%s", shard_count)
+    logger.info("Command: %s", " ".join(shard_command(args.config, 0, shard_count)))
+    supervisor.run_forever()
+
+
+if __name__ == "__main__":
+    main()
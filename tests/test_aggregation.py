@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from queue import Queue
+from unittest import mock
+
+import main
+from common.aggregation import WINDOW_START_TAG, WindowAggregator, parse_aggregation
+from common.delivery import replay_spool, spool_payload
+from storage import jsonl_buffer
+
+T0 = datetime(2026, 4, 11, 18, 0, tzinfo=timezone.utc)
+
+
+class WindowAggregatorTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.aggregator = WindowAggregator(["PT*_R"], window_sec=60, stats=("min", "max", "avg", "last", "count"))
+
+    def test_window_statistics_are_emitted_on_the_next_window(self) -> None:
+        for second, value in enumerate([2.0, 5.0, 1.0, 4.0]):
+            raw, closed = self.aggregator.add({"PT101_R": value, "VE01_ST": True}, T0 + timedelta(seconds=second))
+            self.assertEqual(raw, {"VE01_ST": True})
+            self.assertIsNone(closed)
+
+        raw, closed = self.aggregator.add({"PT101_R": 9.0}, T0 + timedelta(seconds=60))
+        self.assertEqual(raw, {})
+        end, tags = closed
+        self.assertEqual(end, T0 + timedelta(seconds=60))
+        self.assertEqual(
+            tags,
+            {
+                "PT101_R_MIN": 1.0,
+                "PT101_R_MAX": 5.0,
+                "PT101_R_AVG": 3.0,
+                "PT101_R_LAST": 4.0,
+                "PT101_R_COUNT": 4,
+                WINDOW_START_TAG: T0.isoformat(),
+            },
+        )
+        # La muestra que abrio la ventana nueva ya cuenta en ella.
+        self.assertEqual(self.aggregator.flush()[1]["PT101_R_COUNT"], 1)
+
+    def test_missing_or_non_numeric_values_stay_raw(self) -> None:
+        raw, _ = self.aggregator.add({"PT101_R": None, "PT102_R": True, "PT103_R": 1}, T0)
+        self.assertEqual(raw, {"PT101_R": None, "PT102_R": True})
+        self.assertEqual(self.aggregator.flush()[1]["PT103_R_AVG"], 1.0)
+
+    def test_memory_is_per_tag_not_per_sample(self) -> None:
+        tags = {f"PT{index:03d}_R": float(index) for index in range(20)}
+        for second in range(3600):
+            self.aggregator.add(tags, T0 + timedelta(seconds=second % 59))
+        self.assertEqual(len(self.aggregator.names), 20)
+        self.assertEqual(len(self.aggregator._sum), 20)
+        self.assertEqual(self.aggregator.samples, 20 * 3600)
+
+    def test_parse(self) -> None:
+        self.assertIsNone(parse_aggregation(None))
+        self.assertIsNone(parse_aggregation({"window_sec": 60}))
+        parsed = parse_aggregation({"window_sec": 300, "tags": "FIT*_R", "stats": ["AVG"]})
+        self.assertEqual((parsed.window_sec, parsed.patterns, parsed.stats), (300.0, ["FIT*_R"], ("avg",)))
+        with self.assertRaises(ValueError):
+            parse_aggregation({"tags": ["PT*"], "stats": ["median"]})
+        with self.assertRaises(ValueError):
+            parse_aggregation({"tags": ["PT*"], "window_sec": 0})
+
+
+class _ScriptedReader:
+    def __init__(self, cycles: list[dict]) -> None:
+        self.cycles = list(cycles)
+
+    def read_once(self) -> dict:
+        return dict(self.cycles.pop(0))
+
+
+class _ReplaySender:
+    batch_enabled = False
+    circuit_open = False
+
+    def __init__(self) -> None:
+        self.sent: list[dict] = []
+
+    def send(self, payload: dict) -> bool:
+        self.sent.append(payload)
+        return True
+
+
+class CollectorAggregationTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        cwd = os.getcwd()
+        os.chdir(tmpdir.name)
+        self.addCleanup(tmpdir.cleanup)
+        self.addCleanup(os.chdir, cwd)
+        self.addCleanup(jsonl_buffer.close_all)
+
+        cfg = {
+            "lagoon_id": "agg",
+            "source": "simulator",
+            "timezone": "UTC",
+            "event_tags": {"VE01_ST": "Valvula 1"},
+            "runtime": {"log_every_n_cycles": 0},
+            "aggregation": {"window_sec": 60, "tags": ["PT*_R"], "stats": ["avg", "last"]},
+        }
+        self.collector = main.LagoonCollector(cfg, {})
+        self.collector.sender = object()
+        self.collector.send_queue = Queue()
+
+    def _drain(self) -> list:
+        payloads = []
+        while not self.collector.send_queue.empty():
+            payloads.append(self.collector.send_queue.get_nowait())
+        return payloads
+
+    def test_raw_values_drive_events_and_one_aggregate_per_window(self) -> None:
+        cycles = [{"PT101_R": float(second), "VE01_ST": second >= 30} for second in range(61)]
+        self.collector.reader = _ScriptedReader(cycles)
+        clock = iter(T0 + timedelta(seconds=second) for second in range(61))
+        with mock.patch.object(main, "utc_now", lambda: next(clock)):
+            for _ in cycles:
+                self.collector.run_cycle()
+
+        payloads = self._drain()
+        aggregates = [payload for payload in payloads if "PT101_R_AVG" in payload.tags]
+        self.assertEqual(len(aggregates), 1)
+        self.assertEqual(aggregates[0].timestamp, T0 + timedelta(seconds=60))
+        self.assertEqual(aggregates[0].tags, {"PT101_R_AVG": 29.5, "PT101_R_LAST": 59.0, WINDOW_START_TAG: T0.isoformat()})
+        self.assertTrue(all("PT101_R" not in payload.tags for payload in payloads))
+        events = [event for payload in payloads for event in payload.events or ()]
+        self.assertEqual([(event["type"], event["tag_id"]) for event in events], [("OPEN", "VE01_ST")])
+
+    def test_partial_window_is_shipped_on_stop(self) -> None:
+        self.collector.reader = _ScriptedReader([{"PT101_R": 3.0}])
+        with mock.patch.object(main, "utc_now", lambda: T0):
+            self.collector.run_cycle()
+        self._drain()
+        with mock.patch.object(main, "utc_now", lambda: T0 + timedelta(seconds=20)):
+            self.collector.request_stop()
+        (payload,) = self._drain()
+        self.assertEqual(payload.timestamp, T0 + timedelta(seconds=20))
+        self.assertEqual(payload.tags, {"PT101_R_AVG": 3.0, "PT101_R_LAST": 3.0, WINDOW_START_TAG: T0.isoformat()})
+
+    def test_spooled_window_survives_the_replay_age_cutoff(self) -> None:
+        cycles = [{"PT101_R": 1.0}, {"PT101_R": 2.0}]
+        self.collector.reader = _ScriptedReader(cycles)
+        clock = iter([T0 + timedelta(seconds=30), T0 + timedelta(seconds=60)])
+        with mock.patch.object(main, "utc_now", lambda: next(clock)):
+            for _ in cycles:
+                self.collector.run_cycle()
+        (aggregate,) = [payload for payload in self._drain() if "PT101_R_AVG" in payload.tags]
+        spool_payload(aggregate)
+
+        sender = _ReplaySender()
+        # 62 s despues del inicio de la ventana, 2 s despues de su cierre.
+        with mock.patch("common.delivery.utc_now", lambda: T0 + timedelta(seconds=62)):
+            sent, pending, dropped = replay_spool("agg", sender, replay_batch_size=10, max_replay_payload_age_sec=8)
+        self.assertEqual((sent, pending, dropped), (1, 0, 0))
+        self.assertEqual(sender.sent[0]["tags"]["PT101_R_AVG"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import yaml
+
+import main
+from common.config import load_plc_configs
+from common.config_watch import ConfigWatcher, diff_plc_configs
+from common.scheduler import TickScheduler
+from common.sender_engine import AsyncSenderEngine
+from storage import jsonl_buffer
+
+
+def _wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def _lagoon(lagoon_id: str, poll: float = 0.02, **extra) -> dict:
+    cfg = {
+        "lagoon_id": lagoon_id,
+        "source": "simulator",
+        "poll_seconds": poll,
+        "timezone": "UTC",
+        "simulator": {"seed": 1, "tags": {"PT101_R": {"type": "float"}}},
+    }
+    cfg.update(extra)
+    return cfg
+
+
+def _root(*lagoons: dict, **runtime) -> dict:
+    return {
+        "runtime": {"log_every_n_cycles": 0, "watchdog_stall_sec": 0, **runtime},
+        "plcs": list(lagoons),
+    }
+
+
+def _rebuilt(fleet: main.CollectorFleet, lagoon_id: str, original: main.LagoonCollector | None) -> bool:
+    # Bajo el lock de la flota: `apply()` deja collectors, plc_configs y failed juntos.
+    with fleet._lock:
+        collector = fleet.collectors.get(lagoon_id)
+        return collector is not None and collector is not original
+
+
+class _CycleRecorder:
+    """Envuelve `run_cycle` de una laguna y guarda el inicio de cada ciclo."""
+
+    def __init__(self, collector: main.LagoonCollector) -> None:
+        self.run_cycle = collector.run_cycle
+        self.starts: list[float] = []
+        collector.run_cycle = self
+
+    def __call__(self) -> None:
+        self.starts.append(time.perf_counter())
+        self.run_cycle()
+
+    def max_gap(self, since: float) -> float:
+        starts = [since] + [ts for ts in self.starts if ts >= since]
+        return max(b - a for a, b in zip(starts, starts[1:]))
+
+
+class DiffPlcConfigsTests(unittest.TestCase):
+    def test_only_touched_lagoons_are_reported(self) -> None:
+        old_root = _root(_lagoon("a"), _lagoon("b"), _lagoon("c"))
+        new_root = _root(_lagoon("a"), _lagoon("b", poll=0.5), _lagoon("d"))
+
+        diff = diff_plc_configs(old_root["plcs"], old_root, new_root["plcs"], new_root)
+        self.assertEqual(diff.unchanged, ["a"])
+        self.assertEqual([cfg["lagoon_id"] for cfg in diff.changed], ["b"])
+        self.assertEqual([cfg["lagoon_id"] for cfg in diff.added], ["d"])
+        self.assertEqual(diff.removed, ["c"])
+        self.assertEqual(diff.restart_required, [])
+
+    def test_inherited_runtime_change_touches_every_lagoon(self) -> None:
+        old_root = _root(_lagoon("a"), _lagoon("b"))
+        new_root = _root(_lagoon("a"), _lagoon("b"), send_queue_maxsize=500)
+
+        diff = diff_plc_configs(old_root["plcs"], old_root, new_root["plcs"], new_root)
+        self.assertEqual([cfg["lagoon_id"] for cfg in diff.changed], ["a", "b"])
+
+    def test_process_options_only_require_a_restart(self) -> None:
+        old_root = _root(_lagoon("a"))
+        new_root = _root(_lagoon("a"), cycle_workers=4)
+
+        diff = diff_plc_configs(old_root["plcs"], old_root, new_root["plcs"], new_root)
+        self.assertTrue(diff.empty)
+        self.assertEqual(diff.restart_required, ["cycle_workers"])
+
+
+class _ConfigDirTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        cwd = os.getcwd()
+        os.chdir(tmpdir.name)
+        self.addCleanup(tmpdir.cleanup)
+        self.addCleanup(os.chdir, cwd)
+        self.addCleanup(jsonl_buffer.close_all)
+        self.config_path = os.path.join(tmpdir.name, "collectors.yml")
+
+    def _write(self, path: str, data: dict) -> None:
+        stamp = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+        with open(path, "w", encoding="utf-8") as f:
+            yaml.safe_dump(data, f)
+        # Filesystems con mtime grueso: se garantiza que el cambio se vea.
+        os.utime(path, ns=(stamp + 1_000_000_000, stamp + 1_000_000_000))
+
+
+class ConfigWatcherTests(_ConfigDirTestCase):
+    def test_master_and_included_files_are_watched(self) -> None:
+        include_path = os.path.join(os.path.dirname(self.config_path), "lagoon_b.yml")
+        self._write(include_path, _lagoon("b"))
+        self._write(self.config_path, _root(_lagoon("a"), {"include": "lagoon_b.yml"}))
+
+        watcher = ConfigWatcher(self.config_path)
+        self.assertFalse(watcher.changed())
+
+        self._write(include_path, _lagoon("b", poll=0.5))
+        self.assertTrue(watcher.changed())
+        self.assertFalse(watcher.changed())
+
+        self._write(self.config_path, _root(_lagoon("a", poll=0.5), {"include": "lagoon_b.yml"}))
+        self.assertTrue(watcher.changed())
+
+
+class CollectorFleetReloadTests(_ConfigDirTestCase):
+    def _fleet(self, root_cfg: dict, scheduler: TickScheduler | None = None) -> main.CollectorFleet:
+        fleet = main.CollectorFleet(root_cfg["plcs"], root_cfg, scheduler=scheduler)
+        fleet.start_all(main.build_collectors(root_cfg["plcs"], root_cfg, None), jitter=False)
+
+        def _stop_all() -> None:
+            for collector in list(fleet):
+                fleet.stop(collector.lagoon_id)
+
+        self.addCleanup(_stop_all)
+        return fleet
+
+    def test_reload_touches_only_the_diff_without_gaps(self) -> None:
+        root_cfg = _root(_lagoon("a"), _lagoon("b"), _lagoon("c"))
+        fleet = self._fleet(root_cfg)
+        unchanged = fleet.collectors["a"]
+        recorder = _CycleRecorder(unchanged)
+        changed = fleet.collectors["b"]
+        removed = fleet.collectors["c"]
+        self.assertTrue(_wait_until(lambda: len(recorder.starts) >= 3 and changed.cycle_count >= 3))
+
+        since = time.perf_counter()
+        new_root = _root(_lagoon("a"), _lagoon("b", poll=0.05), _lagoon("d"))
+        with self.assertLogs("collector", level="INFO") as logs:
+            diff = fleet.apply(new_root["plcs"], new_root)
+        self.assertIn("added=d removed=c changed=b unchanged=1", "\n".join(logs.output))
+        self.assertEqual(diff.unchanged, ["a"])
+
+        self.assertIs(fleet.collectors["a"], unchanged)
+        self.assertIsNot(fleet.collectors["b"], changed)
+        self.assertEqual(fleet.collectors["b"].poll, 0.05)
+        self.assertIs(fleet.collectors["b"].tot_normalizer, changed.tot_normalizer)
+        self.assertIs(fleet.collectors["b"].tag_plan, changed.tag_plan)
+        self.assertNotIn("c", fleet.collectors)
+        self.assertTrue(changed.stopped and removed.stopped)
+
+        stopped_cycles = removed.cycle_count
+        self.assertTrue(_wait_until(lambda: len(recorder.starts) >= 10 and fleet.collectors["d"].cycle_count >= 3))
+        # A lo sumo el ciclo que ya estaba en curso al detenerla.
+        self.assertLessEqual(removed.cycle_count, stopped_cycles + 1)
+        # La laguna sin cambios siguio ciclando durante el apply: ningun hueco de varios polls.
+        self.assertLess(recorder.max_gap(since), 0.5)
+
+    def test_tick_jobs_follow_the_diff(self) -> None:
+        scheduler = TickScheduler(max_workers=2, stats_every_sec=0)
+        self.addCleanup(scheduler.stop, 1.0)
+        root_cfg = _root(_lagoon("a"), _lagoon("c"))
+        fleet = self._fleet(root_cfg, scheduler)
+        scheduler.start()
+        job = scheduler.jobs["a"]
+        self.assertTrue(_wait_until(lambda: job.runs >= 3))
+
+        new_root = _root(_lagoon("a"), _lagoon("d"))
+        with self.assertLogs("collector", level="INFO"):
+            fleet.apply(new_root["plcs"], new_root)
+        self.assertEqual(sorted(scheduler.jobs), ["a", "d"])
+        self.assertIs(scheduler.jobs["a"], job)
+        runs = job.runs
+        self.assertTrue(_wait_until(lambda: job.runs >= runs + 3 and scheduler.jobs["d"].runs >= 3))
+
+    def test_file_change_is_applied_within_the_reload_interval(self) -> None:
+        self._write(self.config_path, _root(_lagoon("a")))
+        plc_configs, root_cfg = load_plc_configs(self.config_path)
+        fleet = self._fleet(root_cfg)
+
+        stop = threading.Event()
+        self.addCleanup(stop.set)
+        main.start_config_reloader(self.config_path, fleet, 0.05, stop)
+        started = time.perf_counter()
+        with self.assertLogs("collector", level="INFO"):
+            self._write(self.config_path, _root(_lagoon("a"), _lagoon("b")))
+            self.assertTrue(_wait_until(lambda: "b" in fleet.collectors, timeout=2.0))
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(sorted(fleet.collectors), ["a", "b"])
+
+    def test_slow_stop_does_not_hold_the_fleet_lock(self) -> None:
+        root_cfg = _root(_lagoon("a"), _lagoon("c"))
+        fleet = self._fleet(root_cfg)
+        removed = fleet.collectors["c"]
+        release = threading.Event()
+        stop = removed.stop
+        removed.stop = lambda *args: (release.wait(5.0), stop(*args))[1]
+        self.addCleanup(release.set)
+
+        new_root = _root(_lagoon("a"))
+        with self.assertLogs("collector", level="INFO"):
+            reload = threading.Thread(target=fleet.apply, args=(new_root["plcs"], new_root))
+            reload.start()
+            self.assertTrue(_wait_until(lambda: "c" not in fleet.collectors, timeout=2.0))
+            # Mientras el stop de "c" sigue colgado, el health reporter y el watchdog recorren la flota.
+            started = time.perf_counter()
+            self.assertEqual([collector.lagoon_id for collector in fleet], ["a"])
+            self.assertLess(time.perf_counter() - started, 0.5)
+            release.set()
+            reload.join(5.0)
+        self.assertTrue(removed.stopped)
+
+    def test_failed_rebuild_is_retried_on_the_next_poll(self) -> None:
+        self._write(self.config_path, _root(_lagoon("a"), _lagoon("b")))
+        plc_configs, root_cfg = load_plc_configs(self.config_path)
+        fleet = self._fleet(root_cfg)
+        original = fleet.collectors["b"]
+
+        build = main.LagoonCollector
+        attempts = []
+
+        def _flaky(cfg, *args, **kwargs):
+            if cfg["lagoon_id"] == "b" and not attempts:
+                attempts.append(cfg)
+                raise RuntimeError("plc unreachable")
+            return build(cfg, *args, **kwargs)
+
+        stop = threading.Event()
+        self.addCleanup(stop.set)
+        with mock.patch.object(main, "LagoonCollector", side_effect=_flaky), self.assertLogs("collector", level="INFO") as logs:
+            main.start_config_reloader(self.config_path, fleet, 0.05, stop)
+            self._write(self.config_path, _root(_lagoon("a"), _lagoon("b", poll=0.05)))
+            self.assertTrue(_wait_until(lambda: _rebuilt(fleet, "b", original), timeout=2.0))
+        self.assertIn("action=retry_next_reload", "\n".join(logs.output))
+        self.assertEqual(len(attempts), 1)
+        self.assertEqual(fleet.collectors["b"].poll, 0.05)
+        self.assertEqual(fleet.failed, set())
+        self.assertEqual([cfg.get("poll_seconds") for cfg in fleet.plc_configs], [0.02, 0.05])
+
+    def test_lagoon_that_fails_at_startup_is_retried_by_the_reloader(self) -> None:
+        self._write(self.config_path, _root(_lagoon("a"), _lagoon("b")))
+        plc_configs, root_cfg = load_plc_configs(self.config_path)
+
+        build = main.LagoonCollector
+        attempts = []
+
+        def _flaky(cfg, *args, **kwargs):
+            if cfg["lagoon_id"] == "b" and not attempts:
+                attempts.append(cfg)
+                raise RuntimeError("plc unreachable")
+            return build(cfg, *args, **kwargs)
+
+        stop = threading.Event()
+        self.addCleanup(stop.set)
+        with mock.patch.object(main, "LagoonCollector", side_effect=_flaky), self.assertLogs("collector", level="INFO"):
+            fleet = self._fleet(root_cfg)
+            self.assertEqual(sorted(fleet.collectors), ["a"])
+            self.assertEqual(fleet.failed, {"b"})
+            # Sin cambio en el archivo: el reintento sale solo de `failed`.
+            main.start_config_reloader(self.config_path, fleet, 0.05, stop)
+            self.assertTrue(_wait_until(lambda: _rebuilt(fleet, "b", None), timeout=2.0))
+        self.assertEqual(fleet.failed, set())
+
+    def test_failed_rebuild_leaves_no_sender_behind(self) -> None:
+        patcher = mock.patch.dict("os.environ", {"COLLECTOR_API_KEY": "test-key"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        engine = AsyncSenderEngine()
+        engine.start()
+        self.addCleanup(engine.stop, 1.0)
+
+        # Config invalida despues del bloque del sender: cada reintento fallaba con un hilo mas.
+        root_cfg = _root(_lagoon("a", aggregation={"window_sec": -1, "tags": ["PT*"]}))
+        root_cfg["backend"] = {"url": "http://127.0.0.1:1/ingest/scada", "timeout_sec": 0.2}
+        for sender_engine in (None, engine):
+            with self.subTest(engine=sender_engine is not None):
+                fleet = main.CollectorFleet([], _root(), sender_engine)
+                with self.assertLogs("collector", level="INFO") as logs:
+                    for _ in range(3):
+                        fleet.apply(root_cfg["plcs"], root_cfg)
+                self.assertEqual("\n".join(logs.output).count("action=retry_next_reload"), 3)
+                self.assertEqual(fleet.failed, {"a"})
+                self.assertEqual(fleet.collectors, {})
+                self.assertEqual([t for t in threading.enumerate() if t.name == "sender-a"], [])
+                self.assertEqual(engine._lanes, {})
+
+    def test_removed_lagoon_spools_its_pending_payloads(self) -> None:
+        patcher = mock.patch.dict("os.environ", {"COLLECTOR_API_KEY": "test-key"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Puerto cerrado: ningun envio prospera, todo queda en cola, en reintento o en spool.
+        root_cfg = _root(_lagoon("a"))
+        root_cfg["backend"] = {"url": "http://127.0.0.1:1/ingest/scada", "timeout_sec": 0.2}
+        collector = main.LagoonCollector(root_cfg["plcs"][0], root_cfg)
+        fleet = main.CollectorFleet(root_cfg["plcs"], root_cfg)
+        fleet.collectors["a"] = collector
+        for _ in range(5):
+            collector.run_cycle()
+
+        new_root = dict(root_cfg, plcs=[])
+        with self.assertLogs("collector", level="INFO"):
+            fleet.apply([], new_root)
+        self.assertTrue(collector.stopped)
+        self.assertFalse(collector.sender_thread.is_alive())
+        self.assertEqual(jsonl_buffer.pending_for_lagoon("a"), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import threading
+import time
+import unittest
+
+from pycomm3.exceptions import CommError
+
+from workers.connection import (
+    STATE_BACKOFF,
+    STATE_CONNECTING,
+    STATE_DISCONNECTED,
+    ConnectionManager,
+)
+from workers.get_rockwell import RockwellSessionReader
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _FlakyConnect:
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self) -> None:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("plc offline")
+
+
+class ConnectionManagerTests(unittest.TestCase):
+    def test_failed_connects_back_off_exponentially(self) -> None:
+        clock = _Clock()
+        connect = _FlakyConnect(failures=3)
+        manager = ConnectionManager(
+            "plc-a",
+            connect,
+            backoff_base_sec=1.0,
+            backoff_max_sec=3.0,
+            jitter=0.0,
+            background=False,
+            clock=clock,
+        )
+
+        self.assertFalse(manager.ensure_connected())
+        self.assertEqual(manager.state, STATE_BACKOFF)
+        self.assertEqual(manager.retry_in(), 1.0)
+
+        # Dentro del backoff no hay intentos nuevos.
+        self.assertFalse(manager.ensure_connected())
+        self.assertEqual(connect.calls, 1)
+
+        clock.now = 1.0
+        self.assertFalse(manager.ensure_connected())
+        self.assertEqual(manager.retry_in(), 2.0)
+        clock.now = 3.0
+        self.assertFalse(manager.ensure_connected())
+        self.assertEqual(manager.retry_in(), 3.0)
+
+        clock.now = 6.0
+        self.assertTrue(manager.ensure_connected())
+        self.assertEqual(
+            (manager.attempts, manager.failures, manager.successes, manager.consecutive_failures),
+            (4, 3, 1, 0),
+        )
+
+    def test_jitter_stays_within_bounds(self) -> None:
+        manager = ConnectionManager("plc-b", lambda: None, backoff_base_sec=10.0, backoff_max_sec=60.0, jitter=0.2)
+        delays = [manager.delay_for(1) for _ in range(200)]
+        self.assertTrue(all(8.0 <= delay <= 12.0 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_background_connect_does_not_block_caller(self) -> None:
+        release = threading.Event()
+        calls: list[int] = []
+
+        def _slow_connect() -> None:
+            calls.append(1)
+            release.wait(5)
+
+        manager = ConnectionManager("plc-c", _slow_connect)
+        started = time.perf_counter()
+        self.assertFalse(manager.ensure_connected())
+        self.assertFalse(manager.ensure_connected())
+        self.assertLess(time.perf_counter() - started, 0.1)
+        self.assertEqual(manager.state, STATE_CONNECTING)
+
+        release.set()
+        self.assertTrue(manager.wait(2.0))
+        self.assertEqual(len(calls), 1)
+
+        manager.mark_disconnected("read failed")
+        self.assertEqual(manager.state, STATE_DISCONNECTED)
+        self.assertFalse(manager.ensure_connected())
+        self.assertTrue(manager.wait(2.0))
+        self.assertEqual(manager.stats()["attempts"], 2)
+
+
+class RockwellReconnectTests(unittest.TestCase):
+    def test_dead_plc_returns_immediately_and_backs_off(self) -> None:
+        opens: list[float] = []
+
+        class _DeadDriver:
+            def __init__(self, *args, **kwargs) -> None:
+                pass
+
+            def open(self) -> None:
+                opens.append(time.perf_counter())
+                time.sleep(0.3)
+                raise CommError("timeout")
+
+            def close(self) -> None:
+                pass
+
+        reader = RockwellSessionReader(
+            ip="10.0.0.99",
+            slot=0,
+            tag_map={"PT001": "PT001"},
+            reconnect_backoff_base_sec=60.0,
+            driver_factory=_DeadDriver,
+        )
+        started = time.perf_counter()
+        for _ in range(20):
+            self.assertEqual(reader.read_once(), {})
+        self.assertLess(time.perf_counter() - started, 0.2)
+
+        reader.connection.wait(2.0)
+        for _ in range(20):
+            self.assertEqual(reader.read_once(), {})
+
+        self.assertEqual(len(opens), 1)
+        self.assertEqual(reader.connection.state, STATE_BACKOFF)
+        self.assertIn("timeout", reader.connection.last_error)
+
+
+class _Result:
+    def __init__(self, tag: str, value) -> None:
+        self.tag = tag
+        self.value = value
+        self.error = None
+
+
+class _GateDriver:
+    """Driver falso: `open` espera el gate de la instancia y `read` devuelve su numero."""
+
+    instances: list["_GateDriver"] = []
+    gates: list[threading.Event] = []
+    definitions_source = "upload"
+
+    def __init__(self, *args, **kwargs) -> None:
+        self.number = len(self.instances)
+        self.closed = False
+        self.instances.append(self)
+
+    def open(self) -> None:
+        if self.number < len(self.gates):
+            self.gates[self.number].wait(2.0)
+
+    def upload_definitions(self, base_tags):
+        return None
+
+    def read(self, *tags):
+        return [_Result(tag, self.number) for tag in tags]
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class RockwellRotationTests(unittest.TestCase):
+    def setUp(self) -> None:
+        _GateDriver.instances = []
+        _GateDriver.gates = []
+
+    def _reader(self) -> RockwellSessionReader:
+        return RockwellSessionReader(
+            ip="10.0.0.98",
+            slot=0,
+            tag_map={"PT001": "PT001"},
+            driver_factory=_GateDriver,
+        )
+
+    def test_rotation_keeps_reading_while_the_new_driver_connects(self) -> None:
+        reader = self._reader()
+        self.assertEqual(reader.read_once(), {})
+        self.assertTrue(reader.connection.wait(2.0))
+        self.assertEqual(reader.read_once(), {"PT001": 0})
+
+        gate = threading.Event()
+        _GateDriver.gates = [threading.Event(), gate]
+        reader._last_connect_ts -= reader.force_reconnect_every_sec
+        # Mientras el driver nuevo conecta, el actual sigue entregando valores.
+        for _ in range(5):
+            self.assertEqual(reader.read_once(), {"PT001": 0})
+        gate.set()
+        deadline = time.monotonic() + 2.0
+        while reader._next_driver is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(reader.read_once(), {"PT001": 1})
+        self.assertTrue(_GateDriver.instances[0].closed)
+        self.assertFalse(_GateDriver.instances[1].closed)
+        self.assertEqual(len(_GateDriver.instances), 2)
+
+    def test_close_during_connect_discards_the_new_driver(self) -> None:
+        gate = threading.Event()
+        _GateDriver.gates = [gate]
+        reader = self._reader()
+        self.assertEqual(reader.read_once(), {})
+        self.assertEqual(reader.connection.state, STATE_CONNECTING)
+
+        reader.close()
+        gate.set()
+        self.assertFalse(reader.connection.wait(2.0))
+        self.assertIsNone(reader._driver)
+        self.assertTrue(_GateDriver.instances[0].closed)
+        self.assertEqual(reader.connection.state, STATE_BACKOFF)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,10 +2,14 @@ from __future__ import annotations
 
 import json
 import tempfile
+import threading
+import time
 import unittest
+from datetime import datetime, timezone
 from pathlib import Path
 
 from storage import jsonl_buffer
+from storage.segmented_spool import GroupCommitter, SegmentedSpool
 
 
 def _payload(lagoon_id: str, seq: int) -> str:
@@ -19,6 +23,17 @@ def _payload(lagoon_id: str, seq: int) -> str:
     )
 
 
+def _drain(spool: SegmentedSpool) -> list[int]:
+    seen: list[int] = []
+
+    def _send(payload: dict) -> bool:
+        seen.append(int(payload["tags"]["seq"]))
+        return True
+
+    spool.replay(_send, max_items=1_000_000)
+    return seen
+
+
 class JsonlBufferTests(unittest.TestCase):
     def test_migrate_legacy_buffer_splits_entries_by_lagoon(self) -> None:
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -47,12 +62,8 @@ class JsonlBufferTests(unittest.TestCase):
     def test_replay_for_lagoon_requeues_unsent_payloads(self) -> None:
         with tempfile.TemporaryDirectory() as tmpdir:
             spool_dir = Path(tmpdir)
-            target_path = jsonl_buffer.spool_path_for_lagoon("lagoon-a", spool_dir)
-            target_path.parent.mkdir(parents=True, exist_ok=True)
-            target_path.write_text(
-                "\n".join([_payload("lagoon-a", 1), _payload("lagoon-a", 2)]) + "\n",
-                encoding="utf-8",
-            )
+            for seq in (1, 2):
+                jsonl_buffer.append_for_lagoon("lagoon-a", _payload("lagoon-a", seq), spool_dir)
 
             seen: list[int] = []
 
@@ -71,24 +82,17 @@ class JsonlBufferTests(unittest.TestCase):
             self.assertEqual(pending, 1)
             self.assertEqual(dropped, 0)
             self.assertEqual(seen, [1, 2])
-            self.assertIn('"seq": 2', target_path.read_text(encoding="utf-8"))
+            self.assertEqual(jsonl_buffer.pending_for_lagoon("lagoon-a", spool_dir), 1)
+            self.assertEqual(
+                _drain(SegmentedSpool(jsonl_buffer.spool_dir_for_lagoon("lagoon-a", spool_dir))),
+                [2],
+            )
 
     def test_replay_for_lagoon_drops_payloads_marked_for_discard(self) -> None:
         with tempfile.TemporaryDirectory() as tmpdir:
             spool_dir = Path(tmpdir)
-            target_path = jsonl_buffer.spool_path_for_lagoon("lagoon-a", spool_dir)
-            target_path.parent.mkdir(parents=True, exist_ok=True)
-            target_path.write_text(
-                "\n".join(
-                    [
-                        _payload("lagoon-a", 1),
-                        _payload("lagoon-a", 2),
-                        _payload("lagoon-a", 3),
-                    ]
-                )
-                + "\n",
-                encoding="utf-8",
-            )
+            for seq in (1, 2, 3):
+                jsonl_buffer.append_for_lagoon("lagoon-a", _payload("lagoon-a", seq), spool_dir)
 
             def _send(payload: dict) -> str:
                 if payload["tags"]["seq"] < 3:
@@ -105,10 +109,325 @@ class JsonlBufferTests(unittest.TestCase):
             self.assertEqual(replayed, 0)
             self.assertEqual(pending, 1)
             self.assertEqual(dropped, 2)
-            spool_text = target_path.read_text(encoding="utf-8")
-            self.assertNotIn('"seq": 1', spool_text)
-            self.assertNotIn('"seq": 2', spool_text)
-            self.assertIn('"seq": 3', spool_text)
+            self.assertEqual(
+                _drain(SegmentedSpool(jsonl_buffer.spool_dir_for_lagoon("lagoon-a", spool_dir))),
+                [3],
+            )
+
+    def test_replay_imports_legacy_flat_spool_file(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool_dir = Path(tmpdir)
+            legacy_path = jsonl_buffer.spool_path_for_lagoon("lagoon-a", spool_dir)
+            legacy_path.write_text(
+                "\n".join([_payload("lagoon-a", 1), _payload("lagoon-a", 2)]) + "\n",
+                encoding="utf-8",
+            )
+
+            replayed, pending, _ = jsonl_buffer.replay_for_lagoon(
+                lagoon_id="lagoon-a",
+                send_payload=lambda payload: True,
+                max_items=10,
+                base_dir=spool_dir,
+            )
+
+            self.assertEqual((replayed, pending), (2, 0))
+            self.assertFalse(legacy_path.exists())
+
+
+class SegmentedSpoolTests(unittest.TestCase):
+    def test_replay_deletes_acknowledged_segments_and_persists_cursor(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SegmentedSpool(Path(tmpdir), segment_max_bytes=1)
+            spool.append_many(_payload("lagoon-a", seq) for seq in range(1, 6))
+            self.assertEqual(len(list(Path(tmpdir).glob("*.jsonl"))), 5)
+
+            replayed, pending, _ = spool.replay(lambda payload: True, max_items=2)
+
+            self.assertEqual((replayed, pending), (2, 3))
+            self.assertEqual(len(list(Path(tmpdir).glob("*.jsonl"))), 3)
+
+            reopened = SegmentedSpool(Path(tmpdir), segment_max_bytes=1)
+            self.assertEqual(reopened.pending_count(), 3)
+            self.assertEqual(_drain(reopened), [3, 4, 5])
+            self.assertEqual(list(Path(tmpdir).iterdir()), [])
+
+    def test_cursor_resumes_inside_segment_after_restart(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SegmentedSpool(Path(tmpdir))
+            spool.append_many(_payload("lagoon-a", seq) for seq in range(1, 4))
+            spool.replay(lambda payload: True, max_items=1)
+
+            reopened = SegmentedSpool(Path(tmpdir))
+            reopened.append(_payload("lagoon-a", 4))
+
+            self.assertEqual(reopened.pending_count(), 3)
+            self.assertEqual(_drain(reopened), [2, 3, 4])
+
+    def test_torn_tail_line_is_truncated_on_load(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SegmentedSpool(Path(tmpdir))
+            segment_path = spool.append(_payload("lagoon-a", 1))
+            with segment_path.open("ab") as handle:
+                handle.write(b'{"lagoon_id": "lagoon-a", "tags"')
+
+            reopened = SegmentedSpool(Path(tmpdir))
+            reopened.append(_payload("lagoon-a", 2))
+
+            self.assertEqual(_drain(reopened), [1, 2])
+
+
+class BatchReplayTests(unittest.TestCase):
+    def test_batch_replay_sends_payloads_in_one_call(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SegmentedSpool(Path(tmpdir), segment_max_bytes=1)
+            spool.append_many(_payload("lagoon-a", seq) for seq in range(1, 6))
+            calls: list[list[int]] = []
+
+            def _send_batch(payloads: list[dict]) -> list[bool]:
+                calls.append([int(payload["tags"]["seq"]) for payload in payloads])
+                return [True] * len(payloads)
+
+            self.assertEqual(spool.replay_batch(_send_batch, max_items=4), (4, 1, 0))
+            self.assertEqual(spool.replay_batch(_send_batch, max_items=4), (1, 0, 0))
+            self.assertEqual(calls, [[1, 2, 3, 4], [5]])
+
+    def test_batch_replay_keeps_cursor_when_whole_batch_fails(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SegmentedSpool(Path(tmpdir))
+            spool.append_many(_payload("lagoon-a", seq) for seq in range(1, 4))
+
+            result = spool.replay_batch(lambda payloads: [False] * len(payloads), max_items=10)
+
+            self.assertEqual(result, (0, 3, 0))
+            self.assertEqual(_drain(spool), [1, 2, 3])
+
+    def test_batch_replay_requeues_partial_failures_at_tail(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SegmentedSpool(Path(tmpdir))
+            spool.append_many(_payload("lagoon-a", seq) for seq in range(1, 5))
+
+            def _send_batch(payloads: list[dict]) -> list[str]:
+                return ["keep" if payload["tags"]["seq"] == 2 else "sent" for payload in payloads]
+
+            result = spool.replay_batch(_send_batch, max_items=3)
+
+            self.assertEqual(result, (2, 2, 0))
+            self.assertEqual(_drain(spool), [4, 2])
+
+    def test_batch_replay_respects_byte_cap(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SegmentedSpool(Path(tmpdir))
+            spool.append_many(_payload("lagoon-a", seq) for seq in range(1, 5))
+            line_size = len(_payload("lagoon-a", 1)) + 1
+            sizes: list[int] = []
+
+            def _send_batch(payloads: list[dict]) -> list[bool]:
+                sizes.append(len(payloads))
+                return [True] * len(payloads)
+
+            spool.replay_batch(_send_batch, max_items=10, max_bytes=line_size * 2)
+
+            self.assertEqual(sizes, [2])
+            self.assertEqual(spool.pending_count(), 2)
+
+
+class SegmentIndexTests(unittest.TestCase):
+    def _timed_payload(self, seq: int, timestamp: str) -> str:
+        return json.dumps(
+            {"lagoon_id": "lagoon-a", "timestamp": timestamp, "tags": {"seq": seq}}
+        )
+
+    def test_expired_segments_are_dropped_without_parsing(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SegmentedSpool(Path(tmpdir), segment_max_bytes=200)
+            spool.append_many(
+                self._timed_payload(seq, f"2026-04-11T18:00:{seq:02d}Z")
+                for seq in range(1, 21)
+            )
+            spool.append(self._timed_payload(21, "2026-04-11T19:00:00Z"))
+            self.assertTrue(list(Path(tmpdir).glob("*.idx")))
+
+            seen: list[int] = []
+
+            def _send(payload: dict) -> bool:
+                seen.append(int(payload["tags"]["seq"]))
+                return True
+
+            cutoff = datetime(2026, 4, 11, 18, 30, tzinfo=timezone.utc).timestamp()
+            replayed, pending, dropped = spool.replay(_send, min_timestamp=cutoff)
+
+            self.assertEqual((replayed, pending, dropped), (1, 0, 20))
+            self.assertEqual(seen, [21])
+            self.assertEqual(list(Path(tmpdir).iterdir()), [])
+
+    def test_replay_seeks_to_first_fresh_payload_inside_segment(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SegmentedSpool(Path(tmpdir))
+            spool.append_many(
+                self._timed_payload(seq, f"2026-04-11T18:00:{seq:02d}Z")
+                for seq in range(1, 6)
+            )
+            spool.append(json.dumps({"lagoon_id": "lagoon-a", "tags": {"seq": 6}}))
+
+            seen: list[int] = []
+
+            def _send(payload: dict) -> bool:
+                seen.append(int(payload["tags"]["seq"]))
+                return True
+
+            cutoff = datetime(2026, 4, 11, 18, 0, 4, tzinfo=timezone.utc).timestamp()
+            replayed, pending, dropped = spool.replay(_send, min_timestamp=cutoff)
+
+            self.assertEqual((replayed, pending, dropped), (3, 0, 3))
+            self.assertEqual(seen, [4, 5, 6])
+
+    def test_sealed_segment_index_is_rebuilt_when_sidecar_is_missing(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SegmentedSpool(Path(tmpdir), segment_max_bytes=1)
+            spool.append_many(
+                self._timed_payload(seq, f"2026-04-11T18:00:{seq:02d}Z")
+                for seq in range(1, 4)
+            )
+            for index_path in Path(tmpdir).glob("*.idx"):
+                index_path.unlink()
+
+            reopened = SegmentedSpool(Path(tmpdir), segment_max_bytes=1)
+            cutoff = datetime(2026, 4, 11, 18, 0, 3, tzinfo=timezone.utc).timestamp()
+            replayed, pending, dropped = reopened.replay(lambda payload: True, min_timestamp=cutoff)
+
+            self.assertEqual((replayed, pending, dropped), (1, 0, 2))
+
+
+class CompressedSpoolTests(unittest.TestCase):
+    def test_sealed_segments_are_compressed_and_replayed_in_streaming(self) -> None:
+        for codec, suffix in (("zlib", ".gz"), ("lzma", ".xz")):
+            with self.subTest(codec=codec), tempfile.TemporaryDirectory() as tmpdir:
+                spool = SegmentedSpool(Path(tmpdir), segment_max_bytes=300, codec=codec)
+                for seq in range(1, 9):
+                    spool.append(_payload("lagoon-a", seq))
+
+                self.assertTrue(list(Path(tmpdir).glob(f"*.jsonl{suffix}")))
+                spool.replay(lambda payload: True, max_items=3)
+
+                reopened = SegmentedSpool(Path(tmpdir), segment_max_bytes=300, codec=codec)
+                self.assertEqual(_drain(reopened), [4, 5, 6, 7, 8])
+                self.assertEqual(list(Path(tmpdir).iterdir()), [])
+
+    def test_lagoon_quota_evicts_oldest_segments_and_reports_it(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SegmentedSpool(Path(tmpdir), segment_max_bytes=1, max_bytes=300)
+            with self.assertLogs("collector", level="WARNING") as logs:
+                for seq in range(1, 9):
+                    spool.append(_payload("lagoon-a", seq))
+
+            self.assertLessEqual(spool.disk_bytes(), 300)
+            self.assertGreater(spool.evicted_payloads, 0)
+            self.assertIn("[SPOOL EVICT]", logs.output[0])
+            self.assertEqual(spool.pending_count(), 8 - spool.evicted_payloads)
+            self.assertEqual(_drain(spool)[-1], 8)
+
+    def test_total_quota_evicts_globally_oldest_segment(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manager = jsonl_buffer.SpoolManager()
+            manager.total_max_bytes = 500
+            spool_a = manager.open("lagoon-a", tmpdir, segment_max_bytes=1, codec="none")
+            spool_b = manager.open("lagoon-b", tmpdir, segment_max_bytes=1, codec="none")
+
+            with self.assertLogs("collector", level="WARNING"):
+                for seq in range(1, 4):
+                    spool_a.append(_payload("lagoon-a", seq))
+                for seq in range(1, 4):
+                    spool_b.append(_payload("lagoon-b", seq))
+
+            self.assertLessEqual(spool_a.disk_bytes() + spool_b.disk_bytes(), 500)
+            self.assertGreater(spool_a.evicted_segments, 0)
+            self.assertEqual(spool_b.evicted_segments, 0)
+            manager.close_all()
+
+
+class SpoolManagerTests(unittest.TestCase):
+    def test_each_lagoon_gets_its_own_spool_and_append_handle(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manager = jsonl_buffer.SpoolManager()
+            spool_a = manager.open("lagoon-a", tmpdir)
+            spool_b = manager.open("lagoon-b", tmpdir)
+
+            self.assertIs(manager.open("lagoon-a", tmpdir), spool_a)
+            self.assertIsNot(spool_a._lock, spool_b._lock)
+
+            spool_a.append(_payload("lagoon-a", 1))
+            handle = spool_a._handle
+            spool_a.append(_payload("lagoon-a", 2))
+            self.assertIs(spool_a._handle, handle)
+
+            manager.close_all()
+            self.assertTrue(handle.closed)
+
+    def test_slow_replay_does_not_block_appends(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manager = jsonl_buffer.SpoolManager()
+            spool_a = manager.open("lagoon-a", tmpdir)
+            spool_b = manager.open("lagoon-b", tmpdir)
+            spool_a.append(_payload("lagoon-a", 1))
+
+            entered = threading.Event()
+            release = threading.Event()
+
+            def _slow_send(payload: dict) -> bool:
+                entered.set()
+                release.wait(5)
+                return True
+
+            replay_thread = threading.Thread(target=spool_a.replay, args=(_slow_send, 1))
+            replay_thread.start()
+            try:
+                self.assertTrue(entered.wait(5))
+                spool_a.append(_payload("lagoon-a", 2))
+                spool_b.append(_payload("lagoon-b", 1))
+            finally:
+                release.set()
+                replay_thread.join()
+
+            self.assertEqual(spool_a.pending_count(), 1)
+            self.assertEqual(spool_b.pending_count(), 1)
+            manager.close_all()
+
+
+class GroupCommitTests(unittest.TestCase):
+    def test_batched_appends_are_committed_by_flusher(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            committer = GroupCommitter(interval_sec=3600)
+            spool = SegmentedSpool(Path(tmpdir), committer=committer, commit_max_batch=3)
+            committer.register(spool)
+
+            for seq in (1, 2):
+                spool.append(_payload("lagoon-a", seq))
+
+            self.assertEqual(list(Path(tmpdir).glob("*.jsonl")), [])
+            self.assertEqual(spool.pending_count(), 2)
+
+            committer.start()
+            try:
+                spool.append(_payload("lagoon-a", 3))
+                deadline = time.monotonic() + 5
+                while not list(Path(tmpdir).glob("*.jsonl")) and time.monotonic() < deadline:
+                    time.sleep(0.01)
+            finally:
+                committer.stop()
+
+            reopened = SegmentedSpool(Path(tmpdir))
+            self.assertEqual(_drain(reopened), [1, 2, 3])
+
+    def test_replay_commits_pending_batch_first(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SegmentedSpool(
+                Path(tmpdir),
+                committer=GroupCommitter(interval_sec=3600),
+            )
+            spool.append(_payload("lagoon-a", 1))
+
+            self.assertEqual(_drain(spool), [1])
+            self.assertEqual(spool.pending_count(), 0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from common.delivery import replay_spool, spool_payload
+from common.payload import CyclePayload, NormalizedPayload
+from common.sender import BackendSender
+from storage import jsonl_buffer
+
+TS = datetime(2026, 4, 11, 18, 0, tzinfo=timezone.utc)
+EVENTS = [{"type": "OPEN", "lagoon_id": "L1", "tag_id": "VE01_ST", "state": 1, "ts": TS.isoformat()}]
+
+
+def _cycle(**kwargs) -> CyclePayload:
+    return CyclePayload("L1", kwargs.pop("product_type", "crystal"), "rockwell", TS, {"PT101_R": 1.5, "VE01_ST": True}, EVENTS, **kwargs)
+
+
+class CyclePayloadTests(unittest.TestCase):
+    def test_body_matches_the_sender_body_for_the_pydantic_model(self) -> None:
+        for send_events in (False, True):
+            for product_type in ("crystal", None):
+                with self.subTest(send_events=send_events, product_type=product_type):
+                    sender = BackendSender(url="http://127.0.0.1:1/ingest/scada", send_events=send_events)
+                    self.addCleanup(sender.close)
+                    model = NormalizedPayload.model_construct(
+                        lagoon_id="L1",
+                        product_type=product_type,
+                        source="rockwell",
+                        timestamp=TS,
+                        tags={"PT101_R": 1.5, "VE01_ST": True},
+                        events=EVENTS,
+                    )
+                    payload = _cycle(product_type=product_type, send_events=send_events)
+                    self.assertEqual(json.loads(payload.encode()), sender._build_body(model))
+
+    def test_encode_is_cached_and_has_no_instance_dict(self) -> None:
+        payload = _cycle()
+        self.assertIs(payload.encode(), payload.encode())
+        self.assertFalse(hasattr(payload, "__dict__"))
+
+    def test_non_finite_values_are_encoded_as_null(self) -> None:
+        payload = CyclePayload("L1", None, "siemens", TS, {"PT101_R": math.nan, "FIT_R": math.inf, "LT_R": 2.0})
+        self.assertEqual(json.loads(payload.encode())["tags"], {"PT101_R": None, "FIT_R": None, "LT_R": 2.0})
+
+    def test_non_json_native_tags_are_encoded(self) -> None:
+        tags = {"LAST_CIP": TS, "BATCH_ID": b"LOTE-07", "RAW": bytearray(b"\xff"), "LT_R": math.nan}
+        payload = CyclePayload("L1", None, "siemens", TS, tags)
+        self.assertEqual(
+            json.loads(payload.encode())["tags"],
+            {"LAST_CIP": TS.isoformat(), "BATCH_ID": "LOTE-07", "RAW": "\ufffd", "LT_R": None},
+        )
+
+
+class _RecordingSender:
+    batch_enabled = False
+    circuit_open = False
+
+    def __init__(self) -> None:
+        self.sent: list = []
+
+    def send(self, payload) -> bool:
+        self.sent.append(payload)
+        return True
+
+
+class SpoolLineTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        cwd = os.getcwd()
+        os.chdir(tmpdir.name)
+        self.addCleanup(tmpdir.cleanup)
+        self.addCleanup(os.chdir, cwd)
+        self.addCleanup(jsonl_buffer.close_all)
+
+    def test_spool_line_is_the_http_body_and_replays(self) -> None:
+        payload = _cycle(send_events=True)
+        spool_payload(payload)
+
+        (segment,) = jsonl_buffer.spool_dir_for_lagoon("L1").glob("*.jsonl")
+        self.assertEqual(segment.read_bytes(), payload.encode() + b"\n")
+
+        sender = _RecordingSender()
+        self.assertEqual(replay_spool("L1", sender, 10, 0), (1, 0, 0))
+        self.assertEqual(sender.sent, [payload.body()])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from queue import Queue
+
+import main
+from common.report_by_exception import Deadband, ReportByException, parse_report_by_exception
+from storage import jsonl_buffer
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ReportByExceptionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock = _Clock()
+        self.filter = ReportByException(
+            [Deadband("PT*_R", absolute=0.5), Deadband("FIT*_R", percent=10.0)],
+            snapshot_every_sec=60.0,
+            clock=self.clock,
+        )
+
+    def test_first_cycle_is_a_full_snapshot(self) -> None:
+        tags = {"PT101_R": 1.0, "VE01_ST": True}
+        self.assertIs(self.filter.filter(tags), tags)
+        self.assertEqual(self.filter.filter(dict(tags)), {})
+
+    def test_absolute_and_percent_deadbands(self) -> None:
+        self.filter.filter({"PT101_R": 10.0, "FIT101_R": 50.0, "LT101_R": 1.0})
+        self.assertEqual(self.filter.filter({"PT101_R": 10.4, "FIT101_R": 54.0, "LT101_R": 1.0}), {})
+        self.assertEqual(
+            self.filter.filter({"PT101_R": 10.6, "FIT101_R": 56.0, "LT101_R": 1.01}),
+            {"PT101_R": 10.6, "FIT101_R": 56.0, "LT101_R": 1.01},
+        )
+
+    def test_slow_drift_is_measured_against_the_last_reported_value(self) -> None:
+        self.filter.filter({"PT101_R": 10.0})
+        reported = [self.filter.filter({"PT101_R": 10.0 + step * 0.2}) for step in range(1, 5)]
+        self.assertEqual(reported, [{}, {}, {"PT101_R": 10.6}, {}])
+
+    def test_discrete_values_report_any_change(self) -> None:
+        self.filter.filter({"VE01_ST": False, "P01_ST": 1, "MODE": "auto", "AI": None})
+        self.assertEqual(
+            self.filter.filter({"VE01_ST": True, "P01_ST": 1, "MODE": "manual", "AI": 0.0}),
+            {"VE01_ST": True, "MODE": "manual", "AI": 0.0},
+        )
+
+    def test_forced_snapshot_every_interval(self) -> None:
+        tags = {"PT101_R": 10.0, "VE01_ST": False}
+        self.filter.filter(tags)
+        self.clock.now = 59.0
+        self.assertEqual(self.filter.filter(dict(tags)), {})
+        self.clock.now = 60.0
+        self.assertEqual(self.filter.filter(dict(tags)), tags)
+        self.assertEqual(self.filter.snapshots, 2)
+        self.assertEqual((self.filter.tags_in, self.filter.tags_out), (6, 4))
+
+    def test_parse(self) -> None:
+        self.assertIsNone(parse_report_by_exception(None))
+        self.assertIsNone(parse_report_by_exception({"enabled": False, "deadbands": {"PT*": 1}}))
+        parsed = parse_report_by_exception({"snapshot_every_sec": 30, "deadbands": {"PT*": 0.2, "FIT*": {"pct": 2}}})
+        self.assertEqual(parsed.snapshot_every_sec, 30.0)
+        self.assertEqual(
+            [(band.pattern, band.absolute, band.percent) for band in parsed.deadbands],
+            [("PT*", 0.2, 0.0), ("FIT*", 0.0, 2.0)],
+        )
+        with self.assertRaises(ValueError):
+            parse_report_by_exception({"deadbands": {"PT*": {"abs": -1}}})
+
+
+class _ScriptedReader:
+    def __init__(self, cycles: list[dict]) -> None:
+        self.cycles = list(cycles)
+
+    def read_once(self) -> dict:
+        return dict(self.cycles.pop(0))
+
+
+class CollectorReportByExceptionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        cwd = os.getcwd()
+        os.chdir(tmpdir.name)
+        self.addCleanup(tmpdir.cleanup)
+        self.addCleanup(os.chdir, cwd)
+        self.addCleanup(jsonl_buffer.close_all)
+
+        cfg = {
+            "lagoon_id": "rbe",
+            "source": "simulator",
+            "timezone": "UTC",
+            "event_tags": {"VE01_ST": "Valvula 1"},
+            "runtime": {"log_every_n_cycles": 0},
+            "report_by_exception": {"deadbands": {"PT*_R": 0.5, main.TOT_TAG: 100}},
+        }
+        self.collector = main.LagoonCollector(cfg, {})
+        self.collector.sender = object()
+        self.collector.send_queue = Queue()
+
+    def _run(self, cycles: list[dict]) -> list:
+        self.collector.reader = _ScriptedReader(cycles)
+        for _ in cycles:
+            self.collector.run_cycle()
+        payloads = []
+        while not self.collector.send_queue.empty():
+            payloads.append(self.collector.send_queue.get_nowait())
+        return payloads
+
+    def test_unchanged_cycles_send_nothing_but_volume_and_events_always_go(self) -> None:
+        tot = main.TOT_TAG
+        payloads = self._run(
+            [
+                {"PT101_R": 1.0, "VE01_ST": False, tot: 10.0},
+                {"PT101_R": 1.1, "VE01_ST": False, tot: 10.0},
+                {"PT101_R": 1.2, "VE01_ST": False, tot: 10.5},
+                {"PT101_R": 1.2, "VE01_ST": True, tot: 10.5},
+            ]
+        )
+        self.assertEqual(len(payloads), 3)
+        self.assertEqual(len(payloads[0].tags), 4)
+        # El TOT queda dentro de su deadband, pero el delta no se pierde.
+        self.assertEqual(payloads[1].tags, {main.DELTA_TAG: 0.5})
+        self.assertEqual(payloads[2].tags, {"VE01_ST": True})
+        self.assertEqual([event["type"] for event in payloads[2].events], ["OPEN"])
+
+
+if __name__ == "__main__":
+    unittest.main()
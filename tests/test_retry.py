@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timezone
+from queue import Queue
+
+from common.delivery import SenderWorker
+from common.payload import NormalizedPayload
+from common.retry import RetryScheduler
+from storage import jsonl_buffer
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def _payload(seq: int) -> NormalizedPayload:
+    return NormalizedPayload(
+        lagoon_id="retry-lagoon",
+        source="simulator",
+        timestamp=datetime(2026, 4, 11, 18, 0, tzinfo=timezone.utc),
+        tags={"seq": seq},
+    )
+
+
+class _FlakySender:
+    batch_enabled = False
+    batch_max_items = 1
+    circuit_open = False
+
+    def __init__(self, failures: dict[int, int]) -> None:
+        self.failures = dict(failures)
+        self.attempts: list[int] = []
+        self.delivered: list[int] = []
+
+    def send(self, payload: NormalizedPayload) -> bool:
+        seq = int(payload.tags["seq"])
+        self.attempts.append(seq)
+        if self.failures.get(seq, 0) > 0:
+            self.failures[seq] -= 1
+            return False
+        self.delivered.append(seq)
+        return True
+
+
+class RetrySchedulerTests(unittest.TestCase):
+    def test_entries_become_due_after_exponential_backoff(self) -> None:
+        clock = _FakeClock()
+        scheduler = RetryScheduler(3, 1.0, 3.0, clock=clock)
+
+        self.assertTrue(scheduler.schedule("a", 1))
+        self.assertTrue(scheduler.schedule("b", 2))
+        self.assertTrue(scheduler.schedule("c", 3))
+
+        self.assertEqual(scheduler.pop_due(), [])
+        self.assertEqual(scheduler.next_delay(), 1.0)
+        clock.advance(2.0)
+        self.assertEqual([entry.payload for entry in scheduler.pop_due()], ["a", "b"])
+        clock.advance(1.0)
+        self.assertEqual([(entry.payload, entry.attempts) for entry in scheduler.pop_due()], [("c", 3)])
+        self.assertIsNone(scheduler.next_delay())
+
+    def test_exhausted_and_overflow_payloads_are_returned_for_spool(self) -> None:
+        scheduler = RetryScheduler(1, 0.5, 0.5, clock=_FakeClock(), max_pending=1)
+
+        exhausted = scheduler.reschedule_failed(["a", "b", "c"], [0, 0, 1], [False, False, True])
+
+        self.assertEqual(exhausted, ["b"])
+        self.assertEqual(len(scheduler), 1)
+        self.assertFalse(scheduler.schedule("d", 2))
+
+    def test_drain_from_another_thread_neither_loses_nor_duplicates(self) -> None:
+        # Stop con plazo vencido: se drena desde otra hebra mientras el sender sigue agendando y tomando vencidos.
+        scheduler = RetryScheduler(1, 0.0, 0.0)
+        total = 20000
+        popped: list[int] = []
+
+        def _sender() -> None:
+            for seq in range(total):
+                scheduler.schedule(seq, 1)
+                if seq % 7 == 0:
+                    popped.extend(entry.payload for entry in scheduler.pop_due(2))
+
+        thread = threading.Thread(target=_sender)
+        thread.start()
+        drained: list[int] = []
+        while thread.is_alive():
+            drained.extend(scheduler.drain())
+        thread.join()
+        drained.extend(scheduler.drain())
+
+        self.assertEqual(sorted(drained + popped), list(range(total)))
+
+
+class SenderWorkerRetryTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        previous_cwd = os.getcwd()
+        os.chdir(tmpdir.name)
+        self.addCleanup(os.chdir, previous_cwd)
+        self.addCleanup(jsonl_buffer.close_all)
+        self.clock = _FakeClock()
+
+    def _worker(self, sender: _FlakySender, send_queue: Queue, retry_attempts: int) -> SenderWorker:
+        return SenderWorker(
+            "retry-lagoon",
+            sender,
+            send_queue,
+            True,
+            0,
+            10,
+            0,
+            retry_attempts,
+            2.0,
+            8.0,
+            clock=self.clock,
+            idle_wait_sec=0.0,
+        )
+
+    def test_failing_payload_does_not_block_fresh_payloads(self) -> None:
+        sender = _FlakySender({0: 1})
+        send_queue: Queue = Queue(maxsize=3)
+        worker = self._worker(sender, send_queue, retry_attempts=2)
+
+        send_queue.put(_payload(0))
+        worker.run_once()
+        # Durante el backoff de 2s la cola en vivo se sigue drenando.
+        for seq in (1, 2, 3):
+            send_queue.put_nowait(_payload(seq))
+            worker.run_once()
+
+        self.assertEqual(sender.delivered, [1, 2, 3])
+        self.assertEqual(len(worker.retries), 1)
+
+        self.clock.advance(2.0)
+        worker.run_once()
+
+        self.assertEqual(sender.delivered, [1, 2, 3, 0])
+        self.assertEqual(len(worker.retries), 0)
+
+    def test_payload_spools_after_retry_attempts_are_exhausted(self) -> None:
+        sender = _FlakySender({5: 10})
+        send_queue: Queue = Queue(maxsize=3)
+        worker = self._worker(sender, send_queue, retry_attempts=2)
+
+        send_queue.put(_payload(5))
+        worker.run_once()
+        self.clock.advance(2.0)
+        worker.run_once()
+        self.clock.advance(3.9)
+        worker.run_once()
+        self.assertEqual(sender.attempts, [5, 5])
+        self.clock.advance(0.1)
+        worker.run_once()
+
+        self.assertEqual(sender.attempts, [5, 5, 5])
+        self.assertEqual((worker.sent, worker.failed), (0, 1))
+        self.assertEqual(jsonl_buffer.pending_for_lagoon("retry-lagoon"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
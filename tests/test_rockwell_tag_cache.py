@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import struct
+import tempfile
+import unittest
+
+from pycomm3 import LogixDriver, Tag
+
+from workers.get_rockwell import RockwellSessionReader
+from workers.rockwell_tag_cache import CachedLogixDriver, TagDefinitionCache, base_tag
+
+PUMP_TEMPLATE_ID = 0x123
+DINT_CODE = 0xC4
+REAL_CODE = 0xCA
+
+
+def _raw_tag(instance_id: int, name: str, symbol_type: int) -> dict:
+    return {
+        "instance_id": instance_id,
+        "tag_name": name,
+        "symbol_type": symbol_type,
+        "symbol_address": 0,
+        "symbol_object_address": 0,
+        "software_control": 0x20000000,
+        "external_access": "Read/Write",
+        "dimensions": [0, 0, 0],
+    }
+
+
+class _SimulatedPLC(LogixDriver):
+    """Stand-in de red: responde el upload con un tag list fijo y cuenta los requests."""
+
+    uploads = 0
+    template_reads = 0
+    signature_name = "Main"
+    read_error: str | None = None
+
+    def open(self) -> bool:
+        self._target_is_connected = True
+        self._info = {
+            "product_code": 96,
+            "serial": "00c0ffee",
+            "revision": {"major": 33, "minor": 11},
+            "name": self.signature_name,
+        }
+        return True
+
+    def close(self) -> None:
+        pass
+
+    def _get_instance_attribute_list_service(self, program=None):
+        _SimulatedPLC.uploads += 1
+        tags = [_raw_tag(index, f"Filler_{index:04d}", DINT_CODE) for index in range(1, 200)]
+        tags.append(_raw_tag(500, "PT001", REAL_CODE))
+        tags.append(_raw_tag(501, "Pump1", 0x8000 | PUMP_TEMPLATE_ID))
+        return tags
+
+    def _get_structure_makeup(self, instance_id):
+        if instance_id not in self._cache["id:struct"]:
+            self._cache["id:struct"][instance_id] = {
+                "object_definition_size": 10,
+                "structure_size": 8,
+                "member_count": 2,
+                "structure_handle": 0xBEEF,
+            }
+        return self._cache["id:struct"][instance_id]
+
+    def _read_template(self, instance_id, object_definition_size):
+        _SimulatedPLC.template_reads += 1
+        members = struct.pack("<HHI", 0, DINT_CODE, 0) + struct.pack("<HHI", 0, REAL_CODE, 4)
+        return members + b"Pump;n\x00Speed\x00Flow\x00"
+
+    def read(self, *tags):
+        results = []
+        for tag in tags:
+            info = self._tags.get(base_tag(tag))
+            if info is None or self.read_error:
+                results.append(Tag(tag, None, None, self.read_error or "Tag doesn't exist"))
+            else:
+                results.append(Tag(tag, 1.5, info["data_type_name"], None))
+        return results
+
+
+class _SimulatedDriver(CachedLogixDriver, _SimulatedPLC):
+    pass
+
+
+class RockwellTagCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.cache = TagDefinitionCache(tmpdir.name)
+        _SimulatedPLC.uploads = 0
+        _SimulatedPLC.template_reads = 0
+        _SimulatedPLC.signature_name = "Main"
+        _SimulatedPLC.read_error = None
+
+    def _reader(self) -> RockwellSessionReader:
+        return RockwellSessionReader(
+            ip="10.0.0.5",
+            slot=0,
+            tag_map={"PT001": "PT001", "PUMP_SPEED": "Pump1.Speed"},
+            background_connect=False,
+            tag_cache=self.cache,
+            driver_factory=_SimulatedDriver,
+        )
+
+    def test_reconnect_reuses_cached_definitions(self) -> None:
+        cold = self._reader()
+        self.assertEqual(cold.read_once(), {"PT001": 1.5, "PUMP_SPEED": 1.5})
+        self.assertEqual(cold._driver.definitions_source, "upload")
+
+        warm = self._reader()
+        self.assertEqual(warm.read_once(), {"PT001": 1.5, "PUMP_SPEED": 1.5})
+        self.assertEqual(warm._driver.definitions_source, "cache")
+        self.assertEqual((_SimulatedPLC.uploads, _SimulatedPLC.template_reads), (1, 1))
+
+        pump = warm._driver.tags["Pump1"]
+        self.assertEqual(pump["data_type"]["name"], "Pump")
+        self.assertEqual(pump["data_type"]["attributes"], ["Speed", "Flow"])
+        self.assertEqual(set(warm._driver.tags), {"PT001", "Pump1"})
+        self.assertFalse(warm._driver._cfg["use_instance_ids"])
+
+    def test_signature_change_forces_upload(self) -> None:
+        self._reader().read_once()
+        _SimulatedPLC.signature_name = "MainV2"
+        reader = self._reader()
+        reader.read_once()
+        self.assertEqual(reader._driver.definitions_source, "upload")
+        self.assertEqual(_SimulatedPLC.uploads, 2)
+
+    def test_read_error_with_cached_definitions_invalidates_cache(self) -> None:
+        self._reader().read_once()
+        reader = self._reader()
+        _SimulatedPLC.read_error = "Failed to parse reply - unpack requires a buffer of 4 bytes"
+
+        self.assertEqual(reader.read_once(), {"PT001": None, "PUMP_SPEED": None})
+        self.assertFalse(self.cache.path_for("rockwell_10.0.0.5_0").exists())
+        self.assertFalse(reader.connection.connected)
+
+        _SimulatedPLC.read_error = None
+        self.assertEqual(reader.read_once(), {"PT001": 1.5, "PUMP_SPEED": 1.5})
+        self.assertEqual(reader._driver.definitions_source, "upload")
+
+    def test_read_tags_reads_only_the_requested_subset(self) -> None:
+        reader = self._reader()
+        self.assertEqual(reader.read_tags(("PUMP_SPEED",)), {"PUMP_SPEED": 1.5})
+        self.assertEqual(reader.tag_ids, ["PT001", "PUMP_SPEED"])
+
+    def test_base_tag_matches_pycomm3_request_parsing(self) -> None:
+        self.assertEqual(base_tag("Pump1.Speed"), "Pump1")
+        self.assertEqual(base_tag("Values[3]"), "Values")
+        self.assertEqual(base_tag("Program:Main.Level.PV"), "Program:Main.Level")
+        self.assertEqual(base_tag("Bits{4}"), "Bits")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import unittest
+
+from workers.get_simulator import SimulatedTagReader
+from workers.scan_classes import ScanClassReader, parse_scan_classes
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _CountingReader(SimulatedTagReader):
+    def __init__(self, tag_specs: dict) -> None:
+        super().__init__(tag_specs, seed=7)
+        self.requests: list[tuple[str, ...]] = []
+        self.fail = False
+
+    def read_tags(self, tag_ids: tuple[str, ...]) -> dict:
+        self.requests.append(tag_ids)
+        if self.fail:
+            return {}
+        return super().read_tags(tag_ids)
+
+
+TAG_SPECS = {
+    "PT101_R": {"type": "float"},
+    "PT102_R": {"type": "float"},
+    "TE100_R": {"type": "float"},
+    "WM01_TOT": {"type": "int", "min": 0, "max": 10},
+    "P100_ST": {"type": "state"},
+}
+
+SCAN_CLASSES = {
+    "slow": {"interval_sec": 60, "tags": ["TE*", "WM01_TOT"]},
+    "medium": {"interval_sec": 10, "tags": "*_ST"},
+}
+
+
+class ScanClassTests(unittest.TestCase):
+    def _reader(self) -> tuple[ScanClassReader, _CountingReader, _Clock]:
+        clock = _Clock()
+        inner = _CountingReader(TAG_SPECS)
+        reader = ScanClassReader(inner, parse_scan_classes(SCAN_CLASSES, 1.0), 1.0, clock=clock)
+        return reader, inner, clock
+
+    def test_parse_assigns_first_matching_class_and_clamps_interval(self) -> None:
+        classes = parse_scan_classes({"fast": {"interval_sec": 0.2, "tags": ["PT*"]}}, 1.0)
+        self.assertEqual(classes[0].interval_sec, 1.0)
+        with self.assertRaises(ValueError):
+            parse_scan_classes({"bad": {"interval_sec": 0, "tags": ["PT*"]}}, 1.0)
+
+        reader, _, _ = self._reader()
+        self.assertEqual(
+            {scan_class.name: scan_class.tag_ids for scan_class in reader.classes},
+            {
+                "base": ("PT101_R", "PT102_R"),
+                "slow": ("TE100_R", "WM01_TOT"),
+                "medium": ("P100_ST",),
+            },
+        )
+
+    def test_each_tick_reads_due_classes_in_one_batch(self) -> None:
+        reader, inner, clock = self._reader()
+        for _ in range(120):
+            values = reader.read_once()
+            self.assertEqual(set(values), set(TAG_SPECS))
+            clock.now += 1.0
+
+        self.assertEqual(len(inner.requests), 120)
+        reads_per_tag = {tag_id: sum(tag_id in ids for ids in inner.requests) for tag_id in TAG_SPECS}
+        self.assertEqual(reads_per_tag, {"PT101_R": 120, "PT102_R": 120, "TE100_R": 2, "WM01_TOT": 2, "P100_ST": 12})
+        self.assertEqual(inner.requests[0], ("PT101_R", "PT102_R", "TE100_R", "WM01_TOT", "P100_ST"))
+        self.assertEqual(inner.requests[1], ("PT101_R", "PT102_R"))
+
+    def test_tags_not_due_carry_latest_known_value(self) -> None:
+        reader, _, clock = self._reader()
+        first = reader.read_once()
+        clock.now += 1.0
+        second = reader.read_once()
+        self.assertEqual(second["TE100_R"], first["TE100_R"])
+        self.assertEqual(second["WM01_TOT"], first["WM01_TOT"])
+
+    def test_failed_read_keeps_classes_due(self) -> None:
+        reader, inner, clock = self._reader()
+        inner.fail = True
+        self.assertEqual(reader.read_once(), {})
+        inner.fail = False
+        clock.now += 1.0
+        reader.read_once()
+        self.assertEqual(len(inner.requests[1]), len(TAG_SPECS))
+
+    def test_loop_jitter_does_not_skip_a_class_to_the_next_tick(self) -> None:
+        reader, inner, clock = self._reader()
+        reader.read_once()
+        clock.now += 9.8
+        reader.read_once()
+        self.assertIn("P100_ST", inner.requests[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import main
+from common.scheduler import OVERRUN_COALESCE, OVERRUN_SKIP, TickScheduler
+from storage import jsonl_buffer
+
+
+def _wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class _SlowJob:
+    def __init__(self, duration_sec: float) -> None:
+        self.duration_sec = duration_sec
+        self.active = 0
+        self.max_active = 0
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self) -> None:
+        with self.lock:
+            self.active += 1
+            self.calls += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.duration_sec)
+        with self.lock:
+            self.active -= 1
+
+
+class TickSchedulerTests(unittest.TestCase):
+    def _scheduler(self, **kwargs) -> TickScheduler:
+        scheduler = TickScheduler(stats_every_sec=0, **kwargs)
+        self.addCleanup(scheduler.stop, 1.0)
+        return scheduler
+
+    def test_many_jobs_share_a_bounded_pool(self) -> None:
+        scheduler = self._scheduler(max_workers=3)
+        counts = [0] * 40
+        threads: set[str] = set()
+        lock = threading.Lock()
+
+        def _job(index: int) -> None:
+            with lock:
+                counts[index] += 1
+                threads.add(threading.current_thread().name)
+
+        for index in range(40):
+            scheduler.add(f"lagoon-{index}", 0.05, lambda index=index: _job(index))
+        scheduler.start()
+
+        self.assertTrue(_wait_until(lambda: min(counts) >= 3))
+        self.assertLessEqual(len(threads), 3)
+        self.assertEqual(scheduler.stats()["jobs"], 40)
+
+    def test_phases_are_spread_across_the_interval(self) -> None:
+        now = [100.0]
+        scheduler = self._scheduler(clock=lambda: now[0])
+        jobs = [scheduler.add(f"lagoon-{index}", 1.0, lambda: None) for index in range(20)]
+
+        offsets = sorted(job.due - 100.0 for job in jobs)
+        self.assertEqual(len(set(offsets)), 20)
+        self.assertGreaterEqual(offsets[0], 0.0)
+        self.assertLess(offsets[-1], 1.0)
+        self.assertLess(max(b - a for a, b in zip(offsets, offsets[1:])), 0.15)
+
+        pinned = scheduler.add("pinned", 1.0, lambda: None, phase_sec=0.0)
+        self.assertEqual(pinned.due, 100.0)
+
+    def test_skip_policy_never_overlaps_a_slow_job(self) -> None:
+        scheduler = self._scheduler(max_workers=4, overrun_policy=OVERRUN_SKIP)
+        slow = _SlowJob(0.12)
+        job = scheduler.add("slow", 0.05, slow, phase_sec=0.0)
+        scheduler.start()
+
+        self.assertTrue(_wait_until(lambda: job.runs >= 3))
+        self.assertEqual(slow.max_active, 1)
+        self.assertGreater(job.overruns, 0)
+        self.assertGreater(job.skipped, 0)
+        self.assertEqual(job.coalesced, 0)
+
+    def test_coalesce_policy_runs_once_more_right_after_an_overrun(self) -> None:
+        scheduler = self._scheduler(max_workers=4, overrun_policy=OVERRUN_COALESCE)
+        slow = _SlowJob(0.12)
+        job = scheduler.add("slow", 0.05, slow, phase_sec=0.0)
+        scheduler.start()
+
+        self.assertTrue(_wait_until(lambda: job.runs >= 4))
+        self.assertEqual(slow.max_active, 1)
+        self.assertGreater(job.overruns, 0)
+        self.assertGreater(job.coalesced, 0)
+
+    def test_failing_job_keeps_its_schedule(self) -> None:
+        scheduler = self._scheduler(max_workers=1)
+        calls = []
+
+        def _boom() -> None:
+            calls.append(1)
+            raise RuntimeError("plc timeout")
+
+        job = scheduler.add("broken", 0.02, _boom, phase_sec=0.0)
+        with self.assertLogs("collector", level="ERROR"):
+            scheduler.start()
+            self.assertTrue(_wait_until(lambda: len(calls) >= 3))
+        self.assertIn("plc timeout", job.last_error)
+
+    def test_removed_job_stops_running(self) -> None:
+        scheduler = self._scheduler(max_workers=2)
+        calls = []
+        scheduler.add("gone", 0.02, lambda: calls.append(1), phase_sec=0.0)
+        scheduler.start()
+        self.assertTrue(_wait_until(lambda: len(calls) >= 2))
+
+        scheduler.remove("gone")
+        time.sleep(0.05)
+        seen = len(calls)
+        time.sleep(0.1)
+        self.assertEqual(len(calls), seen)
+
+
+class TickSchedulerCollectorTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        cwd = os.getcwd()
+        os.chdir(tmpdir.name)
+        self.addCleanup(tmpdir.cleanup)
+        self.addCleanup(os.chdir, cwd)
+        self.addCleanup(jsonl_buffer.close_all)
+
+    def test_simulated_lagoons_run_on_the_tick_scheduler(self) -> None:
+        root_cfg = {"runtime": {"cycle_workers": 2, "cycle_stats_every_sec": 0}}
+        plc_configs = [
+            {
+                "lagoon_id": f"sim_{index}",
+                "source": "simulator",
+                "poll_seconds": 0.05,
+                "timezone": "UTC",
+                "simulator": {"seed": index, "tags": {"PT101_R": {"type": "float"}}},
+            }
+            for index in range(5)
+        ]
+        plc_configs.append({"lagoon_id": "broken", "source": "simulator", "poll_seconds": 0.05})
+
+        with self.assertLogs("collector", level="ERROR"):
+            collectors = main.build_collectors(plc_configs, root_cfg)
+        scheduler = main.run_tick_scheduler(collectors, root_cfg)
+        self.addCleanup(scheduler.stop, 1.0)
+
+        self.assertEqual(sorted(scheduler.jobs), [f"sim_{index}" for index in range(5)])
+        self.assertEqual(scheduler.max_workers, 2)
+        self.assertTrue(_wait_until(lambda: all(job.runs >= 2 for job in scheduler.jobs.values())))
+
+
+if __name__ == "__main__":
+    unittest.main()
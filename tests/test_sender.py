@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from queue import Queue
+from unittest import mock
+
+from common.delivery import SenderWorker, replay_spool
+from common.payload import CyclePayload, NormalizedPayload
+from common.sender import BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN, BackendSender, CircuitBreaker
+from storage import jsonl_buffer
+from storage.segmented_spool import SegmentedSpool
+
+
+class _IngestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", "0"))
+        raw = self.rfile.read(length)
+        body = json.loads(raw)
+        server: _IngestServer = self.server  # type: ignore[assignment]
+
+        with server.stats_lock:
+            server.bodies.append(raw)
+            server.requests += 1
+            server.payloads += len(body) if isinstance(body, list) else 1
+
+        if self.path.endswith("/down"):
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.path == "/ingest/scada/batch":
+            results = [{"ok": not item["tags"].get("fail", False)} for item in body]
+            response = json.dumps({"results": results}).encode("utf-8")
+        else:
+            response = b"{}"
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class _IngestServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _IngestHandler)
+        self.stats_lock = threading.Lock()
+        self.requests = 0
+        self.payloads = 0
+        self.bodies: list[bytes] = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/ingest/scada"
+
+
+def _payload(seq: int, fail: bool = False) -> dict:
+    tags: dict = {"seq": seq, "PT_101": 1.5 * seq}
+    if fail:
+        tags["fail"] = True
+    return {
+        "lagoon_id": "lagoon-a",
+        "source": "rockwell",
+        "timestamp": "2026-04-11T18:00:00+00:00",
+        "tags": tags,
+    }
+
+
+class BackendSenderBatchTests(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch.dict("os.environ", {"COLLECTOR_API_KEY": "test-key"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.server = _IngestServer()
+        thread = threading.Thread(
+            target=self.server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        )
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def _sender(self, **kwargs) -> BackendSender:
+        sender = BackendSender(url=self.server.base_url, **kwargs)
+        self.addCleanup(sender.close)
+        return sender
+
+    def test_send_batch_splits_by_count_and_bytes(self) -> None:
+        sender = self._sender(batch_url=f"{self.server.base_url}/batch", batch_max_items=4)
+
+        self.assertEqual(sender.send_batch([_payload(seq) for seq in range(10)]), [True] * 10)
+        self.assertEqual((self.server.requests, self.server.payloads), (3, 10))
+
+        one_item = len(json.dumps(sender._build_body(_payload(1)), separators=(",", ":")))
+        sender.batch_max_bytes = one_item * 2 + 4
+        sender.send_batch([_payload(seq) for seq in range(4)])
+        self.assertEqual(self.server.requests, 5)
+
+    def test_send_batch_reports_per_item_results(self) -> None:
+        sender = self._sender(batch_url=f"{self.server.base_url}/batch")
+
+        results = sender.send_batch([_payload(1), _payload(2, fail=True), _payload(3)])
+
+        self.assertEqual(results, [True, False, True])
+
+    def test_send_batch_without_batch_url_sends_one_by_one(self) -> None:
+        sender = self._sender()
+
+        self.assertEqual(sender.send_batch([_payload(1), _payload(2)]), [True, True])
+        self.assertEqual(self.server.requests, 2)
+
+    def test_replay_requeues_failed_items_from_batch(self) -> None:
+        sender = self._sender(batch_url=f"{self.server.base_url}/batch")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SegmentedSpool(Path(tmpdir))
+            spool.append_many(json.dumps(_payload(seq, fail=seq == 2)) for seq in range(1, 5))
+
+            sent, pending, dropped = spool.replay_batch(sender.send_batch, max_items=10)
+
+            self.assertEqual((sent, pending, dropped), (3, 1, 0))
+            self.assertEqual(self.server.requests, 1)
+
+    def test_cycle_payload_is_posted_with_its_encoded_bytes(self) -> None:
+        payloads = [
+            CyclePayload("lagoon-a", None, "rockwell", datetime(2026, 4, 11, 18, 0, tzinfo=timezone.utc), {"seq": seq})
+            for seq in range(2)
+        ]
+        self.assertTrue(self._sender().send(payloads[0]))
+        self.assertEqual(self._sender(batch_url=f"{self.server.base_url}/batch").send_batch(payloads), [True, True])
+
+        self.assertEqual(self.server.bodies[0], payloads[0].encode())
+        self.assertEqual(self.server.bodies[1], b"[" + payloads[0].encode() + b"," + payloads[1].encode() + b"]")
+
+    def test_batched_throughput_beats_single_sends(self) -> None:
+        payloads = [_payload(seq) for seq in range(300)]
+        single = self._sender()
+        batched = self._sender(batch_url=f"{self.server.base_url}/batch", batch_max_items=100)
+
+        started = time.perf_counter()
+        for payload in payloads:
+            self.assertTrue(single.send(payload))
+        single_rate = len(payloads) / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        self.assertTrue(all(batched.send_batch(payloads)))
+        batched_rate = len(payloads) / (time.perf_counter() - started)
+
+        print(f"\n[BENCH] single={single_rate:.0f} payloads/s batched={batched_rate:.0f} payloads/s")
+        self.assertEqual(self.server.requests, len(payloads) + 3)
+        self.assertGreater(batched_rate, single_rate)
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def test_opens_after_threshold_and_closes_after_successful_probe(self) -> None:
+        clock = _FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, open_sec=10.0, clock=clock)
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, BREAKER_CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, BREAKER_OPEN)
+        self.assertTrue(breaker.is_open)
+        self.assertFalse(breaker.allow_request())
+
+        clock.now += 10.0
+        self.assertFalse(breaker.is_open)
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, BREAKER_HALF_OPEN)
+        # Solo una sonda a la vez.
+        self.assertFalse(breaker.allow_request())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, BREAKER_CLOSED)
+        self.assertEqual(
+            breaker.stats(),
+            {
+                "state": BREAKER_CLOSED,
+                "consecutive_failures": 0,
+                "opened": 1,
+                "half_opened": 1,
+                "closed": 1,
+                "rejected": 2,
+            },
+        )
+
+    def test_failed_probe_reopens(self) -> None:
+        clock = _FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, open_sec=5.0, clock=clock)
+        breaker.record_failure()
+        clock.now += 5.0
+
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, BREAKER_OPEN)
+        self.assertFalse(breaker.allow_request())
+        self.assertEqual(breaker.opened, 2)
+
+    def test_disabled_breaker_never_rejects(self) -> None:
+        breaker = CircuitBreaker(failure_threshold=0)
+        for _ in range(10):
+            breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, BREAKER_CLOSED)
+
+
+class BackendSenderBreakerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch.dict("os.environ", {"COLLECTOR_API_KEY": "test-key"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.server = _IngestServer()
+        thread = threading.Thread(
+            target=self.server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        )
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        previous_cwd = os.getcwd()
+        os.chdir(tmpdir.name)
+        self.addCleanup(os.chdir, previous_cwd)
+        self.addCleanup(jsonl_buffer.close_all)
+
+        self.clock = _FakeClock()
+        self.sender = BackendSender(
+            url=f"{self.server.base_url}/down",
+            breaker_failure_threshold=2,
+            breaker_open_sec=30.0,
+        )
+        self.sender.breaker.clock = self.clock
+        self.addCleanup(self.sender.close)
+
+    def test_open_breaker_skips_network(self) -> None:
+        self.assertFalse(self.sender.send(_payload(1)))
+        self.assertFalse(self.sender.send(_payload(2)))
+        self.assertTrue(self.sender.circuit_open)
+
+        self.assertFalse(self.sender.send(_payload(3)))
+        self.assertEqual(self.sender.send_batch([_payload(4), _payload(5)]), [False, False])
+        self.assertEqual(self.server.requests, 2)
+
+        self.clock.now += 30.0
+        self.sender.url = self.server.base_url
+        self.assertTrue(self.sender.send(_payload(6)))
+        self.assertEqual(self.sender.breaker.state, BREAKER_CLOSED)
+        self.assertEqual(self.server.requests, 3)
+
+    def test_client_errors_do_not_open_breaker(self) -> None:
+        self.sender.url = f"{self.server.base_url}/missing"
+        with mock.patch.object(
+            _IngestHandler,
+            "do_POST",
+            lambda handler: (handler.send_response(400), handler.send_header("Content-Length", "0"), handler.end_headers()),
+        ):
+            for seq in range(4):
+                self.assertFalse(self.sender.send(_payload(seq)))
+
+        self.assertEqual(self.sender.breaker.state, BREAKER_CLOSED)
+
+    def test_open_breaker_spools_without_retries_and_skips_replay(self) -> None:
+        send_queue: Queue = Queue(maxsize=10)
+        worker = SenderWorker(
+            "breaker-lagoon",
+            self.sender,
+            send_queue,
+            True,
+            0,
+            10,
+            0,
+            3,
+            60.0,
+            60.0,
+            idle_wait_sec=0.0,
+        )
+        for seq in range(4):
+            send_queue.put(
+                NormalizedPayload(
+                    lagoon_id="breaker-lagoon",
+                    source="rockwell",
+                    timestamp=datetime(2026, 4, 11, 18, 0, tzinfo=timezone.utc),
+                    tags={"seq": seq},
+                )
+            )
+            worker.run_once()
+
+        # El primer fallo queda en reintento; el que abre el breaker y los siguientes van al spool.
+        self.assertEqual(len(worker.retries), 1)
+        self.assertEqual(jsonl_buffer.pending_for_lagoon("breaker-lagoon"), 3)
+        self.assertEqual(self.server.requests, 2)
+
+        self.assertEqual(replay_spool("breaker-lagoon", self.sender, 10, 0), (0, 3, 0))
+        self.assertEqual(self.server.requests, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
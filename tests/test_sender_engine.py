@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+
+from common.delivery import enqueue_payload
+from common.payload import NormalizedPayload
+from common.sender_engine import AsyncSenderEngine, SenderLane
+from storage import jsonl_buffer
+
+
+def _payload(lagoon_id: str, seq: int) -> NormalizedPayload:
+    return NormalizedPayload(
+        lagoon_id=lagoon_id,
+        source="simulator",
+        timestamp=datetime(2026, 4, 11, 18, 0, tzinfo=timezone.utc),
+        tags={"seq": seq},
+    )
+
+
+class _RecordingSender:
+    batch_enabled = False
+    batch_max_items = 1
+    circuit_open = False
+
+    def __init__(self, delay_sec: float = 0.0, fail: bool = False) -> None:
+        self.delay_sec = delay_sec
+        self.fail = fail
+        self.sent: list[tuple[str, int]] = []
+        self.lock = threading.Lock()
+        self.release = threading.Event()
+        self.release.set()
+
+    def send(self, payload: NormalizedPayload) -> bool:
+        self.release.wait()
+        time.sleep(self.delay_sec)
+        with self.lock:
+            self.sent.append((payload.lagoon_id, int(payload.tags["seq"])))
+        return not self.fail
+
+
+def _lane(lagoon_id: str, sender: _RecordingSender, **overrides) -> SenderLane:
+    options = {
+        "spool_on_fail": False,
+        "log_every_n_sends": 0,
+        "replay_batch_size": 10,
+        "max_replay_payload_age_sec": 0,
+        "retry_attempts": 0,
+        "retry_backoff_base_sec": 0.0,
+        "retry_backoff_max_sec": 0.0,
+    }
+    options.update(overrides)
+    return SenderLane(lagoon_id, sender, **options)
+
+
+def _wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class AsyncSenderEngineTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        previous_cwd = os.getcwd()
+        os.chdir(tmpdir.name)
+        self.addCleanup(tmpdir.cleanup)
+        self.addCleanup(os.chdir, previous_cwd)
+        self.addCleanup(jsonl_buffer.close_all)
+
+        self.engine = AsyncSenderEngine(max_connections=1, idle_wait_sec=0.05)
+        self.addCleanup(self.engine.stop, 2.0)
+
+    def test_payloads_of_all_lagoons_are_delivered_by_one_loop(self) -> None:
+        sender = _RecordingSender()
+        queues = {
+            lagoon_id: self.engine.register(_lane(lagoon_id, sender), maxsize=10)
+            for lagoon_id in ("engine-a", "engine-b", "engine-c")
+        }
+        for lagoon_id, send_queue in queues.items():
+            for seq in range(3):
+                enqueue_payload(send_queue, _payload(lagoon_id, seq), "block")
+
+        self.assertTrue(_wait_until(lambda: len(sender.sent) == 9))
+        for lagoon_id in queues:
+            self.assertEqual([seq for lagoon, seq in sender.sent if lagoon == lagoon_id], [0, 1, 2])
+
+    def test_backlogged_lagoon_does_not_starve_others(self) -> None:
+        sender = _RecordingSender(delay_sec=0.002)
+        sender.release.clear()
+        busy = self.engine.register(_lane("engine-busy", sender), maxsize=100)
+        quiet = self.engine.register(_lane("engine-quiet", sender), maxsize=100)
+
+        for seq in range(40):
+            enqueue_payload(busy, _payload("engine-busy", seq), "block")
+        enqueue_payload(quiet, _payload("engine-quiet", 0), "block")
+        sender.release.set()
+
+        self.assertTrue(_wait_until(lambda: len(sender.sent) == 41))
+        self.assertLess(sender.sent.index(("engine-quiet", 0)), 5)
+
+    def test_queue_policies_are_preserved(self) -> None:
+        sender = _RecordingSender()
+        sender.release.clear()
+        send_queue = self.engine.register(_lane("engine-policy", sender), maxsize=2)
+
+        # El primer payload queda en vuelo; la cola se llena con los siguientes.
+        enqueue_payload(send_queue, _payload("engine-policy", 0), "drop_newest")
+        self.assertTrue(_wait_until(lambda: send_queue.qsize() == 0))
+        self.assertTrue(enqueue_payload(send_queue, _payload("engine-policy", 1), "drop_newest"))
+        self.assertTrue(enqueue_payload(send_queue, _payload("engine-policy", 2), "drop_newest"))
+        self.assertFalse(enqueue_payload(send_queue, _payload("engine-policy", 3), "drop_newest"))
+        self.assertTrue(enqueue_payload(send_queue, _payload("engine-policy", 4), "drop_oldest"))
+        sender.release.set()
+
+        self.assertTrue(_wait_until(lambda: len(sender.sent) == 3))
+        self.assertEqual([seq for _, seq in sender.sent], [0, 2, 4])
+
+    def test_failed_payloads_are_retried_and_spooled(self) -> None:
+        sender = _RecordingSender(fail=True)
+        send_queue = self.engine.register(
+            _lane("engine-spool", sender, spool_on_fail=True, retry_attempts=2),
+            maxsize=10,
+        )
+        enqueue_payload(send_queue, _payload("engine-spool", 7), "block")
+
+        self.assertTrue(_wait_until(lambda: jsonl_buffer.pending_for_lagoon("engine-spool") == 1))
+        self.assertEqual(sender.sent[:3], [("engine-spool", 7)] * 3)
+
+    def test_busy_spool_of_one_lagoon_does_not_stall_the_loop(self) -> None:
+        engine = AsyncSenderEngine(max_connections=2, idle_wait_sec=0.05)
+        self.addCleanup(engine.stop, 2.0)
+        # Otra hebra (append o replay de esa laguna) tiene tomado el lock del spool.
+        spool = jsonl_buffer.open_spool("engine-locked")
+        spool._lock.acquire()
+        self.addCleanup(spool._lock.release)
+
+        sender = _RecordingSender()
+        engine.register(_lane("engine-locked", sender), maxsize=10)
+        send_queue = engine.register(_lane("engine-free", sender), maxsize=10)
+        enqueue_payload(send_queue, _payload("engine-free", 1), "block")
+
+        self.assertTrue(_wait_until(lambda: sender.sent == [("engine-free", 1)], timeout=2.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import subprocess
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from common.sharding import (
+    aggregate_health,
+    assign_shards,
+    health_path,
+    resolve_shard_count,
+    select_shard,
+    write_health,
+)
+from supervisor import ShardSupervisor, shard_command
+
+
+def _configs(*weights: float | None) -> list[dict]:
+    configs = []
+    for index, weight in enumerate(weights):
+        cfg = {"lagoon_id": f"lagoon_{index}"}
+        if weight is not None:
+            cfg["shard_weight"] = weight
+        configs.append(cfg)
+    return configs
+
+
+class _FakeProc:
+    next_pid = 100
+
+    def __init__(self, cmd, env=None) -> None:
+        self.cmd = cmd
+        self.pid = _FakeProc.next_pid
+        _FakeProc.next_pid += 1
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self) -> None:
+        self.returncode = -15
+
+    def kill(self) -> None:
+        self.returncode = -9
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            raise subprocess.TimeoutExpired(self.cmd, timeout)
+        return self.returncode
+
+
+class _StubbornProc(_FakeProc):
+    """Shard que no termina su apagado dentro del plazo."""
+
+    def terminate(self) -> None:
+        pass
+
+
+class ShardAssignmentTests(unittest.TestCase):
+    def test_every_lagoon_lands_in_exactly_one_shard(self) -> None:
+        configs = _configs(*([None] * 13))
+        shards = [select_shard(configs, index, 4) for index in range(4)]
+        ids = sorted(cfg["lagoon_id"] for shard in shards for cfg in shard)
+        self.assertEqual(ids, sorted(cfg["lagoon_id"] for cfg in configs))
+        self.assertEqual(sorted(len(shard) for shard in shards), [3, 3, 3, 4])
+
+    def test_weights_balance_the_load(self) -> None:
+        configs = _configs(8, 1, 1, 1, 1, 1, 1, 1, 1)
+        shards = assign_shards(configs, 2)
+        self.assertEqual(shards[0], [0])
+        self.assertEqual(shards[1], list(range(1, 9)))
+
+    def test_assignment_is_deterministic_across_processes(self) -> None:
+        configs = _configs(3, None, 2, 2, None, 5, 1)
+        self.assertEqual(assign_shards(configs, 3), assign_shards(list(configs), 3))
+
+    def test_single_shard_keeps_everything(self) -> None:
+        configs = _configs(None, None)
+        self.assertEqual(select_shard(configs, 0, 1), configs)
+        with self.assertRaises(ValueError):
+            select_shard(configs, 2, 2)
+
+    def test_shard_count_is_capped_by_lagoons(self) -> None:
+        self.assertEqual(resolve_shard_count(8, 3), 3)
+        self.assertEqual(resolve_shard_count("2", 12), 2)
+        self.assertGreaterEqual(resolve_shard_count("auto", 12), 1)
+        self.assertEqual(resolve_shard_count(None, 12), 1)
+
+
+class ShardHealthTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.base_dir = Path(tmpdir.name)
+
+    def test_aggregate_flags_missing_and_stale_shards(self) -> None:
+        now = time.time()
+        write_health(
+            health_path(0, self.base_dir),
+            {"pid": 1, "updated_ts": now, "lagoons": {"a": {"cycles": 10}, "b": {"cycles": 5}}},
+        )
+        write_health(health_path(1, self.base_dir), {"pid": 2, "updated_ts": now - 120, "lagoons": {"c": {"cycles": 1}}})
+
+        health = aggregate_health(3, base_dir=self.base_dir, stale_after_sec=60, now=now)
+        self.assertEqual(health["lagoons"], 3)
+        self.assertEqual(health["cycles"], 16)
+        self.assertEqual(health["stale_shards"], [1, 2])
+        self.assertEqual(health["shards"]["0"]["lagoons"], 2)
+
+
+class ShardSupervisorTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.health_dir = tmpdir.name
+        self.now = [0.0]
+        self.supervisor = ShardSupervisor(
+            "collectors.yml",
+            3,
+            restart_delay_sec=5.0,
+            health_every_sec=0,
+            health_dir=tmpdir.name,
+            popen=_FakeProc,
+            clock=lambda: self.now[0],
+        )
+
+    def test_only_the_dead_shard_is_restarted(self) -> None:
+        self.supervisor.tick()
+        first = list(self.supervisor.procs)
+        self.assertEqual([proc.cmd[-3] for proc in first], ["0", "1", "2"])
+
+        first[1].returncode = 1
+        with self.assertLogs("collector.supervisor", level="WARNING"):
+            self.supervisor.tick()
+        self.assertIsNone(self.supervisor.procs[1])
+
+        self.now[0] = 4.0
+        self.supervisor.tick()
+        self.assertIsNone(self.supervisor.procs[1])
+
+        self.now[0] = 5.0
+        self.supervisor.tick()
+        self.assertIs(self.supervisor.procs[0], first[0])
+        self.assertIs(self.supervisor.procs[2], first[2])
+        self.assertIsNot(self.supervisor.procs[1], first[1])
+        self.assertEqual(self.supervisor.restarts, [0, 1, 0])
+        self.assertEqual(self.supervisor.health()["running"], 3)
+
+    def test_hung_shard_is_killed_when_its_own_health_goes_stale(self) -> None:
+        self.supervisor.tick()
+        procs = list(self.supervisor.procs)
+        stale_ts = time.time() - 600
+        write_health(health_path(0, self.health_dir), {"pid": procs[0].pid, "updated_ts": stale_ts, "lagoons": {}})
+        # Archivo viejo de un proceso anterior: no dice nada del pid actual.
+        write_health(health_path(1, self.health_dir), {"pid": 1, "updated_ts": stale_ts, "lagoons": {}})
+        write_health(health_path(2, self.health_dir), {"pid": procs[2].pid, "updated_ts": time.time(), "lagoons": {}})
+
+        with self.assertLogs("collector.supervisor", level="WARNING"):
+            self.assertEqual(self.supervisor.kill_stale(self.supervisor.health()), [0])
+        self.assertEqual([proc.returncode for proc in procs], [-9, None, None])
+
+        with self.assertLogs("collector.supervisor", level="WARNING"):
+            self.supervisor.tick()
+        self.assertEqual(self.supervisor.restarts, [1, 0, 0])
+
+    def test_terminate_kills_only_shards_past_the_grace_period(self) -> None:
+        self.supervisor.tick()
+        stubborn = _StubbornProc(["main.py"])
+        self.supervisor.procs[1] = stubborn
+        procs = list(self.supervisor.procs)
+
+        with self.assertLogs("collector.supervisor", level="WARNING"):
+            self.supervisor.terminate()
+        self.assertEqual([proc.returncode for proc in procs], [-15, -9, -15])
+
+    def test_single_shard_command_has_no_shard_arguments(self) -> None:
+        self.assertNotIn("--shard-index", shard_command("collectors.yml", 0, 1))
+        self.assertEqual(shard_command("c.yml", 1, 2)[-4:], ["--shard-index", "1", "--shard-count", "2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
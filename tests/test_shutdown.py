@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import os
+import socket
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import main
+from common.sender_engine import AsyncSenderEngine
+from storage import jsonl_buffer
+
+
+def _wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def _root(backend_url: str, *lagoon_ids: str) -> dict:
+    plcs = [
+        {
+            "lagoon_id": lagoon_id,
+            "source": "simulator",
+            "poll_seconds": 0.02,
+            "timezone": "UTC",
+            "simulator": {"seed": 1, "tags": {"PT101_R": {"type": "float"}}},
+        }
+        for lagoon_id in lagoon_ids
+    ]
+    return {
+        "backend": {"url": backend_url, "timeout_sec": 5.0},
+        "runtime": {
+            "log_every_n_cycles": 0,
+            "watchdog_stall_sec": 0,
+            "send_retry_backoff_base_sec": 0.05,
+            "startup_jitter_max_sec": 0,
+        },
+        "plcs": plcs,
+    }
+
+
+class GracefulShutdownTests(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch.dict("os.environ", {"COLLECTOR_API_KEY": "test-key"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        tmpdir = tempfile.TemporaryDirectory()
+        cwd = os.getcwd()
+        os.chdir(tmpdir.name)
+        self.addCleanup(tmpdir.cleanup)
+        self.addCleanup(os.chdir, cwd)
+        self.addCleanup(jsonl_buffer.close_all)
+
+        # Cuenta cada payload armado por un ciclo: todos deben terminar enviados o en spool.
+        self.created: list = []
+        construct = main.CyclePayload
+
+        def _construct(*args, **kwargs):
+            payload = construct(*args, **kwargs)
+            self.created.append(payload)
+            return payload
+
+        patcher = mock.patch.object(main, "CyclePayload", side_effect=_construct)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _hanging_backend(self) -> str:
+        # Acepta la conexion TCP (backlog) y nunca responde: cada envio queda colgado hasta su timeout.
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(64)
+        self.listener = listener
+        return f"http://127.0.0.1:{listener.getsockname()[1]}/ingest/scada"
+
+    def _fleet(self, root_cfg: dict, sender_engine: AsyncSenderEngine | None = None) -> main.CollectorFleet:
+        fleet = main.CollectorFleet(root_cfg["plcs"], root_cfg, sender_engine)
+        for collector in main.build_collectors(root_cfg["plcs"], root_cfg, sender_engine):
+            fleet.start(collector, jitter=False)
+        return fleet
+
+    def _pending(self, *lagoon_ids: str) -> int:
+        return sum(jsonl_buffer.pending_for_lagoon(lagoon_id) for lagoon_id in lagoon_ids)
+
+    def test_queues_and_retries_reach_the_spool(self) -> None:
+        # Puerto cerrado: los envios fallan rapido y quedan en cola, reintento o spool.
+        root_cfg = _root("http://127.0.0.1:1/ingest/scada", "a", "b")
+        fleet = self._fleet(root_cfg)
+        self.assertTrue(_wait_until(lambda: len(self.created) >= 20))
+
+        with self.assertLogs("collector", level="INFO") as logs:
+            spooled = fleet.shutdown(2.0)
+        self.assertIn("[COLLECTOR SHUTDOWN] lagoons=2", "\n".join(logs.output))
+        self.assertGreaterEqual(spooled, 0)
+        self.assertEqual(len(fleet.collectors), 0)
+        self.assertEqual(self._pending("a", "b"), len(self.created))
+
+    def _assert_bounded_without_loss(self, sender_engine: AsyncSenderEngine | None) -> None:
+        root_cfg = _root(self._hanging_backend(), "a", "b")
+        fleet = self._fleet(root_cfg, sender_engine)
+        collectors = list(fleet)
+        self.assertTrue(_wait_until(lambda: all(collector.cycle_count >= 5 for collector in collectors)))
+
+        started = time.perf_counter()
+        with self.assertLogs("collector", level="INFO"):
+            fleet.shutdown(0.5)
+        elapsed = time.perf_counter() - started
+        self.assertLess(elapsed, 2.0)
+        self.assertEqual(self._pending("a", "b"), len(self.created))
+
+        # Se liberan los envios colgados antes de borrar el directorio del spool.
+        self.listener.close()
+        for collector in collectors:
+            if collector.sender_thread is not None:
+                collector.sender_thread.join(5.0)
+
+    def test_hung_send_is_bounded_by_the_deadline_threads(self) -> None:
+        self._assert_bounded_without_loss(None)
+
+    def test_hung_send_is_bounded_by_the_deadline_asyncio(self) -> None:
+        sender_engine = AsyncSenderEngine(max_connections=4)
+        sender_engine.start()
+        self.addCleanup(sender_engine.stop, 1.0)
+        self._assert_bounded_without_loss(sender_engine)
+
+    def test_reload_after_shutdown_is_ignored(self) -> None:
+        root_cfg = _root("http://127.0.0.1:1/ingest/scada", "a")
+        fleet = self._fleet(root_cfg)
+        with self.assertLogs("collector", level="INFO"):
+            fleet.shutdown(1.0)
+        diff = fleet.apply(_root("http://127.0.0.1:1/ingest/scada", "a", "b")["plcs"], root_cfg)
+        self.assertTrue(diff.empty)
+        self.assertEqual(len(fleet.collectors), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
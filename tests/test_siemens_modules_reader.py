@@ -1,9 +1,13 @@
+import threading
+import time
 import unittest
 
 from workers.get_siemens import SiemensModulesReader
 
 
 class _FakeReader:
+    subset_reads: list[tuple[str, ...]] = []
+
     def __init__(self, **kwargs) -> None:
         self.tag_map = kwargs["tag_map"]
 
@@ -13,6 +17,11 @@ class _FakeReader:
             for index, tag_id in enumerate(self.tag_map, start=1)
         }
 
+    def read_tags(self, tag_ids: tuple[str, ...]) -> dict:
+        self.subset_reads.append(tag_ids)
+        values = self.read_once()
+        return {tag_id: values[tag_id] for tag_id in tag_ids}
+
 
 class _FailingReader:
     def __init__(self, **_kwargs) -> None:
@@ -22,6 +31,40 @@ class _FailingReader:
         raise ConnectionError("offline")
 
 
+class _SlowReader:
+    """Modulo cuya latencia se fija por endpoint; `hang` bloquea hasta liberarlo."""
+
+    delays: dict[str, float] = {}
+    release = threading.Event()
+    calls: dict[str, int] = {}
+
+    def __init__(self, **kwargs) -> None:
+        self.endpoint = kwargs["endpoint"]
+        self.tag_map = kwargs["tag_map"]
+
+    def read_once(self) -> dict:
+        self.calls[self.endpoint] = self.calls.get(self.endpoint, 0) + 1
+        delay = self.delays.get(self.endpoint, 0.0)
+        if delay < 0:
+            self.release.wait(5)
+        else:
+            time.sleep(delay)
+        return {tag_id: self.endpoint for tag_id in self.tag_map}
+
+    def read_tags(self, tag_ids: tuple[str, ...]) -> dict:
+        values = self.read_once()
+        return {tag_id: values[tag_id] for tag_id in tag_ids}
+
+
+def _module(name: str) -> dict:
+    return {
+        "id": name,
+        "driver": "siemens",
+        "opc_server_url": f"opc.tcp://{name}:4840",
+        "tags": {f"{name.upper()}_VALUE": "ns=4;i=1"},
+    }
+
+
 class SiemensModulesReaderTests(unittest.TestCase):
     def test_merges_modules_and_supplemental_tags(self) -> None:
         reader = SiemensModulesReader(
@@ -71,6 +114,83 @@ class SiemensModulesReaderTests(unittest.TestCase):
             },
         )
 
+    def test_subset_read_only_queries_modules_with_requested_tags(self) -> None:
+        _FakeReader.subset_reads = []
+        reader = SiemensModulesReader(
+            [
+                {"opc_server_url": "opc.tcp://a:4840", "tags": {"A1": "ns=4;i=1", "A2": "ns=4;i=2"}},
+                {"opc_server_url": "opc.tcp://b:4840", "tags": {"B1": "ns=4;i=1"}},
+            ],
+            supplemental_tags={"TEMP": 28.4},
+            reader_factory=_FakeReader,
+        )
+        self.addCleanup(reader.close)
+
+        self.assertEqual(reader.tag_ids, ["TEMP", "A1", "A2", "B1"])
+        self.assertEqual(reader.read_tags(("A2",)), {"TEMP": 28.4, "A2": 2})
+        self.assertEqual(_FakeReader.subset_reads, [("A2",)])
+
+    def test_modules_are_read_in_parallel(self) -> None:
+        _SlowReader.delays = {f"opc.tcp://m{index}:4840": 0.2 for index in range(4)}
+        reader = SiemensModulesReader(
+            [_module(f"m{index}") for index in range(4)],
+            reader_factory=_SlowReader,
+            read_deadline_sec=2.0,
+        )
+        self.addCleanup(reader.close)
+
+        started = time.perf_counter()
+        values = reader.read_once()
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(values["M3_VALUE"], "opc.tcp://m3:4840")
+        self.assertLess(elapsed, 0.6)
+
+    def test_module_missing_deadline_contributes_none_and_is_not_resubmitted(self) -> None:
+        _SlowReader.release = threading.Event()
+        _SlowReader.calls = {}
+        _SlowReader.delays = {"opc.tcp://hung:4840": -1, "opc.tcp://ok:4840": 0.0}
+        reader = SiemensModulesReader(
+            [_module("hung"), _module("ok")],
+            reader_factory=_SlowReader,
+            read_deadline_sec=0.1,
+        )
+        self.addCleanup(reader.close)
+        self.addCleanup(_SlowReader.release.set)
+
+        started = time.perf_counter()
+        first = reader.read_once()
+        second = reader.read_once()
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(first, {"HUNG_VALUE": None, "OK_VALUE": "opc.tcp://ok:4840"})
+        self.assertEqual(second, first)
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(_SlowReader.calls["opc.tcp://hung:4840"], 1)
+        self.assertEqual(reader.deadline_misses, 2)
+
+        _SlowReader.release.set()
+        time.sleep(0.05)
+        self.assertEqual(reader.read_once()["HUNG_VALUE"], "opc.tcp://hung:4840")
+
+    def test_late_read_of_another_scan_class_is_not_merged(self) -> None:
+        _SlowReader.release = threading.Event()
+        _SlowReader.calls = {}
+        _SlowReader.delays = {"opc.tcp://hung:4840": -1, "opc.tcp://ok:4840": 0.0}
+        hung = _module("hung")
+        hung["tags"] = {"FAST_R": "ns=4;i=1", "SLOW_R": "ns=4;i=2"}
+        reader = SiemensModulesReader([hung, _module("ok")], reader_factory=_SlowReader, read_deadline_sec=0.3)
+        self.addCleanup(reader.close)
+        self.addCleanup(_SlowReader.release.set)
+
+        self.assertEqual(reader.read_tags(("FAST_R",)), {"FAST_R": None})
+        # La lectura de FAST_R termina durante el ciclo de SLOW_R: no debe salir bajo ese ciclo.
+        threading.Timer(0.05, _SlowReader.release.set).start()
+        self.assertEqual(reader.read_tags(("SLOW_R",)), {"SLOW_R": None})
+        time.sleep(0.1)
+        self.assertEqual(reader.read_tags(("SLOW_R",)), {"SLOW_R": "opc.tcp://hung:4840"})
+        self.assertEqual(_SlowReader.calls["opc.tcp://hung:4840"], 2)
+
 
 if __name__ == "__main__":
     unittest.main()
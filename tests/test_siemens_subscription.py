@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import logging
+import socket
+import time
+import unittest
+from unittest import mock
+
+from opcua import Client, Server
+from opcua.common.subscription import Subscription
+from opcua.ua.uaerrors import UaError
+
+from workers.get_siemens import SiemensSessionReader
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+class _CountingReads:
+    """Envuelve uaclient.get_attributes para contar idas y vueltas al servidor."""
+
+    def __init__(self, reader: SiemensSessionReader) -> None:
+        self.count = 0
+        uaclient = reader.client.uaclient
+        original = uaclient.get_attributes
+
+        def _get_attributes(nodes, attr):
+            self.count += 1
+            return original(nodes, attr)
+
+        uaclient.get_attributes = _get_attributes
+
+
+class SiemensSubscriptionTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        logging.getLogger("opcua").setLevel(logging.ERROR)
+        cls.endpoint = f"opc.tcp://127.0.0.1:{_free_port()}/collector-test/"
+        cls.server = Server()
+        cls.server.set_endpoint(cls.endpoint)
+        idx = cls.server.register_namespace("urn:collector-test")
+        plc = cls.server.get_objects_node().add_object(idx, "PLC")
+        cls.variables = {
+            f"PT{index:02d}": plc.add_variable(idx, f"PT{index:02d}", float(index))
+            for index in range(10)
+        }
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.stop()
+
+    def setUp(self) -> None:
+        for index, (tag_id, variable) in enumerate(self.variables.items()):
+            variable.set_value(float(index))
+
+    def _reader(self, **options) -> SiemensSessionReader:
+        reader = SiemensSessionReader(
+            endpoint=self.endpoint,
+            tag_map={tag_id: variable.nodeid.to_string() for tag_id, variable in self.variables.items()},
+            timeout_sec=4,
+            background_connect=False,
+            **options,
+        )
+        self.addCleanup(reader.disconnect)
+        return reader
+
+    def _timed_reads(self, reader: SiemensSessionReader, cycles: int) -> tuple[int, float]:
+        reader.read_once()
+        counter = _CountingReads(reader)
+        started = time.perf_counter()
+        for _ in range(cycles):
+            values = reader.read_once()
+            self.assertEqual(len(values), len(self.variables))
+        return counter.count, (time.perf_counter() - started) / cycles
+
+    def test_subscription_serves_cache_with_fewer_requests_and_lower_latency(self) -> None:
+        poll_requests, poll_latency = self._timed_reads(self._reader(), 20)
+        subscribed = self._reader(read_mode="subscription", sampling_interval_ms=50)
+        sub_requests, sub_latency = self._timed_reads(subscribed, 20)
+
+        self.assertTrue(subscribed.subscribed)
+        self.assertEqual(poll_requests, 20)
+        self.assertEqual(sub_requests, 0)
+        self.assertLess(sub_latency, poll_latency)
+
+    def test_data_changes_update_cache_respecting_deadband(self) -> None:
+        reader = self._reader(read_mode="subscription", sampling_interval_ms=50, deadband=5.0)
+        self.assertEqual(reader.read_once()["PT01"], 1.0)
+        self.assertTrue(_wait_until(lambda: reader.notifications >= len(self.variables)))
+
+        self.variables["PT01"].set_value(3.0)
+        time.sleep(0.3)
+        self.assertEqual(reader.read_once()["PT01"], 1.0)
+
+        self.variables["PT01"].set_value(20.0)
+        self.assertTrue(_wait_until(lambda: reader.read_once()["PT01"] == 20.0))
+
+    def test_periodic_refresh_corrects_values_hidden_by_deadband(self) -> None:
+        now = [0.0]
+        reader = self._reader(
+            read_mode="subscription",
+            sampling_interval_ms=50,
+            deadband=5.0,
+            subscription_refresh_sec=10,
+            clock=lambda: now[0],
+        )
+        reader.read_once()
+        self.variables["PT02"].set_value(4.0)
+        time.sleep(0.2)
+        self.assertEqual(reader.read_once()["PT02"], 2.0)
+
+        now[0] = 10.0
+        self.assertEqual(reader.read_once()["PT02"], 4.0)
+        self.assertEqual(reader.poll_reads, 2)
+
+    def test_silent_session_is_checked_before_serving_the_cache(self) -> None:
+        now = [0.0]
+        reader = self._reader(
+            read_mode="subscription",
+            sampling_interval_ms=50,
+            deadband=5.0,
+            subscription_liveness_sec=5,
+            clock=lambda: now[0],
+        )
+        reader.read_once()
+        self.assertTrue(_wait_until(lambda: reader.notifications >= len(self.variables)))
+        self.variables["PT05"].set_value(6.0)
+        time.sleep(0.2)
+        self.assertEqual(reader.read_once()["PT05"], 5.0)
+
+        # 5 s sin notificaciones: antes de servir el cache se lee directo.
+        now[0] = 5.0
+        self.assertEqual(reader.read_once()["PT05"], 6.0)
+        self.assertEqual(reader.poll_reads, 2)
+
+        # Red caida en silencio: la lectura directa falla y no se sirve el cache como lectura nueva.
+        now[0] = 10.0
+        with mock.patch.object(reader.client, "get_values", side_effect=OSError("connection lost")):
+            self.assertEqual(reader.read_once(), {})
+        self.assertFalse(reader.subscribed)
+
+    def test_monitored_items_do_not_use_private_subscription_helpers(self) -> None:
+        with mock.patch.object(Subscription, "_make_monitored_item_request", side_effect=AssertionError("private API")):
+            reader = self._reader(read_mode="subscription", sampling_interval_ms=50)
+            reader.read_once()
+        self.assertTrue(reader.subscribed)
+        self.assertTrue(_wait_until(lambda: reader.notifications >= len(self.variables)))
+
+    def test_falls_back_to_polling_when_subscription_fails(self) -> None:
+        reader = self._reader(read_mode="subscription")
+        with mock.patch.object(Client, "create_subscription", side_effect=UaError("BadTooManySubscriptions")):
+            reader.connect()
+        self.assertFalse(reader.subscribed)
+
+        self.variables["PT03"].set_value(33.0)
+        self.assertEqual(reader.read_once()["PT03"], 33.0)
+
+    def test_bad_subscription_status_switches_to_polling(self) -> None:
+        reader = self._reader(read_mode="subscription", sampling_interval_ms=50)
+        reader.read_once()
+        self.assertTrue(reader.subscribed)
+
+        reader._on_subscription_status("BadTimeout")
+        self.variables["PT04"].set_value(44.0)
+        self.assertEqual(reader.read_once()["PT04"], 44.0)
+        self.assertFalse(reader.subscribed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from queue import Queue
+
+import main
+from common.tag_plan import TagPlan
+from storage import jsonl_buffer
+from storage.state_snapshot import read_state, state_path_for_lagoon, write_state
+
+T0 = datetime(2026, 4, 11, 18, 0, tzinfo=timezone.utc)
+
+
+class StateFileTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = state_path_for_lagoon("L 1", tmpdir.name)
+
+    def test_round_trip_and_staleness(self) -> None:
+        self.assertEqual(read_state(self.path), (None, "missing"))
+        write_state(self.path, {"totalizer": {"L1:TOT": 12.5}})
+        self.assertEqual(self.path.parent.name, "L_1")
+        self.assertFalse(self.path.with_name("state.json.tmp").exists())
+
+        state, reason = read_state(self.path, 60)
+        self.assertEqual((state["totalizer"], reason), ({"L1:TOT": 12.5}, "ok"))
+        self.assertEqual(read_state(self.path, 60, now=time.time() + 120), (None, "stale"))
+        self.assertEqual(read_state(self.path, 0, now=time.time() + 1e6)[1], "ok")
+
+    def test_corrupt_or_foreign_version_is_ignored(self) -> None:
+        self.path.parent.mkdir(parents=True)
+        self.path.write_text("{trunc", encoding="utf-8")
+        self.assertEqual(read_state(self.path), (None, "corrupt"))
+        self.path.write_text(json.dumps({"version": 99, "saved_at": time.time()}), encoding="utf-8")
+        self.assertEqual(read_state(self.path), (None, "corrupt"))
+
+
+class TagPlanRestoreTests(unittest.TestCase):
+    def test_restored_states_fire_on_first_cycle(self) -> None:
+        plan = TagPlan("L1", {"VE01_ST": "Valvula 1", "VE02_ST": "Valvula 2"})
+        plan.restore({"VE01_ST": False, "VE02_ST": True, "OTHER_ST": True}, {"P01_ST": 1, "P02_ST": 9})
+        self.assertEqual(plan.snapshot(), {"bool": {"VE01_ST": False, "VE02_ST": True}, "state": {"P01_ST": 1}})
+
+        events = plan.process({"VE01_ST": True, "VE02_ST": True, "P01_ST": 2, "FIT_R": 1.5}, T0)
+        self.assertEqual(
+            [(event["type"], event["tag_id"]) for event in events],
+            [("OPEN", "VE01_ST"), ("STATE_CHANGE", "P01_ST")],
+        )
+        self.assertEqual(events[1]["previous_state"], 1)
+
+
+class _ScriptedReader:
+    def __init__(self, cycles: list[dict]) -> None:
+        self.cycles = list(cycles)
+
+    def read_once(self) -> dict:
+        return dict(self.cycles.pop(0))
+
+
+class CollectorRestartTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        cwd = os.getcwd()
+        os.chdir(tmpdir.name)
+        self.addCleanup(tmpdir.cleanup)
+        self.addCleanup(os.chdir, cwd)
+        self.addCleanup(jsonl_buffer.close_all)
+
+        self.cfg = {
+            "lagoon_id": "restart",
+            "source": "simulator",
+            "timezone": "UTC",
+            "event_tags": {"VE01_ST": "Valvula 1"},
+            "runtime": {"log_every_n_cycles": 0, "state_snapshot_every_sec": 30},
+        }
+
+    def _collector(self, cycles: list[dict], root_cfg: dict | None = None) -> main.LagoonCollector:
+        collector = main.LagoonCollector(self.cfg, root_cfg or {})
+        collector.sender = object()
+        collector.send_queue = Queue()
+        collector.reader = _ScriptedReader(cycles)
+        return collector
+
+    def _drain(self, collector: main.LagoonCollector) -> list:
+        payloads = []
+        while not collector.send_queue.empty():
+            payloads.append(collector.send_queue.get_nowait())
+        return payloads
+
+    def test_restart_keeps_totalizer_volume_and_event_states(self) -> None:
+        first = self._collector([{"WM01_TOT_SCADA": 100.0, "VE01_ST": False}, {"WM01_TOT_SCADA": 105.0, "VE01_ST": False}])
+        first.run_cycle()
+        first.run_cycle()
+        first.stop()
+
+        # Mientras el proceso estaba abajo el medidor conto 7 m3 y la valvula abrio.
+        second = self._collector([{"WM01_TOT_SCADA": 112.0, "VE01_ST": True}])
+        second.run_cycle()
+        (payload,) = self._drain(second)
+        self.assertEqual(payload.tags["WM01_TOT_DELTA_SCADA"], 7.0)
+        self.assertEqual([event["type"] for event in payload.events], ["OPEN"])
+
+    def test_stale_snapshot_starts_cold(self) -> None:
+        first = self._collector([{"WM01_TOT_SCADA": 100.0}])
+        first.run_cycle()
+        first.stop()
+        path = Path(first.state_path)
+        state = json.loads(path.read_text(encoding="utf-8"))
+        state["saved_at"] -= 7200
+        path.write_text(json.dumps(state), encoding="utf-8")
+
+        second = self._collector([{"WM01_TOT_SCADA": 900.0}], {"runtime": {"state_max_age_sec": 3600}})
+        second.run_cycle()
+        self.assertEqual(self._drain(second)[0].tags["WM01_TOT_DELTA_SCADA"], 0.0)
+
+    def test_snapshot_is_written_periodically(self) -> None:
+        collector = self._collector([{"WM01_TOT_SCADA": 5.0}, {"WM01_TOT_SCADA": 6.0}])
+        collector.run_cycle()
+        self.assertFalse(Path(collector.state_path).exists())
+        collector._next_state_save = 0.0
+        collector.run_cycle()
+        state, _ = read_state(collector.state_path)
+        self.assertEqual(state["totalizer"], {"restart:WM01_TOT_SCADA": 6.0})
+
+    def test_crash_after_the_periodic_snapshot_does_not_double_count(self) -> None:
+        first = self._collector(
+            [{"WM01_TOT_SCADA": 100.0}, {"WM01_TOT_SCADA": 105.0}, {"WM01_TOT_SCADA": 110.0}]
+        )
+        first.run_cycle()
+        first._next_state_save = 0.0
+        first.run_cycle()
+        first.run_cycle()
+        # Crash sin stop: el ultimo snapshot periodico fue en 105, pero 110 ya se informo.
+        emitted = sum(payload.tags["WM01_TOT_DELTA_SCADA"] for payload in self._drain(first))
+
+        second = self._collector([{"WM01_TOT_SCADA": 112.0}])
+        second.run_cycle()
+        emitted += self._drain(second)[0].tags["WM01_TOT_DELTA_SCADA"]
+        self.assertEqual(emitted, 12.0)
+
+    def test_non_finite_totalizer_does_not_block_the_snapshot(self) -> None:
+        collector = self._collector([{"WM01_TOT_SCADA": float("inf"), "VE01_ST": True}])
+        collector.run_cycle()
+        collector.save_state()
+        state, reason = read_state(collector.state_path)
+        self.assertEqual(reason, "ok")
+        self.assertEqual(state["totalizer"], {})
+        self.assertEqual(state["bool"], {"VE01_ST": True})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import unittest
+from datetime import datetime, timezone
+
+from common.tag_plan import TagPlan
+
+TS = datetime(2026, 4, 11, 18, 0, tzinfo=timezone.utc)
+
+
+class TagPlanTests(unittest.TestCase):
+    def test_boolean_events_open_and_close(self) -> None:
+        plan = TagPlan("lagoon-a", {"VE237_ST": "Valvula 237"})
+
+        self.assertEqual(plan.process({"VE237_ST": False, "PT117_R": 1.0}, TS), [])
+        opened = plan.process({"VE237_ST": True, "PT117_R": 2.0}, TS)
+        closed = plan.process({"VE237_ST": 0, "PT117_R": 3.0}, TS)
+
+        self.assertEqual(
+            opened,
+            [
+                {
+                    "type": "OPEN",
+                    "lagoon_id": "lagoon-a",
+                    "tag_id": "VE237_ST",
+                    "tag_label": "Valvula 237",
+                    "alert_type": "BOOLEAN",
+                    "state": 1,
+                    "ts": TS.isoformat(),
+                }
+            ],
+        )
+        self.assertEqual([event["type"] for event in closed], ["CLOSE"])
+        self.assertNotIn("tag_label", closed[0])
+
+    def test_state_changes_only_for_integer_states(self) -> None:
+        plan = TagPlan("lagoon-a")
+
+        plan.process({"P005_ST": 1, "PT117_R": 1.5, "MODE": "auto"}, TS)
+        # 7 no es estado valido: se ignora y el previo sigue siendo 1.
+        self.assertEqual(plan.process({"P005_ST": 7, "PT117_R": 2.5, "MODE": "man"}, TS), [])
+        events = plan.process({"P005_ST": 3, "PT117_R": 3.5, "MODE": "auto"}, TS)
+
+        self.assertEqual(
+            events,
+            [
+                {
+                    "type": "STATE_CHANGE",
+                    "lagoon_id": "lagoon-a",
+                    "tag_id": "P005_ST",
+                    "alert_type": "STATE",
+                    "previous_state": 1,
+                    "state": 3,
+                    "ts": TS.isoformat(),
+                }
+            ],
+        )
+        self.assertEqual(plan.state_names, ("P005_ST",))
+
+    def test_state_events_can_be_disabled(self) -> None:
+        plan = TagPlan("lagoon-a", enable_state_events=False)
+        plan.process({"P005_ST": 1}, TS)
+        self.assertEqual(plan.process({"P005_ST": 2}, TS), [])
+
+    def test_boolean_events_come_before_state_events(self) -> None:
+        plan = TagPlan("lagoon-a", {"VE1": "v"})
+        plan.process({"VE1": False, "P1": 0}, TS)
+
+        events = plan.process({"VE1": True, "P1": 2}, TS)
+
+        self.assertEqual([event["type"] for event in events], ["OPEN", "STATE_CHANGE"])
+
+    def test_recompile_keeps_previous_states_by_name(self) -> None:
+        plan = TagPlan("lagoon-a", {"VE1": "v"}, totalizer_tag="WM01_TOT_SCADA")
+        plan.process({"VE1": False, "P1": 1}, TS)
+        self.assertFalse(plan.has_totalizer)
+
+        events = plan.process({"P1": 2, "VE1": True, "WM01_TOT_SCADA": 10.0}, TS)
+        self.assertEqual([event["type"] for event in events], ["OPEN", "STATE_CHANGE"])
+        self.assertTrue(plan.has_totalizer)
+
+        # Mismo numero de tags pero con un nombre distinto: tambien recompila.
+        plan.process({"P1": 2, "VE1": True, "OTHER": 1.0}, TS)
+        self.assertEqual(plan.compiles, 3)
+        self.assertFalse(plan.has_totalizer)
+
+    def test_missing_value_keeps_slot_as_state_candidate(self) -> None:
+        plan = TagPlan("lagoon-a")
+        plan.process({"P1": None}, TS)
+        plan.process({"P1": 1}, TS)
+
+        events = plan.process({"P1": 2}, TS)
+
+        self.assertEqual([(event["previous_state"], event["state"]) for event in events], [(1, 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from queue import Queue
+
+import main
+from normalizer.tot_delta_normalizer import TotDeltaNormalizer
+from normalizer.totalizer_pipeline import DEFAULT_TOTALIZERS, TotalizerPipeline, parse_totalizers
+from storage import jsonl_buffer
+
+T0 = datetime(2026, 4, 11, 18, 0, tzinfo=timezone.utc)
+
+
+class TotDeltaNormalizerTests(unittest.TestCase):
+    def test_rollover_and_reset_modes(self) -> None:
+        normalizer = TotDeltaNormalizer()
+        normalizer.compute("a", 999990.0, rollover=1000000.0)
+        self.assertEqual(normalizer.compute("a", 15.0, rollover=1000000.0), 25.0)
+        # Caida chica con rollover: es un reset, no una vuelta.
+        normalizer.compute("a", 500.0, rollover=1000000.0)
+        self.assertEqual(normalizer.compute("a", 3.0, rollover=1000000.0), 3.0)
+
+        normalizer.compute("b", 800.0)
+        self.assertEqual(normalizer.compute("b", 120.0, reset="zero"), 0.0)
+        self.assertEqual(normalizer.compute("b", 121.5, reset="zero"), 1.5)
+
+
+class ParseTotalizersTests(unittest.TestCase):
+    def test_parse(self) -> None:
+        self.assertIs(parse_totalizers(None), DEFAULT_TOTALIZERS)
+        self.assertEqual(parse_totalizers([]), ())
+        short, full = parse_totalizers(
+            ["WM01_TOT", {"tag": "TOT_WM001", "output": "Q1", "rollover": 1e6, "reset": "ZERO", "rate_output": "R1", "rate_unit": "min"}]
+        )
+        self.assertEqual((short.tag, short.output, short.rollover, short.rate_output), ("WM01_TOT", "WM01_TOT_DELTA", None, None))
+        self.assertEqual((full.output, full.rollover, full.reset, full.rate_output, full.rate_scale), ("Q1", 1e6, "zero", "R1", 60.0))
+
+    def test_invalid(self) -> None:
+        for raw in (
+            {"tag": "X"},
+            [{"output": "Y"}],
+            [{"tag": "X", "reset": "keep"}],
+            [{"tag": "X", "rollover": 0}],
+            [{"tag": "X", "rate_unit": "day"}],
+            [{"tag": "X", "output": "Y"}, {"tag": "Z", "output": "Y"}],
+        ):
+            with self.subTest(raw=raw), self.assertRaises(ValueError):
+                parse_totalizers(raw)
+
+
+class TotalizerPipelineTests(unittest.TestCase):
+    def test_each_totalizer_has_its_own_output_and_rate(self) -> None:
+        pipeline = TotalizerPipeline("L1", parse_totalizers(["WM01_TOT", {"tag": "TOT_WM001", "rate_output": "FLOW_H"}]))
+        out: dict = {}
+        pipeline.process({"WM01_TOT": 10.0, "TOT_WM001": 100.0, "PT_R": 1.0}, T0, out)
+        self.assertEqual(out, {"WM01_TOT_DELTA": 0.0, "TOT_WM001_DELTA": 0.0})
+
+        out = {}
+        pipeline.process({"WM01_TOT": 10.5, "TOT_WM001": 102.0, "PT_R": 1.0}, T0 + timedelta(seconds=2), out)
+        self.assertEqual(out, {"WM01_TOT_DELTA": 0.5, "TOT_WM001_DELTA": 2.0, "FLOW_H": 3600.0})
+        self.assertEqual(pipeline.normalizer.prev, {"L1:WM01_TOT": 10.5, "L1:TOT_WM001": 102.0})
+
+    def test_compiles_once_and_recompiles_when_a_totalizer_goes_missing(self) -> None:
+        pipeline = TotalizerPipeline("L1", parse_totalizers(["A_TOT", "B_TOT"]))
+        for value in (1.0, 2.0, 3.0):
+            pipeline.process({"A_TOT": value, "B_TOT": value}, T0, {})
+        self.assertEqual((pipeline.compiles, pipeline.active), (1, ("A_TOT", "B_TOT")))
+
+        out: dict = {}
+        pipeline.process({"A_TOT": 4.0, "OTHER": 0}, T0, out)
+        self.assertEqual((pipeline.compiles, pipeline.active, out), (2, ("A_TOT",), {"A_TOT_DELTA": 1.0}))
+
+    def test_zero_delta_is_skipped_when_not_kept(self) -> None:
+        pipeline = TotalizerPipeline("L1", parse_totalizers([{"tag": "A_TOT", "rate_output": "A_RATE"}]))
+        pipeline.process({"A_TOT": 1.0}, T0, {})
+        out: dict = {}
+        pipeline.process({"A_TOT": 1.0}, T0 + timedelta(seconds=1), out, keep_zero=False)
+        self.assertEqual(out, {})
+
+
+class _ScriptedReader:
+    def __init__(self, cycles: list[dict]) -> None:
+        self.cycles = list(cycles)
+
+    def read_once(self) -> dict:
+        return dict(self.cycles.pop(0))
+
+
+class CollectorTotalizerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        cwd = os.getcwd()
+        os.chdir(tmpdir.name)
+        self.addCleanup(tmpdir.cleanup)
+        self.addCleanup(os.chdir, cwd)
+        self.addCleanup(jsonl_buffer.close_all)
+
+    def _run(self, cfg_extra: dict, root_cfg: dict, cycles: list[dict]) -> list:
+        cfg = {"lagoon_id": "tot", "source": "simulator", "timezone": "UTC", "runtime": {"log_every_n_cycles": 0}}
+        cfg.update(cfg_extra)
+        collector = main.LagoonCollector(cfg, root_cfg)
+        collector.sender = object()
+        collector.send_queue = Queue()
+        collector.reader = _ScriptedReader(cycles)
+        for _ in cycles:
+            collector.run_cycle()
+        return [collector.send_queue.get_nowait().tags for _ in range(collector.send_queue.qsize())]
+
+    def test_configured_totalizers_replace_the_default_tag(self) -> None:
+        cycles = [{"WM01_TOT": 5.0, "TOT_WM001": 50.0, "WM01_TOT_SCADA": 1.0}, {"WM01_TOT": 6.0, "TOT_WM001": 53.0, "WM01_TOT_SCADA": 2.0}]
+        payloads = self._run({}, {"totalizers": ["WM01_TOT", {"tag": "TOT_WM001", "output": "WM001_Q"}]}, cycles)
+        self.assertEqual(payloads[1]["WM01_TOT_DELTA"], 1.0)
+        self.assertEqual(payloads[1]["WM001_Q"], 3.0)
+        self.assertNotIn(main.DELTA_TAG, payloads[1])
+
+    def test_empty_list_on_the_lagoon_disables_the_stage(self) -> None:
+        payloads = self._run({"totalizers": []}, {"totalizers": ["WM01_TOT"]}, [{"WM01_TOT": 5.0}, {"WM01_TOT": 6.0}])
+        self.assertEqual(payloads, [{"WM01_TOT": 5.0}, {"WM01_TOT": 6.0}])
+
+    def test_default_keeps_the_historic_delta_tag(self) -> None:
+        payloads = self._run({}, {}, [{main.TOT_TAG: 5.0}, {main.TOT_TAG: 7.5}])
+        self.assertEqual(payloads[1][main.DELTA_TAG], 2.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import main
+from common.scheduler import TickScheduler
+from common.watchdog import LagoonWatchdog
+from storage import jsonl_buffer
+from workers.get_simulator import SimulatedTagReader
+
+
+def _wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class _WedgedReader:
+    """Reader colgado dentro de una llamada bloqueante del driver."""
+
+    def __init__(self) -> None:
+        self.release = threading.Event()
+        self.entered = threading.Event()
+        self.closed = False
+
+    def read_once(self) -> dict:
+        self.entered.set()
+        self.release.wait()
+        return {"PT101_R": 99.0}
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class _Target:
+    def __init__(self, lagoon_id: str, stall_sec: float) -> None:
+        self.lagoon_id = lagoon_id
+        self.watchdog_stall_sec = stall_sec
+        self.last_beat = 0.0
+        self.now = 0.0
+
+    def beat(self) -> None:
+        self.last_beat = self.now
+
+    def stalled_for(self, now: float) -> float:
+        return now - self.last_beat
+
+
+class LagoonWatchdogTests(unittest.TestCase):
+    def test_only_the_stalled_lagoon_is_recovered(self) -> None:
+        clock = [100.0]
+        healthy = _Target("healthy", 30.0)
+        stuck = _Target("stuck", 30.0)
+        disabled = _Target("disabled", 0.0)
+        healthy.last_beat = 95.0
+        for target in (healthy, stuck, disabled):
+            target.now = 100.0
+        recovered = []
+        watchdog = LagoonWatchdog([healthy, stuck, disabled], recovered.append, clock=lambda: clock[0])
+
+        with self.assertLogs("collector", level="WARNING"):
+            self.assertEqual(watchdog.check(), ["stuck"])
+        self.assertEqual(recovered, [stuck])
+        self.assertEqual(stuck.last_beat, 100.0)
+        self.assertEqual(watchdog.check(), [])
+
+    def test_failed_recovery_waits_a_full_stall_period(self) -> None:
+        clock = [100.0]
+        stuck = _Target("stuck", 10.0)
+        stuck.now = 100.0
+
+        def _fail(target) -> None:
+            raise RuntimeError("bad config")
+
+        watchdog = LagoonWatchdog([stuck], _fail, clock=lambda: clock[0])
+        with self.assertLogs("collector", level="ERROR"):
+            self.assertEqual(watchdog.check(), ["stuck"])
+        clock[0] = 105.0
+        self.assertEqual(watchdog.check(), [])
+
+
+class CollectorWatchdogTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        cwd = os.getcwd()
+        os.chdir(tmpdir.name)
+        self.addCleanup(tmpdir.cleanup)
+        self.addCleanup(os.chdir, cwd)
+        self.addCleanup(jsonl_buffer.close_all)
+
+        cfg = {
+            "lagoon_id": "wedged",
+            "source": "simulator",
+            "poll_seconds": 0.02,
+            "timezone": "UTC",
+            "runtime": {"watchdog_stall_sec": 0.2, "log_every_n_cycles": 0},
+            "simulator": {"seed": 1, "tags": {"PT101_R": {"type": "float"}}},
+        }
+        self.collector = main.LagoonCollector(cfg, {})
+        self.wedged = _WedgedReader()
+        self.collector.reader = self.wedged
+        self.addCleanup(self.wedged.release.set)
+
+    def _recover_until_rebuilt(self, watchdog: LagoonWatchdog) -> None:
+        self.assertTrue(self.wedged.entered.wait(2.0))
+        with self.assertLogs("collector", level="WARNING"):
+            self.assertTrue(_wait_until(lambda: bool(watchdog.check())))
+
+    def test_thread_loop_is_replaced_and_state_is_kept(self) -> None:
+        collector = self.collector
+        tag_plan = collector.tag_plan
+        normalizer = collector.tot_normalizer
+        old_thread = main.start_collector_thread(collector, jitter=False)
+        threads = []
+
+        def _recover(target) -> None:
+            target.rebuild_reader()
+            threads.append(main.start_collector_thread(target, jitter=False))
+
+        self._recover_until_rebuilt(LagoonWatchdog([collector], _recover))
+        self.assertIsInstance(collector.reader, SimulatedTagReader)
+        self.assertTrue(_wait_until(lambda: self.wedged.closed))
+        self.assertEqual((collector.generation, collector.rebuilds), (1, 1))
+
+        cycles = collector.cycle_count
+        self.assertTrue(_wait_until(lambda: collector.cycle_count >= cycles + 3))
+        self.assertIsNotNone(collector.last_read_ok_ts)
+        self.assertIs(collector.tag_plan, tag_plan)
+        self.assertIs(collector.tot_normalizer, normalizer)
+
+        # La lectura colgada vuelve tarde: se descarta y su loop termina.
+        self.wedged.release.set()
+        old_thread.join(2.0)
+        self.assertFalse(old_thread.is_alive())
+        self.assertTrue(threads[0].is_alive())
+        collector.generation += 1
+        threads[0].join(2.0)
+
+    def test_tick_job_is_reset_after_a_stall(self) -> None:
+        collector = self.collector
+        scheduler = TickScheduler(max_workers=2, stats_every_sec=0)
+        self.addCleanup(self.wedged.release.set)
+        self.addCleanup(scheduler.stop, 1.0)
+        scheduler.add(collector.lagoon_id, collector.poll, collector.run_cycle, phase_sec=0.0)
+        scheduler.start()
+
+        def _recover(target) -> None:
+            target.rebuild_reader()
+            scheduler.reset(target.lagoon_id)
+
+        self._recover_until_rebuilt(LagoonWatchdog([collector], _recover))
+        runs = scheduler.jobs[collector.lagoon_id].runs
+        self.assertTrue(_wait_until(lambda: scheduler.jobs[collector.lagoon_id].runs >= runs + 3))
+        self.assertIsInstance(collector.reader, SimulatedTagReader)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Any, Callable
+
+from common.logger import get_logger
+
+logger = get_logger("collector.connection")
+
+STATE_DISCONNECTED = "disconnected"
+STATE_CONNECTING = "connecting"
+STATE_CONNECTED = "connected"
+STATE_BACKOFF = "backoff"
+
+
+class ConnectionManager:
+    """
+    Conexion compartida por los readers de PLC. `ensure_connected` nunca
+    bloquea el loop de polling: lanza el connect en una hebra y devuelve
+    False mientras no haya conexion. Tras un connect fallido espera un
+    backoff exponencial con jitter antes del siguiente intento, asi un PLC
+    caido no consume el timeout del driver en cada ciclo.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        connect: Callable[[], None],
+        *,
+        backoff_base_sec: float = 1.0,
+        backoff_max_sec: float = 60.0,
+        jitter: float = 0.2,
+        background: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[float, float], float] = random.uniform,
+    ) -> None:
+        self.name = name
+        self._connect = connect
+        self.backoff_base_sec = max(0.0, float(backoff_base_sec))
+        self.backoff_max_sec = max(self.backoff_base_sec, float(backoff_max_sec))
+        self.jitter = min(max(0.0, float(jitter)), 1.0)
+        self.background = background
+        self.clock = clock
+        self.rng = rng
+
+        self._lock = threading.Lock()
+        self._state = STATE_DISCONNECTED
+        self._next_attempt_at = 0.0
+        self._thread: threading.Thread | None = None
+
+        self.attempts = 0
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error: str | None = None
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def connected(self) -> bool:
+        return self._state == STATE_CONNECTED
+
+    def delay_for(self, failures: int) -> float:
+        if failures <= 0:
+            return 0.0
+        delay = min(self.backoff_base_sec * (2 ** (failures - 1)), self.backoff_max_sec)
+        if self.jitter:
+            delay *= 1.0 + self.rng(-self.jitter, self.jitter)
+        return max(0.0, delay)
+
+    def retry_in(self) -> float:
+        if self._state != STATE_BACKOFF:
+            return 0.0
+        return max(0.0, self._next_attempt_at - self.clock())
+
+    def ensure_connected(self) -> bool:
+        with self._lock:
+            if self._state == STATE_CONNECTED:
+                return True
+            if self._state == STATE_CONNECTING:
+                return False
+            if self._state == STATE_BACKOFF and self.clock() < self._next_attempt_at:
+                return False
+            self._state = STATE_CONNECTING
+            self.attempts += 1
+
+        if not self.background:
+            self._attempt()
+            return self.connected
+
+        self._thread = threading.Thread(
+            target=self._attempt,
+            name=f"connect-{self.name}",
+            daemon=True,
+        )
+        self._thread.start()
+        return False
+
+    def _attempt(self) -> None:
+        try:
+            self._connect()
+        except Exception as exc:
+            with self._lock:
+                self.failures += 1
+                self.consecutive_failures += 1
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                delay = self.delay_for(self.consecutive_failures)
+                self._next_attempt_at = self.clock() + delay
+                self._state = STATE_BACKOFF
+            logger.warning(
+                "[PLC CONNECT] name=%s state=%s attempt=%s retry_in=%.1fs err=%s",
+                self.name,
+                STATE_BACKOFF,
+                self.attempts,
+                delay,
+                self.last_error,
+            )
+            return
+        self.mark_connected()
+
+    def mark_connected(self) -> None:
+        with self._lock:
+            if self._state == STATE_CONNECTED:
+                return
+            self._state = STATE_CONNECTED
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.last_error = None
+        logger.info("[PLC CONNECT] name=%s state=%s attempts=%s", self.name, STATE_CONNECTED, self.attempts)
+
+    def mark_disconnected(self, error: str | None = None) -> None:
+        """Conexion perdida durante una lectura; el proximo intento es inmediato."""
+        with self._lock:
+            if self._state == STATE_CONNECTING:
+                return
+            self._state = STATE_DISCONNECTED
+            if error:
+                self.last_error = error
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Espera el intento en curso (tests y arranque); devuelve si quedo conectado."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.connected
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "state": self._state,
+            "attempts": self.attempts,
+            "successes": self.successes,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_in_sec": round(self.retry_in(), 3),
+            "last_error": self.last_error,
+        }
@@ -1,9 +1,17 @@
-from pycomm3 import LogixDriver
 from pycomm3.exceptions import CommError
+import threading
 import time
-from typing import Any
+from typing import Any, Callable
 
 from common.logger import get_logger
+from workers.connection import ConnectionManager
+from workers.rockwell_tag_cache import (
+    CachedLogixDriver,
+    TagDefinitionCache,
+    base_tag,
+    is_definition_error,
+    plc_signature,
+)
 
 logger = get_logger("collector.rockwell")
 
@@ -18,6 +26,11 @@ class RockwellSessionReader:
         max_consecutive_fails: int = 10,
         timeout_sec: float = 5.0,
         debug_types: bool = False,  
+        reconnect_backoff_base_sec: float = 1.0,
+        reconnect_backoff_max_sec: float = 60.0,
+        background_connect: bool = True,
+        tag_cache: TagDefinitionCache | None = None,
+        driver_factory: Callable[..., CachedLogixDriver] = CachedLogixDriver,
     ):
         self.ip = ip
         self.slot = slot
@@ -29,58 +42,213 @@ class RockwellSessionReader:
 
         self._last_connect_ts: float = 0.0
         self._consecutive_fails: int = 0
-        self._driver: LogixDriver | None = None
+        self._driver: CachedLogixDriver | None = None
+        # Rotacion: el driver nuevo conecta aparte y se cambia entre lecturas.
+        self._next_driver: CachedLogixDriver | None = None
+        self._rotating = False
+        self._closed = False
+        self._driver_lock = threading.Lock()
+        self.tag_cache = tag_cache
+        self.driver_factory = driver_factory
+        self.last_connect_sec = 0.0
 
         # cache de direcciones PLC para batch read
         self._plc_tags = list(self.tag_map.values())
         self._logical_by_plc_tag = {plc: logical for logical, plc in self.tag_map.items()}
+        self._base_tags = sorted({base_tag(plc_tag) for plc_tag in self._plc_tags})
+        self._plc_tags_by_ids: dict[tuple[str, ...], list[str]] = {}
+        self._cache_key = f"rockwell_{ip}_{slot}"
+
+        self.connection = ConnectionManager(
+            f"rockwell:{ip}",
+            self._connect,
+            backoff_base_sec=reconnect_backoff_base_sec,
+            backoff_max_sec=reconnect_backoff_max_sec,
+            background=background_connect,
+        )
 
     # =========================
     # CONNECTION
     # =========================
 
     def _connect(self):
-        self._disconnect()
+        driver = self._open_driver()
+        with self._driver_lock:
+            if self._closed:
+                # close() durante el connect en segundo plano: el driver nuevo no se instala.
+                self._close_driver(driver)
+                raise ConnectionError("reader closed")
+            old, self._driver = self._driver, driver
+            self._last_connect_ts = time.time()
+            self._consecutive_fails = 0
+        self._close_driver(old)
 
-        driver = LogixDriver(
+    def _open_driver(self) -> CachedLogixDriver:
+        started = time.perf_counter()
+        driver = self.driver_factory(
             self.ip,
             slot=self.slot,
             timeout=self.timeout_sec,
         )
         driver.open()
+        try:
+            self._load_tag_definitions(driver)
+        except Exception:
+            self._close_driver(driver)
+            raise
 
-        self._driver = driver
-        self._last_connect_ts = time.time()
-        self._consecutive_fails = 0
+        self.last_connect_sec = time.perf_counter() - started
+        logger.info(
+            "Connected to Rockwell PLC ip=%s definitions=%s connect_ms=%.1f",
+            self.ip,
+            driver.definitions_source,
+            self.last_connect_sec * 1000,
+        )
+        return driver
 
-        logger.info("Connected to Rockwell PLC ip=%s", self.ip)
+    def _load_tag_definitions(self, driver: CachedLogixDriver):
+        # Definiciones cacheadas por controlador: evitan el upload completo en cada reconexion.
+        if self.tag_cache is not None:
+            definitions = self.tag_cache.load(self._cache_key, plc_signature(driver.info))
+            if definitions is not None and definitions.covers(self._base_tags):
+                try:
+                    driver.load_definitions(definitions)
+                    return
+                except Exception as exc:
+                    logger.warning("[ROCKWELL TAG CACHE] ip=%s invalid=%s", self.ip, exc)
+                    self.tag_cache.invalidate(self._cache_key)
 
-    def _disconnect(self):
-        if self._driver:
+        definitions = driver.upload_definitions(self._base_tags)
+        if self.tag_cache is not None:
+            try:
+                self.tag_cache.save(self._cache_key, definitions)
+            except OSError as exc:
+                logger.warning("[ROCKWELL TAG CACHE] ip=%s save_failed=%s", self.ip, exc)
+
+    @staticmethod
+    def _close_driver(driver: CachedLogixDriver | None):
+        if driver is not None:
             try:
-                self._driver.close()
+                driver.close()
             except Exception:
                 pass
-        self._driver = None
+
+    def _disconnect(self):
+        with self._driver_lock:
+            drivers = (self._driver, self._next_driver)
+            self._driver = None
+            self._next_driver = None
+        for driver in drivers:
+            self._close_driver(driver)
+
+    def _invalidate_tag_cache(self):
+        # Un error de tipo/tag con definiciones cacheadas: el programa cambio; reconecta con upload completo.
+        logger.warning("[ROCKWELL TAG CACHE] ip=%s invalidated=read_error", self.ip)
+        if self.tag_cache is not None:
+            self.tag_cache.invalidate(self._cache_key)
+        self._drop_connection("stale tag definitions")
 
     def _should_rotate(self) -> bool:
         return (
-            self._driver is None
-            or (time.time() - self._last_connect_ts) >= self.force_reconnect_every_sec
+            self._driver is not None
+            and not self._rotating
+            and self._next_driver is None
+            and (time.time() - self._last_connect_ts) >= self.force_reconnect_every_sec
         )
 
+    def _start_rotation(self):
+        self._rotating = True
+        if not self.connection.background:
+            self._rotate()
+            return
+        threading.Thread(
+            target=self._rotate,
+            name=f"rotate-rockwell:{self.ip}",
+            daemon=True,
+        ).start()
+
+    def _rotate(self):
+        # El driver actual sigue leyendo mientras conecta el nuevo: la rotacion no deja ciclos vacios.
+        try:
+            driver = self._open_driver()
+        except Exception as exc:
+            logger.warning(
+                "[PLC CONNECT] name=%s action=rotate_failed err=%s: %s",
+                self.connection.name,
+                type(exc).__name__,
+                exc,
+            )
+            driver = None
+        stale = None
+        with self._driver_lock:
+            self._rotating = False
+            if driver is None:
+                # Rotacion fallida: se sigue con el driver actual hasta el proximo intervalo.
+                self._last_connect_ts = time.time()
+            elif self._closed or self._driver is None:
+                # Cerrado o conexion caida durante la rotacion: el reconnect normal toma el relevo.
+                stale = driver
+            else:
+                self._next_driver = driver
+        self._close_driver(stale)
+
+    def _swap_driver(self):
+        with self._driver_lock:
+            if self._next_driver is None:
+                return
+            old, self._driver, self._next_driver = self._driver, self._next_driver, None
+            self._last_connect_ts = time.time()
+            self._consecutive_fails = 0
+        self._close_driver(old)
+        logger.info(
+            "[PLC CONNECT] name=%s action=rotated connect_ms=%.1f",
+            self.connection.name,
+            self.last_connect_sec * 1000,
+        )
+
+    def _drop_connection(self, error: str | None = None):
+        self._disconnect()
+        self.connection.mark_disconnected(error)
+
+    def close(self) -> None:
+        with self._driver_lock:
+            self._closed = True
+        self._drop_connection("closed")
+
     # =========================
     # READ (BATCH)
     # =========================
 
+    @property
+    def tag_ids(self) -> list[str]:
+        return list(self.tag_map)
+
     def read_once(self) -> dict[str, Any]:
+        return self._read_plc_tags(self._plc_tags)
+
+    def read_tags(self, tag_ids: tuple[str, ...]) -> dict[str, Any]:
+        """Lectura batch de un subconjunto de tags logicos (scan classes)."""
+        plc_tags = self._plc_tags_by_ids.get(tag_ids)
+        if plc_tags is None:
+            plc_tags = [self.tag_map[tag_id] for tag_id in tag_ids]
+            self._plc_tags_by_ids[tag_ids] = plc_tags
+        return self._read_plc_tags(plc_tags)
+
+    def _read_plc_tags(self, plc_tags: list[str]) -> dict[str, Any]:
         if self._should_rotate():
-            self._connect()
+            self._start_rotation()
+        if self._next_driver is not None:
+            self._swap_driver()
+
+        # Sin conexion se devuelve {} al instante; el connect corre en segundo plano con backoff.
+        if not self.connection.ensure_connected():
+            return {}
 
         values: dict[str, Any] = {}
+        stale_definitions = False
 
         try:
-            results = self._driver.read(*self._plc_tags)
+            results = self._driver.read(*plc_tags)
             if not isinstance(results, list):
                 results = [results]
 
@@ -92,6 +260,8 @@ class RockwellSessionReader:
 
                 if res.error:
                     values[logical_tag] = None
+                    if is_definition_error(res.error):
+                        stale_definitions = True
                     continue
 
                 raw_value = res.value
@@ -106,19 +276,21 @@ class RockwellSessionReader:
                         type(value).__name__,
                     )
 
+            if stale_definitions and self._driver.definitions_source == "cache":
+                self._invalidate_tag_cache()
             self._consecutive_fails = 0
             return values
 
-        except CommError:
+        except CommError as exc:
             self._consecutive_fails += 1
             if self._consecutive_fails >= self.max_consecutive_fails:
-                self._disconnect()
+                self._drop_connection(f"CommError: {exc}")
             return {}
 
-        except Exception:
+        except Exception as exc:
             self._consecutive_fails += 1
             if self._consecutive_fails >= self.max_consecutive_fails:
-                self._disconnect()
+                self._drop_connection(f"{type(exc).__name__}: {exc}")
             return {}
 
     # =========================
@@ -1,12 +1,34 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
 from typing import Any, Callable
 
 from common.logger import get_logger
-from opcua import Client
+from opcua import Client, ua
 from opcua.ua.uaerrors import UaError
+from workers.connection import ConnectionManager
 
 logger = get_logger("collector.siemens")
 
 
+READ_MODE_POLL = "poll"
+READ_MODE_SUBSCRIPTION = "subscription"
+
+
+class _SubscriptionHandler:
+    """Recibe notificaciones del cliente OPC UA (hebra del cliente) y actualiza el cache."""
+
+    def __init__(self, reader: "SiemensSessionReader") -> None:
+        self._reader = reader
+
+    def datachange_notification(self, node, val, data) -> None:
+        self._reader._on_datachange(node, val)
+
+    def status_change_notification(self, status) -> None:
+        self._reader._on_subscription_status(status)
+
+
 class SiemensSessionReader:
     def __init__(
         self,
@@ -15,12 +37,29 @@ class SiemensSessionReader:
         timeout_sec: float = 4,
         username: str | None = None,
         password: str | None = None,
+        read_mode: str = READ_MODE_POLL,
+        sampling_interval_ms: float = 500.0,
+        deadband: float = 0.0,
+        subscription_refresh_sec: float = 60.0,
+        subscription_liveness_sec: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+        reconnect_backoff_base_sec: float = 1.0,
+        reconnect_backoff_max_sec: float = 60.0,
+        background_connect: bool = True,
     ):
         self.endpoint = endpoint
         self.tag_map = tag_map
         self.timeout_sec = timeout_sec
         self.username = username
         self.password = password
+        self.read_mode = str(read_mode or READ_MODE_POLL).strip().lower()
+        if self.read_mode not in {READ_MODE_POLL, READ_MODE_SUBSCRIPTION}:
+            raise ValueError(f"Unsupported Siemens read_mode: {read_mode!r}")
+        self.sampling_interval_ms = max(0.0, float(sampling_interval_ms))
+        self.deadband = max(0.0, float(deadband))
+        self.subscription_refresh_sec = max(0.0, float(subscription_refresh_sec))
+        self.subscription_liveness_sec = max(0.0, float(subscription_liveness_sec))
+        self.clock = clock
 
         self.client: Client | None = None
         self.nodes: dict[str, Any] = {}
@@ -28,8 +67,31 @@ class SiemensSessionReader:
         self._nodes_in_order: list[Any] = []
         self._connected = False
 
+        self._subscription = None
+        self._subscription_failed = False
+        self._tags_by_node: dict[Any, list[str]] = {}
+        self._cache: dict[str, Any] = {}
+        self._cache_lock = threading.Lock()
+        self._last_refresh = 0.0
+        # Ultima prueba de que la sesion vive: una notificacion o una lectura directa.
+        self._last_alive = 0.0
+        self.poll_reads = 0
+        self.notifications = 0
+
+        self.connection = ConnectionManager(
+            f"siemens:{endpoint}",
+            self.connect,
+            backoff_base_sec=reconnect_backoff_base_sec,
+            backoff_max_sec=reconnect_backoff_max_sec,
+            background=background_connect,
+        )
+
+    @property
+    def subscribed(self) -> bool:
+        return self._subscription is not None and not self._subscription_failed
+
     def connect(self):
-        self.disconnect()
+        self._close()
 
         client = Client(self.endpoint, timeout=self.timeout_sec)
 
@@ -45,7 +107,19 @@ class SiemensSessionReader:
         self._nodes_in_order = [self.nodes[tag_id] for tag_id in self._tag_ids]
         self._connected = True
 
+        if self.read_mode == READ_MODE_SUBSCRIPTION:
+            self._subscribe()
+        self.connection.mark_connected()
+
     def disconnect(self):
+        self._close()
+        self.connection.mark_disconnected()
+
+    def close(self) -> None:
+        self.disconnect()
+
+    def _close(self):
+        self._drop_subscription()
         if self.client:
             try:
                 self.client.disconnect()
@@ -58,16 +132,150 @@ class SiemensSessionReader:
         self._nodes_in_order = []
         self._connected = False
 
+    # =========================
+    # SUBSCRIPTION
+    # =========================
+
+    def _monitored_item_requests(self) -> list[ua.MonitoredItemCreateRequest]:
+        # Armado con los tipos `ua` publicos, sin helpers privados de `Subscription`.
+        mfilter = None
+        if self.deadband > 0:
+            mfilter = ua.DataChangeFilter()
+            mfilter.Trigger = ua.DataChangeTrigger.StatusValue
+            mfilter.DeadbandType = ua.DeadbandType.Absolute
+            mfilter.DeadbandValue = self.deadband
+
+        requests = []
+        # La suscripcion es nueva en cada connect: los client handles solo deben ser unicos dentro de ella.
+        for handle, node in enumerate(dict.fromkeys(self._nodes_in_order), start=1):
+            item = ua.ReadValueId()
+            item.NodeId = node.nodeid
+            item.AttributeId = ua.AttributeIds.Value
+
+            params = ua.MonitoringParameters()
+            params.ClientHandle = handle
+            params.SamplingInterval = self.sampling_interval_ms
+            params.QueueSize = 0
+            params.DiscardOldest = True
+            if mfilter is not None:
+                params.Filter = mfilter
+
+            request = ua.MonitoredItemCreateRequest()
+            request.ItemToMonitor = item
+            request.MonitoringMode = ua.MonitoringMode.Reporting
+            request.RequestedParameters = params
+            requests.append(request)
+        return requests
+
+    def _subscribe(self) -> None:
+        self._tags_by_node = {}
+        for tag_id, node in zip(self._tag_ids, self._nodes_in_order):
+            self._tags_by_node.setdefault(node.nodeid, []).append(tag_id)
+
+        try:
+            # Cache inicial completo: las notificaciones iniciales pueden tardar un ciclo de publicacion.
+            self._refresh_cache()
+            subscription = self.client.create_subscription(
+                self.sampling_interval_ms,
+                _SubscriptionHandler(self),
+            )
+            self._subscription = subscription
+            self._subscription_failed = False
+            results = subscription.create_monitored_items(self._monitored_item_requests())
+            bad = [result for result in results if isinstance(result, ua.StatusCode)]
+            if bad:
+                raise UaError(f"monitored items rejected count={len(bad)} status={bad[0]}")
+        except Exception as exc:
+            logger.warning(
+                "[SIEMENS SUBSCRIPTION] endpoint=%s fallback=poll err=%s",
+                self.endpoint,
+                exc,
+            )
+            self._drop_subscription()
+            return
+
+        logger.info(
+            "[SIEMENS SUBSCRIPTION] endpoint=%s nodes=%s sampling_ms=%.0f deadband=%s",
+            self.endpoint,
+            len(self._tags_by_node),
+            self.sampling_interval_ms,
+            self.deadband,
+        )
+
+    def _drop_subscription(self) -> None:
+        subscription, self._subscription = self._subscription, None
+        self._subscription_failed = False
+        if subscription is not None:
+            try:
+                subscription.delete()
+            except Exception:
+                pass
+
+    def _on_datachange(self, node, value: Any) -> None:
+        tag_ids = self._tags_by_node.get(node.nodeid)
+        if not tag_ids:
+            return
+        with self._cache_lock:
+            for tag_id in tag_ids:
+                self._cache[tag_id] = value
+            self.notifications += 1
+        self._last_alive = self.clock()
+
+    def _on_subscription_status(self, status) -> None:
+        logger.warning("[SIEMENS SUBSCRIPTION] endpoint=%s status=%s fallback=poll", self.endpoint, status)
+        self._subscription_failed = True
+
+    def _poll_values(self, tag_ids: tuple[str, ...] | None = None) -> dict[str, Any]:
+        if tag_ids is None:
+            tag_ids, nodes = self._tag_ids, self._nodes_in_order
+        else:
+            nodes = [self.nodes[tag_id] for tag_id in tag_ids]
+        raw_values = self.client.get_values(nodes)
+        self.poll_reads += 1
+        return {tag_id: value for tag_id, value in zip(tag_ids, raw_values)}
+
+    def _refresh_cache(self) -> None:
+        values = self._poll_values()
+        with self._cache_lock:
+            self._cache = values
+        self._last_refresh = self._last_alive = self.clock()
+
+    def _read_subscribed(self, tag_ids: tuple[str, ...] | None = None) -> dict[str, Any]:
+        now = self.clock()
+        # Lectura completa periodica: corrige lo que el deadband filtro. Y si la sesion lleva
+        # `subscription_liveness_sec` sin notificaciones ni lecturas, pudo caer en silencio: se
+        # lee directo antes de servir el cache (si la red cayo, falla y read_tags reconecta).
+        if (self.subscription_refresh_sec and now - self._last_refresh >= self.subscription_refresh_sec) or (
+            self.subscription_liveness_sec and now - self._last_alive >= self.subscription_liveness_sec
+        ):
+            self._refresh_cache()
+        with self._cache_lock:
+            if tag_ids is None:
+                return dict(self._cache)
+            return {tag_id: self._cache.get(tag_id) for tag_id in tag_ids}
+
+    @property
+    def tag_ids(self) -> list[str]:
+        return list(self.tag_map)
+
     def read_once(self) -> dict:
-        if not self._connected:
-            self.connect()
+        return self.read_tags(None)
+
+    def read_tags(self, tag_ids: tuple[str, ...] | None) -> dict:
+        """Lectura batch de un subconjunto de tags (scan classes); None = todos."""
+        # Sin conexion se devuelve {} al instante; el connect corre en segundo plano con backoff.
+        if not self.connection.ensure_connected():
+            return {}
 
         if not self.client:
             return {}
 
         try:
-            raw_values = self.client.get_values(self._nodes_in_order)
-            return {tag_id: value for tag_id, value in zip(self._tag_ids, raw_values)}
+            if self._subscription_failed:
+                self._drop_subscription()
+            if self._subscription is not None:
+                return self._read_subscribed(tag_ids)
+            return self._poll_values(tag_ids)
         except UaError:
             self.disconnect()
             return {}
@@ -79,16 +287,49 @@ class SiemensSessionReader:
 SiemensReaderFactory = Callable[..., SiemensSessionReader]
 
 
+def subscription_options(cfg: dict[str, Any]) -> dict[str, Any]:
+    """Opciones de modo suscripcion presentes en un bloque `siemens` o en un modulo."""
+    options: dict[str, Any] = {}
+    if cfg.get("read_mode"):
+        options["read_mode"] = str(cfg["read_mode"])
+    for key in ("sampling_interval_ms", "deadband", "subscription_refresh_sec", "subscription_liveness_sec"):
+        if cfg.get(key) is not None:
+            options[key] = float(cfg[key])
+    return options
+
+
+DEFAULT_MODULE_READ_WORKERS = 8
+
+
 class SiemensModulesReader:
+    """
+    Lee los modulos OPC UA en paralelo sobre un pool acotado. Cada ciclo espera
+    a lo sumo `read_deadline_sec`; un modulo que no responde a tiempo aporta
+    None en sus tags (igual que un modulo caido) y su lectura sigue en segundo
+    plano. Mientras esa lectura no termine, el modulo no se vuelve a encolar;
+    su resultado solo se usa en un ciclo que pida el mismo subconjunto de tags
+    (scan class) con el que se encolo.
+    """
+
     def __init__(
         self,
         modules: list[dict[str, Any]],
         *,
         supplemental_tags: dict[str, Any] | None = None,
         reader_factory: SiemensReaderFactory = SiemensSessionReader,
+        read_deadline_sec: float | None = None,
+        max_workers: int = DEFAULT_MODULE_READ_WORKERS,
+        reader_options: dict[str, Any] | None = None,
     ) -> None:
         self.supplemental_tags = dict(supplemental_tags or {})
+        self.read_deadline_sec = read_deadline_sec
         self._readers: list[tuple[SiemensSessionReader, tuple[str, ...]]] = []
+        self._endpoints: list[str] = []
+        # Por modulo: (subconjunto de tags de la lectura, future).
+        self._in_flight: dict[int, tuple[tuple[str, ...], Future]] = {}
+        self._plans: dict[tuple[str, ...], list[tuple[int, Callable[[], dict], tuple[str, ...]]]] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self.deadline_misses = 0
 
         for module in modules:
             driver = str(module.get("driver") or "siemens").strip().lower()
@@ -112,20 +353,103 @@ class SiemensModulesReader:
                 timeout_sec=float(module.get("timeout_sec", 4)),
                 username=module.get("username"),
                 password=module.get("password"),
+                **subscription_options(module),
+                **(reader_options or {}),
             )
             self._readers.append((reader, tuple(tag_map)))
+            self._endpoints.append(endpoint)
 
-    def read_once(self) -> dict[str, Any]:
-        values = dict(self.supplemental_tags)
-        for reader, tag_ids in self._readers:
+        if len(self._readers) > 1:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, min(int(max_workers), len(self._readers))),
+                thread_name_prefix="siemens-read",
+            )
+
+    @staticmethod
+    def _merge(values: dict[str, Any], module_values: dict | None, tag_ids: tuple[str, ...]) -> None:
+        if module_values:
+            values.update(module_values)
+        else:
+            values.update({tag_id: None for tag_id in tag_ids})
+
+    @property
+    def tag_ids(self) -> list[str]:
+        ids = dict.fromkeys(self.supplemental_tags)
+        for _, module_ids in self._readers:
+            ids.update(dict.fromkeys(module_ids))
+        return list(ids)
+
+    def _module_reads(self, tag_ids: tuple[str, ...] | None) -> list[tuple[int, Callable[[], dict], tuple[str, ...]]]:
+        if tag_ids is None:
+            return [(index, reader.read_once, module_ids) for index, (reader, module_ids) in enumerate(self._readers)]
+        plan = self._plans.get(tag_ids)
+        if plan is None:
+            wanted = set(tag_ids)
+            plan = []
+            for index, (reader, module_ids) in enumerate(self._readers):
+                subset = tuple(tag_id for tag_id in module_ids if tag_id in wanted)
+                if subset:
+                    plan.append((index, partial(reader.read_tags, subset), subset))
+            self._plans[tag_ids] = plan
+        return plan
+
+    def _read_sequential(self, values: dict[str, Any], module_reads) -> dict[str, Any]:
+        for _, read, tag_ids in module_reads:
             try:
-                module_values = reader.read_once()
+                module_values = read()
             except Exception:
                 module_values = {}
+            self._merge(values, module_values, tag_ids)
+        return values
 
-            if module_values:
-                values.update(module_values)
+    def read_once(self) -> dict[str, Any]:
+        return self.read_tags(None)
+
+    def read_tags(self, tag_ids: tuple[str, ...] | None) -> dict[str, Any]:
+        """Solo se leen los modulos con tags pedidos (scan classes); None = todos."""
+        values = dict(self.supplemental_tags)
+        module_reads = self._module_reads(tag_ids)
+        if self._executor is None:
+            return self._read_sequential(values, module_reads)
+
+        # Un reader no es thread-safe: si su lectura previa sigue en curso no se encola otra.
+        # Esa lectura solo sirve a este ciclo si se encolo para el mismo subconjunto de tags.
+        futures: dict[int, Future] = {}
+        for index, read, module_ids in module_reads:
+            pending = self._in_flight.get(index)
+            if pending is None or pending[1].done():
+                pending = self._in_flight[index] = (module_ids, self._executor.submit(read))
+            if pending[0] == module_ids:
+                futures[index] = pending[1]
+
+        wait(futures.values(), timeout=self.read_deadline_sec)
+
+        for index, _, module_ids in module_reads:
+            future = futures.get(index)
+            module_values: dict | None = None
+            if future is not None and future.done():
+                del self._in_flight[index]
+                try:
+                    module_values = future.result()
+                except Exception:
+                    module_values = None
             else:
-                values.update({tag_id: None for tag_id in tag_ids})
+                self.deadline_misses += 1
+                logger.warning(
+                    "[SIEMENS MODULE DEADLINE] endpoint=%s deadline_sec=%s misses=%s",
+                    self._endpoints[index],
+                    self.read_deadline_sec,
+                    self.deadline_misses,
+                )
+            self._merge(values, module_values, module_ids)
 
         return values
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        for reader, _ in self._readers:
+            close = getattr(reader, "close", None)
+            if close is not None:
+                close()
@@ -21,6 +21,16 @@ class SimulatedTagReader:
             for tag_id, spec in self.tag_specs.items()
         }
 
+    @property
+    def tag_ids(self) -> list[str]:
+        return list(self.tag_specs)
+
+    def read_tags(self, tag_ids: tuple[str, ...]) -> dict[str, Any]:
+        return {
+            tag_id: self._next_value(tag_id, self.tag_specs[tag_id])
+            for tag_id in tag_ids
+        }
+
     def _next_value(self, tag_id: str, spec: Any) -> Any:
         if not isinstance(spec, dict):
             return spec
@@ -34,6 +44,11 @@ class SimulatedTagReader:
             return self._next_int(tag_id, spec)
         return self._next_float(tag_id, spec)
 
+    def _changes(self, spec: dict[str, Any]) -> bool:
+        # `change_probability` en analogos: por defecto se mueven en cada lectura.
+        change_probability = float(spec.get("change_probability", 1.0))
+        return change_probability >= 1.0 or self._random.random() < change_probability
+
     def _next_float(self, tag_id: str, spec: dict[str, Any]) -> float:
         min_value = float(spec.get("min", 0.0))
         max_value = float(spec.get("max", 100.0))
@@ -44,7 +59,7 @@ class SimulatedTagReader:
         current = self._state.get(tag_id)
         if not isinstance(current, (int, float)):
             current = self._random.uniform(min_value, max_value)
-        else:
+        elif self._changes(spec):
             current = float(current) + self._random.uniform(-step, step)
 
         next_value = min(max(float(current), min_value), max_value)
@@ -59,7 +74,7 @@ class SimulatedTagReader:
         current = self._state.get(tag_id)
         if not isinstance(current, int):
             current = self._random.randint(min_value, max_value)
-        else:
+        elif self._changes(spec):
             current += self._random.randint(-step, step)
 
         next_value = min(max(current, min_value), max_value)
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import base64
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable
+
+from pycomm3 import LogixDriver
+
+from common.logger import get_logger
+
+logger = get_logger("collector.rockwell")
+
+CACHE_VERSION = 1
+DEFAULT_TAG_CACHE_DIR = Path("data") / "tag_cache"
+
+# Errores de lectura que indican definiciones obsoletas (programa descargado de nuevo).
+DEFINITION_ERROR_MARKERS = (
+    "doesn't exist",
+    "does not exist",
+    "invalid ioi",
+    "failed to parse reply",
+    "invalid tag request",
+    "failed to build request path",
+)
+
+
+def base_tag(plc_tag: str) -> str:
+    """Tag base tal como lo indexa pycomm3 (`Program:X.Tag`, sin miembros ni indices)."""
+    tag = plc_tag.split("{", 1)[0]
+    base, *attrs = tag.split(".")
+    if base.startswith("Program:") and attrs:
+        base = f"{base}.{attrs[0]}"
+    return re.sub(r"\[[^\]]*\]$", "", base)
+
+
+def plc_signature(info: dict[str, Any]) -> str:
+    revision = info.get("revision") or {}
+    return ":".join(
+        str(part)
+        for part in (
+            info.get("product_code", ""),
+            info.get("serial", ""),
+            f"{revision.get('major', '')}.{revision.get('minor', '')}",
+            info.get("name", ""),
+        )
+    )
+
+
+def is_definition_error(error: Any) -> bool:
+    if not error:
+        return False
+    text = str(error).lower()
+    return any(marker in text for marker in DEFINITION_ERROR_MARKERS)
+
+
+@dataclass
+class TagDefinitions:
+    """Respuestas crudas del upload: atributos de simbolo, makeup y template de cada UDT."""
+
+    signature: str
+    raw_tags: dict[str, dict[str, Any]] = field(default_factory=dict)
+    makeups: dict[int, dict[str, Any]] = field(default_factory=dict)
+    templates: dict[int, bytes] = field(default_factory=dict)
+    saved_at: float = 0.0
+
+    def covers(self, base_tags: Iterable[str]) -> bool:
+        return all(tag in self.raw_tags for tag in base_tags)
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "version": CACHE_VERSION,
+            "signature": self.signature,
+            "saved_at": self.saved_at,
+            "raw_tags": self.raw_tags,
+            "makeups": {str(key): value for key, value in self.makeups.items()},
+            "templates": {
+                str(key): base64.b64encode(value).decode("ascii") for key, value in self.templates.items()
+            },
+        }
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> TagDefinitions:
+        return cls(
+            signature=str(data["signature"]),
+            raw_tags=dict(data["raw_tags"]),
+            makeups={int(key): value for key, value in data["makeups"].items()},
+            templates={int(key): base64.b64decode(value) for key, value in data["templates"].items()},
+            saved_at=float(data.get("saved_at", 0.0)),
+        )
+
+
+class TagDefinitionCache:
+    """Un archivo JSON por controlador (`<ip>_<slot>.json`) con las definiciones de los tags configurados."""
+
+    def __init__(self, directory: str | Path = DEFAULT_TAG_CACHE_DIR, max_age_sec: float = 0.0) -> None:
+        self.directory = Path(directory)
+        self.max_age_sec = max(0.0, float(max_age_sec))
+
+    def path_for(self, key: str) -> Path:
+        return self.directory / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', key)}.json"
+
+    def load(self, key: str, signature: str) -> TagDefinitions | None:
+        path = self.path_for(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("version") != CACHE_VERSION:
+                return None
+            definitions = TagDefinitions.from_json(data)
+        except FileNotFoundError:
+            return None
+        except Exception as exc:
+            logger.warning("[ROCKWELL TAG CACHE] key=%s unreadable=%s", key, exc)
+            return None
+
+        if definitions.signature != signature:
+            return None
+        if self.max_age_sec and time.time() - definitions.saved_at > self.max_age_sec:
+            return None
+        return definitions
+
+    def save(self, key: str, definitions: TagDefinitions) -> None:
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        definitions.saved_at = time.time()
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(definitions.to_json(), separators=(",", ":")), encoding="utf-8")
+        os.replace(temp_path, path)
+
+    def invalidate(self, key: str) -> None:
+        try:
+            self.path_for(key).unlink()
+        except FileNotFoundError:
+            pass
+
+
+class CachedLogixDriver(LogixDriver):
+    """
+    LogixDriver que no sube el tag list en `open()`. `upload_definitions` hace
+    el upload normal registrando las respuestas crudas; `load_definitions`
+    reconstruye las definiciones desde esas respuestas con el mismo parser de
+    pycomm3, sin tocar el PLC. Con definiciones cacheadas las lecturas van por
+    nombre simbolico: un instance_id viejo podria apuntar a otro tag.
+    """
+
+    def __init__(self, path: str, *args, **kwargs) -> None:
+        kwargs["init_tags"] = False
+        super().__init__(path, *args, **kwargs)
+        self._recording: TagDefinitions | None = None
+        self._template_source: dict[int, bytes] = {}
+        self.definitions_source = "none"
+
+    # pycomm3 llama estos hooks durante get_tag_list; aqui se registran o se sirven desde cache.
+
+    def _create_tag(self, name, raw_tag):
+        if self._recording is not None:
+            self._recording.raw_tags[name] = dict(raw_tag)
+        return super()._create_tag(name, raw_tag)
+
+    def _get_structure_makeup(self, instance_id):
+        makeup = super()._get_structure_makeup(instance_id)
+        if self._recording is not None:
+            self._recording.makeups[instance_id] = dict(makeup)
+        return makeup
+
+    def _read_template(self, instance_id, object_definition_size):
+        cached = self._template_source.get(instance_id)
+        if cached is not None:
+            return cached
+        data = super()._read_template(instance_id, object_definition_size)
+        if self._recording is not None:
+            self._recording.templates[instance_id] = data
+        return data
+
+    def upload_definitions(self, base_tags: Iterable[str]) -> TagDefinitions:
+        wanted = set(base_tags)
+        program = "*" if any(tag.startswith("Program:") for tag in wanted) else None
+        self._recording = TagDefinitions(signature=plc_signature(self.info))
+        try:
+            self.get_tag_list(program=program)
+        finally:
+            recording, self._recording = self._recording, None
+
+        recording.raw_tags = {name: raw for name, raw in recording.raw_tags.items() if name in wanted}
+        self.definitions_source = "upload"
+        return recording
+
+    def load_definitions(self, definitions: TagDefinitions) -> None:
+        self._cache = {
+            "tag_name:id": {},
+            "id:struct": dict(definitions.makeups),
+            "handle:id": {
+                makeup["structure_handle"]: instance_id
+                for instance_id, makeup in definitions.makeups.items()
+                if "structure_handle" in makeup
+            },
+            "id:udt": {},
+        }
+        self._template_source = definitions.templates
+        try:
+            self._tags = {name: self._create_tag(name, raw) for name, raw in definitions.raw_tags.items()}
+        finally:
+            self._cache = None
+            self._template_source = {}
+        self._cfg["use_instance_ids"] = False
+        self.definitions_source = "cache"
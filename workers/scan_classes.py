@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import fnmatch
+import time
+from typing import Any, Callable, Protocol
+
+
+class SubsetReader(Protocol):
+    tag_ids: list[str]
+
+    def read_tags(self, tag_ids: tuple[str, ...]) -> dict[str, Any]: ...
+
+
+class ScanClass:
+    __slots__ = ("name", "interval_sec", "patterns", "tag_ids", "next_due")
+
+    def __init__(self, name: str, interval_sec: float, patterns: list[str]) -> None:
+        self.name = name
+        self.interval_sec = interval_sec
+        self.patterns = patterns
+        self.tag_ids: tuple[str, ...] = ()
+        self.next_due = 0.0
+
+    def matches(self, tag_id: str) -> bool:
+        return any(fnmatch.fnmatchcase(tag_id, pattern) for pattern in self.patterns)
+
+
+def parse_scan_classes(raw: dict[str, Any] | None, poll_sec: float) -> list[ScanClass]:
+    """
+    `scan_classes` del YAML: `{nombre: {interval_sec: N, tags: [patrones]}}`.
+    Los patrones son fnmatch sobre el tag logico; gana la primera clase que
+    calza. Un intervalo menor a `poll_seconds` se sube a `poll_seconds`.
+    """
+    classes: list[ScanClass] = []
+    for name, spec in (raw or {}).items():
+        if not isinstance(spec, dict):
+            raise ValueError(f"scan class {name!r} must be a mapping")
+        patterns = spec.get("tags") or []
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        interval_sec = float(spec.get("interval_sec", poll_sec))
+        if interval_sec <= 0:
+            raise ValueError(f"scan class {name!r} interval_sec must be > 0")
+        classes.append(ScanClass(str(name), max(interval_sec, poll_sec), [str(p) for p in patterns]))
+    return classes
+
+
+class ScanClassReader:
+    """
+    Lectura multi-rate sobre un reader con `read_tags`. Los tags sin clase
+    se leen en cada tick (clase base a `poll_seconds`); cada tick junta las
+    clases vencidas en una sola lectura batch y el resto de los tags se
+    entrega con su ultimo valor conocido. Si la lectura falla (`{}`), las
+    clases quedan vencidas y se reintentan en el siguiente tick.
+    """
+
+    def __init__(
+        self,
+        reader: SubsetReader,
+        classes: list[ScanClass],
+        poll_sec: float,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.reader = reader
+        self.poll_sec = poll_sec
+        self.clock = clock
+        self.reads = 0
+        self.tags_read = 0
+
+        base = ScanClass("base", poll_sec, [])
+        assigned: dict[str, list[str]] = {scan_class.name: [] for scan_class in classes}
+        base_ids: list[str] = []
+        for tag_id in reader.tag_ids:
+            owner = next((scan_class for scan_class in classes if scan_class.matches(tag_id)), None)
+            if owner is None:
+                base_ids.append(tag_id)
+            else:
+                assigned[owner.name].append(tag_id)
+        base.tag_ids = tuple(base_ids)
+        for scan_class in classes:
+            scan_class.tag_ids = tuple(assigned[scan_class.name])
+
+        self.classes = [scan_class for scan_class in [base, *classes] if scan_class.tag_ids]
+        self._ids_by_due: dict[tuple[int, ...], tuple[str, ...]] = {}
+        self._last: dict[str, Any] = {}
+
+    def _ids_for(self, due: tuple[int, ...]) -> tuple[str, ...]:
+        ids = self._ids_by_due.get(due)
+        if ids is None:
+            ids = tuple(tag_id for index in due for tag_id in self.classes[index].tag_ids)
+            self._ids_by_due[due] = ids
+        return ids
+
+    def read_once(self) -> dict[str, Any]:
+        now = self.clock()
+        # Medio tick de tolerancia: el jitter del loop no debe correr una clase al tick siguiente.
+        horizon = now + self.poll_sec / 2
+        due = tuple(index for index, scan_class in enumerate(self.classes) if scan_class.next_due <= horizon)
+        if not due:
+            return dict(self._last)
+
+        tag_ids = self._ids_for(due)
+        values = self.reader.read_tags(tag_ids)
+        self.reads += 1
+        self.tags_read += len(tag_ids)
+        if not values:
+            return {}
+
+        for index in due:
+            scan_class = self.classes[index]
+            scan_class.next_due += scan_class.interval_sec
+            if scan_class.next_due <= now:
+                scan_class.next_due = now + scan_class.interval_sec
+        self._last.update(values)
+        return dict(self._last)
+
+    def __getattr__(self, name: str) -> Any:
+        # connection, close(), etc. del reader envuelto.
+        return getattr(self.reader, name)